@@ -0,0 +1,265 @@
+"""
+Streaming Block File Format for SPIMI
+=====================================
+Milestone 2 - SEG301: Search Engines & Information Retrieval
+
+Định dạng file block tuần tự, thay cho pickle.dump(sorted_index):
+- Block pickle cũ buộc merging.py phải load TOÀN BỘ block vào RAM
+  (và sort lại) trước khi merge -> RAM khi merge tăng theo số block.
+- Định dạng mới ghi từng record (term, postings) nối tiếp nhau, có tiền tố
+  độ dài -> đọc tuần tự term-by-term với 1 buffer nhỏ.
+
+Cấu trúc file block_XXXX.blk:
+    [Header 8 bytes]  MAGIC (4s) | VERSION (uint16) | FLAGS (uint16)
+    [Record]*         term_len (uint16) | term (UTF-8)
+                      postings_len (uint32) | postings (postings_codec)
+                      [positions_len (uint32) | positions]   nếu FLAG_POSITIONS
+
+Records được ghi theo thứ tự term tăng dần (đúng thứ tự K-way merge cần).
+Mỗi record đọc ra là (term, doc_ids, tfs, positions); positions = None
+nếu block không có index vị trí (xem positions.py). Block theo trường
+(FLAG_FIELDS, số trường ở byte cao của FLAGS) có tfs là ma trận n x F.
+
+Sidecar block_XXXX.smp (JSON): cứ SAMPLE_INTERVAL records lấy mẫu 1 cặp
+(term, byte offset của record). Merge song song dùng mẫu này để chia không
+gian term thành các khoảng [lo, hi) và seek thẳng tới đầu khoảng trong
+mỗi block thay vì đọc từ đầu file.
+"""
+
+import os
+import json
+import struct
+import pickle
+from bisect import bisect_right
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from src.indexer.postings_codec import (
+    encode_postings, decode_postings, postings_from_pairs, fields_flags, num_fields_from_flags,
+)
+from src.indexer.positions import encode_positions, decode_positions
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+BLOCK_MAGIC = b"OFBK"
+BLOCK_VERSION = 1
+BLOCK_EXT = ".blk"
+LEGACY_BLOCK_EXT = ".pkl"
+
+# Header flags
+FLAG_POSITIONS = 1
+
+HEADER_STRUCT = struct.Struct("<4sHH")
+TERM_LEN_STRUCT = struct.Struct("<H")
+POSTINGS_LEN_STRUCT = struct.Struct("<I")
+
+# Buffer đọc mặc định cho mỗi block khi merge (RAM merge ~ số block mở x buffer)
+DEFAULT_READ_BUFFER = 64 * 1024
+
+# Sidecar lấy mẫu term boundaries
+SAMPLE_EXT = ".smp"
+SAMPLE_INTERVAL = 256
+
+
+def sample_path(block_path: str) -> str:
+    """Đường dẫn file sample đi kèm block."""
+    return os.path.splitext(block_path)[0] + SAMPLE_EXT
+
+
+# ============================================================================
+# WRITER
+# ============================================================================
+
+class BlockWriter:
+    """Ghi 1 block file theo kiểu streaming, term tăng dần."""
+
+    def __init__(self, path: str, sample_interval: int = SAMPLE_INTERVAL,
+                 positions: bool = False, num_fields: int = 0):
+        self.path = path
+        self.sample_interval = sample_interval
+        self.positions = positions
+        self.num_fields = num_fields
+        self._file = open(path, "wb")
+        flags = (FLAG_POSITIONS if positions else 0) | fields_flags(num_fields)
+        self._file.write(HEADER_STRUCT.pack(BLOCK_MAGIC, BLOCK_VERSION, flags))
+        self._prev_term = None
+        self._samples = []
+        self.num_terms = 0
+
+    def add(self, term: str, doc_ids, tfs, positions=None):
+        """
+        Ghi 1 record. doc_ids phải tăng dần; term phải lớn hơn term trước.
+        positions (mảng vị trí phẳng) bắt buộc nếu block có index vị trí.
+        """
+        if self._prev_term is not None and term <= self._prev_term:
+            raise ValueError(f"Block terms must be strictly increasing: {term!r}")
+        if self.positions and positions is None:
+            raise ValueError(f"Missing positions for {term!r} in a positional block")
+        encoded_term = term.encode("utf-8")
+        data = encode_postings(doc_ids, tfs)
+
+        if self.num_terms % self.sample_interval == 0:
+            self._samples.append((term, self._file.tell()))
+        self._file.write(TERM_LEN_STRUCT.pack(len(encoded_term)))
+        self._file.write(encoded_term)
+        self._file.write(POSTINGS_LEN_STRUCT.pack(len(data)))
+        self._file.write(data)
+        if self.positions:
+            position_data = encode_positions(tfs, positions)
+            self._file.write(POSTINGS_LEN_STRUCT.pack(len(position_data)))
+            self._file.write(position_data)
+
+        self._prev_term = term
+        self.num_terms += 1
+
+    def close(self):
+        if self._file is not None:
+            end = self._file.tell()
+            self._file.close()
+            self._file = None
+            with open(sample_path(self.path), "w", encoding="utf-8") as f:
+                json.dump({"samples": self._samples, "end": end}, f, ensure_ascii=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def write_block(block_index: Dict[str, List[Tuple[int, int]]], path: str) -> str:
+    """Ghi 1 block index (term -> [(doc_id, tf), ...]) ra định dạng .blk."""
+    with BlockWriter(path) as writer:
+        for term in sorted(block_index):
+            writer.add(term, *postings_from_pairs(block_index[term]))
+    return path
+
+
+# ============================================================================
+# READER
+# ============================================================================
+
+def load_samples(block_path: str) -> Optional[Tuple[List[Tuple[str, int]], int]]:
+    """
+    Đọc sidecar sample của block: ([(term, offset), ...], end_offset).
+    Trả về None nếu block không có sidecar (block cũ .pkl).
+    """
+    path = sample_path(block_path)
+    if block_path.endswith(LEGACY_BLOCK_EXT) or not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return [(term, offset) for term, offset in data["samples"]], data["end"]
+
+
+def _block_flags(path: str) -> int:
+    if path.endswith(LEGACY_BLOCK_EXT):
+        return 0
+    with open(path, "rb") as f:
+        _, _, flags = HEADER_STRUCT.unpack(f.read(HEADER_STRUCT.size))
+    return flags
+
+
+def block_has_positions(path: str) -> bool:
+    """Block có index vị trí (FLAG_POSITIONS) hay không."""
+    return bool(_block_flags(path) & FLAG_POSITIONS)
+
+
+def block_num_fields(path: str) -> int:
+    """Số trường của block theo trường (0 nếu 1 tf/posting)."""
+    return num_fields_from_flags(_block_flags(path))
+
+
+def iter_block_records(path: str, buffer_size: int = DEFAULT_READ_BUFFER,
+                       lo: Optional[str] = None, hi: Optional[str] = None
+                       ) -> Iterator[Tuple[str, np.ndarray, np.ndarray, Optional[np.ndarray]]]:
+    """
+    Đọc tuần tự từng record của block: yields (term, doc_ids, tfs, positions).
+
+    Nếu có lo / hi: chỉ trả về terms trong khoảng [lo, hi); với lo, seek
+    thẳng tới sample gần nhất <= lo (nếu có sidecar).
+
+    Block .pkl cũ vẫn đọc được (load toàn bộ, chỉ để tương thích ngược).
+    """
+    if path.endswith(LEGACY_BLOCK_EXT):
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        for term in sorted(data):
+            if lo is not None and term < lo:
+                continue
+            if hi is not None and term >= hi:
+                return
+            doc_ids, tfs = postings_from_pairs(data[term])
+            yield term, doc_ids, tfs, None
+        return
+
+    with open(path, "rb", buffering=buffer_size) as f:
+        magic, version, flags = HEADER_STRUCT.unpack(f.read(HEADER_STRUCT.size))
+        has_positions = bool(flags & FLAG_POSITIONS)
+        num_fields = num_fields_from_flags(flags)
+        if magic != BLOCK_MAGIC:
+            raise ValueError(f"Not a block file: {path}")
+        if version > BLOCK_VERSION:
+            raise ValueError(f"Unsupported block version {version}: {path}")
+
+        if lo is not None:
+            sampled = load_samples(path)
+            if sampled:
+                samples = sampled[0]
+                pos = bisect_right([term for term, _ in samples], lo) - 1
+                if pos >= 0:
+                    f.seek(samples[pos][1])
+
+        while True:
+            raw = f.read(TERM_LEN_STRUCT.size)
+            if not raw:
+                return
+            (term_len,) = TERM_LEN_STRUCT.unpack(raw)
+            term = f.read(term_len).decode("utf-8")
+            if hi is not None and term >= hi:
+                return
+            (postings_len,) = POSTINGS_LEN_STRUCT.unpack(f.read(POSTINGS_LEN_STRUCT.size))
+            if lo is not None and term < lo:
+                f.seek(postings_len, os.SEEK_CUR)
+                if has_positions:
+                    (positions_len,) = POSTINGS_LEN_STRUCT.unpack(f.read(POSTINGS_LEN_STRUCT.size))
+                    f.seek(positions_len, os.SEEK_CUR)
+                continue
+            doc_ids, tfs = decode_postings(f.read(postings_len), num_fields)
+            positions = None
+            if has_positions:
+                (positions_len,) = POSTINGS_LEN_STRUCT.unpack(f.read(POSTINGS_LEN_STRUCT.size))
+                positions = decode_positions(f.read(positions_len), tfs)
+            yield term, doc_ids, tfs, positions
+
+
+def read_block(path: str) -> Dict[str, List[Tuple[int, int]]]:
+    """Đọc toàn bộ block thành dict term -> [(doc_id, tf), ...] (dùng cho test/debug)."""
+    return {
+        term: list(zip(doc_ids.tolist(), tfs.tolist()))
+        for term, doc_ids, tfs, _ in iter_block_records(path)
+    }
+
+
+def remove_block(path: str):
+    """Xoá block file cùng sidecar sample (nếu có)."""
+    os.remove(path)
+    if os.path.exists(sample_path(path)):
+        os.remove(sample_path(path))
+
+
+def list_block_files(blocks_dir: str) -> List[str]:
+    """
+    Liệt kê block files theo thứ tự tên (= thứ tự doc_id).
+
+    Nếu thư mục có cả block .blk mới lẫn .pkl cũ (từ lần build trước),
+    chỉ lấy .blk để không merge trùng documents.
+    """
+    names = [f for f in os.listdir(blocks_dir) if f.startswith("block_")]
+    stream_blocks = sorted(f for f in names if f.endswith(BLOCK_EXT))
+    chosen = stream_blocks or sorted(f for f in names if f.endswith(LEGACY_BLOCK_EXT))
+    return [os.path.join(blocks_dir, f) for f in chosen]
@@ -6,16 +6,22 @@ import re
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 JSONL_PATH = os.path.join(PROJECT_ROOT, "data", "milestone1_fixed.jsonl")
-INDEX_PATH = os.path.join(PROJECT_ROOT, "data", "index", "mst_index.pkl")
+MST_INDEX_FILENAME = "mst_index.pkl"
+INDEX_PATH = os.path.join(PROJECT_ROOT, "data", "index", MST_INDEX_FILENAME)
 
-def build_mst_index():
+def normalize_tax_code(value) -> str:
+    """Khoá của mst_index: MST dạng chuỗi đã strip (server.py tra bằng chuỗi truy vấn đã strip)."""
+    return str(value).strip()
+
+def build_mst_index(jsonl_path=JSONL_PATH, index_path=INDEX_PATH):
     print(f"Building MST Index...")
     start_time = time.time()
     
     mst_dict = {}
-    tax_regex = re.compile(br'"tax_code":\s*"([^"]+)"')
+    # tax_code dạng chuỗi hoặc số (không có dấu nháy)
+    tax_regex = re.compile(br'"tax_code":\s*(?:"([^"]+)"|(\d+))')
     
-    with open(JSONL_PATH, "rb") as f:
+    with open(jsonl_path, "rb") as f:
         offset = 0
         count = 0
         while True:
@@ -25,8 +31,9 @@ def build_mst_index():
                 
             m = tax_regex.search(line)
             if m:
-                tax_code = m.group(1).decode('utf-8')
-                mst_dict[tax_code] = offset
+                tax_code = normalize_tax_code((m.group(1) or m.group(2)).decode('utf-8'))
+                if tax_code:
+                    mst_dict[tax_code] = offset
                 
             offset += len(line)
             count += 1
@@ -34,16 +41,20 @@ def build_mst_index():
             if count % 500000 == 0:
                 print(f"  Processed {count:,} documents...")
                 
+    write_mst_index(mst_dict, index_path)
+        
+    elapsed = time.time() - start_time
+    print(f"Done in {elapsed:.2f}s!")
+
+def write_mst_index(mst_dict, index_path=INDEX_PATH):
+    """Ghi map MST -> byte offset trong JSONL (dùng chung với ingest.py)."""
     print(f"Found {len(mst_dict):,} unique MSTs.")
     print("Saving to pickle...")
     
-    os.makedirs(os.path.dirname(INDEX_PATH), exist_ok=True)
-    with open(INDEX_PATH, "wb") as f:
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    with open(index_path, "wb") as f:
         pickle.dump(mst_dict, f)
-        
-    elapsed = time.time() - start_time
-    print(f"Done in {elapsed:.2f}s!")
-    print(f"Index size: {os.path.getsize(INDEX_PATH) / 1024 / 1024:.2f} MB")
+    print(f"Index size: {os.path.getsize(index_path) / 1024 / 1024:.2f} MB")
 
 if __name__ == "__main__":
     build_mst_index()
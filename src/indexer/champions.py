@@ -0,0 +1,226 @@
+"""
+Champion Lists (Static-Pruned Fast Tier)
+========================================
+Milestone 2 - SEG301: Search Engines & Information Retrieval
+
+Term phổ biến (df lớn, vd. "công_ty", "hà_nội") có postings hàng trăm
+nghìn entries; trước đây search cắt ở MAX_MATCHES theo thứ tự doc_id nên
+posting bị bỏ là ngẫu nhiên chứ không phải posting ít quan trọng nhất.
+
+Với impacts 8-bit tính sẵn (impacts.py) mỗi posting có điểm tĩnh, nên lúc
+merge có thể tách cho mỗi term có df >= min_df 1 champion list: `size`
+posting có impact cao nhất (hoà impact: doc_id nhỏ trước, giống thứ tự
+top-k của search), sắp theo doc_id, cùng
+    floor = impact lớn nhất trong các posting KHÔNG được chọn
+-> mọi doc ngoài champion list đóng góp tối đa idf * scale * floor cho term.
+
+Searcher (bm25.py) trả lời từ tầng champion trước: cận dưới / cận trên điểm
+của từng doc ứng viên, tra chính xác (qua skip table) các term còn thiếu của
+ứng viên sát ngưỡng, và chỉ quay về postings đầy đủ khi không chứng minh
+được top-k (cận trên của mọi doc khác < điểm thứ k). Khi tầng champion trả
+lời, top-k trùng với tính trên postings đầy đủ (không cắt MAX_MATCHES).
+
+File (cạnh impacts.bin, chỉ hợp lệ với đúng impacts đã dùng để tính):
+    champions_terms.npy     int64[T]      term ordinal có champion list (tăng dần)
+    champions_offsets.npy   int64[T + 1]  vị trí trong 2 mảng dưới
+    champions_doc_ids.npy   int32[...]    doc_id (tăng dần trong từng term)
+    champions_impacts.npy   uint8[...]    impact tương ứng
+    champions_floors.npy    uint8[T]      impact lớn nhất ngoài champion list
+    champions.json          size, min_df, thống kê + tham số của impacts
+
+Build: python src/indexer/champions.py [index_dir]   (hoặc merging.py --champions)
+"""
+
+import os
+import sys
+import json
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Thêm project root vào path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.indexer.postings_codec import (
+    decode_postings, read_header, num_fields_from_flags, block_size_from_flags,
+)
+from src.indexer.mmap_term_dict import MmapTermDict, TERM_DICT_FILENAME
+from src.indexer.impacts import ImpactsReader, IMPACT_DTYPE
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Số posting của mỗi champion list
+CHAMPION_SIZE = 5_000
+# Chỉ term có df >= CHAMPION_MIN_DF mới có champion list
+CHAMPION_MIN_DF = 50_000
+
+CHAMPIONS_META_FILENAME = "champions.json"
+CHAMPIONS_FILES = {
+    "terms": "champions_terms.npy",
+    "offsets": "champions_offsets.npy",
+    "doc_ids": "champions_doc_ids.npy",
+    "impacts": "champions_impacts.npy",
+    "floors": "champions_floors.npy",
+}
+
+# Tham số của impacts được chép vào champions.json để phát hiện champions cũ
+IMPACTS_KEYS = ("k1", "b", "fields", "field_weights", "field_b", "scale",
+                "num_terms", "num_postings")
+
+
+def has_champions(index_dir: str) -> bool:
+    """Index có champion lists hay không."""
+    return os.path.exists(os.path.join(index_dir, CHAMPIONS_META_FILENAME))
+
+
+def remove_champions(index_dir: str):
+    """Xoá champion lists (index / impacts vừa tính lại)."""
+    for filename in (CHAMPIONS_META_FILENAME, *CHAMPIONS_FILES.values()):
+        path = os.path.join(index_dir, filename)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def select_champions(impacts: np.ndarray, size: int) -> Tuple[np.ndarray, int]:
+    """
+    Chọn champion list trong 1 postings list: `size` posting đầu tiên theo
+    (impact giảm dần, vị trí tăng dần). Posting ngoài list có impact bằng
+    floor luôn đứng sau (doc_id lớn hơn) mọi posting trong list cùng impact.
+
+    Returns:
+        (vị trí được chọn - tăng dần, floor)
+    """
+    if impacts.size <= size:
+        return np.arange(impacts.size), 0
+    order = np.argsort(-impacts.astype(np.int16), kind="stable")
+    return np.sort(order[:size]), int(impacts[order[size]])
+
+
+# ============================================================================
+# BUILD
+# ============================================================================
+
+def write_champions(index_dir: str, size: int = CHAMPION_SIZE,
+                    min_df: int = CHAMPION_MIN_DF) -> dict:
+    """
+    Tính champion lists từ impacts.bin + postings.bin của index.
+
+    Args:
+        index_dir: Thư mục index (cần impacts, xem impacts.py)
+        size: Số posting mỗi champion list
+        min_df: Chỉ term có df >= min_df (và df > size) mới có champion list
+
+    Returns:
+        meta (cũng được ghi ra champions.json)
+    """
+    remove_champions(index_dir)
+    term_dict = MmapTermDict(os.path.join(index_dir, TERM_DICT_FILENAME))
+    impacts = ImpactsReader(index_dir)
+    terms, offsets, floors = [], [0], []
+    doc_id_parts, impact_parts = [], []
+    try:
+        with open(os.path.join(index_dir, "postings.bin"), "rb") as postings_file:
+            header = read_header(postings_file)
+            if header is None:
+                raise ValueError(f"Legacy pickle postings in {index_dir}: "
+                                 f"run postings_codec.py to convert first")
+            num_fields = num_fields_from_flags(header[1])
+            block_size = block_size_from_flags(header[1])
+            for ordinal in range(len(term_dict)):
+                df, offset, length = term_dict.entry(ordinal)
+                if df < min_df or df <= size:
+                    continue
+                postings_file.seek(offset)
+                doc_ids, _ = decode_postings(postings_file.read(length), num_fields, block_size)
+                term_impacts = np.asarray(impacts.get(ordinal))
+                positions, floor = select_champions(term_impacts, size)
+                terms.append(ordinal)
+                floors.append(floor)
+                doc_id_parts.append(doc_ids[positions].astype(np.int32))
+                impact_parts.append(term_impacts[positions])
+                offsets.append(offsets[-1] + len(positions))
+    finally:
+        term_dict.close()
+
+    arrays = {
+        "terms": np.asarray(terms, dtype=np.int64),
+        "offsets": np.asarray(offsets, dtype=np.int64),
+        "doc_ids": np.concatenate(doc_id_parts) if doc_id_parts else np.empty(0, np.int32),
+        "impacts": np.concatenate(impact_parts) if impact_parts else np.empty(0, IMPACT_DTYPE),
+        "floors": np.asarray(floors, dtype=IMPACT_DTYPE),
+    }
+    for key, filename in CHAMPIONS_FILES.items():
+        np.save(os.path.join(index_dir, filename), arrays[key])
+
+    meta = {
+        "size": size,
+        "min_df": min_df,
+        "num_terms": len(terms),
+        "num_postings": int(offsets[-1]),
+        "impacts": {key: impacts.meta.get(key) for key in IMPACTS_KEYS},
+    }
+    impacts.close()
+    # Ghi meta sau cùng: searcher chỉ mở champions khi meta tồn tại
+    with open(os.path.join(index_dir, CHAMPIONS_META_FILENAME), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+# ============================================================================
+# READER
+# ============================================================================
+
+def load_champions_meta(index_dir: str) -> dict:
+    with open(os.path.join(index_dir, CHAMPIONS_META_FILENAME), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class ChampionsReader:
+    """Champion lists theo term ordinal (mmap); get() trả về view, không copy."""
+
+    def __init__(self, index_dir: str):
+        self.meta = load_champions_meta(index_dir)
+        for key, filename in CHAMPIONS_FILES.items():
+            setattr(self, key, np.load(os.path.join(index_dir, filename), mmap_mode="r"))
+
+    def matches(self, impacts: ImpactsReader) -> bool:
+        """Champions được tính từ đúng bộ impacts này hay không."""
+        return self.meta["impacts"] == {key: impacts.meta.get(key) for key in IMPACTS_KEYS}
+
+    def get(self, ordinal: Optional[int]) -> Optional[Tuple[np.ndarray, np.ndarray, int]]:
+        """(doc_ids, impacts, floor) của term, None nếu term không có champion list."""
+        if ordinal is None or not len(self.terms):
+            return None
+        i = int(np.searchsorted(self.terms, ordinal))
+        if i >= len(self.terms) or int(self.terms[i]) != ordinal:
+            return None
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self.doc_ids[start:end], self.impacts[start:end], int(self.floors[i])
+
+    def close(self):
+        for key in CHAMPIONS_FILES:
+            setattr(self, key, None)
+
+
+# ============================================================================
+# ENTRY POINT
+# ============================================================================
+
+if __name__ == "__main__":
+    import argparse
+    from src.ranking.bm25 import DEFAULT_INDEX_DIR
+
+    parser = argparse.ArgumentParser(description="Tính champion lists (tầng nhanh) từ impacts")
+    parser.add_argument("index_dir", nargs="?", default=DEFAULT_INDEX_DIR)
+    parser.add_argument("--size", type=int, default=CHAMPION_SIZE)
+    parser.add_argument("--min-df", type=int, default=CHAMPION_MIN_DF)
+    args = parser.parse_args()
+
+    start = time.time()
+    meta = write_champions(args.index_dir, args.size, args.min_df)
+    print(f"✓ Champions: {meta['num_terms']:,d} terms, {meta['num_postings']:,d} postings "
+          f"({time.time() - start:.1f}s)")
@@ -0,0 +1,150 @@
+"""
+Document Reordering (Doc-ID Reassignment)
+=========================================
+Milestone 2 - SEG301: Search Engines & Information Retrieval
+
+Mặc định doc_id = thứ tự dòng trong JSONL (thứ tự crawl) nên các công ty
+giống nhau (cùng tỉnh, cùng ngành) nằm rải rác trên cả dải doc_id. Bước
+này chạy trước SPIMI: đọc 1 lượt JSONL lấy khoá sắp xếp của từng doc rồi
+cấp lại doc_id theo thứ tự
+
+    tỉnh / thành (phần cuối địa chỉ) -> mã ngành chính -> tên công ty
+
+Postings của các term địa danh / ngành nghề (chiếm phần lớn truy vấn) khi
+đó là các dải doc_id liền nhau:
+  - gap nhỏ hơn -> varint ngắn hơn -> postings.bin nhỏ hơn
+  - mảng điểm / doc store được truy cập gần như tuần tự khi chấm điểm
+    (cache locality tốt hơn)
+
+Doc không có text (không được index) xếp cuối. doc_offsets.npy vẫn là
+byte offset trong JSONL theo doc_id mới; thêm:
+
+    doc_order.npy   int64[doc_id] -> số dòng (0-based) trong JSONL
+                    (vector index dùng số dòng làm id -> map về doc_id mới)
+
+Build: python src/indexer/spimi.py --reorder
+"""
+
+import os
+import json
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+DOC_ORDER_FILE = "doc_order.npy"
+
+# Đánh dấu ngành chính trong industries_detail
+MAIN_INDUSTRY_MARK = "(Ngành chính)"
+
+
+def has_doc_order(index_dir: str) -> bool:
+    """Index có được build với doc_id đã sắp xếp lại hay không."""
+    return os.path.exists(os.path.join(index_dir, DOC_ORDER_FILE))
+
+
+def remove_doc_order(index_dir: str):
+    """Xoá doc_order.npy (index build lại theo thứ tự crawl)."""
+    path = os.path.join(index_dir, DOC_ORDER_FILE)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+# ============================================================================
+# SORT KEY
+# ============================================================================
+
+def province_of(address: str) -> str:
+    """Tỉnh / thành phố: phần cuối của địa chỉ (sau dấu phẩy cuối cùng)."""
+    return address.rsplit(",", 1)[-1].strip().lower() if address else ""
+
+
+def main_industry_code(doc: dict) -> str:
+    """Mã ngành chính (ngành đầu tiên nếu không có đánh dấu)."""
+    industries = doc.get("industries_detail") or []
+    for industry in industries:
+        if MAIN_INDUSTRY_MARK in (industry.get("name") or ""):
+            return industry.get("code") or ""
+    return (industries[0].get("code") or "") if industries else ""
+
+
+def document_sort_key(doc: dict) -> Tuple[str, str, str]:
+    """(tỉnh, mã ngành chính, tên công ty) - doc thiếu trường nào xếp trước trong nhóm đó."""
+    return (province_of(doc.get("address") or ""),
+            main_industry_code(doc),
+            (doc.get("company_name") or "").lower())
+
+
+# ============================================================================
+# ORDER
+# ============================================================================
+
+def compute_doc_order(jsonl_path: str, has_text=None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Thứ tự doc mới cho 1 file JSONL.
+
+    Args:
+        jsonl_path: File JSONL nguồn
+        has_text: Hàm doc -> bool (doc có được index không); doc không có
+                  text vẫn giữ doc_id nhưng xếp cuối
+
+    Returns:
+        (lines, offsets): 2 mảng int64 theo doc_id mới - số dòng và byte
+        offset trong JSONL của doc đó. Dòng rỗng / JSON lỗi bị bỏ qua
+        (giống read_documents).
+    """
+    keys: List[tuple] = []
+    lines = []
+    offsets = []
+    with open(jsonl_path, "rb") as f:
+        line_no = -1
+        while True:
+            byte_offset = f.tell()
+            raw_line = f.readline()
+            if not raw_line:
+                break
+            line_no += 1
+            line = raw_line.decode("utf-8", errors="ignore").strip()
+            if not line:
+                continue
+            try:
+                doc = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            empty = has_text is not None and not has_text(doc)
+            keys.append((empty,) + document_sort_key(doc))
+            lines.append(line_no)
+            offsets.append(byte_offset)
+
+    # sorted ổn định: doc trùng khoá giữ thứ tự crawl
+    order = sorted(range(len(keys)), key=keys.__getitem__)
+    order = np.asarray(order, dtype=np.int64)
+    return (np.asarray(lines, dtype=np.int64)[order] if lines else np.empty(0, np.int64),
+            np.asarray(offsets, dtype=np.int64)[order] if offsets else np.empty(0, np.int64))
+
+
+def save_doc_order(index_dir: str, lines: np.ndarray):
+    os.makedirs(index_dir, exist_ok=True)
+    np.save(os.path.join(index_dir, DOC_ORDER_FILE), np.asarray(lines, dtype=np.int64))
+
+
+def load_doc_order(index_dir: str) -> Optional[np.ndarray]:
+    """doc_id -> số dòng JSONL (None nếu index theo thứ tự crawl)."""
+    if not has_doc_order(index_dir):
+        return None
+    return np.load(os.path.join(index_dir, DOC_ORDER_FILE))
+
+
+def doc_ids_for_lines(doc_order: np.ndarray, line_numbers) -> np.ndarray:
+    """Số dòng JSONL -> doc_id mới (-1 nếu dòng không có trong index)."""
+    line_numbers = np.asarray(line_numbers, dtype=np.int64)
+    size = max(int(doc_order.max()) + 1 if doc_order.size else 0,
+               int(line_numbers.max()) + 1 if line_numbers.size else 0)
+    inverse = np.full(size, -1, dtype=np.int64)
+    inverse[doc_order] = np.arange(doc_order.size, dtype=np.int64)
+    return inverse[line_numbers] if line_numbers.size else line_numbers
+
@@ -0,0 +1,290 @@
+"""
+Array-Backed Document Store
+===========================
+Milestone 2 - SEG301: Search Engines & Information Retrieval
+
+Thay thế doc_lengths.pkl / doc_offsets.pkl (Dict[int, int] với 1.8M entries,
+>100MB Python objects mỗi process) bằng các mảng NumPy dày đặc,
+đánh chỉ số trực tiếp bằng doc_id:
+
+    doc_lengths.npy  int32    Số terms của document (EMPTY_DOC nếu không index)
+    doc_offsets.npy  int64    Byte offset trong JSONL (EMPTY_DOC nếu không có)
+    doc_norms.npy    float32  Length normalisation của BM25:
+                              1 - b + b * |D| / avgdl   (tính sẵn lúc build)
+    doc_field_lengths.npy  uint16[num_docs, F]  Số terms từng trường (chỉ
+                     có ở index theo trường, phục vụ BM25F; chặn ở 65535)
+    doc_store.json   Thống kê: num_docs, indexed_docs, avg_doc_length, b
+                     (+ fields, avg_field_lengths nếu index theo trường)
+
+Các file .npy được load bằng mmap (np.load(mmap_mode="r")) nên nhiều worker
+dùng chung page cache, và hot loop của BM25 chỉ cần gather theo mảng
+thay vì dict.get trên từng posting.
+"""
+
+import os
+import json
+import pickle
+from array import array
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Sentinel cho doc_id không được index (dòng rỗng / không có text)
+EMPTY_DOC = -1
+
+# Tham số b mặc định dùng để tính sẵn doc_norms (khớp với B trong bm25.py).
+# Searcher dùng b khác sẽ tự tính lại mảng norms lúc load.
+DEFAULT_B = 0.4
+
+DOC_LENGTHS_FILE = "doc_lengths.npy"
+DOC_OFFSETS_FILE = "doc_offsets.npy"
+DOC_NORMS_FILE = "doc_norms.npy"
+DOC_FIELD_LENGTHS_FILE = "doc_field_lengths.npy"
+FIELD_LENGTH_DTYPE = np.uint16
+DOC_STORE_META_FILE = "doc_store.json"
+
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+
+def compute_length_norms(doc_lengths: np.ndarray, avg_doc_length: float, b: float) -> np.ndarray:
+    """
+    Tính mảng length normalisation: 1 - b + b * |D| / avgdl.
+
+    Doc không được index (EMPTY_DOC) nhận norm = 1.0 (tương đương |D| = avgdl,
+    giống hành vi cũ doc_lengths.get(doc_id, avgdl)).
+    """
+    lengths = np.asarray(doc_lengths)
+    if avg_doc_length <= 0:
+        return np.ones(lengths.shape, dtype=np.float32)
+    norms = 1.0 - b + b * (lengths.astype(np.float64) / avg_doc_length)
+    norms[lengths < 0] = 1.0
+    return norms.astype(np.float32)
+
+
+def collection_stats(doc_lengths: np.ndarray):
+    """Trả về (số docs được index, avgdl) từ mảng doc_lengths."""
+    indexed = doc_lengths >= 0
+    indexed_docs = int(np.count_nonzero(indexed))
+    total_length = int(doc_lengths[indexed].sum(dtype=np.int64))
+    avg_doc_length = total_length / indexed_docs if indexed_docs > 0 else 0.0
+    return indexed_docs, avg_doc_length
+
+
+def average_field_lengths(doc_lengths: np.ndarray, field_lengths: np.ndarray) -> List[float]:
+    """Độ dài trung bình từng trường trên các doc được index."""
+    indexed = doc_lengths >= 0
+    indexed_docs = int(np.count_nonzero(indexed))
+    if indexed_docs == 0:
+        return [0.0] * field_lengths.shape[1]
+    totals = field_lengths[indexed].sum(axis=0, dtype=np.int64)
+    return (totals / indexed_docs).tolist()
+
+
+# ============================================================================
+# WRITER
+# ============================================================================
+
+class DocStoreWriter:
+    """
+    Thu thập (doc_id, length, byte_offset) trong lúc build index.
+
+    Dùng array.array (4-8 bytes / doc) thay vì dict; các doc_id bị bỏ qua
+    (dòng rỗng) được lấp bằng EMPTY_DOC.
+
+    fields (index theo trường): tên các trường, add() nhận thêm độ dài
+    từng trường (length = tổng độ dài các trường).
+    """
+
+    def __init__(self, fields: Optional[Sequence[str]] = None):
+        self.lengths = array("i")
+        self.offsets = array("q")
+        self.fields = list(fields) if fields else None
+        self.field_lengths = array("i")
+
+    def add(self, doc_id: int, length: int, byte_offset: int,
+            field_lengths: Optional[Sequence[int]] = None):
+        self.reserve(doc_id + 1)
+        self.lengths[doc_id] = length
+        self.offsets[doc_id] = byte_offset
+        if self.fields:
+            num_fields = len(self.fields)
+            self.field_lengths[doc_id * num_fields:(doc_id + 1) * num_fields] = \
+                array("i", field_lengths)
+
+    def reserve(self, num_docs: int):
+        """Đảm bảo có đủ num_docs slots (slot mới = EMPTY_DOC)."""
+        missing = num_docs - len(self.lengths)
+        if missing > 0:
+            self.lengths.extend([EMPTY_DOC] * missing)
+            self.offsets.extend([EMPTY_DOC] * missing)
+            if self.fields:
+                self.field_lengths.extend([0] * (missing * len(self.fields)))
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def save(self, index_dir: str, b: float = DEFAULT_B) -> dict:
+        """Ghi các mảng + metadata xuống index_dir. Trả về metadata."""
+        return write_doc_store(
+            index_dir,
+            np.frombuffer(self.lengths, dtype=np.int32) if len(self.lengths) else np.empty(0, np.int32),
+            np.frombuffer(self.offsets, dtype=np.int64) if len(self.offsets) else np.empty(0, np.int64),
+            b=b,
+            field_lengths=np.frombuffer(self.field_lengths, dtype=np.int32).reshape(
+                -1, len(self.fields)) if self.fields else None,
+            fields=self.fields,
+        )
+
+
+def write_doc_store(index_dir: str, doc_lengths: np.ndarray, doc_offsets: np.ndarray,
+                    b: float = DEFAULT_B, field_lengths: Optional[np.ndarray] = None,
+                    fields: Optional[Sequence[str]] = None) -> dict:
+    """
+    Ghi doc store dạng mảng xuống đĩa.
+
+    Args:
+        index_dir: Thư mục index
+        doc_lengths: Mảng int32 theo doc_id (EMPTY_DOC = không index)
+        doc_offsets: Mảng int64 theo doc_id (EMPTY_DOC = không có)
+        b: Tham số b của BM25 dùng để tính sẵn doc_norms
+        field_lengths: Mảng [num_docs, len(fields)] (index theo trường)
+        fields: Tên các trường, cùng thứ tự cột của field_lengths
+
+    Returns:
+        meta: Dict thống kê (cũng được ghi ra doc_store.json)
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    doc_lengths = np.asarray(doc_lengths, dtype=np.int32)
+    doc_offsets = np.asarray(doc_offsets, dtype=np.int64)
+    if doc_lengths.shape != doc_offsets.shape:
+        raise ValueError("doc_lengths and doc_offsets must have the same shape")
+
+    indexed_docs, avg_doc_length = collection_stats(doc_lengths)
+    norms = compute_length_norms(doc_lengths, avg_doc_length, b)
+
+    np.save(os.path.join(index_dir, DOC_LENGTHS_FILE), doc_lengths)
+    np.save(os.path.join(index_dir, DOC_OFFSETS_FILE), doc_offsets)
+    np.save(os.path.join(index_dir, DOC_NORMS_FILE), norms)
+
+    meta = {
+        "num_docs": int(doc_lengths.size),
+        "indexed_docs": indexed_docs,
+        "avg_doc_length": avg_doc_length,
+        "b": b,
+    }
+    if fields:
+        field_lengths = np.asarray(field_lengths).reshape(-1, len(fields))
+        if field_lengths.shape[0] != doc_lengths.size:
+            raise ValueError("field_lengths must have one row per document")
+        max_length = np.iinfo(FIELD_LENGTH_DTYPE).max
+        field_lengths = np.minimum(field_lengths, max_length).astype(FIELD_LENGTH_DTYPE)
+        np.save(os.path.join(index_dir, DOC_FIELD_LENGTHS_FILE), field_lengths)
+        meta["fields"] = list(fields)
+        meta["avg_field_lengths"] = average_field_lengths(doc_lengths, field_lengths)
+    with open(os.path.join(index_dir, DOC_STORE_META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+# ============================================================================
+# READER
+# ============================================================================
+
+class DocStore:
+    """
+    Doc store chỉ-đọc: lengths, offsets, norms (mmap) + thống kê collection.
+    Index theo trường có thêm field_lengths (mmap), fields, avg_field_lengths.
+    """
+
+    def __init__(self, doc_lengths: np.ndarray, doc_offsets: Optional[np.ndarray],
+                 doc_norms: np.ndarray, indexed_docs: int, avg_doc_length: float, b: float,
+                 fields: Optional[List[str]] = None, field_lengths: Optional[np.ndarray] = None,
+                 avg_field_lengths: Optional[List[float]] = None):
+        self.doc_lengths = doc_lengths
+        self.doc_offsets = doc_offsets
+        self.doc_norms = doc_norms
+        self.indexed_docs = indexed_docs
+        self.avg_doc_length = avg_doc_length
+        self.b = b
+        self.fields = fields
+        self.field_lengths = field_lengths
+        self.avg_field_lengths = avg_field_lengths
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+
+def has_doc_store(index_dir: str) -> bool:
+    return os.path.exists(os.path.join(index_dir, DOC_STORE_META_FILE))
+
+
+def load_doc_store(index_dir: str, b: float = DEFAULT_B, mmap: bool = True) -> DocStore:
+    """
+    Load doc store dạng mảng (mmap mặc định).
+
+    Nếu b khác với b lúc build, mảng norms được tính lại trong RAM.
+    """
+    with open(os.path.join(index_dir, DOC_STORE_META_FILE), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    mmap_mode = "r" if mmap else None
+
+    doc_lengths = np.load(os.path.join(index_dir, DOC_LENGTHS_FILE), mmap_mode=mmap_mode)
+    offsets_path = os.path.join(index_dir, DOC_OFFSETS_FILE)
+    doc_offsets = np.load(offsets_path, mmap_mode=mmap_mode) if os.path.exists(offsets_path) else None
+
+    avg_doc_length = meta["avg_doc_length"]
+    if abs(meta.get("b", DEFAULT_B) - b) < 1e-12:
+        doc_norms = np.load(os.path.join(index_dir, DOC_NORMS_FILE), mmap_mode=mmap_mode)
+    else:
+        doc_norms = compute_length_norms(doc_lengths, avg_doc_length, b)
+
+    fields = meta.get("fields")
+    field_lengths = None
+    if fields:
+        field_lengths = np.load(os.path.join(index_dir, DOC_FIELD_LENGTHS_FILE), mmap_mode=mmap_mode)
+
+    return DocStore(doc_lengths, doc_offsets, doc_norms,
+                    meta["indexed_docs"], avg_doc_length, b,
+                    fields, field_lengths, meta.get("avg_field_lengths"))
+
+
+def doc_store_from_pickles(index_dir: str, b: float = DEFAULT_B) -> DocStore:
+    """
+    Đọc index cũ (doc_lengths.pkl / doc_offsets.pkl) và chuyển sang mảng
+    trong RAM, để searcher chỉ cần 1 code path.
+    """
+    with open(os.path.join(index_dir, "doc_lengths.pkl"), "rb") as f:
+        lengths_dict = pickle.load(f)
+    offsets_dict = None
+    offsets_path = os.path.join(index_dir, "doc_offsets.pkl")
+    if os.path.exists(offsets_path):
+        with open(offsets_path, "rb") as f:
+            offsets_dict = pickle.load(f)
+
+    doc_lengths = dense_from_dict(lengths_dict, np.int32)
+    doc_offsets = dense_from_dict(offsets_dict, np.int64, size=len(doc_lengths)) \
+        if offsets_dict is not None else None
+
+    indexed_docs, avg_doc_length = collection_stats(doc_lengths)
+    doc_norms = compute_length_norms(doc_lengths, avg_doc_length, b)
+    return DocStore(doc_lengths, doc_offsets, doc_norms, indexed_docs, avg_doc_length, b)
+
+
+def dense_from_dict(values: Dict[int, int], dtype, size: Optional[int] = None) -> np.ndarray:
+    """Chuyển Dict[doc_id, value] sang mảng dày đặc (EMPTY_DOC cho chỗ trống)."""
+    if size is None:
+        size = max(values) + 1 if values else 0
+    dense = np.full(size, EMPTY_DOC, dtype=dtype)
+    if values:
+        keys = np.fromiter(values.keys(), dtype=np.int64, count=len(values))
+        vals = np.fromiter(values.values(), dtype=np.int64, count=len(values))
+        keep = keys < size
+        dense[keys[keep]] = vals[keep]
+    return dense
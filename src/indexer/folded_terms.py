@@ -0,0 +1,152 @@
+"""
+Accent-Folded Term Dictionary
+=============================
+Milestone 2 - SEG301: Search Engines & Information Retrieval
+
+Người dùng hay gõ không dấu ("xay dung ha noi"): các token đó không có
+trong term_dict nên BM25 không trả về gì và API phải rơi xuống vector
+search (chậm). Lúc merge, từ điển phụ này gom mọi term có dấu theo dạng
+bỏ dấu của nó:
+
+    fold("xây_dựng") = "xay_dung"  ->  [ordinal("xây_dựng"), ordinal("xay_dựng"), ...]
+
+Các term cùng dạng bỏ dấu xếp theo df giảm dần, nên 1 lần tra từ điển cho
+ngay term có dấu phổ biến nhất (bm25.py: _resolve_folded ghép lại các âm
+tiết thành từ ghép theo kiểu longest-match).
+
+File (cạnh term_dict.bin, theo term ordinal của nó):
+    folded_terms.bin     Cùng định dạng term_dict.bin (mmap_term_dict.py),
+                         key = dạng bỏ dấu; record (offset, df, length) =
+                         (vị trí trong folded_targets.npy, df của term phổ
+                         biến nhất, số term có dấu)
+    folded_targets.npy   int64[...] term ordinal, df giảm dần trong từng key
+
+Term chỉ có trong segments (chưa merge / compaction) chưa có dạng bỏ dấu.
+
+Build: merging.py luôn ghi kèm; index cũ: python src/indexer/folded_terms.py [index_dir]
+"""
+
+import os
+import sys
+import time
+import unicodedata
+from collections import defaultdict
+from typing import Optional
+
+import numpy as np
+
+# Thêm project root vào path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.indexer.mmap_term_dict import MmapTermDict, TermDictWriter, TERM_DICT_FILENAME
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+FOLDED_DICT_FILENAME = "folded_terms.bin"
+FOLDED_TARGETS_FILENAME = "folded_targets.npy"
+
+# đ / Đ không tách được dấu bằng NFD
+_FOLD_TABLE = str.maketrans({"đ": "d", "Đ": "D"})
+
+
+def fold_accents(text: str) -> str:
+    """Bỏ dấu tiếng Việt: "Xây_Dựng Đà_Nẵng" -> "Xay_Dung Da_Nang"."""
+    decomposed = unicodedata.normalize("NFD", text.translate(_FOLD_TABLE))
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def has_folded_terms(index_dir: str) -> bool:
+    """Index có từ điển bỏ dấu hay không."""
+    return os.path.exists(os.path.join(index_dir, FOLDED_DICT_FILENAME))
+
+
+# ============================================================================
+# BUILD
+# ============================================================================
+
+def write_folded_terms(index_dir: str) -> int:
+    """
+    Tính từ điển bỏ dấu từ term_dict.bin của index.
+
+    Chỉ term có dấu được gom (term không dấu tự tra được trong term_dict).
+
+    Returns:
+        Số key (dạng bỏ dấu)
+    """
+    term_dict = MmapTermDict(os.path.join(index_dir, TERM_DICT_FILENAME))
+    try:
+        groups = defaultdict(list)  # dạng bỏ dấu -> [(-df, ordinal)]
+        dfs = term_dict.records["df"]
+        for ordinal, term in enumerate(term_dict):
+            folded = fold_accents(term)
+            if folded != term:
+                groups[folded].append((-int(dfs[ordinal]), ordinal))
+    finally:
+        term_dict.close()
+
+    targets = []
+    tmp_path = os.path.join(index_dir, FOLDED_TARGETS_FILENAME + ".tmp.npy")
+    with TermDictWriter(os.path.join(index_dir, FOLDED_DICT_FILENAME)) as writer:
+        # Thứ tự str của Python = thứ tự byte UTF-8 (yêu cầu của TermDictWriter)
+        for folded in sorted(groups):
+            variants = sorted(groups[folded])
+            writer.add(folded, -variants[0][0], len(targets), len(variants))
+            targets.extend(ordinal for _, ordinal in variants)
+        np.save(tmp_path, np.asarray(targets, dtype=np.int64))
+        os.replace(tmp_path, os.path.join(index_dir, FOLDED_TARGETS_FILENAME))
+    return len(groups)
+
+
+# ============================================================================
+# READER
+# ============================================================================
+
+class FoldedTermDict:
+    """Dạng bỏ dấu -> term ordinal có dấu (df giảm dần), mmap."""
+
+    def __init__(self, index_dir: str):
+        self.keys = MmapTermDict(os.path.join(index_dir, FOLDED_DICT_FILENAME))
+        self.targets = np.load(os.path.join(index_dir, FOLDED_TARGETS_FILENAME), mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def variants(self, folded: str) -> Optional[np.ndarray]:
+        """Term ordinal có dạng bỏ dấu = folded (df giảm dần), None nếu không có."""
+        ordinal = self.keys.ordinal(folded)
+        if ordinal is None:
+            return None
+        _, offset, length = self.keys.entry(ordinal)
+        return self.targets[offset:offset + length]
+
+    def best(self, folded: str) -> Optional[tuple]:
+        """(term ordinal phổ biến nhất, df) của folded, None nếu không có."""
+        ordinal = self.keys.ordinal(folded)
+        if ordinal is None:
+            return None
+        df, offset, _ = self.keys.entry(ordinal)
+        return int(self.targets[offset]), df
+
+    def close(self):
+        self.keys.close()
+        self.targets = None
+
+
+# ============================================================================
+# ENTRY POINT
+# ============================================================================
+
+if __name__ == "__main__":
+    import argparse
+    from src.ranking.bm25 import DEFAULT_INDEX_DIR
+
+    parser = argparse.ArgumentParser(description="Tính từ điển bỏ dấu cho index đã merge")
+    parser.add_argument("index_dir", nargs="?", default=DEFAULT_INDEX_DIR)
+    args = parser.parse_args()
+
+    start = time.time()
+    num_keys = write_folded_terms(args.index_dir)
+    print(f"✓ Folded terms: {num_keys:,d} keys ({time.time() - start:.1f}s)")
@@ -0,0 +1,313 @@
+"""
+Fuzzy Term Lookup (Character Trigram Index)
+===========================================
+Milestone 2 - SEG301: Search Engines & Information Retrieval
+
+Tên công ty gõ sai chính tả ("vinamlik", "xay dunh") không có trong
+term_dict nên BM25 trả về 0 kết quả. Lúc merge, index phụ này ghi cho mỗi
+trigram ký tự (trên dạng bỏ dấu, có đệm "$" 2 đầu) danh sách term chứa nó:
+
+    "$vi", "vin", "ina", ..., "ilk", "lk$"  ->  [ordinal("vinamilk"), ...]
+
+Tra 1 token sai:
+  1. Khoảng cách sửa tối đa theo độ dài (AUTO: <= 2 ký tự: 0, 3-5: 1, > 5: 2)
+  2. Mỗi danh sách trigram sắp theo (độ dài, ordinal) -> chỉ cắt lấy các
+     term có độ dài lệch <= d (searchsorted, không decode cả danh sách)
+  3. Đếm trigram chung của từng term (1 lần bincount); mỗi phép sửa phá tối
+     đa 4 trigram (hoán vị) -> term khoảng cách <= d chung >= |G| - 4d
+  4. Ứng viên xét theo (số trigram chung, df) giảm dần (tối đa FUZZY_VERIFY_LIMIT),
+     tính khoảng cách Damerau-Levenshtein (OSA) chính xác; dừng khi cận dưới
+     khoảng cách ceil((|G| - chung) / 4) không còn vào được top kết quả
+  5. Xếp hạng: khoảng cách tăng dần, df giảm dần
+
+Term df < min_df (phần lớn là lỗi chính tả trong chính dữ liệu) và term
+toàn số (MST, số nhà) không được gợi ý. Kèm tập âm tiết (dạng bỏ dấu) của
+mọi term: token chỉ gồm âm tiết có thật (vd. "xây" khi index chỉ có
+"xây_dựng") là lệch tách từ chứ không phải gõ sai (is_known_syllables).
+
+File (cạnh term_dict.bin, theo term ordinal của nó):
+    fuzzy_grams.bin       Cùng định dạng term_dict.bin (mmap_term_dict.py),
+                          key = trigram; record (offset, df, length) = (vị
+                          trí trong fuzzy_postings.npy, số term, số term)
+    fuzzy_postings.npy    int64[...] (độ dài dạng bỏ dấu << 32) | ordinal,
+                          tăng dần trong từng trigram
+    fuzzy_syllables.bin   Cùng định dạng, key = âm tiết bỏ dấu, df = số term chứa nó
+    fuzzy_terms.json      min_df, số term của term_dict (phát hiện index cũ), thống kê
+
+Build: merging.py luôn ghi kèm; index cũ: python src/indexer/fuzzy_terms.py [index_dir]
+"""
+
+import os
+import sys
+import json
+import time
+from array import array
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# Thêm project root vào path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.indexer.mmap_term_dict import MmapTermDict, TermDictWriter, TERM_DICT_FILENAME
+from src.indexer.folded_terms import fold_accents
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+FUZZY_GRAMS_FILENAME = "fuzzy_grams.bin"
+FUZZY_POSTINGS_FILENAME = "fuzzy_postings.npy"
+FUZZY_SYLLABLES_FILENAME = "fuzzy_syllables.bin"
+FUZZY_META_FILENAME = "fuzzy_terms.json"
+
+# Term xuất hiện ít hơn FUZZY_MIN_DF docs không được gợi ý
+FUZZY_MIN_DF = 2
+# Khoảng cách sửa tối đa (Damerau-Levenshtein, hoán vị 2 ký tự kề = 1)
+MAX_EDIT_DISTANCE = 2
+# Term dài hơn (dạng bỏ dấu) không được index
+MAX_FUZZY_TERM_LENGTH = 40
+# Số ứng viên tối đa được tính khoảng cách chính xác mỗi token
+FUZZY_VERIFY_LIMIT = 32
+
+GRAM = 3
+# Số trigram tối đa 1 phép sửa phá được (hoán vị 2 ký tự kề)
+GRAMS_PER_EDIT = 4
+
+
+def has_fuzzy_terms(index_dir: str) -> bool:
+    """Index có trigram index (tra từ gần đúng) hay không."""
+    return os.path.exists(os.path.join(index_dir, FUZZY_META_FILENAME))
+
+
+def load_fuzzy_meta(index_dir: str) -> dict:
+    with open(os.path.join(index_dir, FUZZY_META_FILENAME), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def term_grams(text: str) -> List[str]:
+    """Các trigram (không trùng) của text có đệm "$": "abc" -> ["$ab", "abc", "bc$"]."""
+    padded = f"${text}$"
+    return list(dict.fromkeys(padded[i:i + GRAM] for i in range(len(padded) - GRAM + 1)))
+
+
+def auto_distance(length: int) -> int:
+    """Khoảng cách sửa cho phép theo độ dài token."""
+    if length <= 2:
+        return 0
+    return 1 if length <= 5 else MAX_EDIT_DISTANCE
+
+
+def edit_distance(a: str, b: str, limit: int = MAX_EDIT_DISTANCE) -> int:
+    """
+    Khoảng cách Damerau-Levenshtein (optimal string alignment) giữa a và b,
+    chỉ tính dải |i - j| <= limit; trả về limit + 1 khi vượt limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    over = limit + 1
+    prev2 = None
+    prev = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [over] * (len(b) + 1)
+        if i <= limit:
+            current[0] = i
+        ca = a[i - 1]
+        row_min = current[0]
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            value = prev[j - 1] if ca == b[j - 1] else prev[j - 1] + 1
+            if prev[j] + 1 < value:
+                value = prev[j] + 1
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if prev2 is not None and j > 1 and ca == b[j - 2] and a[i - 2] == b[j - 1] \
+                    and prev2[j - 2] + 1 < value:
+                value = prev2[j - 2] + 1
+            current[j] = value if value < over else over
+            if value < row_min:
+                row_min = value
+        if row_min > limit:
+            return over
+        prev2, prev = prev, current
+    return prev[-1]
+
+
+def _fuzzy_token(folded: str) -> bool:
+    return 0 < len(folded) <= MAX_FUZZY_TERM_LENGTH and not folded.isdigit()
+
+
+# ============================================================================
+# BUILD
+# ============================================================================
+
+def write_fuzzy_terms(index_dir: str, min_df: int = FUZZY_MIN_DF) -> dict:
+    """
+    Tính trigram index từ term_dict.bin của index.
+
+    Returns:
+        meta (cũng được ghi ra fuzzy_terms.json)
+    """
+    term_dict = MmapTermDict(os.path.join(index_dir, TERM_DICT_FILENAME))
+    gram_ids = {}
+    gram_column = array("i")
+    key_column = array("q")
+    syllables = {}
+    num_terms = 0
+    vocab_size = len(term_dict)
+    try:
+        dfs = term_dict.records["df"]
+        for ordinal, term in enumerate(term_dict):
+            folded = fold_accents(term)
+            for syllable in folded.split("_"):
+                syllables[syllable] = syllables.get(syllable, 0) + 1
+            if dfs[ordinal] < min_df or not _fuzzy_token(folded):
+                continue
+            num_terms += 1
+            key = (len(folded) << 32) | ordinal
+            for gram in term_grams(folded):
+                gram_column.append(gram_ids.setdefault(gram, len(gram_ids)))
+                key_column.append(key)
+    finally:
+        term_dict.close()
+
+    # Trigram theo thứ tự str (= thứ tự byte UTF-8, yêu cầu của TermDictWriter)
+    names = sorted(gram_ids)
+    rank = np.empty(len(names), dtype=np.int64)
+    rank[[gram_ids[name] for name in names]] = np.arange(len(names))
+    grams = rank[np.frombuffer(gram_column, dtype=np.int32)] if len(gram_column) \
+        else np.empty(0, np.int64)
+    keys = np.frombuffer(key_column, dtype=np.int64) if len(key_column) \
+        else np.empty(0, np.int64)
+    order = np.lexsort((keys, grams))
+    counts = np.bincount(grams, minlength=len(names))
+
+    tmp_path = os.path.join(index_dir, FUZZY_POSTINGS_FILENAME + ".tmp.npy")
+    np.save(tmp_path, keys[order])
+    os.replace(tmp_path, os.path.join(index_dir, FUZZY_POSTINGS_FILENAME))
+    with TermDictWriter(os.path.join(index_dir, FUZZY_GRAMS_FILENAME)) as writer:
+        offset = 0
+        for name, count in zip(names, counts.tolist()):
+            writer.add(name, count, offset, count)
+            offset += count
+    with TermDictWriter(os.path.join(index_dir, FUZZY_SYLLABLES_FILENAME)) as writer:
+        for syllable in sorted(syllables):
+            if syllable:
+                writer.add(syllable, syllables[syllable], 0, 0)
+
+    meta = {"min_df": min_df, "vocab_size": vocab_size, "num_terms": num_terms, "num_grams": len(names),
+            "num_postings": int(len(keys))}
+    # Ghi meta sau cùng: searcher chỉ mở trigram index khi meta tồn tại
+    with open(os.path.join(index_dir, FUZZY_META_FILENAME), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+# ============================================================================
+# READER
+# ============================================================================
+
+class FuzzyTermIndex:
+    """Tra term gần đúng trên trigram index (mmap)."""
+
+    def __init__(self, index_dir: str, term_dict: Optional[MmapTermDict] = None):
+        self.meta = load_fuzzy_meta(index_dir)
+        self.grams = MmapTermDict(os.path.join(index_dir, FUZZY_GRAMS_FILENAME))
+        self.syllables = MmapTermDict(os.path.join(index_dir, FUZZY_SYLLABLES_FILENAME))
+        self.postings = np.load(os.path.join(index_dir, FUZZY_POSTINGS_FILENAME), mmap_mode="r")
+        self._owns_term_dict = term_dict is None
+        self.term_dict = term_dict if term_dict is not None \
+            else MmapTermDict(os.path.join(index_dir, TERM_DICT_FILENAME))
+
+    def __len__(self) -> int:
+        return self.meta["num_terms"]
+
+    def is_known_syllables(self, token: str) -> bool:
+        """Mọi âm tiết của token (bỏ dấu) đều xuất hiện trong 1 term nào đó của index."""
+        folded = fold_accents(token.lower())
+        return all(syllable in self.syllables for syllable in folded.split("_"))
+
+    def _gram_lists(self, folded: str, distance: int) -> List[np.ndarray]:
+        """Danh sách key của từng trigram, chỉ phần độ dài trong [len - d, len + d]."""
+        lo = max(len(folded) - distance, 1) << 32
+        hi = (len(folded) + distance + 1) << 32
+        lists = []
+        for gram in term_grams(folded):
+            ordinal = self.grams.ordinal(gram)
+            if ordinal is None:
+                lists.append(self.postings[:0])
+                continue
+            _, offset, length = self.grams.entry(ordinal)
+            keys = self.postings[offset:offset + length]
+            start, stop = np.searchsorted(keys, (lo, hi))
+            lists.append(keys[start:stop])
+        return lists
+
+    def lookup(self, token: str, max_distance: int = MAX_EDIT_DISTANCE,
+               limit: int = 5) -> List[Tuple[str, int, int]]:
+        """
+        Các term gần đúng với token.
+
+        Returns:
+            [(term, khoảng cách, df)] theo khoảng cách tăng dần, df giảm dần;
+            rỗng nếu token quá ngắn hoặc không có term nào đủ gần
+        """
+        folded = fold_accents(token.lower())
+        distance = min(auto_distance(len(folded)), max_distance)
+        if distance == 0 or not _fuzzy_token(folded):
+            return []
+
+        lists = self._gram_lists(folded, distance)
+        keys = np.concatenate(lists)
+        if not len(keys):
+            return []
+        num_grams = len(lists)
+        shared = np.bincount(keys & 0xFFFFFFFF)
+        min_shared = max(num_grams - GRAMS_PER_EDIT * distance, 1)
+        candidates = np.flatnonzero(shared >= min_shared)
+        # Chung nhiều trigram trước, hoà: df lớn trước (df < 2^32)
+        dfs = self.term_dict.records["df"][candidates].astype(np.int64)
+        priority = -((shared[candidates].astype(np.int64) << 32) | dfs)
+        if len(candidates) > FUZZY_VERIFY_LIMIT:
+            top = np.argpartition(priority, FUZZY_VERIFY_LIMIT - 1)[:FUZZY_VERIFY_LIMIT]
+            candidates, dfs, priority = candidates[top], dfs[top], priority[top]
+        order = np.argsort(priority, kind="stable")
+        candidates, dfs = candidates[order], dfs[order]
+
+        matches = []
+        for ordinal, count, df in zip(candidates.tolist(), shared[candidates].tolist(), dfs.tolist()):
+            lower_bound = -(-(num_grams - count) // GRAMS_PER_EDIT)
+            if len(matches) >= limit and lower_bound > matches[limit - 1][0]:
+                break
+            term = self.term_dict.term_at(ordinal)
+            dist = edit_distance(folded, fold_accents(term), distance)
+            if dist <= distance:
+                matches.append((dist, -df, term))
+                matches.sort()
+        return [(term, dist, -neg_df) for dist, neg_df, term in matches[:limit]]
+
+    def close(self):
+        self.grams.close()
+        self.syllables.close()
+        self.postings = None
+        if self._owns_term_dict:
+            self.term_dict.close()
+
+
+# ============================================================================
+# ENTRY POINT
+# ============================================================================
+
+if __name__ == "__main__":
+    import argparse
+    from src.ranking.bm25 import DEFAULT_INDEX_DIR
+
+    parser = argparse.ArgumentParser(description="Tính trigram index (tra từ gần đúng) cho index đã merge")
+    parser.add_argument("index_dir", nargs="?", default=DEFAULT_INDEX_DIR)
+    parser.add_argument("--min-df", type=int, default=FUZZY_MIN_DF)
+    args = parser.parse_args()
+
+    start = time.time()
+    meta = write_fuzzy_terms(args.index_dir, args.min_df)
+    print(f"✓ Fuzzy terms: {meta['num_terms']:,d} terms, {meta['num_grams']:,d} trigrams "
+          f"({time.time() - start:.1f}s)")
@@ -0,0 +1,294 @@
+"""
+Precomputed Quantized Impacts (8-bit)
+=====================================
+Milestone 2 - SEG301: Search Engines & Information Retrieval
+
+k1, b và thống kê collection (avgdl / độ dài trung bình từng trường) cố
+định sau khi build, nên thành phần TF của BM25 / BM25F của mỗi posting có
+thể tính sẵn lúc index thay vì tính lại cho mọi truy vấn:
+
+    BM25:   tf_comp = tf * (k1 + 1) / (tf + k1 * (1 - b + b * |D| / avgdl))
+    BM25F:  tf_comp = tf~ * (k1 + 1) / (k1 + tf~)       (tf~ xem bm25.py)
+
+tf_comp nằm trong [0, k1 + 1) -> lượng tử hoá tuyến tính 8 bit:
+    impact = round(tf_comp / scale),  scale = (k1 + 1) / 255,  impact >= 1
+Lúc truy vấn: đóng góp của term = idf * scale * impact -> 1 phép nhân +
+cộng NumPy trên cả postings list (IDF vẫn tính theo N / df toàn cục nên
+segments thêm sau không làm impacts sai lệch về IDF).
+
+Sai số mỗi term <= scale / 2 (~0.0043 với k1 = 1.2); đo độ lệch xếp hạng
+so với tính chính xác bằng tests/benchmark_impacts.py.
+
+File (cùng bố cục với index vị trí, đánh chỉ số theo term ordinal):
+    impacts.bin           [Header 8 bytes] MAGIC | VERSION | FLAGS
+                          [df uint8 của term 0][df uint8 của term 1]...
+                          (cùng thứ tự với postings của term)
+    impacts_offsets.npy   int64[num_terms + 1]
+    impacts.json          k1, b, trọng số / b từng trường, scale, thống kê
+                          dùng để tính -> searcher chỉ dùng impacts khi
+                          tham số truy vấn khớp và avgdl / avglen_f toàn
+                          cục (kể cả segments) chưa lệch quá
+                          AVG_LENGTH_TOLERANCE
+
+Build: python src/indexer/impacts.py [index_dir]   (hoặc merging.py --impacts)
+"""
+
+import os
+import sys
+import json
+import time
+import struct
+from typing import Dict, Optional
+
+import numpy as np
+
+# Thêm project root vào path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.indexer.postings_codec import (
+    decode_postings, read_header, num_fields_from_flags, block_size_from_flags,
+)
+from src.indexer.mmap_term_dict import MmapTermDict, TERM_DICT_FILENAME
+from src.indexer.doc_store import load_doc_store
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+IMPACTS_MAGIC = b"OFIM"
+IMPACTS_VERSION = 1
+HEADER_STRUCT = struct.Struct("<4sHH")
+
+IMPACTS_FILENAME = "impacts.bin"
+IMPACTS_OFFSETS_FILENAME = "impacts_offsets.npy"
+IMPACTS_META_FILENAME = "impacts.json"
+
+IMPACT_BITS = 8
+IMPACT_MAX = (1 << IMPACT_BITS) - 1
+IMPACT_DTYPE = np.uint8
+
+# Coordination factor c(m) = (m / n) ** COORDINATION_EXPONENT: doc khớp m
+# trong n term của truy vấn (mọi tầng chấm điểm / cận trên dùng chung)
+COORDINATION_EXPONENT = 1.5
+
+# Lệch tương đối tối đa của avgdl / avglen_f (vd. sau add_documents) so với
+# lúc tính impacts; lệch hơn -> điểm index gốc khác thang với segments, không dùng
+AVG_LENGTH_TOLERANCE = 0.01
+
+
+def has_impacts(index_dir: str) -> bool:
+    """Index có impacts tính sẵn hay không."""
+    return os.path.exists(os.path.join(index_dir, IMPACTS_META_FILENAME))
+
+
+def remove_impacts(index_dir: str):
+    """Xoá impacts (index vừa build lại -> impacts cũ lệch term ordinal)."""
+    for filename in (IMPACTS_META_FILENAME, IMPACTS_FILENAME, IMPACTS_OFFSETS_FILENAME):
+        path = os.path.join(index_dir, filename)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+# ============================================================================
+# SCORING FORMULAS (dùng chung với bm25.py)
+# ============================================================================
+
+def bm25_tf_component(tfs: np.ndarray, norms: np.ndarray, k1: float) -> np.ndarray:
+    """tf * (k1 + 1) / (tf + k1 * norm), norm = 1 - b + b * |D| / avgdl."""
+    tfs = tfs.astype(np.float64)
+    return tfs * (k1 + 1) / (tfs + k1 * norms.astype(np.float64))
+
+
+def bm25f_field_tf(tfs: np.ndarray, field_lengths: np.ndarray, weights: np.ndarray,
+                   b: np.ndarray, avg_field_lengths: np.ndarray) -> np.ndarray:
+    """
+    tf~ của BM25F cho nhiều postings cùng lúc:
+        tf~ = Σ_f w_f * tf_f / (1 - b_f + b_f * |D_f| / avglen_f)
+
+    Args:
+        tfs: Ma trận n x F tf theo trường
+        field_lengths: Ma trận n x F độ dài trường của các doc tương ứng
+        weights, b, avg_field_lengths: Mảng F phần tử (avglen_f > 0)
+    """
+    norms = 1.0 - b + b * (field_lengths / avg_field_lengths)
+    return (tfs * (weights / np.maximum(norms, 1e-9))).sum(axis=1)
+
+
+def coordination_factor(matches, num_query_tokens: int):
+    """c(m) = (m / n) ** COORDINATION_EXPONENT (m: số hoặc mảng NumPy, n > 0)."""
+    return (matches / num_query_tokens) ** COORDINATION_EXPONENT
+
+
+def quantize(tf_components: np.ndarray, scale: float) -> np.ndarray:
+    """Lượng tử hoá tuyến tính về [1, IMPACT_MAX] (posting nào cũng đóng góp > 0)."""
+    impacts = np.rint(tf_components / scale)
+    return np.clip(impacts, 1, IMPACT_MAX).astype(IMPACT_DTYPE)
+
+
+def impact_scale(k1: float) -> float:
+    """Bước lượng tử: tf_comp < k1 + 1."""
+    return (k1 + 1) / IMPACT_MAX
+
+
+# ============================================================================
+# BUILD
+# ============================================================================
+
+def write_impacts(index_dir: str, k1: float, b: float,
+                  field_weights: Optional[Dict[str, float]] = None,
+                  field_b: Optional[Dict[str, float]] = None) -> dict:
+    """
+    Tính impacts cho toàn bộ postings của 1 index (theo term ordinal của
+    term_dict.bin) với thống kê trong doc store của chính index đó.
+
+    Args:
+        index_dir: Thư mục index (cần term_dict.bin, postings.bin nén, doc store)
+        k1, b: Tham số BM25 (b: mặc định cho mọi trường với index theo trường)
+        field_weights: Trọng số trường (BM25F); trường không nêu = 1.0
+        field_b: b riêng từng trường (BM25F); trường không nêu = b
+
+    Returns:
+        meta (cũng được ghi ra impacts.json)
+    """
+    term_dict = MmapTermDict(os.path.join(index_dir, TERM_DICT_FILENAME))
+    store = load_doc_store(index_dir, b=b)
+    scale = impact_scale(k1)
+    tmp_meta_path = os.path.join(index_dir, IMPACTS_META_FILENAME)
+    # Xoá meta trước: searcher không dùng impacts khi file đang được ghi
+    if os.path.exists(tmp_meta_path):
+        os.remove(tmp_meta_path)
+
+    meta = {"bits": IMPACT_BITS, "scale": scale, "k1": k1, "b": b, "fields": None}
+    field_params = None
+    if store.fields:
+        field_weights = field_weights or {}
+        field_b = field_b or {}
+        weights = np.array([field_weights.get(name, 1.0) for name in store.fields])
+        field_bs = np.array([field_b.get(name, b) for name in store.fields])
+        avg = np.asarray(store.avg_field_lengths, dtype=np.float64)
+        field_params = (weights, field_bs, np.where(avg > 0, avg, 1.0))
+        meta.update(fields=list(store.fields), field_weights=weights.tolist(),
+                    field_b=field_bs.tolist(), avg_field_lengths=avg.tolist())
+    else:
+        meta["avg_doc_length"] = store.avg_doc_length
+
+    offsets = np.empty(len(term_dict) + 1, dtype=np.int64)
+    total_postings = 0
+    try:
+        with open(os.path.join(index_dir, "postings.bin"), "rb") as postings_file, \
+                open(os.path.join(index_dir, IMPACTS_FILENAME), "wb") as out:
+            header = read_header(postings_file)
+            if header is None:
+                raise ValueError(f"Legacy pickle postings in {index_dir}: "
+                                 f"run postings_codec.py to convert first")
+            num_fields = num_fields_from_flags(header[1])
+            block_size = block_size_from_flags(header[1])
+            out.write(HEADER_STRUCT.pack(IMPACTS_MAGIC, IMPACTS_VERSION, 0))
+            offsets[0] = out.tell()
+            for ordinal in range(len(term_dict)):
+                _, offset, length = term_dict.entry(ordinal)
+                postings_file.seek(offset)
+                doc_ids, tfs = decode_postings(postings_file.read(length), num_fields, block_size)
+                if field_params is not None:
+                    field_tf = bm25f_field_tf(tfs, store.field_lengths[doc_ids], *field_params)
+                    tf_components = field_tf * (k1 + 1) / (k1 + field_tf)
+                else:
+                    tf_components = bm25_tf_component(tfs, store.doc_norms[doc_ids], k1)
+                out.write(quantize(tf_components, scale).tobytes())
+                offsets[ordinal + 1] = out.tell()
+                total_postings += len(doc_ids)
+    finally:
+        term_dict.close()
+
+    np.save(os.path.join(index_dir, IMPACTS_OFFSETS_FILENAME), offsets)
+    meta["num_terms"] = len(offsets) - 1
+    meta["num_postings"] = total_postings
+    with open(tmp_meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def load_impacts_meta(index_dir: str) -> dict:
+    with open(os.path.join(index_dir, IMPACTS_META_FILENAME), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# ============================================================================
+# READER
+# ============================================================================
+
+class ImpactsReader:
+    """Impacts theo term ordinal: 1 mmap cho cả file, get() trả về view (không copy)."""
+
+    def __init__(self, index_dir: str):
+        self.meta = load_impacts_meta(index_dir)
+        self.scale = self.meta["scale"]
+        self.offsets = np.load(os.path.join(index_dir, IMPACTS_OFFSETS_FILENAME), mmap_mode="r")
+        path = os.path.join(index_dir, IMPACTS_FILENAME)
+        with open(path, "rb") as f:
+            magic, version, _ = HEADER_STRUCT.unpack(f.read(HEADER_STRUCT.size))
+        if magic != IMPACTS_MAGIC:
+            raise ValueError(f"Not an impacts file: {index_dir}")
+        if version > IMPACTS_VERSION:
+            raise ValueError(f"Unsupported impacts version {version}: {index_dir}")
+        self.data = np.memmap(path, dtype=IMPACT_DTYPE, mode="r")
+
+    def get(self, ordinal: int) -> np.ndarray:
+        return self.data[int(self.offsets[ordinal]):int(self.offsets[ordinal + 1])]
+
+    def block_max(self, ordinal: int, block_size: int) -> np.ndarray:
+        """Impact lớn nhất của từng block postings (cùng chia block với skip table)."""
+        impacts = self.get(ordinal)
+        if not impacts.size:
+            return impacts
+        if not block_size:
+            return impacts.max(keepdims=True)
+        return np.maximum.reduceat(impacts, np.arange(0, impacts.size, block_size))
+
+    def matches(self, k1: float, b: float, fields=None, field_weights=None, field_b=None,
+                avg_doc_length: Optional[float] = None, avg_field_lengths=None) -> bool:
+        """
+        Impacts được tính với đúng các tham số này hay không. avg_doc_length /
+        avg_field_lengths (thống kê toàn cục hiện tại, None = không kiểm tra)
+        phải lệch <= AVG_LENGTH_TOLERANCE so với lúc tính.
+        """
+        meta = self.meta
+        if not (np.isclose(meta["k1"], k1) and np.isclose(meta["b"], b)):
+            return False
+        if meta["fields"] is None or fields is None:
+            if meta["fields"] is not None or fields is not None:
+                return False
+            return avg_doc_length is None or bool(
+                np.isclose(avg_doc_length, meta["avg_doc_length"], rtol=AVG_LENGTH_TOLERANCE, atol=0))
+        return (list(fields) == meta["fields"]
+                and np.allclose(field_weights, meta["field_weights"])
+                and np.allclose(field_b, meta["field_b"])
+                and (avg_field_lengths is None
+                     or np.allclose(avg_field_lengths, meta["avg_field_lengths"],
+                                    rtol=AVG_LENGTH_TOLERANCE, atol=0)))
+
+    def close(self):
+        self.data = None
+        self.offsets = None
+
+
+# ============================================================================
+# ENTRY POINT
+# ============================================================================
+
+if __name__ == "__main__":
+    import argparse
+    from src.ranking.bm25 import K1, B, FIELD_WEIGHTS, DEFAULT_INDEX_DIR
+
+    parser = argparse.ArgumentParser(description="Tính sẵn impacts 8-bit cho postings")
+    parser.add_argument("index_dir", nargs="?", default=DEFAULT_INDEX_DIR)
+    parser.add_argument("--k1", type=float, default=K1)
+    parser.add_argument("--b", type=float, default=B)
+    args = parser.parse_args()
+
+    start = time.time()
+    meta = write_impacts(args.index_dir, args.k1, args.b, FIELD_WEIGHTS)
+    size_mb = os.path.getsize(os.path.join(args.index_dir, IMPACTS_FILENAME)) / (1024 * 1024)
+    print(f"✓ Impacts: {meta['num_postings']:,d} postings, {meta['num_terms']:,d} terms, "
+          f"{size_mb:.1f} MB ({time.time() - start:.1f}s)")
@@ -0,0 +1,221 @@
+"""
+Single-Pass Ingestion
+=====================
+Milestone 2 - SEG301: Search Engines & Information Retrieval
+
+Build đầy đủ trước đây đọc + parse file JSONL nhiều lần, mỗi artifact 1
+lượt riêng:
+
+    spimi.py            inverted index + doc store
+    merging.py          gợi ý tên công ty (write_suggest_names)
+    build_mst_index.py  map MST -> byte offset
+    vector.py           text cần encode cho FAISS
+
+Với 1.8M dòng, phần đọc + json.loads lặp lại chiếm phần lớn thời gian của
+các bước phụ. ingest() đọc mỗi dòng đúng 1 lần (iter_records) và chia
+record đã parse cho các "sink" trong lúc SPIMI tiêu thụ chúng:
+
+    iter_records ──> tap_records ──> build_spimi_index (blocks, doc store)
+                         │
+                         ├── MstSink     mst_index.pkl
+                         ├── NameSink    suggest_names_*
+                         └── VectorSink  vector_faiss.index (tuỳ chọn)
+
+Mỗi sink có add(doc_id, line_no, byte_offset, doc) và finish(index_dir);
+sau khi merge xong các sink ghi artifact của mình. Kết quả giống hệt chạy
+từng script riêng.
+
+Usage: python src/indexer/ingest.py [--workers 4] [--vectors] [--impacts]
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+from typing import Iterable, List
+
+# Thêm project root vào path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.indexer.spimi import build_spimi_index, iter_records, BLOCK_SIZE, DEFAULT_MEMORY_BUDGET_MB
+from src.indexer.merging import merge_blocks
+from src.indexer.build_mst_index import write_mst_index, normalize_tax_code, MST_INDEX_FILENAME
+from src.indexer.suggest import NameSuggestions
+from src.indexer.impacts import write_impacts
+from src.indexer.champions import write_champions
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+DEFAULT_DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+DEFAULT_INDEX_DIR = os.path.join(DEFAULT_DATA_PATH, "index")
+
+
+# ============================================================================
+# SINKS
+# ============================================================================
+
+class MstSink:
+    """MST -> byte offset của dòng trong JSONL (như build_mst_index.py)."""
+
+    name = "mst"
+
+    def __init__(self):
+        self.mst_dict = {}
+
+    def add(self, doc_id, line_no, byte_offset, doc):
+        tax_code = doc.get("tax_code")
+        if tax_code is None:
+            return
+        tax_code = normalize_tax_code(tax_code)
+        if tax_code:
+            self.mst_dict[tax_code] = byte_offset
+
+    def finish(self, index_dir: str):
+        write_mst_index(self.mst_dict, os.path.join(index_dir, MST_INDEX_FILENAME))
+
+
+class NameSink:
+    """Gợi ý tên công ty (suggest_names_*, xem suggest.py)."""
+
+    name = "names"
+
+    def __init__(self):
+        self.names = NameSuggestions()
+
+    def add(self, doc_id, line_no, byte_offset, doc):
+        self.names.add(doc)
+
+    def finish(self, index_dir: str):
+        meta = self.names.write(index_dir)
+        print(f"  Suggest: {meta['num_keys']:,d} company names")
+
+
+class VectorSink:
+    """
+    Encode text cho vector index theo chunk trong lúc đọc. doc_id của vector
+    index là số dòng JSONL (giống create_vector_index).
+    """
+
+    name = "vectors"
+
+    def __init__(self):
+        # Import muộn: sentence_transformers / faiss chỉ cần khi bật --vectors
+        from src.ranking.vector import VectorIndexWriter
+        self.writer = VectorIndexWriter()
+
+    def add(self, doc_id, line_no, byte_offset, doc):
+        self.writer.add(line_no, doc)
+
+    def finish(self, index_dir: str):
+        from src.ranking.vector import DEFAULT_VECTOR_INDEX_PATH, DEFAULT_DOC_IDS_PATH
+        self.writer.save(os.path.join(index_dir, os.path.basename(DEFAULT_VECTOR_INDEX_PATH)),
+                         os.path.join(index_dir, os.path.basename(DEFAULT_DOC_IDS_PATH)))
+
+
+def tap_records(records: Iterable, sinks: List) -> Iterable:
+    """Chuyển tiếp từng record cho SPIMI, đồng thời đưa cho mọi sink."""
+    for record in records:
+        for sink in sinks:
+            sink.add(*record)
+        yield record
+
+
+# ============================================================================
+# DRIVER
+# ============================================================================
+
+def ingest(jsonl_path: str, index_dir: str = DEFAULT_INDEX_DIR,
+           workers: int = 1, block_size: int = BLOCK_SIZE,
+           memory_budget_mb: float = DEFAULT_MEMORY_BUDGET_MB,
+           positions: bool = False, fields: bool = True,
+           vectors: bool = False, impacts: bool = False, champions: bool = False) -> dict:
+    """
+    Build toàn bộ index từ 1 lượt đọc JSONL: SPIMI blocks + merge (term
+    dict, postings, doc store, index tra cứu), map MST, gợi ý tên công ty,
+    và vector index nếu vectors=True.
+
+    Returns:
+        stats: {"docs", "mst", "names", "time"}
+    """
+    print("=" * 70)
+    print("  SINGLE-PASS INGESTION")
+    print("=" * 70)
+    start_time = time.time()
+
+    sinks = [MstSink(), NameSink()]
+    if vectors:
+        sinks.append(VectorSink())
+
+    blocks_dir = os.path.join(index_dir, "blocks")
+    records = tap_records(iter_records(jsonl_path), sinks)
+    _, total_docs, _ = build_spimi_index(jsonl_path, blocks_dir, block_size, workers=workers,
+                                         memory_budget_mb=memory_budget_mb, positions=positions,
+                                         fields=fields, records=records)
+    # Tên công ty do NameSink ghi -> merge không đọc lại JSONL
+    merge_blocks(blocks_dir, index_dir, workers=workers)
+    shutil.rmtree(blocks_dir, ignore_errors=True)
+
+    for sink in sinks:
+        sink.finish(index_dir)
+
+    if impacts or champions:
+        from src.ranking.bm25 import K1, B, FIELD_WEIGHTS
+        impacts_meta = write_impacts(index_dir, K1, B, FIELD_WEIGHTS)
+        print(f"  Impacts: {impacts_meta['num_postings']:,d} postings (8-bit, k1={K1}, b={B})")
+    if champions:
+        champions_meta = write_champions(index_dir)
+        print(f"  Champion lists: {champions_meta['num_terms']:,d} terms, "
+              f"{champions_meta['num_postings']:,d} postings")
+
+    elapsed = time.time() - start_time
+    stats = {
+        "docs": total_docs,
+        "mst": len(sinks[0].mst_dict),
+        "names": len(sinks[1].names.entries),
+        "time": elapsed,
+    }
+    print("-" * 70)
+    print(f"  Ingestion Complete! ({', '.join(sink.name for sink in sinks)})")
+    print(f"  Docs: {total_docs:,d} | MSTs: {stats['mst']:,d} | Names: {stats['names']:,d}")
+    print(f"  Time: {elapsed:.1f}s")
+    print("=" * 70)
+    return stats
+
+
+# ============================================================================
+# ENTRY POINT
+# ============================================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build mọi artifact của index trong 1 lượt đọc JSONL")
+    parser.add_argument("--jsonl", default=os.path.join(DEFAULT_DATA_PATH, "milestone1_fixed.jsonl"))
+    parser.add_argument("--out", default=DEFAULT_INDEX_DIR, help="Thư mục index")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Số worker processes SPIMI / merge")
+    parser.add_argument("--block-size", type=int, default=BLOCK_SIZE)
+    parser.add_argument("--memory-budget-mb", type=float, default=DEFAULT_MEMORY_BUDGET_MB)
+    parser.add_argument("--positions", action="store_true",
+                        help="Build kèm index vị trí (phrase / proximity queries)")
+    parser.add_argument("--no-fields", action="store_true",
+                        help="Index 1 text gộp thay vì theo trường")
+    parser.add_argument("--vectors", action="store_true",
+                        help="Encode luôn vector index (cần sentence_transformers + faiss)")
+    parser.add_argument("--impacts", action="store_true",
+                        help="Tính sẵn impacts 8-bit (xem impacts.py)")
+    parser.add_argument("--champions", action="store_true",
+                        help="Thêm champion lists (xem champions.py, kèm --impacts)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.jsonl):
+        print(f"ERROR: Data file not found: {args.jsonl}")
+        sys.exit(1)
+
+    ingest(args.jsonl, args.out, workers=args.workers, block_size=args.block_size,
+           memory_budget_mb=args.memory_budget_mb, positions=args.positions,
+           fields=not args.no_fields, vectors=args.vectors,
+           impacts=args.impacts, champions=args.champions)
+    print(f"\n✓ Ingestion complete. Run search_console.py to start searching!")
@@ -8,29 +8,81 @@ module này merge tất cả blocks thành một Inverted Index hoàn chỉnh.
 
 Thuật toán Merge:
 - Sử dụng K-way merge (tương tự merge sort) nhờ heapq.
-- Mở tất cả block files, đọc từng term theo thứ tự alphabet.
+- Đọc streaming từng block file (buffer nhỏ), từng term theo thứ tự alphabet.
 - Merge postings lists của cùng một term từ các blocks khác nhau.
+- Nếu số block > max_fan_in: merge nhiều pass (mỗi pass gộp tối đa
+  max_fan_in blocks thành block trung gian) -> RAM đỉnh không phụ thuộc
+  vào số block.
+- Chế độ song song (--workers N): chia không gian term thành các khoảng
+  [lo, hi) theo sample boundaries của blocks, mỗi khoảng merge trong
+  1 process riêng ra 1 postings part, sau đó nối các part (dời offset)
+  thành postings.bin + term dictionary duy nhất.
+- Blocks có index vị trí (spimi.py --positions): vị trí được merge cùng
+  postings và ghi ra positions.bin + positions_offsets.npy (positions.py).
+- Blocks theo trường (tf theo từng trường, cho BM25F): postings.bin ghi
+  FLAG_FIELDS + số trường trong header, entry giữ tf của từng trường.
+- postings.bin chia block (POSTINGS_BLOCK_SIZE postings) + skip table cho
+  list dài (FLAG_BLOCKS, xem postings_codec.py); block files giữ entry liền.
+- --impacts: tính sẵn impacts 8-bit (BM25 / BM25F) sau khi merge
+  (impacts.py); merge lại luôn xoá impacts cũ.
+- Luôn ghi kèm từ điển bỏ dấu (folded_terms.bin, xem folded_terms.py) cho
+  truy vấn không dấu, trigram index (fuzzy_grams.bin, xem fuzzy_terms.py)
+  cho token gõ sai và index gợi ý tiền tố (suggest_terms.bin, xem
+  suggest.py; kèm tên công ty khi có jsonl_path).
+- --champions: thêm champion lists (tầng nhanh cho term df lớn, champions.py,
+  kéo theo --impacts); merge lại cũng xoá champion lists cũ.
+- Luôn gom kèm cận trên điểm theo term (term_bounds.npy, xem term_bounds.py)
+  trong lúc ghi postings, cho MaxScore (bm25.py scorer="maxscore").
 - Ghi final inverted index dưới dạng 2 file:
     1. term_dict.pkl: Dict[str, (df, offset, length)] - nhỏ, load nhanh
+       (kèm term_dict.bin: bản front-coded, mmap được - xem mmap_term_dict.py)
     2. postings.bin: Binary file chứa postings data - đọc random access
 
 Cấu trúc Final Index:
     term_dict.pkl: Dict[str, Tuple[int, int, int]]
     Trong đó: term -> (document_frequency, byte_offset, byte_length)
     
-    postings.bin: Binary file
-    Mỗi entry: pickle.dumps([(doc_id, term_freq), ...])
+    postings.bin: Binary file (định dạng nén, xem postings_codec.py)
+    Header 8 bytes + mỗi entry: varint(n) | doc-id gaps | term freqs
 """
 
 import os
 import gc
 import sys
 import time
+import argparse
 import pickle
 import heapq
+import shutil
 import struct
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, Iterator, List, Tuple, Optional
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Thêm project root vào path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.indexer.postings_codec import (
+    encode_postings, write_header, fields_flags, blocks_flags, POSTINGS_BLOCK_SIZE,
+)
+from src.indexer.block_format import (
+    BlockWriter, iter_block_records, list_block_files, load_samples, remove_block,
+    block_has_positions, block_num_fields, DEFAULT_READ_BUFFER,
+)
+from src.indexer.positions import (
+    PositionsWriter, PositionsPartWriter, reorder_positions,
+    POSITIONS_FILENAME, POSITIONS_OFFSETS_FILENAME,
+)
+from src.indexer.mmap_term_dict import TermDictWriter, TERM_DICT_FILENAME
+from src.indexer.doc_store import has_doc_store
+from src.indexer.impacts import write_impacts, remove_impacts
+from src.indexer.champions import write_champions, remove_champions
+from src.indexer.term_bounds import TermBoundsWriter, remove_term_bounds
+from src.indexer.folded_terms import write_folded_terms, FOLDED_DICT_FILENAME
+from src.indexer.fuzzy_terms import write_fuzzy_terms, FUZZY_GRAMS_FILENAME
+from src.indexer.suggest import write_suggest_terms, write_suggest_names
 
 
 # ============================================================================
@@ -41,6 +93,13 @@ DEFAULT_DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "data")
 DEFAULT_INDEX_DIR = os.path.join(DEFAULT_DATA_PATH, "index")
 DEFAULT_BLOCKS_DIR = os.path.join(DEFAULT_INDEX_DIR, "blocks")
 
+# Số block tối đa mở đồng thời trong 1 pass merge
+# (RAM readers ~ MAX_FAN_IN x DEFAULT_READ_BUFFER)
+MAX_FAN_IN = 64
+
+# Số khoảng term cho mỗi worker khi merge song song (nhiều hơn 1 để cân tải)
+RANGES_PER_WORKER = 4
+
 
 # ============================================================================
 # K-WAY MERGE
@@ -48,23 +107,33 @@ DEFAULT_BLOCKS_DIR = os.path.join(DEFAULT_INDEX_DIR, "blocks")
 
 class BlockReader:
     """
-    Reader cho 1 block file.
-    Hỗ trợ đọc từng term theo thứ tự alphabet (iterator pattern).
+    Reader streaming cho 1 block file.
+    Đọc từng term theo thứ tự alphabet (iterator pattern), chỉ giữ
+    record hiện tại + buffer đọc trong RAM.
+    
+    Nếu truyền records (iterator (term, doc_ids, tfs, positions) bất kỳ,
+    vd. postings của 1 segment), reader đọc từ đó thay vì từ block file.
     """
     
-    def __init__(self, block_path: str, block_id: int):
+    def __init__(self, block_path: Optional[str], block_id: int,
+                 buffer_size: int = DEFAULT_READ_BUFFER,
+                 lo: Optional[str] = None, hi: Optional[str] = None,
+                 records: Optional[Iterator[tuple]] = None):
         self.block_id = block_id
         self.block_path = block_path
-        self._data = None
+        self.buffer_size = buffer_size
+        self.lo = lo
+        self.hi = hi
+        self._records = records
         self._iter = None
         self._current = None
     
     def open(self):
-        """Load block data từ pickle file."""
-        with open(self.block_path, "rb") as f:
-            self._data = pickle.load(f)
-        # sorted dictionary -> iterator qua (term, postings)
-        self._iter = iter(sorted(self._data.items()))
+        """Mở block file và đọc record đầu tiên."""
+        if self._records is not None:
+            self._iter = self._records
+        else:
+            self._iter = iter_block_records(self.block_path, self.buffer_size, self.lo, self.hi)
         self._advance()
     
     def _advance(self):
@@ -82,11 +151,11 @@ class BlockReader:
         return self._current[0]
     
     @property 
-    def current_postings(self) -> Optional[List[Tuple[int, int]]]:
-        """Trả về postings list của term hiện tại."""
+    def current_postings(self) -> Optional[Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]]:
+        """Trả về postings (doc_ids, tfs, positions) của term hiện tại."""
         if self._current is None:
             return None
-        return self._current[1]
+        return self._current[1], self._current[2], self._current[3]
     
     @property
     def is_exhausted(self) -> bool:
@@ -98,14 +167,324 @@ class BlockReader:
         self._advance()
     
     def close(self):
-        """Giải phóng bộ nhớ."""
-        self._data = None
+        """Đóng file (generator) và giải phóng bộ nhớ."""
+        if self._iter is not None and hasattr(self._iter, "close"):
+            self._iter.close()
         self._iter = None
         self._current = None
 
 
+def kway_merge(block_files: List[str],
+               buffer_size: int = DEFAULT_READ_BUFFER,
+               lo: Optional[str] = None, hi: Optional[str] = None
+               ) -> Iterator[tuple]:
+    """
+    K-way merge streaming các block files.
+    
+    Block files phải theo thứ tự doc_id (thứ tự tên file do SPIMI sinh ra),
+    nên postings của cùng 1 term nối theo thứ tự block là đã sắp xếp.
+    Nếu có lo / hi: chỉ merge các terms trong khoảng [lo, hi).
+    
+    Yields:
+        (term, doc_ids, tfs, positions) theo thứ tự term tăng dần
+        (positions = None nếu blocks không có index vị trí)
+    """
+    return merge_readers([
+        BlockReader(path, i, buffer_size, lo, hi) for i, path in enumerate(block_files)
+    ])
+
+
+def merge_record_streams(streams: List[Iterator[tuple]]) -> Iterator[tuple]:
+    """
+    K-way merge các iterator (term, doc_ids, tfs, positions) đã sắp theo term
+    (vd. postings của nhiều segments). streams phải theo thứ tự doc_id.
+    """
+    return merge_readers([
+        BlockReader(None, i, records=stream) for i, stream in enumerate(streams)
+    ])
+
+
+def merge_readers(readers: List[BlockReader]) -> Iterator[tuple]:
+    """Heap merge các BlockReader (chỉ số trong list = block_id)."""
+    for reader in readers:
+        reader.open()
+    
+    # Min-heap: (term, block_id). block_id cũng là chỉ số trong readers -> O(1)
+    heap = [(r.current_term, r.block_id) for r in readers if not r.is_exhausted]
+    heapq.heapify(heap)
+    
+    try:
+        while heap:
+            # Lấy term nhỏ nhất
+            min_term = heap[0][0]
+            
+            # Thu thập postings từ tất cả blocks có cùng term này
+            # (heap trả về theo block_id tăng dần khi cùng term)
+            parts_ids = []
+            parts_tfs = []
+            parts_positions = []
+            while heap and heap[0][0] == min_term:
+                _, block_id = heapq.heappop(heap)
+                reader = readers[block_id]
+                doc_ids, tfs, positions = reader.current_postings
+                parts_ids.append(doc_ids)
+                parts_tfs.append(tfs)
+                parts_positions.append(positions)
+                reader.consume()
+                
+                # Nếu reader chưa hết, đẩy term tiếp theo vào heap
+                if not reader.is_exhausted:
+                    heapq.heappush(heap, (reader.current_term, block_id))
+            
+            if len(parts_ids) == 1:
+                doc_ids, tfs, positions = parts_ids[0], parts_tfs[0], parts_positions[0]
+            else:
+                doc_ids = np.concatenate(parts_ids)
+                tfs = np.concatenate(parts_tfs)
+                # Vị trí mỗi doc độc lập -> nối theo cùng thứ tự với postings
+                positions = None
+                if all(p is not None for p in parts_positions):
+                    positions = np.concatenate(parts_positions)
+                # Phòng trường hợp block không theo thứ tự doc_id
+                if (np.diff(doc_ids) <= 0).any():
+                    order = np.argsort(doc_ids, kind="stable")
+                    if positions is not None:
+                        positions = reorder_positions(tfs, positions, order)
+                    doc_ids, tfs = doc_ids[order], tfs[order]
+            
+            yield min_term, doc_ids, tfs, positions
+    finally:
+        for reader in readers:
+            reader.close()
+
+
+def reduce_blocks(block_files: List[str], work_dir: str,
+                  max_fan_in: int = MAX_FAN_IN,
+                  buffer_size: int = DEFAULT_READ_BUFFER) -> List[str]:
+    """
+    Merge nhiều pass cho tới khi số block <= max_fan_in.
+    
+    Mỗi pass gộp các nhóm max_fan_in blocks LIÊN TIẾP (giữ thứ tự doc_id)
+    thành 1 block trung gian trong work_dir. Block trung gian của pass
+    trước bị xoá ngay khi không còn cần.
+    """
+    pass_num = 0
+    while len(block_files) > max_fan_in:
+        next_files = []
+        for group_num, start in enumerate(range(0, len(block_files), max_fan_in)):
+            group = block_files[start:start + max_fan_in]
+            if len(group) == 1:
+                next_files.append(group[0])
+                continue
+            
+            out_path = os.path.join(work_dir, f"pass{pass_num}_{group_num:04d}.blk")
+            positional = all(block_has_positions(path) for path in group)
+            with BlockWriter(out_path, positions=positional,
+                             num_fields=blocks_num_fields(group)) as writer:
+                for term, doc_ids, tfs, positions in kway_merge(group, buffer_size):
+                    writer.add(term, doc_ids, tfs, positions)
+            next_files.append(out_path)
+            
+            # Xoá block trung gian đã dùng xong (không xoá block gốc của SPIMI)
+            for path in group:
+                if os.path.dirname(path) == work_dir:
+                    remove_block(path)
+        
+        print(f"  Merge pass {pass_num}: {len(block_files)} -> {len(next_files)} blocks")
+        block_files = next_files
+        pass_num += 1
+    
+    return block_files
+
+
+def blocks_num_fields(block_files: List[str]) -> int:
+    """Số trường chung của các blocks (không merge lẫn block theo trường / không)."""
+    counts = {block_num_fields(path) for path in block_files}
+    if len(counts) > 1:
+        raise ValueError(f"Cannot merge blocks with different field layouts: {sorted(counts)}")
+    return counts.pop() if counts else 0
+
+
+def write_postings(postings_file, merged: Iterator[tuple], positions_writer=None,
+                   block_size: int = POSTINGS_BLOCK_SIZE,
+                   bounds_writer: Optional[TermBoundsWriter] = None
+                   ) -> Iterator[Tuple[str, int, int, int]]:
+    """
+    Ghi postings đã merge xuống file (delta + varint, list dài chia block
+    block_size postings + skip table - header phải có blocks_flags(block_size)).
+    Nếu có positions_writer (PositionsWriter / PositionsPartWriter): ghi
+    kèm vị trí của từng term, cùng thứ tự term. Nếu có bounds_writer: gom
+    cận trên điểm của từng term (term_bounds.py).
+    
+    Yields:
+        (term, df, byte_offset, byte_length) theo thứ tự term
+    """
+    for term, doc_ids, tfs, positions in merged:
+        postings_bytes = encode_postings(doc_ids, tfs, block_size)
+        offset = postings_file.tell()
+        postings_file.write(postings_bytes)
+        if positions_writer is not None:
+            if positions is None:
+                raise ValueError(f"Missing positions for {term!r}")
+            positions_writer.add(tfs, positions)
+        if bounds_writer is not None:
+            bounds_writer.add(doc_ids, tfs)
+        yield term, len(doc_ids), offset, len(postings_bytes)
+
+
+# ============================================================================
+# RANGE-PARTITIONED PARALLEL MERGE
+# ============================================================================
+
+def plan_term_ranges(block_files: List[str], num_ranges: int
+                     ) -> List[Tuple[Optional[str], Optional[str]]]:
+    """
+    Chia không gian term thành tối đa num_ranges khoảng [lo, hi) liên tiếp.
+    
+    Mỗi sample (term, offset) của block đại diện cho đoạn bytes tới sample
+    kế tiếp -> chọn ranh giới tại các phân vị theo tổng bytes postings,
+    để các khoảng có khối lượng merge xấp xỉ nhau.
+    Khoảng đầu có lo = None, khoảng cuối có hi = None.
+    """
+    weighted = []
+    for path in block_files:
+        sampled = load_samples(path)
+        if not sampled:
+            continue
+        samples, end = sampled
+        for i, (term, offset) in enumerate(samples):
+            next_offset = samples[i + 1][1] if i + 1 < len(samples) else end
+            weighted.append((term, next_offset - offset))
+    
+    if num_ranges <= 1 or not weighted:
+        return [(None, None)]
+    
+    weighted.sort()
+    total = sum(weight for _, weight in weighted)
+    boundaries = []
+    cumulative = 0
+    next_cut = 1
+    for term, weight in weighted:
+        if next_cut >= num_ranges:
+            break
+        if cumulative >= total * next_cut / num_ranges:
+            if not boundaries or term > boundaries[-1]:
+                boundaries.append(term)
+            next_cut += 1
+        cumulative += weight
+    
+    edges = [None] + boundaries + [None]
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def merge_term_range(block_files: List[str], lo: Optional[str], hi: Optional[str],
+                     part_path: str, buffer_size: int = DEFAULT_READ_BUFFER,
+                     positions: bool = False, doc_store_dir: Optional[str] = None
+                     ) -> Tuple[List[Tuple[str, int, int, int]], Optional[List[int]], Optional[np.ndarray]]:
+    """
+    Worker: merge các terms trong [lo, hi) ra 1 postings part (không header),
+    kèm part vị trí part_path + ".pos" nếu positions.
+    Hàm top-level để ProcessPoolExecutor pickle được.
+    
+    Returns:
+        entries: [(term, df, offset trong part, length), ...]
+        position_lengths: độ dài entry vị trí của từng term (None nếu không có)
+        bounds: cận trên theo term (term_bounds.py) nếu có doc_store_dir, ngược lại None
+    """
+    merged = kway_merge(block_files, buffer_size, lo, hi)
+    bounds_writer = TermBoundsWriter(doc_store_dir) if doc_store_dir else None
+    position_lengths = None
+    with open(part_path, "wb") as part_file:
+        if not positions:
+            entries = list(write_postings(part_file, merged, bounds_writer=bounds_writer))
+        else:
+            with PositionsPartWriter(part_path + ".pos") as positions_part:
+                entries = list(write_postings(part_file, merged, positions_part,
+                                              bounds_writer=bounds_writer))
+            position_lengths = positions_part.lengths
+    return entries, position_lengths, bounds_writer.bounds() if bounds_writer is not None else None
+
+
+def stitch_parts(postings_file, parts: List[tuple], positions_writer: Optional[PositionsWriter] = None,
+                 bounds_writer: Optional[TermBoundsWriter] = None
+                 ) -> Iterator[Tuple[str, int, int, int]]:
+    """
+    Nối các postings parts (theo thứ tự khoảng term) vào postings_file,
+    dời offset của từng entry theo vị trí part trong file cuối.
+    Part vị trí (nếu có) được nối vào positions_writer, cận trên theo term
+    vào bounds_writer.
+    """
+    for part_path, entries, position_lengths, bounds in parts:
+        base = postings_file.tell()
+        with open(part_path, "rb") as part_file:
+            shutil.copyfileobj(part_file, postings_file, 1024 * 1024)
+        os.remove(part_path)
+        if positions_writer is not None:
+            with open(part_path + ".pos", "rb") as part_file:
+                positions_writer.add_encoded(part_file, position_lengths)
+            os.remove(part_path + ".pos")
+        if bounds_writer is not None:
+            bounds_writer.extend(bounds)
+        for term, doc_freq, offset, length in entries:
+            yield term, doc_freq, base + offset, length
+
+
+def merge_ranges_parallel(block_files: List[str], work_dir: str, workers: int,
+                          buffer_size: int = DEFAULT_READ_BUFFER,
+                          positions: bool = False, doc_store_dir: Optional[str] = None
+                          ) -> List[tuple]:
+    """
+    Merge từng khoảng term trong process riêng.
+    Trả về parts [(part_path, entries, position_lengths, bounds), ...] theo thứ tự term.
+    """
+    ranges = plan_term_ranges(block_files, workers * RANGES_PER_WORKER)
+    print(f"  Parallel merge: {len(ranges)} term ranges on {workers} workers")
+    
+    part_paths = [os.path.join(work_dir, f"part_{i:04d}.bin") for i in range(len(ranges))]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(merge_term_range, block_files, lo, hi, part_path, buffer_size,
+                            positions, doc_store_dir)
+            for (lo, hi), part_path in zip(ranges, part_paths)
+        ]
+        parts = []
+        for i, (future, part_path) in enumerate(zip(futures, part_paths)):
+            entries, position_lengths, bounds = future.result()
+            parts.append((part_path, entries, position_lengths, bounds))
+            print(f"  Range {i + 1}/{len(ranges)} done: {len(entries):,d} terms")
+    return parts
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak RSS của process hiện tại (MB), None nếu hệ điều hành không hỗ trợ."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KB, macOS: bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def current_rss_mb() -> Optional[float]:
+    """RSS hiện tại của process (MB, /proc/self/status), None nếu không đọc được."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
 def merge_blocks(blocks_dir: str = DEFAULT_BLOCKS_DIR,
-                  index_dir: str = DEFAULT_INDEX_DIR) -> str:
+                  index_dir: str = DEFAULT_INDEX_DIR,
+                  max_fan_in: int = MAX_FAN_IN,
+                  buffer_size: int = DEFAULT_READ_BUFFER,
+                  workers: int = 1,
+                  jsonl_path: Optional[str] = None,
+                  lookup_indexes: bool = True) -> str:
     """
     K-way merge tất cả block files thành final inverted index.
     
@@ -116,9 +495,19 @@ def merge_blocks(blocks_dir: str = DEFAULT_BLOCKS_DIR,
     Ưu điểm: Load nhanh (chỉ cần load term_dict ~50MB thay vì 1GB),
     search nhanh (random file seek cho postings).
     
+    Bộ nhớ khi merge: mỗi block chỉ giữ 1 record + buffer_size bytes,
+    tối đa max_fan_in blocks mở cùng lúc -> không tăng theo số block.
+    
     Args:
         blocks_dir: Thư mục chứa block files 
         index_dir: Thư mục xuất final index
+        max_fan_in: Số block tối đa mở đồng thời trong 1 pass
+        buffer_size: Kích thước buffer đọc cho mỗi block (bytes)
+        workers: Số process merge song song theo khoảng term (1 = tuần tự)
+        jsonl_path: File JSONL nguồn - thêm gợi ý tên công ty (None: giữ gợi ý
+                    tên đã có, chỉ tính lại gợi ý term)
+        lookup_indexes: Ghi kèm từ điển bỏ dấu / trigram index / gợi ý (False:
+                        shard - các index này tính 1 lần trên từ điển toàn cục)
     
     Returns:
         term_dict_path: Đường dẫn đến term dictionary
@@ -129,80 +518,76 @@ def merge_blocks(blocks_dir: str = DEFAULT_BLOCKS_DIR,
     
     start_time = time.time()
     
-    # Tìm tất cả block files
-    block_files = sorted([
-        os.path.join(blocks_dir, f) 
-        for f in os.listdir(blocks_dir) 
-        if f.startswith("block_") and f.endswith(".pkl")
-    ])
+    # Tìm tất cả block files (thứ tự tên = thứ tự doc_id)
+    block_files = list_block_files(blocks_dir)
     
     if not block_files:
         print("ERROR: No block files found!")
         return None
     
-    print(f"  Found {len(block_files)} block files to merge")
-    
-    # Mở tất cả block readers
-    readers = []
-    for i, path in enumerate(block_files):
-        reader = BlockReader(path, i)
-        reader.open()
-        if not reader.is_exhausted:
-            readers.append(reader)
-        print(f"  Loaded block {i}: {os.path.basename(path)}")
-    
-    # Min-heap: (term, block_id) 
-    heap = []
-    for reader in readers:
-        if reader.current_term is not None:
-            heapq.heappush(heap, (reader.current_term, reader.block_id))
+    print(f"  Found {len(block_files)} block files to merge (fan-in: {max_fan_in})")
+    
+    work_dir = os.path.join(blocks_dir, "_merge_tmp")
+    if len(block_files) > max_fan_in or workers > 1:
+        os.makedirs(work_dir, exist_ok=True)
+    if len(block_files) > max_fan_in:
+        block_files = reduce_blocks(block_files, work_dir, max_fan_in, buffer_size)
+    
+    num_fields = blocks_num_fields(block_files)
+    if num_fields:
+        print(f"  Field postings: {num_fields} fields (BM25F)")
+    
+    # Index vị trí nếu mọi block đều có (spimi.py --positions)
+    positional = all(block_has_positions(path) for path in block_files)
+    positions_writer = PositionsWriter(index_dir) if positional else None
+    if positional:
+        print(f"  Positional blocks: writing {POSITIONS_FILENAME}")
+    else:
+        # Không để lại index vị trí cũ lệch term ordinal với term dict mới
+        for filename in (POSITIONS_FILENAME, POSITIONS_OFFSETS_FILENAME):
+            if os.path.exists(os.path.join(index_dir, filename)):
+                os.remove(os.path.join(index_dir, filename))
+    
+    # Impacts / champion lists (nếu có) ứng với term dict cũ -> tính lại bằng --impacts
+    remove_impacts(index_dir)
+    remove_champions(index_dir)
+    
+    # Cận trên điểm theo term (MaxScore) gom ngay trong lúc ghi postings, cần
+    # độ dài doc trong doc store spimi.py đã ghi vào index_dir
+    remove_term_bounds(index_dir)
+    doc_store_dir = index_dir if has_doc_store(index_dir) else None
+    bounds_writer = TermBoundsWriter(doc_store_dir) if doc_store_dir else None
+    
+    parts = None
+    if workers > 1:
+        parts = merge_ranges_parallel(block_files, work_dir, workers, buffer_size, positional,
+                                      doc_store_dir)
     
     # Merge và ghi xuống 2 files
     postings_path = os.path.join(index_dir, "postings.bin")
     term_dict = {}  # term -> (df, offset, length)
     
+    # Terms ra khỏi heap theo thứ tự tăng dần -> ghi term_dict.bin dạng streaming
+    mmap_dict_path = os.path.join(index_dir, TERM_DICT_FILENAME)
+    mmap_dict_writer = TermDictWriter(mmap_dict_path)
+    
     total_terms = 0
     total_postings = 0
     
     with open(postings_path, "wb") as postings_file:
-        while heap:
-            # Lấy term nhỏ nhất
-            min_term, _ = heap[0]
-            
-            # Thu thập postings từ tất cả blocks có cùng term này
-            merged_postings = []
-            
-            while heap and heap[0][0] == min_term:
-                _, block_id = heapq.heappop(heap)
-                
-                # Tìm reader tương ứng
-                reader = None
-                for r in readers:
-                    if r.block_id == block_id:
-                        reader = r
-                        break
-                
-                if reader and reader.current_term == min_term:
-                    merged_postings.extend(reader.current_postings)
-                    reader.consume()
-                    
-                    # Nếu reader chưa hết, đẩy term tiếp theo vào heap
-                    if not reader.is_exhausted:
-                        heapq.heappush(heap, (reader.current_term, reader.block_id))
-            
-            # Sắp xếp postings theo doc_id
-            merged_postings.sort(key=lambda x: x[0])
-            
-            # Ghi postings xuống binary file
-            doc_freq = len(merged_postings)
-            postings_bytes = pickle.dumps(merged_postings, protocol=pickle.HIGHEST_PROTOCOL)
-            
-            offset = postings_file.tell()
-            postings_file.write(postings_bytes)
-            length = len(postings_bytes)
-            
+        write_header(postings_file, fields_flags(num_fields) | blocks_flags(POSTINGS_BLOCK_SIZE))
+        
+        # Ghi postings xuống binary file (delta + varint), hoặc nối các parts
+        if parts is not None:
+            entries = stitch_parts(postings_file, parts, positions_writer, bounds_writer)
+        else:
+            entries = write_postings(postings_file, kway_merge(block_files, buffer_size),
+                                     positions_writer, bounds_writer=bounds_writer)
+        
+        for term, doc_freq, offset, length in entries:
             # Lưu vào term dictionary
-            term_dict[min_term] = (doc_freq, offset, length)
+            term_dict[term] = (doc_freq, offset, length)
+            mmap_dict_writer.add(term, doc_freq, offset, length)
             
             total_terms += 1
             total_postings += doc_freq
@@ -211,9 +596,8 @@ def merge_blocks(blocks_dir: str = DEFAULT_BLOCKS_DIR,
                 print(f"  Merged {total_terms:>10,d} terms | "
                       f"Postings: {total_postings:>12,d}")
     
-    # Đóng tất cả readers
-    for reader in readers:
-        reader.close()
+    if os.path.isdir(work_dir):
+        shutil.rmtree(work_dir)
     gc.collect()
     
     elapsed = time.time() - start_time
@@ -223,6 +607,9 @@ def merge_blocks(blocks_dir: str = DEFAULT_BLOCKS_DIR,
     print(f"  Total unique terms: {total_terms:,d}")
     print(f"  Total postings: {total_postings:,d}")
     print(f"  Time: {elapsed:.1f}s")
+    peak = peak_rss_mb()
+    if peak is not None:
+        print(f"  Peak RSS: {peak:.1f} MB")
     
     # Ghi term dictionary (nhỏ, chỉ chứa term -> (df, offset, length))
     print(f"\n  Writing term dictionary to disk...")
@@ -232,11 +619,30 @@ def merge_blocks(blocks_dir: str = DEFAULT_BLOCKS_DIR,
     with open(term_dict_path, "wb") as f:
         pickle.dump(term_dict, f, protocol=pickle.HIGHEST_PROTOCOL)
     
+    mmap_dict_writer.close()
+    if positions_writer is not None:
+        positions_writer.close()
+    if bounds_writer is not None:
+        bounds_writer.save(index_dir)
+    if lookup_indexes:
+        num_folded = write_folded_terms(index_dir)
+        fuzzy_meta = write_fuzzy_terms(index_dir)
+        suggest_meta = write_suggest_terms(index_dir)
+        names_meta = write_suggest_names(index_dir, jsonl_path) if jsonl_path else None
+    
     dict_size_mb = os.path.getsize(term_dict_path) / (1024 * 1024)
+    mmap_dict_size_mb = os.path.getsize(mmap_dict_path) / (1024 * 1024)
     postings_size_mb = os.path.getsize(postings_path) / (1024 * 1024)
     save_time = time.time() - save_start
     
     print(f"  Term dict saved: {term_dict_path} ({dict_size_mb:.1f} MB)")
+    print(f"  Mmap term dict:  {mmap_dict_path} ({mmap_dict_size_mb:.1f} MB)")
+    if lookup_indexes:
+        print(f"  Folded terms:    {FOLDED_DICT_FILENAME} ({num_folded:,d} unaccented keys)")
+        print(f"  Fuzzy terms:     {FUZZY_GRAMS_FILENAME} ({fuzzy_meta['num_terms']:,d} terms, "
+              f"{fuzzy_meta['num_grams']:,d} trigrams)")
+        print(f"  Suggest:         {suggest_meta['num_keys']:,d} term prefixes" +
+              (f", {names_meta['num_keys']:,d} company names" if names_meta else ""))
     print(f"  Postings saved:  {postings_path} ({postings_size_mb:.1f} MB)")
     print(f"  Save time: {save_time:.1f}s")
     print("=" * 70)
@@ -249,6 +655,17 @@ def merge_blocks(blocks_dir: str = DEFAULT_BLOCKS_DIR,
 # ============================================================================
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge SPIMI blocks into the final index")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Số process merge song song theo khoảng term (mặc định: 1)")
+    parser.add_argument("--max-fan-in", type=int, default=MAX_FAN_IN,
+                        help=f"Số block mở đồng thời tối đa (mặc định: {MAX_FAN_IN})")
+    parser.add_argument("--impacts", action="store_true",
+                        help="Tính sẵn impacts 8-bit cho BM25 / BM25F (xem impacts.py)")
+    parser.add_argument("--champions", action="store_true",
+                        help="Thêm champion lists cho term df lớn (xem champions.py, kèm --impacts)")
+    args = parser.parse_args()
+    
     data_dir = os.path.join(os.path.dirname(__file__), "..", "..", "data")
     index_dir = os.path.join(data_dir, "index")
     blocks_dir = os.path.join(index_dir, "blocks")
@@ -258,7 +675,19 @@ if __name__ == "__main__":
         print(f"Run spimi.py first to build blocks.")
         sys.exit(1)
     
-    final_path = merge_blocks(blocks_dir, index_dir)
+    jsonl_path = os.path.join(data_dir, "milestone1_fixed.jsonl")
+    final_path = merge_blocks(blocks_dir, index_dir,
+                              max_fan_in=args.max_fan_in, workers=args.workers,
+                              jsonl_path=jsonl_path if os.path.exists(jsonl_path) else None)
+    
+    if final_path and (args.impacts or args.champions):
+        from src.ranking.bm25 import K1, B, FIELD_WEIGHTS
+        impacts_meta = write_impacts(index_dir, K1, B, FIELD_WEIGHTS)
+        print(f"  Impacts: {impacts_meta['num_postings']:,d} postings (8-bit, k1={K1}, b={B})")
+    if final_path and args.champions:
+        champions_meta = write_champions(index_dir)
+        print(f"  Champion lists: {champions_meta['num_terms']:,d} terms, "
+              f"{champions_meta['num_postings']:,d} postings")
     
     if final_path:
         print(f"\n✓ Merge complete. Term dict: {final_path}")
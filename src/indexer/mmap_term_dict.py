@@ -0,0 +1,379 @@
+"""
+Memory-Mapped Term Dictionary
+=============================
+Milestone 2 - SEG301: Search Engines & Information Retrieval
+
+Thay thế term_dict.pkl (unpickle toàn bộ Dict[str, (df, offset, length)]
+vào RAM của mỗi worker) bằng file term_dict.bin:
+- Terms được sắp xếp và nén kiểu front-coding theo block (mỗi block
+  BLOCK_TERMS terms, term đầu block lưu đầy đủ, các term sau chỉ lưu
+  độ dài tiền tố chung + phần hậu tố).
+- Records (df, offset, length) có độ dài cố định, truy cập theo thứ tự
+  (ordinal) của term.
+- File được mmap -> các worker dùng chung qua page cache của hệ điều hành,
+  khởi động gần như tức thì (không phải parse gì cả).
+
+Tra cứu: binary search trên term đầu của các block, sau đó duyệt tuần tự
+trong 1 block (tối đa BLOCK_TERMS terms).
+
+Cấu trúc file term_dict.bin:
+    [Header]      MAGIC | VERSION | BLOCK_TERMS | num_terms | num_blocks |
+                  records_offset | blocks_offset | strings_offset
+    [Records]     num_terms x (offset uint64, df uint32, length uint32)
+    [Block index] num_blocks x uint64 (vị trí block trong vùng strings)
+    [Strings]     Các block front-coded (độ dài dạng varint)
+"""
+
+import os
+import sys
+import mmap
+import struct
+import pickle
+from array import array
+from collections.abc import Mapping
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+TERM_DICT_MAGIC = b"OFTD"
+TERM_DICT_VERSION = 1
+TERM_DICT_FILENAME = "term_dict.bin"
+
+# Số terms mỗi block front-coding (trade-off: nén tốt hơn vs scan dài hơn)
+BLOCK_TERMS = 16
+
+HEADER_STRUCT = struct.Struct("<4sHHQQQQQ")
+
+RECORD_DTYPE = np.dtype([("offset", "<u8"), ("df", "<u4"), ("length", "<u4")])
+
+# Giới hạn cache tra cứu (term -> ordinal) cho mỗi instance
+_LOOKUP_CACHE_SIZE = 4096
+
+
+# ============================================================================
+# VARINT HELPERS (scalar)
+# ============================================================================
+
+def _write_varint(buf: bytearray, value: int):
+    while value >= 0x80:
+        buf.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+
+def _read_varint(buf, pos: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _common_prefix_len(a: bytes, b: bytes) -> int:
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+# ============================================================================
+# WRITER
+# ============================================================================
+
+class TermDictWriter:
+    """
+    Ghi term_dict.bin theo kiểu streaming.
+
+    Terms PHẢI được add theo thứ tự tăng dần (đúng thứ tự mà K-way merge
+    sinh ra). So sánh str của Python theo code point trùng với thứ tự
+    byte UTF-8, nên binary search trên bytes khi đọc vẫn đúng.
+    """
+
+    def __init__(self, path: str, block_terms: int = BLOCK_TERMS):
+        self.path = path
+        self.block_terms = block_terms
+        self._strings = bytearray()
+        self._block_offsets = array("Q")
+        self._offsets = array("Q")
+        self._dfs = array("I")
+        self._lengths = array("I")
+        self._prev = None  # bytes của term trước đó
+
+    def add(self, term: str, df: int, offset: int, length: int):
+        """Thêm 1 term (phải lớn hơn term trước đó)."""
+        encoded = term.encode("utf-8")
+        if self._prev is not None and encoded <= self._prev:
+            raise ValueError(f"Terms must be added in strictly increasing order: {term!r}")
+
+        if len(self._offsets) % self.block_terms == 0:
+            # Term đầu block: lưu đầy đủ
+            self._block_offsets.append(len(self._strings))
+            _write_varint(self._strings, len(encoded))
+            self._strings += encoded
+        else:
+            prefix = _common_prefix_len(self._prev, encoded)
+            _write_varint(self._strings, prefix)
+            _write_varint(self._strings, len(encoded) - prefix)
+            self._strings += encoded[prefix:]
+
+        self._prev = encoded
+        self._offsets.append(offset)
+        self._dfs.append(df)
+        self._lengths.append(length)
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def close(self):
+        """Ghi toàn bộ xuống đĩa (ghi ra file tạm rồi rename)."""
+        num_terms = len(self._offsets)
+        records = np.empty(num_terms, dtype=RECORD_DTYPE)
+        records["offset"] = np.frombuffer(self._offsets, dtype=np.uint64) if num_terms else 0
+        records["df"] = np.frombuffer(self._dfs, dtype=np.uint32) if num_terms else 0
+        records["length"] = np.frombuffer(self._lengths, dtype=np.uint32) if num_terms else 0
+        block_index = np.frombuffer(self._block_offsets, dtype=np.uint64) \
+            if len(self._block_offsets) else np.empty(0, dtype=np.uint64)
+
+        records_offset = HEADER_STRUCT.size
+        blocks_offset = records_offset + records.nbytes
+        strings_offset = blocks_offset + block_index.nbytes
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER_STRUCT.pack(
+                TERM_DICT_MAGIC, TERM_DICT_VERSION, self.block_terms,
+                num_terms, len(block_index),
+                records_offset, blocks_offset, strings_offset,
+            ))
+            f.write(records.tobytes())
+            f.write(block_index.astype("<u8").tobytes())
+            f.write(bytes(self._strings))
+        os.replace(tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+
+
+# ============================================================================
+# READER
+# ============================================================================
+
+class MmapTermDict(Mapping):
+    """
+    Term dictionary chỉ-đọc, memory-mapped.
+
+    Dùng thay thế trực tiếp cho Dict[str, (df, offset, length)] cũ:
+    hỗ trợ `term in d`, `d[term]`, `d.get(term)`, `len(d)` và duyệt
+    các term theo thứ tự tăng dần.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # mmap không cho phép map file rỗng -> file hỏng
+            self._file.close()
+            raise ValueError(f"Empty term dictionary file: {path}")
+
+        (magic, version, self.block_terms, self.num_terms, self.num_blocks,
+         records_offset, blocks_offset, strings_offset) = HEADER_STRUCT.unpack_from(self._mm, 0)
+        if magic != TERM_DICT_MAGIC:
+            self.close()
+            raise ValueError(f"Not a term dictionary file: {path}")
+        if version > TERM_DICT_VERSION:
+            self.close()
+            raise ValueError(f"Unsupported term dictionary version {version}")
+
+        # Zero-copy views trên mmap
+        self.records = np.frombuffer(self._mm, dtype=RECORD_DTYPE,
+                                     count=self.num_terms, offset=records_offset)
+        self._block_index = np.frombuffer(self._mm, dtype="<u8",
+                                          count=self.num_blocks, offset=blocks_offset)
+        self._strings_offset = strings_offset
+        self._cache = {}
+
+    # ------------------------------------------------------------------
+    # Low-level decoding
+    # ------------------------------------------------------------------
+
+    def _block_first_term(self, block: int) -> bytes:
+        pos = self._strings_offset + int(self._block_index[block])
+        length, pos = _read_varint(self._mm, pos)
+        return self._mm[pos:pos + length]
+
+    def _iter_block(self, block: int) -> Iterator[bytes]:
+        """Giải nén tuần tự các term trong 1 block."""
+        pos = self._strings_offset + int(self._block_index[block])
+        count = min(self.block_terms, self.num_terms - block * self.block_terms)
+
+        length, pos = _read_varint(self._mm, pos)
+        term = self._mm[pos:pos + length]
+        pos += length
+        yield term
+
+        for _ in range(count - 1):
+            prefix, pos = _read_varint(self._mm, pos)
+            suffix_len, pos = _read_varint(self._mm, pos)
+            term = term[:prefix] + self._mm[pos:pos + suffix_len]
+            pos += suffix_len
+            yield term
+
+    def ordinal(self, term: str) -> Optional[int]:
+        """
+        Trả về thứ tự (0-based) của term trong từ điển, None nếu không có.
+        Binary search trên term đầu block + scan trong block.
+        """
+        cached = self._cache.get(term, -1)
+        if cached != -1:
+            return cached
+
+        key = term.encode("utf-8")
+        lo, hi = 0, self.num_blocks - 1
+        block = -1
+        # Tìm block cuối cùng có term đầu <= key
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            if self._block_first_term(mid) <= key:
+                block = mid
+                lo = mid + 1
+            else:
+                hi = mid - 1
+
+        result = None
+        if block >= 0:
+            for i, candidate in enumerate(self._iter_block(block)):
+                if candidate == key:
+                    result = block * self.block_terms + i
+                    break
+                if candidate > key:
+                    break
+
+        if len(self._cache) >= _LOOKUP_CACHE_SIZE:
+            self._cache.clear()
+        self._cache[term] = result
+        return result
+
+    def lower_bound(self, term: str) -> int:
+        """
+        Ordinal của term đầu tiên >= term (num_terms nếu không có).
+        Các term cùng tiền tố p nằm liền nhau: [lower_bound(p), lower_bound(p + "\\U0010ffff")).
+        """
+        key = term.encode("utf-8")
+        lo, hi = 0, self.num_blocks - 1
+        block = -1
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            if self._block_first_term(mid) <= key:
+                block = mid
+                lo = mid + 1
+            else:
+                hi = mid - 1
+        if block < 0:
+            return 0
+        for i, candidate in enumerate(self._iter_block(block)):
+            if candidate >= key:
+                return block * self.block_terms + i
+        return min((block + 1) * self.block_terms, self.num_terms)
+
+    def entry(self, ordinal: int) -> Tuple[int, int, int]:
+        """Trả về (df, offset, length) theo ordinal."""
+        rec = self.records[ordinal]
+        return int(rec["df"]), int(rec["offset"]), int(rec["length"])
+
+    def term_at(self, ordinal: int) -> str:
+        """Trả về term theo ordinal."""
+        if not 0 <= ordinal < self.num_terms:
+            raise IndexError(ordinal)
+        block, i = divmod(ordinal, self.block_terms)
+        for j, term in enumerate(self._iter_block(block)):
+            if j == i:
+                return term.decode("utf-8")
+
+    # ------------------------------------------------------------------
+    # Mapping interface
+    # ------------------------------------------------------------------
+
+    def __getitem__(self, term: str) -> Tuple[int, int, int]:
+        ordinal = self.ordinal(term)
+        if ordinal is None:
+            raise KeyError(term)
+        return self.entry(ordinal)
+
+    def __contains__(self, term) -> bool:
+        return isinstance(term, str) and self.ordinal(term) is not None
+
+    def __len__(self) -> int:
+        return self.num_terms
+
+    def __iter__(self) -> Iterator[str]:
+        for block in range(self.num_blocks):
+            for term in self._iter_block(block):
+                yield term.decode("utf-8")
+
+    def close(self):
+        """Giải phóng mmap và file handle."""
+        self.records = None
+        self._block_index = None
+        if getattr(self, "_mm", None) is not None:
+            try:
+                self._mm.close()
+            except BufferError:
+                # Vẫn còn view NumPy trỏ vào mmap -> để GC tự giải phóng
+                pass
+            self._mm = None
+        if getattr(self, "_file", None) is not None:
+            self._file.close()
+            self._file = None
+
+
+# ============================================================================
+# CONVERTER: term_dict.pkl -> term_dict.bin
+# ============================================================================
+
+def write_term_dict(term_dict: dict, path: str):
+    """Ghi 1 Dict[str, (df, offset, length)] ra định dạng term_dict.bin."""
+    with TermDictWriter(path) as writer:
+        for term in sorted(term_dict):
+            df, offset, length = term_dict[term]
+            writer.add(term, df, offset, length)
+
+
+def convert_pickle_term_dict(index_dir: str) -> str:
+    """Tạo term_dict.bin từ term_dict.pkl có sẵn (index cũ)."""
+    with open(os.path.join(index_dir, "term_dict.pkl"), "rb") as f:
+        term_dict = pickle.load(f)
+    path = os.path.join(index_dir, TERM_DICT_FILENAME)
+    write_term_dict(term_dict, path)
+    return path
+
+
+# ============================================================================
+# ENTRY POINT
+# ============================================================================
+
+if __name__ == "__main__":
+    data_dir = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+    index_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join(data_dir, "index")
+
+    if not os.path.exists(os.path.join(index_dir, "term_dict.pkl")):
+        print(f"ERROR: term_dict.pkl not found in {index_dir}")
+        sys.exit(1)
+
+    path = convert_pickle_term_dict(index_dir)
+    print(f"✓ Wrote {path} ({os.path.getsize(path) / (1024 * 1024):.1f} MB)")
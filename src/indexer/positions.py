@@ -0,0 +1,263 @@
+"""
+Positional Index (Positions Codec + Phrase / Proximity Matching)
+================================================================
+Milestone 2 - SEG301: Search Engines & Information Retrieval
+
+Index vị trí (tuỳ chọn, spimi.py --positions) để tìm cụm từ chính xác
+("công_ty xây_dựng hoà_bình") và truy vấn lân cận ("a b"~3) ngay trên
+index, thay vì đọc metadata JSONL của top kết quả rồi so chuỗi.
+
+Postings không đổi; vị trí được ghi ở file riêng để truy vấn BM25 thường
+không phải đọc thêm byte nào:
+
+    positions.bin           [Header 8 bytes] MAGIC | VERSION | FLAGS
+                            [Entry term 0][Entry term 1]...
+    positions_offsets.npy   int64[num_terms + 1], chỉ số = term ordinal
+                            (thứ tự trong term_dict.bin)
+
+1 entry = varint các vị trí của từng doc, theo đúng thứ tự postings:
+vị trí đầu của mỗi doc lưu tuyệt đối, các vị trí sau lưu khoảng cách.
+Số vị trí của mỗi doc = tf (đã có trong postings) nên không lưu lại.
+
+Trong bộ nhớ, vị trí của 1 term là 1 mảng phẳng int32 (tf vị trí của
+doc đầu, rồi doc thứ 2, ...) đi kèm (doc_ids, tfs). Với index theo trường
+tfs là ma trận n x F; số vị trí của doc = tổng tf các trường (các trường
+nối tiếp nhau trong không gian vị trí, cách nhau POSITION_GAP).
+"""
+
+import os
+import struct
+from typing import List, Tuple
+
+import numpy as np
+
+from src.indexer.postings_codec import encode_varints, decode_varints
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+POSITIONS_MAGIC = b"OFPS"
+POSITIONS_VERSION = 1
+HEADER_STRUCT = struct.Struct("<4sHH")
+
+POSITIONS_FILENAME = "positions.bin"
+POSITIONS_OFFSETS_FILENAME = "positions_offsets.npy"
+
+POSITION_DTYPE = np.int32
+
+
+def has_positions(index_dir: str) -> bool:
+    """Index / segment có index vị trí hay không."""
+    return os.path.exists(os.path.join(index_dir, POSITIONS_OFFSETS_FILENAME))
+
+
+# ============================================================================
+# ENCODE / DECODE
+# ============================================================================
+
+def doc_tfs(tfs) -> np.ndarray:
+    """tf theo doc (int64): cộng các trường nếu tfs là ma trận tf theo trường."""
+    tfs = np.asarray(tfs, dtype=np.int64)
+    return tfs.sum(axis=1) if tfs.ndim == 2 else tfs
+
+
+def _doc_starts(tfs: np.ndarray) -> np.ndarray:
+    """Chỉ số bắt đầu của mỗi doc trong mảng vị trí phẳng."""
+    tfs = doc_tfs(tfs)
+    return np.cumsum(tfs) - tfs
+
+
+def encode_positions(tfs, positions) -> bytes:
+    """
+    Mã hoá vị trí của 1 term (phẳng, tăng dần trong từng doc).
+
+    Args:
+        tfs: tf từng doc (= số vị trí của doc đó)
+        positions: Mảng phẳng sum(tfs) vị trí
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    tfs = doc_tfs(tfs)
+    if positions.size != int(tfs.sum()):
+        raise ValueError("positions must have sum(tfs) entries")
+    if positions.size == 0:
+        return b""
+    gaps = np.diff(positions, prepend=0)
+    starts = _doc_starts(tfs)
+    gaps[starts] = positions[starts]
+    if (gaps < 0).any():
+        raise ValueError("positions must be increasing within each document")
+    return encode_varints(gaps)
+
+
+def decode_positions(data, tfs) -> np.ndarray:
+    """Giải mã 1 entry thành mảng vị trí phẳng (int32)."""
+    values = decode_varints(data).astype(np.int64)
+    tfs = doc_tfs(tfs)
+    if values.size != int(tfs.sum()):
+        raise ValueError(f"Corrupted positions entry: expected {int(tfs.sum())} values, "
+                         f"got {values.size}")
+    if values.size == 0:
+        return np.empty(0, POSITION_DTYPE)
+    cumulative = np.cumsum(values)
+    starts = _doc_starts(tfs)
+    # Trừ phần cộng dồn của các doc trước -> cumsum bắt đầu lại ở mỗi doc
+    base = cumulative[starts] - values[starts]
+    return (cumulative - np.repeat(base, tfs)).astype(POSITION_DTYPE)
+
+
+def select_positions(tfs: np.ndarray, positions: np.ndarray, keep: np.ndarray) -> np.ndarray:
+    """Vị trí của các doc được giữ (keep: mask bool theo doc)."""
+    return positions[np.repeat(keep, doc_tfs(tfs))]
+
+
+def reorder_positions(tfs: np.ndarray, positions: np.ndarray, order: np.ndarray) -> np.ndarray:
+    """Vị trí theo thứ tự doc mới (order: hoán vị chỉ số doc, vd. argsort)."""
+    starts = _doc_starts(tfs)[order]
+    new_tfs = doc_tfs(tfs)[order]
+    within = np.arange(int(new_tfs.sum())) - np.repeat(np.cumsum(new_tfs) - new_tfs, new_tfs)
+    return positions[np.repeat(starts, new_tfs) + within]
+
+
+# ============================================================================
+# WRITER / READER
+# ============================================================================
+
+class PositionsWriter:
+    """Ghi positions.bin + positions_offsets.npy theo thứ tự term ordinal."""
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        self._file = open(os.path.join(index_dir, POSITIONS_FILENAME), "wb")
+        self._file.write(HEADER_STRUCT.pack(POSITIONS_MAGIC, POSITIONS_VERSION, 0))
+        self._offsets = [self._file.tell()]
+
+    def add(self, tfs, positions):
+        """Ghi vị trí của term kế tiếp (cùng thứ tự với term dictionary)."""
+        self._file.write(encode_positions(tfs, positions))
+        self._offsets.append(self._file.tell())
+
+    def add_encoded(self, part_file, lengths: List[int]):
+        """Nối các entry đã mã hoá sẵn (part của merge song song)."""
+        for length in lengths:
+            self._file.write(part_file.read(length))
+            self._offsets.append(self._file.tell())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            np.save(os.path.join(self.index_dir, POSITIONS_OFFSETS_FILENAME),
+                    np.array(self._offsets, dtype=np.int64))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class PositionsPartWriter:
+    """Ghi các entry vị trí nối tiếp (không header) cho 1 part của merge song song."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lengths: List[int] = []
+        self._file = open(path, "wb")
+
+    def add(self, tfs, positions):
+        data = encode_positions(tfs, positions)
+        self._file.write(data)
+        self.lengths.append(len(data))
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class PositionsReader:
+    """Đọc vị trí theo term ordinal (offsets mmap, file seek)."""
+
+    def __init__(self, index_dir: str):
+        self.offsets = np.load(os.path.join(index_dir, POSITIONS_OFFSETS_FILENAME), mmap_mode="r")
+        self._file = open(os.path.join(index_dir, POSITIONS_FILENAME), "rb")
+        magic, version, _ = HEADER_STRUCT.unpack(self._file.read(HEADER_STRUCT.size))
+        if magic != POSITIONS_MAGIC:
+            raise ValueError(f"Not a positions file: {index_dir}")
+        if version > POSITIONS_VERSION:
+            raise ValueError(f"Unsupported positions version {version}: {index_dir}")
+
+    def get(self, ordinal: int, tfs: np.ndarray) -> np.ndarray:
+        start = int(self.offsets[ordinal])
+        end = int(self.offsets[ordinal + 1])
+        self._file.seek(start)
+        return decode_positions(self._file.read(end - start), tfs)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.offsets = None
+
+
+# ============================================================================
+# PHRASE / PROXIMITY MATCHING
+# ============================================================================
+
+def match_phrase(terms: List[Tuple[np.ndarray, np.ndarray, np.ndarray]],
+                 slop: int = 0) -> np.ndarray:
+    """
+    Doc khớp cụm từ: các term xuất hiện ĐÚNG THỨ TỰ, tổng số vị trí chen
+    giữa <= slop (slop = 0: liền kề - phrase chính xác).
+
+    Với mỗi lần xuất hiện của term đầu, nối tham lam lần xuất hiện sớm nhất
+    của term kế tiếp nằm sau nó (trong cùng doc) -> khoảng nhỏ nhất cho điểm
+    bắt đầu đó. Toàn bộ chạy vectorized bằng searchsorted trên khoá
+    (doc_id << 32 | vị trí), không lặp Python theo doc.
+
+    Args:
+        terms: [(doc_ids, tfs, positions), ...] theo thứ tự trong cụm từ
+        slop: Số vị trí chen giữa tối đa
+
+    Returns:
+        doc_ids (tăng dần) khớp cụm từ
+    """
+    if not terms:
+        return np.empty(0, dtype=np.int32)
+
+    # Chỉ xét doc chứa đủ mọi term
+    candidates = terms[0][0]
+    for doc_ids, _, _ in terms[1:]:
+        candidates = np.intersect1d(candidates, doc_ids, assume_unique=True)
+    if candidates.size == 0:
+        return candidates.astype(np.int32)
+
+    keys = []
+    for doc_ids, tfs, positions in terms:
+        keep = np.isin(doc_ids, candidates, assume_unique=True)
+        docs = np.repeat(doc_ids[keep].astype(np.int64), doc_tfs(tfs)[keep])
+        keys.append((docs << 32) | select_positions(tfs, positions, keep).astype(np.int64))
+
+    start = keys[0]
+    end = start
+    for term_keys in keys[1:]:
+        idx = np.searchsorted(term_keys, end, side="right")
+        found = idx < term_keys.size
+        nxt = term_keys[np.minimum(idx, term_keys.size - 1)]
+        # Lần xuất hiện kế tiếp phải cùng doc
+        found &= (nxt >> 32) == (end >> 32)
+        start, end = start[found], nxt[found]
+        if start.size == 0:
+            return np.empty(0, dtype=np.int32)
+
+    inserted = (end - start) - (len(terms) - 1)
+    matched = start[inserted <= slop] >> 32
+    return np.unique(matched).astype(np.int32)
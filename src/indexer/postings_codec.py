@@ -0,0 +1,686 @@
+"""
+Postings Codec: Delta + Varint
+===============================
+Milestone 2 - SEG301: Search Engines & Information Retrieval
+
+Định dạng nén cho postings.bin, thay thế pickle.dumps([(doc_id, tf), ...]).
+
+Vấn đề của định dạng pickle cũ:
+- Mỗi posting là 1 tuple Python -> unpickle hàng trăm nghìn object cho
+  các term phổ biến như "công_ty", "xây_dựng".
+- Doc ID lưu nguyên giá trị (không tận dụng tính tăng dần).
+
+Định dạng mới:
+- Doc IDs lưu dưới dạng khoảng cách (gap) giữa 2 doc_id liên tiếp.
+- Gap và TF được mã hoá varint (7 bit dữ liệu / byte, bit cao = "còn tiếp").
+- Decode bằng NumPy (vectorized) -> trả về mảng gọn thay vì list tuple.
+
+Cấu trúc file postings.bin:
+    [Header 8 bytes]  MAGIC (4s) | VERSION (uint16) | FLAGS (uint16)
+    [Entry term 1][Entry term 2]...
+
+Cấu trúc 1 entry (offset/length lưu trong term_dict):
+    varint(n) | n varint doc-id gaps | n varint tf
+    (gap đầu tiên chính là doc_id đầu tiên)
+
+Index theo trường (FLAG_FIELDS, VERSION 2, số trường ở byte cao của FLAGS):
+tf là ma trận n x F (tf của term trong từng trường) và entry là
+    varint(n) | n varint doc-id gaps | n varint code | tf của posting nhiều trường
+code của 1 posting (~97% postings chỉ nằm trong 1 trường -> 1 byte như cũ):
+    1 trường f:       tf << (FB + 1) | f << 1          (FB = số bit cho chỉ số trường)
+    nhiều trường:     mask << 1 | 1, tf các trường có mặt ghi sau toàn bộ codes
+
+Postings chia block (FLAG_BLOCKS, VERSION 3, log2(block size) ở bit 4-7 của
+FLAGS): list dài hơn block size (mặc định 128) được chia thành các block cố
+định kèm skip table ở đầu entry, để nhảy tới doc_id bất kỳ và chỉ decode các
+block cần thiết (nền cho document-at-a-time, WAND, list khổng lồ như "công_ty"):
+    varint(n) | varint(số bytes skip table) | skip table | block 1 | block 2 ...
+    skip table: mỗi block 3 varint (last doc_id - last doc_id block trước,
+                số bytes của block, max tf của block)
+    block:      gaps | tfs (hoặc gaps | codes | tf nhiều trường) của các
+                posting trong block; gap đầu tính từ last doc_id block trước
+List ngắn (n <= block size) giữ nguyên bố cục 1 entry như trên.
+"""
+
+import os
+import sys
+import time
+import pickle
+import struct
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+# Thêm project root vào path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+POSTINGS_MAGIC = b"OFPB"
+POSTINGS_VERSION = 3      # Version cao nhất đọc được (2 = tf theo trường, 3 = chia block)
+
+# FLAGS: bit 1 = postings theo trường, byte cao = số trường
+FLAG_FIELDS = 2     # bit 0 dành cho FLAG_POSITIONS của block file
+# bit 2 = postings chia block + skip table, bit 4-7 = log2(block size)
+FLAG_BLOCKS = 4
+BLOCK_SIZE_SHIFT = 4
+
+# Số postings / block: đủ nhỏ để nhảy tới doc_id chỉ decode ~128 postings,
+# đủ lớn để skip table chỉ tốn ~3 bytes / 128 postings
+POSTINGS_BLOCK_SIZE = 128
+
+# Header đầu file: magic, version, flags (dự phòng cho các mở rộng sau)
+HEADER_STRUCT = struct.Struct("<4sHH")
+HEADER_SIZE = HEADER_STRUCT.size
+
+# Kiểu dữ liệu của mảng sau khi decode (1.8M docs vẫn vừa int32)
+DOC_ID_DTYPE = np.int32
+TF_DTYPE = np.int32
+
+# Varint 64-bit dài tối đa 10 bytes
+_MAX_VARINT_BYTES = 10
+
+
+# ============================================================================
+# VARINT (VECTORIZED)
+# ============================================================================
+
+def varint_sizes(values) -> np.ndarray:
+    """Số byte varint của từng giá trị: 1 + số ngưỡng 2^(7k) mà giá trị vượt qua."""
+    values = np.asarray(values, dtype=np.uint64).ravel()
+    nbytes = np.ones(values.size, dtype=np.int64)
+    for k in range(1, _MAX_VARINT_BYTES):
+        nbytes += values >= np.uint64(1 << (7 * k))
+    return nbytes
+
+
+def encode_varints(values) -> bytes:
+    """
+    Mã hoá 1 dãy số nguyên không âm thành varint.
+
+    Vectorized: xử lý theo từng "vị trí byte" (tối đa 10 vòng lặp),
+    không lặp Python trên từng phần tử.
+    """
+    values = np.asarray(values, dtype=np.uint64).ravel()
+    if values.size == 0:
+        return b""
+
+    nbytes = varint_sizes(values)
+    ends = np.cumsum(nbytes)
+    starts = ends - nbytes
+    out = np.empty(int(ends[-1]), dtype=np.uint8)
+
+    for k in range(int(nbytes.max())):
+        mask = nbytes > k
+        chunk = (values[mask] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        # Bit cao = 1 nếu chưa phải byte cuối của giá trị
+        cont = (nbytes[mask] - 1 > k).astype(np.uint64) << np.uint64(7)
+        out[starts[mask] + k] = (chunk | cont).astype(np.uint8)
+
+    return out.tobytes()
+
+
+def decode_varints(data) -> np.ndarray:
+    """
+    Giải mã chuỗi varint thành mảng uint64 (vectorized).
+
+    Raises:
+        ValueError: Nếu dữ liệu bị cắt cụt (byte cuối vẫn còn bit "còn tiếp")
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    if buf.size == 0:
+        return np.empty(0, dtype=np.uint64)
+    if buf[-1] & 0x80:
+        raise ValueError("Truncated varint stream")
+
+    # Fast path: tất cả giá trị < 128 (rất phổ biến với gap nhỏ và tf)
+    is_end = buf < 0x80
+    if is_end.all():
+        return buf.astype(np.uint64)
+
+    ends = np.flatnonzero(is_end)
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+
+    # Vị trí của mỗi byte bên trong varint của nó -> số bit cần dịch
+    byte_pos = np.arange(buf.size) - np.repeat(starts, ends - starts + 1)
+    shifted = (buf & 0x7F).astype(np.uint64) << (byte_pos * 7).astype(np.uint64)
+    return np.add.reduceat(shifted, starts)
+
+
+def _read_varint(buf, pos: int) -> Tuple[int, int]:
+    """Đọc 1 varint tại buf[pos] (cho header của entry). Trả về (giá trị, pos mới)."""
+    value = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+# ============================================================================
+# POSTINGS ENCODE / DECODE
+# ============================================================================
+
+def encode_postings(doc_ids, tfs, block_size: int = 0) -> bytes:
+    """
+    Mã hoá 1 postings list (đã sắp xếp theo doc_id tăng dần).
+
+    Args:
+        doc_ids: Dãy doc_id tăng dần
+        tfs: Dãy term frequency tương ứng, hoặc ma trận n x F (tf theo trường)
+        block_size: > 0 -> list dài hơn block_size được chia block + skip table
+            (postings.bin có FLAG_BLOCKS); 0 = 1 entry liền (block files)
+
+    Returns:
+        Bytes của entry: varint(n) | gaps | tfs  (hoặc gaps | masks | tf != 0)
+    """
+    doc_ids = np.asarray(doc_ids, dtype=np.int64)
+    tfs = np.asarray(tfs, dtype=np.int64)
+    if doc_ids.shape[0] != tfs.shape[0] or tfs.ndim > 2:
+        raise ValueError("doc_ids and tfs must have the same length")
+
+    n = doc_ids.size
+    gaps = np.diff(doc_ids, prepend=0)
+    if n and (gaps[1:] <= 0).any():
+        raise ValueError("doc_ids must be strictly increasing")
+
+    if tfs.ndim == 2:
+        present = tfs > 0
+        single = present.sum(axis=1) == 1
+        shift = _field_bits(tfs.shape[1]) + 1
+        masks = (present << np.arange(tfs.shape[1], dtype=np.int64)).sum(axis=1)
+        codes = np.where(single,
+                         (tfs.max(axis=1) << shift) | (present.argmax(axis=1) << 1),
+                         (masks << 1) | 1)
+        extra = tfs[~single][present[~single]]
+        if block_size and n > block_size:
+            extra_owner = np.flatnonzero(~single).repeat(present[~single].sum(axis=1))
+            return _encode_blocked(doc_ids, gaps, codes, extra, extra_owner,
+                                   tfs.sum(axis=1), block_size)
+        values = np.concatenate(([n], gaps, codes, extra)).astype(np.uint64)
+        return encode_varints(values)
+
+    if block_size and n > block_size:
+        empty = np.empty(0, dtype=np.int64)
+        return _encode_blocked(doc_ids, gaps, tfs, empty, empty, tfs, block_size)
+
+    values = np.empty(1 + 2 * n, dtype=np.uint64)
+    values[0] = n
+    values[1:1 + n] = gaps
+    values[1 + n:] = tfs
+    return encode_varints(values)
+
+
+def _encode_blocked(doc_ids, gaps, codes, extra, extra_owner, doc_tfs, block_size: int) -> bytes:
+    """
+    Entry chia block: varint(n) | varint(len skip) | skip table | blocks.
+
+    Args:
+        gaps, codes: 1 giá trị / posting (codes = tfs nếu 1 tf/posting)
+        extra, extra_owner: tf của posting nhiều trường + chỉ số posting sở hữu
+        doc_tfs: tf tổng của từng posting (cho max tf của block)
+    """
+    n = gaps.size
+    block_of = np.arange(n) // block_size
+    num_blocks = int(block_of[-1]) + 1
+    counts = np.bincount(block_of, minlength=num_blocks)
+    extra_block = block_of[extra_owner]
+    extras_per_block = np.bincount(extra_block, minlength=num_blocks)
+    block_values = 2 * counts + extras_per_block
+    value_starts = np.cumsum(block_values) - block_values
+
+    # Mỗi block: gaps | codes | extra của riêng block đó
+    body = np.empty(int(block_values.sum()), dtype=np.uint64)
+    within = np.arange(n) - block_of * block_size
+    body[value_starts[block_of] + within] = gaps
+    body[value_starts[block_of] + counts[block_of] + within] = codes
+    if extra.size:
+        extra_first = np.cumsum(extras_per_block) - extras_per_block
+        extra_within = np.arange(extra.size) - extra_first[extra_block]
+        body[value_starts[extra_block] + 2 * counts[extra_block] + extra_within] = extra
+
+    block_bytes = np.add.reduceat(varint_sizes(body), value_starts)
+    starts = np.arange(0, n, block_size)
+    last_docs = doc_ids[np.minimum(starts + block_size, n) - 1]
+    skip = np.column_stack((np.diff(last_docs, prepend=0), block_bytes,
+                            np.maximum.reduceat(doc_tfs, starts)))
+    skip_bytes = encode_varints(skip)
+    return encode_varints([n, len(skip_bytes)]) + skip_bytes + encode_varints(body)
+
+
+def _block_counts(n: int, block_size: int) -> np.ndarray:
+    """Số postings của từng block (block cuối có thể thiếu)."""
+    num_blocks = -(-n // block_size)
+    counts = np.full(num_blocks, block_size, dtype=np.int64)
+    counts[-1] = n - (num_blocks - 1) * block_size
+    return counts
+
+
+def _block_value_starts(body_bytes, block_bytes: np.ndarray, counts: np.ndarray,
+                        num_fields: int) -> np.ndarray:
+    """
+    Chỉ số value đầu tiên của từng block trong body đã decode.
+    1 tf/posting: 2 value / posting. Theo trường: đếm số varint kết thúc
+    trước byte đầu block (số tf nhiều trường của block không cố định).
+    """
+    if not num_fields:
+        return 2 * (np.cumsum(counts) - counts)
+    ends = np.cumsum(np.frombuffer(body_bytes, dtype=np.uint8) < 0x80)
+    byte_starts = np.cumsum(block_bytes) - block_bytes
+    return np.where(byte_starts > 0, ends[np.maximum(byte_starts - 1, 0)], 0)
+
+
+def _decode_blocks(body: np.ndarray, counts: np.ndarray, value_starts: np.ndarray,
+                   num_fields: int, base_doc: int = 0,
+                   first_gap_offsets: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Giải mã các block (values đã decode) thành (doc_ids, tfs). Block không
+    liền nhau: first_gap_offsets cộng vào gap đầu của từng block (khoảng
+    cách giữa last doc_id của block liền trước nó và của block decode trước).
+    """
+    total = int(counts.sum())
+    if not num_fields and counts.size > 1 and (counts[:-1] == counts[0]).all():
+        # Fast path: các block đầy đủ có bố cục cố định gaps(c) | tfs(c) -> ghi
+        # thẳng vào mảng kết quả (không concatenate)
+        if body.size != 2 * total:
+            raise ValueError(f"Corrupted postings blocks: expected {2 * total} values, got {body.size}")
+        size = int(counts[0])
+        full = (counts.size - 1) * size
+        head = body[:2 * full].reshape(-1, 2, size)
+        gaps = np.empty(total, dtype=np.uint64)
+        gaps[:full].reshape(-1, size)[:] = head[:, 0]
+        gaps[full:] = body[2 * full:2 * full + total - full]
+        tfs = np.empty(total, dtype=TF_DTYPE)
+        tfs[:full].reshape(-1, size)[:] = head[:, 1]
+        tfs[full:] = body[2 * full + total - full:]
+        _add_first_gaps(gaps, counts, first_gap_offsets)
+        return _gaps_to_doc_ids(gaps, base_doc), tfs
+
+    block_first = np.cumsum(counts) - counts
+    gap_idx = np.repeat(value_starts, counts) + np.arange(total) - np.repeat(block_first, counts)
+    code_idx = gap_idx + np.repeat(counts, counts)
+    gaps = body[gap_idx]
+    _add_first_gaps(gaps, counts, first_gap_offsets)
+    doc_ids = _gaps_to_doc_ids(gaps, base_doc)
+    if num_fields:
+        keep = np.ones(body.size, dtype=bool)
+        keep[gap_idx] = False
+        keep[code_idx] = False
+        return doc_ids, _field_tfs(body[code_idx], body[keep], num_fields)
+    if body.size != 2 * total:
+        raise ValueError(f"Corrupted postings blocks: expected {2 * total} values, got {body.size}")
+    return doc_ids, body[code_idx].astype(TF_DTYPE)
+
+
+def _add_first_gaps(gaps: np.ndarray, counts: np.ndarray, offsets: Optional[np.ndarray]):
+    if offsets is not None and gaps.size:
+        gaps[np.cumsum(counts) - counts] += offsets.astype(np.uint64)
+
+
+def _gaps_to_doc_ids(gaps: np.ndarray, base_doc: int) -> np.ndarray:
+    """Cộng dồn gaps (tại chỗ) thành doc_ids, bắt đầu sau base_doc."""
+    if base_doc:
+        gaps[0] += np.uint64(base_doc)
+    return np.cumsum(gaps, out=gaps).astype(DOC_ID_DTYPE)
+
+
+def _field_tfs(codes: np.ndarray, extras: np.ndarray, num_fields: int) -> np.ndarray:
+    """Ma trận n x F tf theo trường từ codes + tf của các posting nhiều trường."""
+    codes = codes.astype(np.int64)
+    n = codes.size
+    shift = _field_bits(num_fields) + 1
+    multi = (codes & 1).astype(bool)
+    tfs = np.zeros((n, num_fields), dtype=TF_DTYPE)
+    single = np.flatnonzero(~multi)
+    tfs[single, (codes[single] >> 1) & ((1 << (shift - 1)) - 1)] = codes[single] >> shift
+    present = ((codes[multi, None] >> (np.arange(num_fields) + 1)) & 1).astype(bool)
+    if extras.size != int(present.sum()):
+        raise ValueError("Corrupted field postings entry")
+    if present.size:
+        multi_tfs = np.zeros(present.shape, dtype=TF_DTYPE)
+        multi_tfs[present] = extras
+        tfs[multi] = multi_tfs
+    return tfs
+
+
+def decode_postings(data, num_fields: int = 0, block_size: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Giải mã 1 entry thành 2 mảng NumPy (doc_ids, tfs).
+
+    Thay vì list[(doc_id, tf)] gồm hàng trăm nghìn tuple Python,
+    trả về 2 mảng int32 liên tục trong bộ nhớ.
+    num_fields > 0 (index theo trường): tfs là ma trận n x num_fields.
+    block_size > 0 (postings.bin có FLAG_BLOCKS): entry dài hơn block_size
+    được đọc theo bố cục chia block.
+    """
+    values = decode_varints(data)
+    if values.size == 0:
+        if num_fields:
+            return np.empty(0, DOC_ID_DTYPE), np.empty((0, num_fields), TF_DTYPE)
+        return np.empty(0, DOC_ID_DTYPE), np.empty(0, TF_DTYPE)
+
+    n = int(values[0])
+    if block_size and n > block_size:
+        counts = _block_counts(n, block_size)
+        skip = values[2:2 + 3 * counts.size].reshape(-1, 3)
+        body_size = int(skip[:, 1].sum())
+        value_starts = _block_value_starts(
+            memoryview(data)[len(data) - body_size:] if num_fields else None,
+            skip[:, 1].astype(np.int64), counts, num_fields)
+        return _decode_blocks(values[2 + 3 * counts.size:], counts, value_starts, num_fields)
+
+    doc_ids = np.cumsum(values[1:1 + n]).astype(DOC_ID_DTYPE)
+
+    if num_fields:
+        return doc_ids, _field_tfs(values[1 + n:1 + 2 * n], values[1 + 2 * n:], num_fields)
+
+    if values.size != 1 + 2 * n:
+        raise ValueError(f"Corrupted postings entry: expected {1 + 2 * n} values, got {values.size}")
+    tfs = values[1 + n:].astype(TF_DTYPE)
+    return doc_ids, tfs
+
+
+class PostingsBlocks:
+    """
+    Skip table của 1 entry: chỉ đọc header + skip table, decode từng block
+    khi cần (nhảy tới doc_id >= x mà không decode phần đầu của list).
+
+    Entry không chia block (n <= block_size, hoặc block_size = 0) được xem
+    như 1 block duy nhất. data có thể là bytes hoặc memoryview của mmap.
+
+    Attributes:
+        n: Số postings
+        last_doc_ids: int64[num_blocks] doc_id cuối của từng block
+        max_tfs: int64[num_blocks] tf lớn nhất của từng block (tf tổng các trường)
+        block_offsets: int64[num_blocks + 1] byte offset của block trong data
+    """
+
+    def __init__(self, data, num_fields: int = 0, block_size: int = 0):
+        self.data = data
+        self.num_fields = num_fields
+        buf = memoryview(data)
+        self.n, pos = _read_varint(buf, 0) if len(buf) else (0, 0)
+        if block_size and self.n > block_size:
+            skip_length, pos = _read_varint(buf, pos)
+            skip = decode_varints(buf[pos:pos + skip_length]).astype(np.int64).reshape(-1, 3)
+            self.counts = _block_counts(self.n, block_size)
+            self.last_doc_ids = np.cumsum(skip[:, 0])
+            self.block_offsets = pos + skip_length + np.concatenate(([0], np.cumsum(skip[:, 1])))
+            self.max_tfs = skip[:, 2]
+            self._postings = None
+        else:
+            # 1 block: decode luôn cả entry (ngắn)
+            self._postings = decode_postings(data, num_fields)
+            doc_ids, tfs = self._postings
+            self.counts = np.array([self.n], dtype=np.int64)
+            self.last_doc_ids = doc_ids[-1:].astype(np.int64)
+            self.block_offsets = np.array([0, len(buf)], dtype=np.int64)
+            doc_tfs = tfs.sum(axis=1) if tfs.ndim == 2 else tfs
+            self.max_tfs = doc_tfs.max(keepdims=True).astype(np.int64) if self.n else self.last_doc_ids
+
+    @property
+    def num_blocks(self) -> int:
+        return len(self.last_doc_ids)
+
+    def find_block(self, doc_id: int) -> int:
+        """Block đầu tiên có thể chứa doc_id >= doc_id (num_blocks nếu không có)."""
+        return int(np.searchsorted(self.last_doc_ids, doc_id))
+
+    def decode_blocks(self, start: int, stop: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(doc_ids, tfs) của các block [start, stop)."""
+        stop = self.num_blocks if stop is None else stop
+        if self._postings is not None or start >= stop:
+            doc_ids, tfs = self._postings if self._postings is not None \
+                else decode_postings(b"", self.num_fields)
+            return (doc_ids, tfs) if start < stop else (doc_ids[:0], tfs[:0])
+        lo, hi = int(self.block_offsets[start]), int(self.block_offsets[stop])
+        region = memoryview(self.data)[lo:hi]
+        counts = self.counts[start:stop]
+        value_starts = _block_value_starts(region, np.diff(self.block_offsets[start:stop + 1]),
+                                           counts, self.num_fields)
+        base = int(self.last_doc_ids[start - 1]) if start else 0
+        return _decode_blocks(decode_varints(region), counts, value_starts, self.num_fields, base)
+
+    def decode_block_set(self, blocks: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (doc_ids, tfs) của các block (chỉ số tăng dần, không cần liền nhau):
+        gom bytes của các block rồi decode 1 lần thay vì từng block.
+        """
+        blocks = np.asarray(blocks, dtype=np.int64)
+        if self._postings is not None or not blocks.size:
+            return self.decode_blocks(0, 1 if blocks.size else 0)
+        starts = self.block_offsets[blocks]
+        sizes = self.block_offsets[blocks + 1] - starts
+        region = np.frombuffer(self.data, dtype=np.uint8)[
+            np.repeat(starts - (np.cumsum(sizes) - sizes), sizes) + np.arange(int(sizes.sum()))]
+        counts = self.counts[blocks]
+        value_starts = _block_value_starts(region, sizes, counts, self.num_fields)
+        # Gap đầu block tính từ last doc_id của block liền trước nó
+        previous = np.where(blocks > 0, self.last_doc_ids[blocks - 1], 0)
+        decoded = np.concatenate(([0], self.last_doc_ids[blocks[:-1]]))
+        return _decode_blocks(decode_varints(region), counts, value_starts, self.num_fields,
+                              first_gap_offsets=previous - decoded)
+
+    def decode_from(self, doc_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(doc_ids, tfs) của các postings có doc_id >= doc_id - chỉ decode từ block chứa nó."""
+        doc_ids, tfs = self.decode_blocks(self.find_block(doc_id))
+        if len(doc_ids) and doc_ids[0] < doc_id:
+            first = int(np.searchsorted(doc_ids, doc_id))
+            doc_ids, tfs = doc_ids[first:], tfs[first:]
+        return doc_ids, tfs
+
+    def find_postings(self, doc_ids: np.ndarray) -> np.ndarray:
+        """
+        Vị trí (trong cả postings list) của từng doc_id, -1 nếu term không có
+        trong doc đó. Chỉ decode các block chứa doc_ids (cả list 1 lần nếu
+        phải chạm nhiều hơn 1/8 số block - rẻ hơn lặp từng block).
+        """
+        return self._locate(doc_ids, with_tfs=False)[0]
+
+    def lookup(self, doc_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Như find_postings, kèm tf của từng doc_id (0 / hàng 0 nếu term không
+        có trong doc): chấm điểm vài doc mà không decode cả list.
+        """
+        return self._locate(doc_ids, with_tfs=True)
+
+    def _locate(self, doc_ids: np.ndarray, with_tfs: bool) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        positions = np.full(len(doc_ids), -1, dtype=np.int64)
+        blocks = np.searchsorted(self.last_doc_ids, doc_ids)
+        touched = np.unique(blocks[blocks < self.num_blocks])
+        if len(touched) * 8 > self.num_blocks:
+            touched = np.arange(self.num_blocks)
+            block_ids, block_tfs = self.decode_blocks(0)
+        else:
+            block_ids, block_tfs = self.decode_block_set(touched)
+        found_tfs = None
+        if with_tfs:
+            found_tfs = np.zeros((len(doc_ids),) + block_tfs.shape[1:], dtype=block_tfs.dtype)
+        if not len(block_ids):
+            return positions, found_tfs
+        idx = np.minimum(np.searchsorted(block_ids, doc_ids), len(block_ids) - 1)
+        found = block_ids[idx] == doc_ids
+        idx = idx[found]
+        # Vị trí trong các block đã decode -> vị trí trong cả postings list
+        block_starts = np.cumsum(self.counts) - self.counts
+        decoded_starts = np.cumsum(self.counts[touched]) - self.counts[touched]
+        owner = np.searchsorted(decoded_starts, idx, side="right") - 1
+        positions[found] = block_starts[touched[owner]] + idx - decoded_starts[owner]
+        if with_tfs:
+            found_tfs[found] = block_tfs[idx]
+        return positions, found_tfs
+
+
+def postings_from_pairs(pairs: Iterable[Tuple[int, int]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Chuyển list[(doc_id, tf)] (định dạng pickle cũ) sang 2 mảng NumPy."""
+    arr = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+    return arr[:, 0].astype(DOC_ID_DTYPE), arr[:, 1].astype(TF_DTYPE)
+
+
+# ============================================================================
+# FILE HEADER
+# ============================================================================
+
+def _field_bits(num_fields: int) -> int:
+    """Số bit cho chỉ số trường trong code của posting 1 trường."""
+    return max(1, (num_fields - 1).bit_length())
+
+
+def fields_flags(num_fields: int) -> int:
+    """FLAGS cho postings theo num_fields trường (0 = 1 tf/posting)."""
+    return FLAG_FIELDS | (num_fields << 8) if num_fields else 0
+
+
+def num_fields_from_flags(flags: int) -> int:
+    """Số trường của postings (0 nếu 1 tf/posting)."""
+    return flags >> 8 if flags & FLAG_FIELDS else 0
+
+
+def blocks_flags(block_size: int = POSTINGS_BLOCK_SIZE) -> int:
+    """FLAGS cho postings chia block (block_size là luỹ thừa của 2, <= 2^15)."""
+    shift = block_size.bit_length() - 1
+    if block_size <= 0 or block_size != 1 << shift or shift > 15:
+        raise ValueError(f"Block size must be a power of 2 up to 2^15: {block_size}")
+    return FLAG_BLOCKS | (shift << BLOCK_SIZE_SHIFT)
+
+
+def block_size_from_flags(flags: int) -> int:
+    """Số postings / block (0 nếu postings không chia block)."""
+    return 1 << ((flags >> BLOCK_SIZE_SHIFT) & 0xF) if flags & FLAG_BLOCKS else 0
+
+
+def write_header(f, flags: int = 0):
+    """Ghi header đầu file postings.bin (version thấp nhất đọc được file)."""
+    version = 3 if flags & FLAG_BLOCKS else 2 if flags & FLAG_FIELDS else 1
+    f.write(HEADER_STRUCT.pack(POSTINGS_MAGIC, version, flags))
+
+
+def read_header(f) -> Optional[Tuple[int, int]]:
+    """
+    Đọc header đầu file postings.bin.
+
+    Returns:
+        (version, flags) nếu là định dạng nén, None nếu là file pickle cũ.
+
+    Raises:
+        ValueError: Nếu version mới hơn version mà code này hỗ trợ
+    """
+    f.seek(0)
+    raw = f.read(HEADER_SIZE)
+    if len(raw) < HEADER_SIZE or raw[:4] != POSTINGS_MAGIC:
+        return None
+    _, version, flags = HEADER_STRUCT.unpack(raw)
+    if version > POSTINGS_VERSION:
+        raise ValueError(f"Unsupported postings format version {version} "
+                         f"(this build supports <= {POSTINGS_VERSION})")
+    return version, flags
+
+
+# ============================================================================
+# CONVERTER: PICKLE INDEX -> COMPRESSED INDEX
+# ============================================================================
+
+def _finish_conversion(index_dir: str, ready_path: str) -> None:
+    """
+    Thay các file đã ghi xong: term_dict.bin, term_dict.pkl rồi mới tới
+    postings.bin. File tạm nào không còn là đã được thay ở lần chạy trước.
+    """
+    from src.indexer.mmap_term_dict import TERM_DICT_FILENAME
+    for name in (TERM_DICT_FILENAME, "term_dict.pkl"):
+        path = os.path.join(index_dir, name)
+        if os.path.exists(path + ".tmp"):
+            os.replace(path + ".tmp", path)
+    os.replace(ready_path, os.path.join(index_dir, "postings.bin"))
+
+
+def convert_pickle_index(index_dir: str) -> Tuple[int, int]:
+    """
+    Chuyển index cũ (postings.bin dạng pickle) sang định dạng nén.
+
+    Đọc term_dict.pkl + postings.bin hiện có, ghi postings, term_dict.pkl
+    (offset mới) và term_dict.bin (bản mmap) ra file tạm; postings.bin.tmp
+    chỉ xuất hiện khi mọi file tạm đã ghi xong. Sau đó thay 2 từ điển trước,
+    postings.bin sau cùng. Bị ngắt giữa chừng: postings.bin vẫn là pickle
+    (read_header) -> chạy lại sẽ ghi lại từ đầu, hoặc chỉ thay nốt các file
+    nếu postings.bin.tmp đã có (từ điển có thể đã mang offset mới).
+
+    Returns:
+        (old_size, new_size): Kích thước postings.bin trước và sau (bytes)
+    """
+    from src.indexer.mmap_term_dict import write_term_dict, TERM_DICT_FILENAME
+
+    dict_path = os.path.join(index_dir, "term_dict.pkl")
+    postings_path = os.path.join(index_dir, "postings.bin")
+    ready_path = postings_path + ".tmp"
+
+    with open(postings_path, "rb") as src:
+        if read_header(src) is not None:
+            print("  postings.bin is already in compressed format, nothing to do.")
+            size = os.path.getsize(postings_path)
+            return size, size
+
+    old_size = os.path.getsize(postings_path)
+    if os.path.exists(ready_path):
+        print("  Resuming interrupted conversion (all files already written)...")
+        _finish_conversion(index_dir, ready_path)
+        return old_size, os.path.getsize(postings_path)
+
+    with open(dict_path, "rb") as f:
+        term_dict = pickle.load(f)
+
+    print(f"  Converting {len(term_dict):,d} postings lists...")
+    start_time = time.time()
+
+    partial_path = postings_path + ".partial"
+    new_term_dict = {}
+
+    # Duyệt theo offset để đọc file nguồn tuần tự
+    entries = sorted(term_dict.items(), key=lambda item: item[1][1])
+    with open(postings_path, "rb") as src, open(partial_path, "wb") as dst:
+        write_header(dst, blocks_flags(POSTINGS_BLOCK_SIZE))
+        for i, (term, (df, offset, length)) in enumerate(entries, 1):
+            src.seek(offset)
+            doc_ids, tfs = postings_from_pairs(pickle.loads(src.read(length)))
+            data = encode_postings(doc_ids, tfs, POSTINGS_BLOCK_SIZE)
+            new_term_dict[term] = (df, dst.tell(), len(data))
+            dst.write(data)
+
+            if i % 100_000 == 0:
+                print(f"  Converted {i:>10,d} terms")
+
+    # Giữ thứ tự term như dict gốc
+    new_term_dict = {term: new_term_dict[term] for term in term_dict}
+    new_size = os.path.getsize(partial_path)
+
+    with open(dict_path + ".tmp", "wb") as f:
+        pickle.dump(new_term_dict, f, protocol=pickle.HIGHEST_PROTOCOL)
+    write_term_dict(new_term_dict, os.path.join(index_dir, TERM_DICT_FILENAME) + ".tmp")
+    os.replace(partial_path, ready_path)  # Đánh dấu: mọi file tạm đã ghi xong
+    _finish_conversion(index_dir, ready_path)
+
+    print(f"  Done in {time.time() - start_time:.1f}s: "
+          f"{old_size / (1024 * 1024):.1f} MB -> {new_size / (1024 * 1024):.1f} MB")
+    return old_size, new_size
+
+
+# ============================================================================
+# ENTRY POINT
+# ============================================================================
+
+if __name__ == "__main__":
+    data_dir = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+    index_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join(data_dir, "index")
+
+    if not os.path.exists(os.path.join(index_dir, "term_dict.pkl")):
+        print(f"ERROR: Index not found in {index_dir}")
+        sys.exit(1)
+
+    convert_pickle_index(index_dir)
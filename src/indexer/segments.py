@@ -0,0 +1,879 @@
+"""
+Incremental Segment-Based Indexing (LSM-style)
+==============================================
+Milestone 2 - SEG301: Search Engines & Information Retrieval
+
+Thêm documents mới (crawl hằng ngày) mà KHÔNG cần chạy lại spimi.py +
+merging.py trên toàn bộ 1.8M records:
+
+- Documents mới được ghi thành 1 segment nhỏ, bất biến, có term dictionary
+  và postings riêng (cùng định dạng với index gốc).
+- BM25Searcher tìm trên index gốc + tất cả segments, dùng thống kê toàn cục
+  (N, df, avgdl) để IDF / length norm giống hệt như khi build 1 index duy nhất.
+- Tiered merge policy gộp dần các segments liền kề cùng "tier" (kích thước)
+  thành segment lớn hơn, có thể chạy nền (BackgroundMerger).
+- Xoá = tombstone trong deletion bitmap (deletes.py); cập nhật = xoá +
+  thêm lại (doc_id mới). Compaction ghi lại postings không còn doc đã xoá
+  khi tỉ lệ xoá của index gốc / segment vượt ngưỡng.
+
+Cấu trúc thư mục:
+    index/                       Index gốc (SPIMI + merging): doc_id [0, base_docs)
+    index/segments.json          Manifest: next_doc_id + segments theo thứ tự doc_id
+                                 + file deletion bitmap hiện hành + base_generation
+    index/deletes_000001.npy     Deletion bitmap (thế hệ hiện hành do manifest trỏ tới)
+    index/segments/seg_000001/   1 segment = 1 index nhỏ:
+        postings.bin             Header + delta/varint postings (doc_id toàn cục)
+        term_dict.bin            Term dictionary front-coded (mmap)
+        doc_lengths.npy, ...     Doc store, chỉ số = doc_id - doc_start
+        docs.jsonl               Bản ghi gốc của documents (metadata on-demand)
+        positions.bin, ...       Index vị trí, nếu index gốc có (positions.py)
+
+Segment dùng cùng bố cục postings với index gốc: index theo trường (tf +
+độ dài từng trường, BM25F) hoặc 1 text gộp (index cũ). Impacts tính sẵn
+(impacts.py), champion lists (champions.py), từ điển bỏ dấu
+(folded_terms.py), trigram index (fuzzy_terms.py) và gợi ý term
+(suggest.py) chỉ có ở index gốc: segments được chấm điểm chính xác,
+compaction tính lại tất cả cho index gốc.
+
+doc_id luôn tăng dần: segment mới nhận dải [next_doc_id, next_doc_id + n),
+nên gộp các segments liền kề chỉ cần nối postings theo thứ tự segment.
+Chỉ 1 process ghi (add/merge) tại 1 thời điểm; trong process đó các thao
+tác ghi được tuần tự hoá bằng 1 lock.
+"""
+
+import os
+import sys
+import json
+import math
+import mmap
+import time
+import pickle
+import shutil
+import argparse
+import threading
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Thêm project root vào path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.indexer.postings_codec import (
+    decode_postings, write_header, read_header, fields_flags, num_fields_from_flags,
+    blocks_flags, block_size_from_flags, PostingsBlocks, POSTINGS_BLOCK_SIZE,
+)
+from src.indexer.mmap_term_dict import MmapTermDict, TermDictWriter, TERM_DICT_FILENAME
+from src.indexer.doc_store import (
+    EMPTY_DOC, has_doc_store, load_doc_store, doc_store_from_pickles, write_doc_store,
+    compute_length_norms, DOC_STORE_META_FILE,
+)
+from src.indexer.deletes import DeletionBitmap, deletes_filename, filter_deleted
+from src.indexer.positions import PositionsWriter, PositionsReader, has_positions
+from src.indexer.impacts import has_impacts, load_impacts_meta, write_impacts
+from src.indexer.champions import has_champions, load_champions_meta, write_champions
+from src.indexer.term_bounds import has_term_bounds, write_term_bounds
+from src.indexer.folded_terms import has_folded_terms, write_folded_terms
+from src.indexer.fuzzy_terms import has_fuzzy_terms, load_fuzzy_meta, write_fuzzy_terms
+from src.indexer.suggest import has_suggest_index, load_suggest_meta, write_suggest_terms
+from src.indexer.spimi import (
+    BlockInverter, document_text, document_fields, tokenize, tokenize_with_positions,
+    tokenize_fields, FIELD_NAMES,
+)
+from src.indexer.merging import write_postings, merge_record_streams
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+DEFAULT_DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+DEFAULT_INDEX_DIR = os.path.join(DEFAULT_DATA_PATH, "index")
+
+MANIFEST_FILENAME = "segments.json"
+SEGMENTS_DIRNAME = "segments"
+SEGMENT_DOCS_FILENAME = "docs.jsonl"
+POSTINGS_FILENAME = "postings.bin"
+
+# Tiered merge policy: gộp MERGE_FACTOR segments liền kề cùng tier.
+# Tier = floor(log_{MERGE_FACTOR}(số docs / MIN_SEGMENT_DOCS))
+MERGE_FACTOR = 10
+MIN_SEGMENT_DOCS = 1_000
+
+# Chu kỳ kiểm tra merge của BackgroundMerger (giây)
+MERGE_INTERVAL = 60.0
+
+# Compaction khi (số doc đã xoá còn trong postings) / (số doc được index) vượt ngưỡng
+DELETE_RATIO_THRESHOLD = 0.2
+
+# Tuần tự hoá các thao tác ghi manifest trong 1 process (add vs merge nền)
+_WRITE_LOCK = threading.Lock()
+
+
+# ============================================================================
+# MANIFEST
+# ============================================================================
+
+def base_num_docs(index_dir: str) -> int:
+    """Số doc_id slots của index gốc (0 nếu chưa có index gốc)."""
+    if has_doc_store(index_dir):
+        with open(os.path.join(index_dir, DOC_STORE_META_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)["num_docs"]
+    if os.path.exists(os.path.join(index_dir, "doc_lengths.pkl")):
+        return len(doc_store_from_pickles(index_dir).doc_lengths)
+    return 0
+
+
+def manifest_path(index_dir: str) -> str:
+    return os.path.join(index_dir, MANIFEST_FILENAME)
+
+
+def load_manifest(index_dir: str) -> dict:
+    """
+    Đọc segments.json. Nếu chưa có: manifest rỗng, doc_id tiếp theo
+    bắt đầu sau dải doc_id của index gốc.
+    """
+    path = manifest_path(index_dir)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {
+        "next_doc_id": base_num_docs(index_dir),
+        "next_segment": 1,
+        "segments": [],
+        "deletes": {"file": None, "generation": 0, "count": 0},
+        "base_generation": 0,
+    }
+
+
+def save_manifest(index_dir: str, manifest: dict):
+    """Ghi manifest nguyên tử (tmp + os.replace): reader luôn thấy bản đầy đủ."""
+    path = manifest_path(index_dir)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def segment_dir(index_dir: str, name: str) -> str:
+    return os.path.join(index_dir, SEGMENTS_DIRNAME, name)
+
+
+def _deletes_info(manifest: dict) -> dict:
+    # Manifest cũ (trước khi có tombstones) không có khoá "deletes"
+    return manifest.get("deletes") or {"file": None, "generation": 0, "count": 0}
+
+
+def load_deletions(index_dir: str, manifest: Optional[dict] = None) -> Optional[DeletionBitmap]:
+    """Deletion bitmap hiện hành (None nếu chưa xoá doc nào)."""
+    if manifest is None:
+        if not os.path.exists(manifest_path(index_dir)):
+            return None
+        manifest = load_manifest(index_dir)
+    info = _deletes_info(manifest)
+    if not info["file"]:
+        return None
+    return DeletionBitmap.load(os.path.join(index_dir, info["file"]), manifest["next_doc_id"])
+
+
+# ============================================================================
+# SEGMENT WRITER
+# ============================================================================
+
+def write_postings_index(out_dir: str, records: Iterator[tuple],
+                         with_pickle_dict: bool = False, positions: bool = False,
+                         num_fields: int = 0) -> int:
+    """
+    Ghi postings.bin + term_dict.bin từ các record (term tăng dần),
+    kèm term_dict.pkl nếu with_pickle_dict (index gốc) và index vị trí
+    nếu positions. num_fields > 0: record mang tf theo trường.
+    Trả về số terms.
+    """
+    num_terms = 0
+    term_dict = {} if with_pickle_dict else None
+    positions_writer = PositionsWriter(out_dir) if positions else None
+    with open(os.path.join(out_dir, POSTINGS_FILENAME), "wb") as postings_file, \
+            TermDictWriter(os.path.join(out_dir, TERM_DICT_FILENAME)) as dict_writer:
+        write_header(postings_file, fields_flags(num_fields) | blocks_flags(POSTINGS_BLOCK_SIZE))
+        for term, doc_freq, offset, length in write_postings(postings_file, records,
+                                                             positions_writer):
+            dict_writer.add(term, doc_freq, offset, length)
+            if term_dict is not None:
+                term_dict[term] = (doc_freq, offset, length)
+            num_terms += 1
+    if positions_writer is not None:
+        positions_writer.close()
+    if term_dict is not None:
+        with open(os.path.join(out_dir, "term_dict.pkl"), "wb") as f:
+            pickle.dump(term_dict, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return num_terms
+
+
+def write_segment(out_dir: str, doc_start: int, docs: List[dict],
+                  positions: bool = False, fields: bool = True) -> dict:
+    """
+    Build 1 segment cho documents với doc_id = doc_start + i
+    (kèm index vị trí nếu positions; theo trường nếu fields).
+
+    Document không có text vẫn chiếm doc_id (length = EMPTY_DOC), giống
+    hành vi của SPIMI với dòng rỗng.
+
+    Returns:
+        meta: thông tin segment cho manifest (chưa có "name")
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    num_fields = len(FIELD_NAMES) if fields else 0
+    inverter = BlockInverter(positions, num_fields)
+    lengths = np.full(len(docs), EMPTY_DOC, dtype=np.int32)
+    offsets = np.full(len(docs), EMPTY_DOC, dtype=np.int64)
+    field_lengths = np.zeros((len(docs), num_fields), dtype=np.int32)
+
+    with open(os.path.join(out_dir, SEGMENT_DOCS_FILENAME), "wb") as docs_file:
+        for i, doc in enumerate(docs):
+            offsets[i] = docs_file.tell()
+            docs_file.write(json.dumps(doc, ensure_ascii=False).encode("utf-8") + b"\n")
+
+            if fields:
+                field_texts = document_fields(doc)
+                if not any(text.strip() for text in field_texts):
+                    continue
+                tokens, token_fields, token_positions, field_lengths[i] = \
+                    tokenize_fields(field_texts, positions)
+                lengths[i] = len(tokens)
+                inverter.add_document(doc_start + i, tokens, token_positions, token_fields)
+                continue
+
+            text = document_text(doc)
+            if not text.strip():
+                continue
+            if positions:
+                tokens, token_positions = tokenize_with_positions(text)
+            else:
+                tokens, token_positions = tokenize(text), None
+            lengths[i] = len(tokens)
+            inverter.add_document(doc_start + i, tokens, token_positions)
+
+    num_terms = write_postings_index(out_dir, inverter.records(), positions=positions,
+                                     num_fields=num_fields)
+    meta = write_doc_store(out_dir, lengths, offsets, field_lengths=field_lengths,
+                           fields=FIELD_NAMES if fields else None)
+    return _segment_meta(doc_start, doc_start + len(docs), meta, lengths, num_terms,
+                         field_lengths if fields else None)
+
+
+def _segment_meta(doc_start: int, doc_end: int, store_meta: dict, lengths: np.ndarray,
+                  num_terms: int, field_lengths: Optional[np.ndarray]) -> dict:
+    """Thông tin segment cho manifest (thống kê để tính N / avgdl toàn cục)."""
+    indexed = lengths >= 0
+    meta = {
+        "doc_start": doc_start,
+        "doc_end": doc_end,
+        "indexed_docs": store_meta["indexed_docs"],
+        "total_length": int(lengths[indexed].sum(dtype=np.int64)),
+        "num_terms": num_terms,
+    }
+    if field_lengths is not None:
+        meta["total_field_lengths"] = field_lengths[indexed].sum(axis=0, dtype=np.int64).tolist()
+    return meta
+
+
+def index_has_positions(index_dir: str, manifest: dict) -> bool:
+    """
+    Segments mới có index vị trí nếu index gốc có (hoặc, khi chưa có index
+    gốc, nếu segments hiện có đều có).
+    """
+    if os.path.exists(os.path.join(index_dir, TERM_DICT_FILENAME)):
+        return has_positions(index_dir)
+    return bool(manifest["segments"]) and all(
+        has_positions(segment_dir(index_dir, meta["name"])) for meta in manifest["segments"]
+    )
+
+
+def postings_num_fields(index_dir: str) -> int:
+    """Số trường của postings.bin (0 = 1 tf/posting, kể cả postings pickle cũ)."""
+    with open(os.path.join(index_dir, POSTINGS_FILENAME), "rb") as f:
+        header = read_header(f)
+    return num_fields_from_flags(header[1]) if header is not None else 0
+
+
+def index_has_fields(index_dir: str, manifest: dict) -> bool:
+    """
+    Segments mới theo trường nếu index gốc theo trường (hoặc, khi chưa có
+    index gốc, nếu segment đầu tiên theo trường / chưa có segment nào).
+    """
+    if os.path.exists(os.path.join(index_dir, POSTINGS_FILENAME)):
+        return postings_num_fields(index_dir) > 0
+    if manifest["segments"]:
+        return postings_num_fields(segment_dir(index_dir, manifest["segments"][0]["name"])) > 0
+    return True
+
+
+def _next_segment_name(manifest: dict) -> str:
+    name = f"seg_{manifest['next_segment']:06d}"
+    manifest["next_segment"] += 1
+    return name
+
+
+def _mark_deleted(index_dir: str, manifest: dict, doc_ids: List[int]) -> Tuple[int, Optional[str]]:
+    """
+    Ghi bitmap thế hệ mới với doc_ids bị xoá và trỏ manifest tới nó
+    (manifest chưa được lưu). Gọi trong _WRITE_LOCK.
+
+    Returns:
+        (số doc mới bị xoá, đường dẫn bitmap cũ cần dọn sau khi lưu manifest)
+    """
+    for doc_id in doc_ids:
+        if not 0 <= doc_id < manifest["next_doc_id"]:
+            raise ValueError(f"Unknown doc_id: {doc_id}")
+
+    info = _deletes_info(manifest)
+    bitmap = load_deletions(index_dir, manifest) or DeletionBitmap(manifest["next_doc_id"])
+    newly_deleted = bitmap.delete(doc_ids)
+    if newly_deleted == 0:
+        return 0, None
+
+    generation = info["generation"] + 1
+    filename = deletes_filename(generation)
+    bitmap.save(os.path.join(index_dir, filename))
+    manifest["deletes"] = {"file": filename, "generation": generation, "count": bitmap.count}
+    old_path = os.path.join(index_dir, info["file"]) if info["file"] else None
+    return newly_deleted, old_path
+
+
+def _remove_file(path: Optional[str]):
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+def add_documents(index_dir: str, docs: List[dict],
+                  replaces: Optional[List[int]] = None) -> Tuple[Optional[str], List[int]]:
+    """
+    Thêm documents mới thành 1 segment bất biến.
+
+    replaces: doc_id cũ bị thay thế (cập nhật = xoá + thêm lại); việc xoá
+    và thêm được ghi trong CÙNG 1 lần lưu manifest nên searcher không bao
+    giờ thấy cả 2 phiên bản (hoặc không thấy phiên bản nào).
+
+    Returns:
+        (tên segment, danh sách doc_id đã cấp) - (None, []) nếu docs rỗng
+    """
+    if not docs:
+        return None, []
+
+    with _WRITE_LOCK:
+        manifest = load_manifest(index_dir)
+        doc_start = manifest["next_doc_id"]
+        name = _next_segment_name(manifest)
+
+        final_dir = segment_dir(index_dir, name)
+        tmp_dir = final_dir + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        meta = write_segment(tmp_dir, doc_start, docs, index_has_positions(index_dir, manifest),
+                             index_has_fields(index_dir, manifest))
+        os.replace(tmp_dir, final_dir)
+
+        stale = None
+        if replaces:
+            _, stale = _mark_deleted(index_dir, manifest, replaces)
+
+        meta["name"] = name
+        manifest["segments"].append(meta)
+        manifest["next_doc_id"] = meta["doc_end"]
+        save_manifest(index_dir, manifest)
+        _remove_file(stale)
+
+    return name, list(range(meta["doc_start"], meta["doc_end"]))
+
+
+def delete_documents(index_dir: str, doc_ids: List[int]) -> int:
+    """Xoá (tombstone) các doc_id. Trả về số doc mới bị xoá."""
+    with _WRITE_LOCK:
+        manifest = load_manifest(index_dir)
+        newly_deleted, stale = _mark_deleted(index_dir, manifest, list(doc_ids))
+        if newly_deleted:
+            save_manifest(index_dir, manifest)
+            _remove_file(stale)
+    return newly_deleted
+
+
+def update_document(index_dir: str, doc_id: int, doc: dict) -> int:
+    """Cập nhật 1 document: xoá doc_id cũ + thêm bản mới. Trả về doc_id mới."""
+    _, doc_ids = add_documents(index_dir, [doc], replaces=[doc_id])
+    return doc_ids[0]
+
+
+def add_documents_from_jsonl(index_dir: str, jsonl_path: str) -> Tuple[Optional[str], List[int]]:
+    """Đọc file JSONL (mỗi dòng 1 document) và thêm thành 1 segment."""
+    docs = []
+    with open(jsonl_path, "rb") as f:
+        for raw_line in f:
+            line = raw_line.decode("utf-8", errors="ignore").strip()
+            if not line:
+                continue
+            try:
+                docs.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return add_documents(index_dir, docs)
+
+
+# ============================================================================
+# SEGMENT READER
+# ============================================================================
+
+def iter_index_records(index_dir: str, positions: bool = False) -> Iterator[tuple]:
+    """
+    Đọc tuần tự toàn bộ (term, doc_ids, tfs, positions) của 1 index / segment
+    theo term (positions = None nếu không yêu cầu).
+    """
+    term_dict = MmapTermDict(os.path.join(index_dir, TERM_DICT_FILENAME))
+    positions_reader = PositionsReader(index_dir) if positions else None
+    try:
+        with open(os.path.join(index_dir, POSTINGS_FILENAME), "rb") as f:
+            header = read_header(f)
+            if header is None:
+                raise ValueError(f"Legacy pickle postings in {index_dir}: "
+                                 f"run postings_codec.py to convert first")
+            num_fields = num_fields_from_flags(header[1])
+            block_size = block_size_from_flags(header[1])
+            for ordinal in range(len(term_dict)):
+                _, offset, length = term_dict.entry(ordinal)
+                f.seek(offset)
+                doc_ids, tfs = decode_postings(f.read(length), num_fields, block_size)
+                term_positions = None
+                if positions_reader is not None:
+                    term_positions = positions_reader.get(ordinal, tfs)
+                yield term_dict.term_at(ordinal), doc_ids, tfs, term_positions
+    finally:
+        term_dict.close()
+        if positions_reader is not None:
+            positions_reader.close()
+
+
+class Segment:
+    """
+    Segment chỉ-đọc dùng khi search: term dict (mmap), postings (file seek),
+    doc lengths (mmap) và norms tính theo avgdl TOÀN CỤC. Segment theo
+    trường có thêm field_lengths (mmap) cho BM25F.
+    """
+
+    def __init__(self, index_dir: str, meta: dict):
+        self.name = meta["name"]
+        self.doc_start = meta["doc_start"]
+        self.doc_end = meta["doc_end"]
+        self.indexed_docs = meta["indexed_docs"]
+        self.total_length = meta["total_length"]
+        self.total_field_lengths = meta.get("total_field_lengths")
+        self.path = segment_dir(index_dir, self.name)
+
+        self.term_dict = MmapTermDict(os.path.join(self.path, TERM_DICT_FILENAME))
+        self.postings_file = open(os.path.join(self.path, POSTINGS_FILENAME), "rb")
+        flags = read_header(self.postings_file)[1]
+        self.num_fields = num_fields_from_flags(flags)
+        self.block_size = block_size_from_flags(flags)
+        self._postings_mmap = None
+        store = load_doc_store(self.path)
+        self.doc_lengths = store.doc_lengths
+        self.doc_offsets = store.doc_offsets
+        self.doc_norms = store.doc_norms
+        self.field_lengths = store.field_lengths
+        self.docs_file = open(os.path.join(self.path, SEGMENT_DOCS_FILENAME), "rb")
+        self.positions = PositionsReader(self.path) if has_positions(self.path) else None
+
+    def set_collection_stats(self, avg_doc_length: float, b: float):
+        """Tính lại length norms theo avgdl toàn cục (segment nhỏ -> rẻ)."""
+        self.doc_norms = compute_length_norms(self.doc_lengths, avg_doc_length, b)
+
+    def df(self, term: str) -> int:
+        entry = self.term_dict.get(term)
+        return entry[0] if entry is not None else 0
+
+    def get_postings(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Postings của term trong segment (doc_id toàn cục)."""
+        entry = self.term_dict.get(term)
+        if entry is None:
+            return None
+        _, offset, length = entry
+        self.postings_file.seek(offset)
+        return decode_postings(self.postings_file.read(length), self.num_fields, self.block_size)
+
+    def get_postings_blocks(self, term: str) -> Optional[PostingsBlocks]:
+        """Skip table + decode từng block của term (mmap, không đọc cả list)."""
+        entry = self.term_dict.get(term)
+        if entry is None:
+            return None
+        if self._postings_mmap is None:
+            self._postings_mmap = mmap.mmap(self.postings_file.fileno(), 0, access=mmap.ACCESS_READ)
+        _, offset, length = entry
+        return PostingsBlocks(memoryview(self._postings_mmap)[offset:offset + length],
+                              self.num_fields, self.block_size)
+
+    def get_positional_postings(self, term: str):
+        """(doc_ids, tfs, positions) của term (None nếu không có term / index vị trí)."""
+        if self.positions is None:
+            return None
+        ordinal = self.term_dict.ordinal(term)
+        if ordinal is None:
+            return None
+        _, offset, length = self.term_dict.entry(ordinal)
+        self.postings_file.seek(offset)
+        doc_ids, tfs = decode_postings(self.postings_file.read(length), self.num_fields, self.block_size)
+        return doc_ids, tfs, self.positions.get(ordinal, tfs)
+
+    def contains_doc(self, doc_id: int) -> bool:
+        return self.doc_start <= doc_id < self.doc_end
+
+    def read_doc_line(self, doc_id: int) -> Optional[bytes]:
+        """Dòng JSON gốc của document (None nếu không có)."""
+        offset = int(self.doc_offsets[doc_id - self.doc_start])
+        if offset < 0:
+            return None
+        self.docs_file.seek(offset)
+        return self.docs_file.readline()
+
+    def close(self):
+        self.term_dict.close()
+        if self._postings_mmap is not None:
+            try:
+                self._postings_mmap.close()
+            except BufferError:
+                # Vẫn còn PostingsBlocks trỏ vào mmap -> để GC tự giải phóng
+                pass
+            self._postings_mmap = None
+        self.postings_file.close()
+        self.docs_file.close()
+        if self.positions is not None:
+            self.positions.close()
+
+
+def open_segments(index_dir: str, manifest: Optional[dict] = None) -> List[Segment]:
+    """Mở tất cả segments trong manifest (theo thứ tự doc_id)."""
+    if manifest is None:
+        if not os.path.exists(manifest_path(index_dir)):
+            return []
+        manifest = load_manifest(index_dir)
+    return [Segment(index_dir, meta) for meta in manifest["segments"]]
+
+
+# ============================================================================
+# TIERED MERGE POLICY
+# ============================================================================
+
+class TieredMergePolicy:
+    """
+    Gộp merge_factor segments LIỀN KỀ cùng tier thành 1 segment.
+
+    Tier của segment tăng theo log kích thước, nên mỗi document chỉ bị
+    ghi lại O(log_{merge_factor}(N)) lần (giống LSM-tree / Lucene).
+    """
+
+    def __init__(self, merge_factor: int = MERGE_FACTOR,
+                 min_segment_docs: int = MIN_SEGMENT_DOCS):
+        self.merge_factor = merge_factor
+        self.min_segment_docs = min_segment_docs
+
+    def tier(self, meta: dict) -> int:
+        num_docs = max(meta["doc_end"] - meta["doc_start"], 1)
+        if num_docs < self.min_segment_docs:
+            return 0
+        return int(math.log(num_docs / self.min_segment_docs, self.merge_factor)) + 1
+
+    def find_merge(self, segments: List[dict]) -> Optional[List[str]]:
+        """Trả về tên các segments cần gộp (1 lần merge), hoặc None."""
+        run = []
+        for meta in segments:
+            if run and self.tier(meta) != self.tier(run[-1]):
+                run = []
+            run.append(meta)
+            if len(run) >= self.merge_factor:
+                return [m["name"] for m in run]
+        return None
+
+
+def merge_segments(index_dir: str, names: List[str]) -> dict:
+    """
+    Gộp các segments liền kề (theo doc_id) thành 1 segment mới và cập nhật
+    manifest. Postings/docs được nối theo thứ tự segment (doc_id đã tăng dần).
+    Doc đã xoá (tombstone) bị loại khỏi postings của segment mới, nên gộp
+    1 segment duy nhất chính là compaction segment đó.
+
+    Returns:
+        meta của segment mới
+    """
+    with _WRITE_LOCK:
+        manifest = load_manifest(index_dir)
+        by_name = {meta["name"]: meta for meta in manifest["segments"]}
+        sources = sorted((by_name[name] for name in names), key=lambda m: m["doc_start"])
+        for prev, cur in zip(sources, sources[1:]):
+            if prev["doc_end"] != cur["doc_start"]:
+                raise ValueError(f"Segments are not adjacent: {prev['name']}, {cur['name']}")
+        name = _next_segment_name(manifest)
+        save_manifest(index_dir, manifest)
+        deletions = load_deletions(index_dir, manifest)
+    final_dir = segment_dir(index_dir, name)
+    tmp_dir = final_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    # Phần tốn thời gian chạy ngoài lock: segments nguồn là bất biến
+    source_dirs = [segment_dir(index_dir, meta["name"]) for meta in sources]
+    positional = all(has_positions(d) for d in source_dirs)
+    num_fields = postings_num_fields(source_dirs[0])
+    num_terms = write_postings_index(
+        tmp_dir,
+        filter_deleted(merge_record_streams([iter_index_records(d, positional) for d in source_dirs]),
+                       deletions),
+        positions=positional,
+        num_fields=num_fields,
+    )
+
+    lengths, offsets, field_lengths = [], [], []
+    with open(os.path.join(tmp_dir, SEGMENT_DOCS_FILENAME), "wb") as docs_out:
+        for source in source_dirs:
+            store = load_doc_store(source, mmap=False)
+            base = docs_out.tell()
+            with open(os.path.join(source, SEGMENT_DOCS_FILENAME), "rb") as docs_in:
+                shutil.copyfileobj(docs_in, docs_out)
+            lengths.append(store.doc_lengths)
+            offsets.append(np.where(store.doc_offsets >= 0, store.doc_offsets + base, EMPTY_DOC))
+            if num_fields:
+                field_lengths.append(store.field_lengths)
+    lengths = np.concatenate(lengths)
+    field_lengths = np.concatenate(field_lengths) if num_fields else None
+    doc_start = sources[0]["doc_start"]
+    if deletions is not None:
+        deleted = deletions.bits[doc_start:doc_start + len(lengths)]
+        lengths[:len(deleted)][deleted] = EMPTY_DOC
+    meta = write_doc_store(tmp_dir, lengths, np.concatenate(offsets), field_lengths=field_lengths,
+                           fields=FIELD_NAMES if num_fields else None)
+    os.replace(tmp_dir, final_dir)
+
+    merged = _segment_meta(doc_start, sources[-1]["doc_end"], meta, lengths, num_terms,
+                           field_lengths)
+    merged["name"] = name
+
+    # Thay các segments nguồn bằng segment mới (đúng vị trí theo doc_id)
+    with _WRITE_LOCK:
+        manifest = load_manifest(index_dir)
+        remaining = [meta for meta in manifest["segments"] if meta["name"] not in set(names)]
+        remaining.append(merged)
+        manifest["segments"] = sorted(remaining, key=lambda m: m["doc_start"])
+        save_manifest(index_dir, manifest)
+
+    # Reader đang mở segment cũ vẫn đọc được trên POSIX; trên Windows bỏ qua lỗi
+    for source in source_dirs:
+        shutil.rmtree(source, ignore_errors=True)
+    return merged
+
+
+# ============================================================================
+# COMPACTION
+# ============================================================================
+
+def deleted_ratio(lengths: np.ndarray, doc_start: int, deletions: Optional[DeletionBitmap]) -> float:
+    """
+    Tỉ lệ doc đã xoá nhưng VẪN còn trong postings (length >= 0) trên số
+    doc được index của 1 đơn vị (index gốc / segment).
+    """
+    if deletions is None or deletions.count == 0:
+        return 0.0
+    indexed = lengths >= 0
+    num_indexed = int(np.count_nonzero(indexed))
+    if num_indexed == 0:
+        return 0.0
+    deleted = deletions.bits[doc_start:doc_start + len(lengths)]
+    stale = int(np.count_nonzero(deleted & indexed[:len(deleted)]))
+    return stale / num_indexed
+
+
+def compact_base(index_dir: str) -> int:
+    """
+    Ghi lại index gốc không còn doc đã xoá: postings.bin, term_dict.bin/.pkl
+    và doc store (doc đã xoá -> EMPTY_DOC). Các file được thay bằng
+    os.replace, sau đó tăng base_generation để searcher load lại.
+
+    Returns:
+        Số terms của index gốc mới
+    """
+    manifest = load_manifest(index_dir)
+    deletions = load_deletions(index_dir, manifest)
+
+    if has_doc_store(index_dir):
+        with open(os.path.join(index_dir, DOC_STORE_META_FILE), "r", encoding="utf-8") as f:
+            b = json.load(f).get("b")
+        store = load_doc_store(index_dir, mmap=False)
+    else:
+        store = doc_store_from_pickles(index_dir)
+        b = store.b
+    lengths = np.array(store.doc_lengths, dtype=np.int32)
+    if deletions is not None:
+        deleted = deletions.bits[:len(lengths)]
+        lengths[:len(deleted)][deleted] = EMPTY_DOC
+    offsets = store.doc_offsets if store.doc_offsets is not None \
+        else np.full(len(lengths), EMPTY_DOC, dtype=np.int64)
+
+    tmp_dir = os.path.join(index_dir, "_compact_tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    with_pickle = os.path.exists(os.path.join(index_dir, "term_dict.pkl"))
+    positional = has_positions(index_dir)
+    num_fields = postings_num_fields(index_dir)
+    num_terms = write_postings_index(
+        tmp_dir, filter_deleted(iter_index_records(index_dir, positional), deletions),
+        with_pickle, positional, num_fields,
+    )
+    write_doc_store(tmp_dir, lengths, np.array(offsets, dtype=np.int64), b=b,
+                    field_lengths=store.field_lengths, fields=store.fields)
+    if has_folded_terms(index_dir):
+        write_folded_terms(tmp_dir)
+    if has_fuzzy_terms(index_dir):
+        write_fuzzy_terms(tmp_dir, load_fuzzy_meta(index_dir)["min_df"])
+    if has_suggest_index(index_dir, "terms"):
+        write_suggest_terms(tmp_dir, load_suggest_meta(index_dir, "terms")["min_df"])
+    if has_term_bounds(index_dir):
+        write_term_bounds(tmp_dir)
+    if has_impacts(index_dir):
+        # Term ordinal + avgdl đổi sau compaction -> tính lại với cùng tham số
+        impacts_meta = load_impacts_meta(index_dir)
+        fields = impacts_meta["fields"] or []
+        write_impacts(tmp_dir, impacts_meta["k1"], impacts_meta["b"],
+                      dict(zip(fields, impacts_meta.get("field_weights", []))),
+                      dict(zip(fields, impacts_meta.get("field_b", []))))
+        if has_champions(index_dir):
+            champions_meta = load_champions_meta(index_dir)
+            write_champions(tmp_dir, champions_meta["size"], champions_meta["min_df"])
+
+    with _WRITE_LOCK:
+        for filename in os.listdir(tmp_dir):
+            os.replace(os.path.join(tmp_dir, filename), os.path.join(index_dir, filename))
+        manifest = load_manifest(index_dir)
+        manifest["base_generation"] = manifest.get("base_generation", 0) + 1
+        save_manifest(index_dir, manifest)
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    return num_terms
+
+
+def compact(index_dir: str, threshold: float = DELETE_RATIO_THRESHOLD) -> List[str]:
+    """
+    Compaction các đơn vị có tỉ lệ xoá > threshold.
+
+    Returns:
+        Danh sách đơn vị đã compaction ("base" và/hoặc tên segment cũ)
+    """
+    if not os.path.exists(manifest_path(index_dir)):
+        return []
+    manifest = load_manifest(index_dir)
+    deletions = load_deletions(index_dir, manifest)
+    if deletions is None:
+        return []
+
+    compacted = []
+    if os.path.exists(os.path.join(index_dir, TERM_DICT_FILENAME)):
+        if has_doc_store(index_dir):
+            base_lengths = load_doc_store(index_dir).doc_lengths
+        else:
+            base_lengths = doc_store_from_pickles(index_dir).doc_lengths
+        if deleted_ratio(base_lengths, 0, deletions) > threshold:
+            start = time.time()
+            compact_base(index_dir)
+            compacted.append("base")
+            print(f"  Compacted base index ({time.time() - start:.1f}s)")
+
+    for meta in manifest["segments"]:
+        lengths = load_doc_store(segment_dir(index_dir, meta["name"])).doc_lengths
+        if deleted_ratio(lengths, meta["doc_start"], deletions) > threshold:
+            merged = merge_segments(index_dir, [meta["name"]])
+            compacted.append(meta["name"])
+            print(f"  Compacted {meta['name']} -> {merged['name']}")
+    return compacted
+
+
+def maybe_merge(index_dir: str, policy: Optional[TieredMergePolicy] = None) -> int:
+    """Chạy policy cho tới khi không còn gì để gộp. Trả về số lần merge."""
+    if not os.path.exists(manifest_path(index_dir)):
+        return 0
+    policy = policy or TieredMergePolicy()
+    merges = 0
+    while True:
+        names = policy.find_merge(load_manifest(index_dir)["segments"])
+        if not names:
+            return merges
+        start = time.time()
+        merged = merge_segments(index_dir, names)
+        merges += 1
+        print(f"  Merged {len(names)} segments -> {merged['name']} "
+              f"({merged['doc_end'] - merged['doc_start']:,d} docs, {time.time() - start:.1f}s)")
+
+
+class BackgroundMerger(threading.Thread):
+    """Thread nền chạy compaction + maybe_merge định kỳ."""
+
+    def __init__(self, index_dir: str, policy: Optional[TieredMergePolicy] = None,
+                 interval: float = MERGE_INTERVAL,
+                 delete_ratio_threshold: float = DELETE_RATIO_THRESHOLD):
+        super().__init__(daemon=True, name="segment-merger")
+        self.index_dir = index_dir
+        self.policy = policy or TieredMergePolicy()
+        self.interval = interval
+        self.delete_ratio_threshold = delete_ratio_threshold
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                compact(self.index_dir, self.delete_ratio_threshold)
+                maybe_merge(self.index_dir, self.policy)
+            except Exception as e:
+                print(f"  ⚠ Segment merge failed: {e}")
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+# ============================================================================
+# ENTRY POINT
+# ============================================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Incremental segments: add / delete / update / merge / compact / list")
+    parser.add_argument("command", choices=["add", "delete", "update", "merge", "compact", "list"])
+    parser.add_argument("args", nargs="*",
+                        help="add: file JSONL | delete: doc_id... | update: doc_id file JSON")
+    parser.add_argument("--index-dir", default=DEFAULT_INDEX_DIR)
+    parser.add_argument("--threshold", type=float, default=DELETE_RATIO_THRESHOLD,
+                        help="Ngưỡng tỉ lệ xoá cho 'compact'")
+    args = parser.parse_args()
+
+    if args.command == "add":
+        if len(args.args) != 1:
+            parser.error("add requires a JSONL file")
+        start = time.time()
+        name, doc_ids = add_documents_from_jsonl(args.index_dir, args.args[0])
+        if name is None:
+            print("No documents to add.")
+        else:
+            print(f"✓ Added {len(doc_ids):,d} documents as {name} "
+                  f"(doc_id {doc_ids[0]:,d}-{doc_ids[-1]:,d}) in {time.time() - start:.1f}s")
+    elif args.command == "delete":
+        deleted = delete_documents(args.index_dir, [int(doc_id) for doc_id in args.args])
+        print(f"✓ Deleted {deleted:,d} documents")
+    elif args.command == "update":
+        if len(args.args) != 2:
+            parser.error("update requires a doc_id and a JSON file")
+        with open(args.args[1], "r", encoding="utf-8") as f:
+            new_doc_id = update_document(args.index_dir, int(args.args[0]), json.load(f))
+        print(f"✓ Document {args.args[0]} replaced by doc_id {new_doc_id:,d}")
+    elif args.command == "merge":
+        merges = maybe_merge(args.index_dir)
+        print(f"✓ {merges} merge(s) performed")
+    elif args.command == "compact":
+        compacted = compact(args.index_dir, args.threshold)
+        print(f"✓ Compacted: {', '.join(compacted) if compacted else 'nothing'}")
+    else:
+        manifest = load_manifest(args.index_dir)
+        print(f"Next doc_id: {manifest['next_doc_id']:,d} | "
+              f"Deleted: {_deletes_info(manifest)['count']:,d}")
+        for meta in manifest["segments"]:
+            print(f"  {meta['name']}: doc_id [{meta['doc_start']:,d}, {meta['doc_end']:,d}) "
+                  f"| {meta['indexed_docs']:,d} indexed | {meta['num_terms']:,d} terms")
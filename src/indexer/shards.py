@@ -0,0 +1,251 @@
+"""
+Doc-Range Shards
+================
+Milestone 2 - SEG301: Search Engines & Information Retrieval
+
+1 BM25Searcher giữ toàn bộ corpus: mỗi truy vấn chỉ chạy trên 1 core và cả
+index phải nằm trong RAM / page cache của 1 máy. Build này chia doc_id
+thành N khoảng liền nhau; mỗi shard là 1 index đầy đủ (term dict, postings,
+doc store) giống data/index:
+
+    shards_dir/
+        shard_000/ ... shard_{N-1}/
+                         Index của doc_id [doc_start, doc_end); doc_id cục
+                         bộ = doc_id - doc_start, byte offset vẫn trỏ vào
+                         file JSONL gốc (không chép dữ liệu)
+        term_dict.bin    df TOÀN CỤC của mọi term (cộng df các shard,
+                         offset / length = 0) -> IDF giống index không chia
+        shards.json      Khoảng doc_id từng shard + N, tổng độ dài doc / từng
+                         trường -> avgdl, avglen_f toàn cục
+        folded_terms.bin, fuzzy_*, suggest_*
+                         Tính 1 lần trên từ điển toàn cục (shard không có)
+
+doc_id toàn cục = doc_id của index không chia (thứ tự dòng trong JSONL),
+nên kết quả gộp từ các shard trùng với search trên 1 index. Impacts /
+champion lists không được tính cho shard (chúng lượng tử hoá theo thống kê
+của riêng index đó); shard luôn chấm điểm chính xác.
+
+Search: src/ranking/sharded.py (mỗi shard 1 worker process, coordinator
+gộp top-k).
+
+Build: python src/indexer/shards.py --shards 4 [--workers 2]
+"""
+
+import os
+import sys
+import json
+import time
+import heapq
+import shutil
+import argparse
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# Thêm project root vào path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.indexer.mmap_term_dict import MmapTermDict, TermDictWriter, TERM_DICT_FILENAME
+from src.indexer.doc_store import load_doc_store
+from src.indexer.spimi import build_spimi_index, iter_records, BLOCK_SIZE, DEFAULT_MEMORY_BUDGET_MB
+from src.indexer.merging import merge_blocks
+from src.indexer.folded_terms import write_folded_terms
+from src.indexer.fuzzy_terms import write_fuzzy_terms
+from src.indexer.suggest import write_suggest_terms, write_suggest_names
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+SHARDS_META_FILENAME = "shards.json"
+SHARD_DIR_FORMAT = "shard_{:03d}"
+
+DEFAULT_DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+DEFAULT_SHARDS_DIR = os.path.join(DEFAULT_DATA_PATH, "shards")
+
+
+def has_shards(shards_dir: str) -> bool:
+    """Thư mục có index chia shard đã build hay không."""
+    return os.path.exists(os.path.join(shards_dir, SHARDS_META_FILENAME))
+
+
+def load_shards_meta(shards_dir: str) -> dict:
+    with open(os.path.join(shards_dir, SHARDS_META_FILENAME), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# ============================================================================
+# DOC RANGES
+# ============================================================================
+
+def document_offsets(jsonl_path: str) -> np.ndarray:
+    """
+    Byte offset (int64) của các dòng được cấp doc_id, theo doc_id: dòng rỗng
+    / JSON lỗi bị bỏ qua (giống read_documents).
+    """
+    return np.fromiter((byte_offset for _, _, byte_offset, _ in iter_records(jsonl_path)),
+                       dtype=np.int64)
+
+
+def shard_ranges(num_docs: int, num_shards: int) -> List[Tuple[int, int]]:
+    """Chia [0, num_docs) thành num_shards khoảng liền nhau, chênh nhau tối đa 1 doc."""
+    bounds = np.linspace(0, num_docs, num_shards + 1).round().astype(np.int64).tolist()
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+# ============================================================================
+# GLOBAL STATISTICS
+# ============================================================================
+
+def _iter_dfs(path: str):
+    term_dict = MmapTermDict(path)
+    try:
+        dfs = term_dict.records["df"]
+        for ordinal, term in enumerate(term_dict):
+            yield term, int(dfs[ordinal])
+    finally:
+        term_dict.close()
+
+
+def merge_term_dicts(dict_paths: List[str], out_path: str) -> int:
+    """
+    K-way merge các term_dict.bin (đã sắp xếp) thành 1 từ điển df toàn cục:
+    df = tổng df các shard, offset / length = 0. Trả về số term.
+    """
+    num_terms = 0
+    with TermDictWriter(out_path) as writer:
+        current, total = None, 0
+        for term, df in heapq.merge(*(_iter_dfs(path) for path in dict_paths)):
+            if term != current:
+                if current is not None:
+                    writer.add(current, total, 0, 0)
+                    num_terms += 1
+                current, total = term, 0
+            total += df
+        if current is not None:
+            writer.add(current, total, 0, 0)
+            num_terms += 1
+    return num_terms
+
+
+def collection_totals(index_dir: str) -> Tuple[int, int, Optional[List[int]]]:
+    """(số doc được index, tổng độ dài, tổng độ dài từng trường hoặc None) của 1 index."""
+    store = load_doc_store(index_dir)
+    indexed = np.asarray(store.doc_lengths) >= 0
+    total_length = int(np.asarray(store.doc_lengths)[indexed].sum(dtype=np.int64))
+    field_totals = None
+    if store.fields:
+        field_totals = np.asarray(store.field_lengths)[indexed].sum(axis=0, dtype=np.int64).tolist()
+    return int(np.count_nonzero(indexed)), total_length, field_totals
+
+
+# ============================================================================
+# BUILD
+# ============================================================================
+
+def build_shards(jsonl_path: str, shards_dir: str = DEFAULT_SHARDS_DIR, num_shards: int = 4,
+                 block_size: int = BLOCK_SIZE, workers: int = 1,
+                 memory_budget_mb: float = DEFAULT_MEMORY_BUDGET_MB,
+                 positions: bool = False, fields: bool = True) -> dict:
+    """
+    Build num_shards index theo khoảng doc_id + thống kê toàn cục.
+
+    Mỗi shard chạy SPIMI (chỉ các dòng của khoảng đó, workers process) rồi
+    merge như index thường; sau đó từ điển df toàn cục, shards.json và các
+    index tra cứu (bỏ dấu, trigram, gợi ý) được ghi vào shards_dir.
+
+    Returns:
+        meta: Nội dung shards.json
+    """
+    if num_shards < 1:
+        raise ValueError(f"num_shards must be >= 1, got {num_shards}")
+    print("=" * 70)
+    print(f"  SHARDED INDEXING - {num_shards} doc-range shards")
+    print("=" * 70)
+    start_time = time.time()
+
+    offsets = document_offsets(jsonl_path)
+    os.makedirs(shards_dir, exist_ok=True)
+    for name in os.listdir(shards_dir):
+        if name.startswith("shard_") and os.path.isdir(os.path.join(shards_dir, name)):
+            shutil.rmtree(os.path.join(shards_dir, name))
+
+    shards = []
+    num_docs = total_length = 0
+    field_totals = None
+    for i, (doc_start, doc_end) in enumerate(shard_ranges(len(offsets), num_shards)):
+        name = SHARD_DIR_FORMAT.format(i)
+        shard_dir = os.path.join(shards_dir, name)
+        blocks_dir = os.path.join(shard_dir, "blocks")
+        print(f"\n  Shard {name}: doc_id [{doc_start:,d}, {doc_end:,d})")
+        build_spimi_index(jsonl_path, blocks_dir, block_size, workers=workers,
+                          memory_budget_mb=memory_budget_mb, positions=positions,
+                          fields=fields, offsets=offsets[doc_start:doc_end])
+        merge_blocks(blocks_dir, shard_dir, workers=workers, lookup_indexes=False)
+        shutil.rmtree(blocks_dir, ignore_errors=True)
+
+        indexed_docs, length, shard_fields = collection_totals(shard_dir)
+        num_docs += indexed_docs
+        total_length += length
+        if shard_fields is not None:
+            field_totals = shard_fields if field_totals is None \
+                else [a + b for a, b in zip(field_totals, shard_fields)]
+        shards.append({"name": name, "doc_start": doc_start, "doc_end": doc_end,
+                       "indexed_docs": indexed_docs})
+
+    num_terms = merge_term_dicts(
+        [os.path.join(shards_dir, shard["name"], TERM_DICT_FILENAME) for shard in shards],
+        os.path.join(shards_dir, TERM_DICT_FILENAME))
+    write_folded_terms(shards_dir)
+    write_fuzzy_terms(shards_dir)
+    write_suggest_terms(shards_dir)
+    write_suggest_names(shards_dir, jsonl_path)
+
+    meta = {
+        "num_shards": num_shards,
+        "shards": shards,
+        "total_docs": num_docs,
+        "total_length": total_length,
+        "field_totals": field_totals,
+        "num_terms": num_terms,
+    }
+    with open(os.path.join(shards_dir, SHARDS_META_FILENAME), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    print("-" * 70)
+    print(f"  Sharding Complete!")
+    print(f"  Shards: {num_shards} | Docs: {num_docs:,d} | Global terms: {num_terms:,d} | "
+          f"avgdl: {total_length / max(num_docs, 1):.1f}")
+    print(f"  Time: {time.time() - start_time:.1f}s")
+    print("=" * 70)
+    return meta
+
+
+# ============================================================================
+# ENTRY POINT
+# ============================================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build index chia shard theo khoảng doc_id")
+    parser.add_argument("--jsonl", default=os.path.join(DEFAULT_DATA_PATH, "milestone1_fixed.jsonl"))
+    parser.add_argument("--out", default=DEFAULT_SHARDS_DIR, help="Thư mục shards")
+    parser.add_argument("--shards", type=int, default=4, help="Số shard (mặc định: 4)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Số worker processes SPIMI / merge cho mỗi shard")
+    parser.add_argument("--block-size", type=int, default=BLOCK_SIZE)
+    parser.add_argument("--memory-budget-mb", type=float, default=DEFAULT_MEMORY_BUDGET_MB)
+    parser.add_argument("--positions", action="store_true",
+                        help="Build kèm index vị trí (phrase / proximity queries)")
+    parser.add_argument("--no-fields", action="store_true",
+                        help="Index 1 text gộp thay vì theo trường")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.jsonl):
+        print(f"ERROR: Data file not found: {args.jsonl}")
+        sys.exit(1)
+
+    build_shards(args.jsonl, args.out, args.shards, args.block_size, workers=args.workers,
+                 memory_budget_mb=args.memory_budget_mb, positions=args.positions,
+                 fields=not args.no_fields)
+    print(f"\n✓ Shards built. Search: python src/ranking/sharded.py {args.out}")
@@ -5,14 +5,21 @@ Milestone 2 - SEG301: Search Engines & Information Retrieval
 
 Thuật toán SPIMI:
 1. Đọc documents theo từng block (batch) để tránh tràn RAM.
-2. Với mỗi block, xây dựng một Inverted Index tạm (in-memory dictionary).
-3. Khi dictionary đạt giới hạn kích thước (hoặc hết block) -> sắp xếp terms 
-   và ghi xuống đĩa thành 1 file block.
+2. Với mỗi block, xây dựng một Inverted Index tạm (in-memory dictionary),
+   thêm trực tiếp từng document (không tạo token stream (term, doc_id)).
+3. Khi dictionary đạt giới hạn kích thước ước lượng (memory budget, bytes)
+   hoặc hết batch -> sắp xếp terms và ghi xuống đĩa thành 1 file block.
 4. Sau khi xử lý hết tất cả documents, merge các block files thành 
    một Inverted Index hoàn chỉnh.
 
 Cấu trúc Inverted Index:
     term -> [doc_freq, [(doc_id, term_freq), (doc_id, term_freq), ...]]
+
+Index theo trường (mặc định): tên, địa chỉ, người đại diện, tình trạng,
+ngành nghề được tokenize riêng; mỗi posting giữ tf của từng trường và doc
+store giữ độ dài từng trường -> BM25F chọn trọng số trường lúc truy vấn
+(thay vì lặp text tên / ngành nghề 2 lần lúc build).
+    term -> [(doc_id, [tf_name, tf_address, tf_rep, tf_status, tf_industries]), ...]
 """
 
 import json
@@ -20,20 +27,62 @@ import os
 import sys
 import gc
 import time
+import argparse
 import struct
-import pickle
 import tempfile
-from collections import defaultdict
-from typing import Dict, List, Tuple, Generator, Optional
+from array import array
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple, Generator, Iterable, Optional
+
+# Thêm project root vào path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.indexer.doc_store import DocStoreWriter
+import numpy as np
+
+from src.indexer.block_format import BlockWriter, write_block, BLOCK_EXT
+from src.indexer.merging import current_rss_mb
+from src.indexer.doc_reorder import compute_doc_order, save_doc_order, remove_doc_order
 
 
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
 
-# Số documents mỗi block (điều chỉnh tùy RAM)
+# Số documents tối đa mỗi batch (đơn vị công việc giao cho 1 worker)
 BLOCK_SIZE = 50_000
 
+# Ngân sách RAM cho dictionary của 1 block: vượt ngưỡng -> flush block xuống đĩa
+# (1 batch có thể sinh nhiều block nếu documents dài)
+DEFAULT_MEMORY_BUDGET_MB = 256
+
+# Ước lượng chi phí bộ nhớ của BlockInverter (CPython 64-bit, đã đối chiếu
+# với tracemalloc trên data_sample, sai số < 5%):
+#   term mới: sys.getsizeof(term) + array('i') rỗng (64) + slot dict (~40)
+#   mỗi posting: 2 x int32 trong array (index theo trường: 1 + số trường)
+TERM_OVERHEAD_BYTES = 64 + 40
+POSTING_BYTES = 8
+INT_BYTES = 4
+#   index vị trí (--positions): thêm 1 array('i') / term + 4 bytes / vị trí
+POSITION_BYTES = 4
+
+# Ranh giới giữa các trường trong text tìm kiếm. tokenize() bỏ qua token này
+# (chỉ gồm ký tự đặc biệt) nên postings không đổi; index vị trí nhảy
+# POSITION_GAP vị trí tại đây để cụm từ không khớp xuyên qua 2 trường.
+FIELD_SEPARATOR = "|"
+POSITION_GAP = 100
+
+# Các trường được index riêng (index theo trường): (tên trường, khoá _seg trong JSONL)
+INDEX_FIELDS = (
+    ("company_name", "company_name_seg"),
+    ("address", "address_seg"),
+    ("representative", "representative_seg"),
+    ("status", "status_seg"),
+    ("industries", "industries_str_seg"),
+)
+FIELD_NAMES = tuple(name for name, _ in INDEX_FIELDS)
+
 # Thư mục lưu các block tạm và index cuối cùng
 DEFAULT_DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "data")
 DEFAULT_INDEX_DIR = os.path.join(DEFAULT_DATA_PATH, "index")
@@ -44,27 +93,87 @@ DEFAULT_BLOCKS_DIR = os.path.join(DEFAULT_INDEX_DIR, "blocks")
 # DOCUMENT READER
 # ============================================================================
 
-def read_documents(jsonl_path: str, batch_size: int = BLOCK_SIZE) -> Generator:
+def document_text(doc: dict) -> str:
     """
-    Đọc documents từ file JSONL theo batch.
+    Tạo text tìm kiếm của 1 document từ các trường đã segmented
+    (dùng chung cho SPIMI và incremental segments).
+    """
+    # Ưu tiên dùng trường _seg (đã tách từ tiếng Việt)
+    text_parts = []
+    
+    # Tên công ty (trọng số cao - lặp lại để tăng TF)
+    company_seg = doc.get("company_name_seg", "")
+    if company_seg:
+        text_parts.append(company_seg)
+        text_parts.append(company_seg)  # boost tên công ty
+    
+    # Địa chỉ
+    addr_seg = doc.get("address_seg", "")
+    if addr_seg:
+        text_parts.append(addr_seg)
+    
+    # Người đại diện
+    rep_seg = doc.get("representative_seg", "")
+    if rep_seg:
+        text_parts.append(rep_seg)
+    
+    # Tình trạng hoạt động
+    status_seg = doc.get("status_seg", "")
+    if status_seg:
+        text_parts.append(status_seg)
+    
+    # Ngành nghề kinh doanh (trọng số cao)
+    industries_seg = doc.get("industries_str_seg", "")
+    if industries_seg:
+        text_parts.append(industries_seg)
+        text_parts.append(industries_seg)  # boost ngành nghề
+    
+    return f" {FIELD_SEPARATOR} ".join(text_parts).lower()
+
+
+def document_fields(doc: dict) -> List[str]:
+    """
+    Text đã segmented của từng trường trong INDEX_FIELDS (cùng thứ tự),
+    mỗi trường đúng 1 lần - trọng số trường do BM25F quyết định lúc truy vấn.
+    """
+    return [(doc.get(key) or "").lower() for _, key in INDEX_FIELDS]
+
+
+def has_index_text(text) -> bool:
+    """Text (hoặc list text từng trường) có gì để index không."""
+    return any(part.strip() for part in text) if isinstance(text, list) else bool(text.strip())
+
+
+def iter_records(jsonl_path: str, offsets: Optional[np.ndarray] = None) -> Generator:
+    """
+    Parse từng dòng JSONL đúng 1 lần - điểm đọc chung của SPIMI và
+    ingest.py (1 lượt đọc cho mọi artifact của index).
     
-    Mỗi document sẽ được tạo thành một chuỗi text bao gồm các trường 
-    đã được tách từ (segmented) để phục vụ indexing.
+    Dòng rỗng / JSON lỗi bị bỏ qua và không được cấp doc_id.
+    Đọc ở binary mode để f.tell() trả về byte offset chính xác
+    (text mode trên Windows với UTF-8 encoding rất chậm với tell()).
     
-    Lưu byte_offset của từng dòng để có thể random access sau này
-    (thay vì lưu toàn bộ metadata vào RAM).
+    offsets: đọc theo đúng thứ tự byte offset này (doc_id = vị trí trong
+    offsets, xem doc_reorder.py / shards.py) thay vì tuần tự từng dòng.
     
     Yields:
-        batch: List of (doc_id, text, byte_offset) tuples
+        (doc_id, line_no, byte_offset, doc): line_no là số dòng (0-based)
+        trong JSONL, None khi đọc theo offsets
     """
-    batch = []
     doc_id = 0
+    line_no = -1
+    offset_iter = iter(offsets.tolist()) if offsets is not None else None
     
-    # Đọc ở binary mode để f.tell() trả về byte offset chính xác
-    # (text mode trên Windows với UTF-8 encoding rất chậm với tell())
     with open(jsonl_path, "rb") as f:
         while True:
-            byte_offset = f.tell()
+            if offset_iter is not None:
+                byte_offset = next(offset_iter, None)
+                if byte_offset is None:
+                    break
+                f.seek(byte_offset)
+            else:
+                byte_offset = f.tell()
+                line_no += 1
             raw_line = f.readline()
             if not raw_line:
                 break
@@ -78,49 +187,46 @@ def read_documents(jsonl_path: str, batch_size: int = BLOCK_SIZE) -> Generator:
             except json.JSONDecodeError:
                 continue
             
-            # Tạo text tìm kiếm từ các trường đã segmented
-            # Ưu tiên dùng trường _seg (đã tách từ tiếng Việt)
-            text_parts = []
-            
-            # Tên công ty (trọng số cao - lặp lại để tăng TF)
-            company_seg = doc.get("company_name_seg", "")
-            if company_seg:
-                text_parts.append(company_seg)
-                text_parts.append(company_seg)  # boost tên công ty
-            
-            # Địa chỉ
-            addr_seg = doc.get("address_seg", "")
-            if addr_seg:
-                text_parts.append(addr_seg)
-            
-            # Người đại diện
-            rep_seg = doc.get("representative_seg", "")
-            if rep_seg:
-                text_parts.append(rep_seg)
-            
-            # Tình trạng hoạt động
-            status_seg = doc.get("status_seg", "")
-            if status_seg:
-                text_parts.append(status_seg)
-            
-            # Ngành nghề kinh doanh (trọng số cao)
-            industries_seg = doc.get("industries_str_seg", "")
-            if industries_seg:
-                text_parts.append(industries_seg)
-                text_parts.append(industries_seg)  # boost ngành nghề
-            
-            text = " ".join(text_parts).lower()
-            
-            if not text.strip():
-                doc_id += 1
-                continue
-            
-            batch.append((doc_id, text, byte_offset))
+            yield doc_id, line_no if offset_iter is None else None, byte_offset, doc
             doc_id += 1
-            
-            if len(batch) >= batch_size:
-                yield batch
-                batch = []
+
+
+def read_documents(jsonl_path: str, batch_size: int = BLOCK_SIZE,
+                   fields: bool = False, offsets: Optional[np.ndarray] = None,
+                   records: Optional[Iterable] = None) -> Generator:
+    """
+    Đọc documents từ file JSONL theo batch.
+    
+    Mỗi document sẽ được tạo thành một chuỗi text bao gồm các trường 
+    đã được tách từ (segmented) để phục vụ indexing.
+    fields=True: thay chuỗi text bằng list text từng trường (document_fields).
+    
+    Lưu byte_offset của từng dòng để có thể random access sau này
+    (thay vì lưu toàn bộ metadata vào RAM).
+    
+    offsets: xem iter_records. records: các record đã parse sẵn
+    (doc_id, line_no, byte_offset, doc) thay vì đọc jsonl_path.
+    
+    Yields:
+        batch: List of (doc_id, text, byte_offset) tuples
+    """
+    if records is None:
+        records = iter_records(jsonl_path, offsets)
+    batch = []
+    
+    for doc_id, _, byte_offset, doc in records:
+        # Tạo text tìm kiếm từ các trường đã segmented
+        text = document_fields(doc) if fields else document_text(doc)
+        
+        # Doc không có text vẫn giữ doc_id (không vào batch)
+        if not has_index_text(text):
+            continue
+        
+        batch.append((doc_id, text, byte_offset))
+        
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
     
     if batch:
         yield batch
@@ -141,17 +247,68 @@ def tokenize(text: str) -> List[str]:
     """
     tokens = text.split()
     # Lọc tokens quá ngắn hoặc chỉ chứa ký tự đặc biệt
-    result = []
-    for token in tokens:
-        # Bỏ qua tokens quá ngắn (1 ký tự) trừ khi là số
-        if len(token) <= 1 and not token.isdigit():
-            continue
-        # Bỏ qua tokens chỉ chứa ký tự đặc biệt
-        if all(c in '.,;:!?()-_/\\|@#$%^&*+=<>{}[]"\'~`' for c in token):
-            continue
-        result.append(token)
+    return [token for token in tokens if is_index_token(token)]
+
+
+def is_index_token(token: str) -> bool:
+    """Token có được index hay không."""
+    # Bỏ qua tokens quá ngắn (1 ký tự) trừ khi là số
+    if len(token) <= 1 and not token.isdigit():
+        return False
+    # Bỏ qua tokens chỉ chứa ký tự đặc biệt
+    if all(c in '.,;:!?()-_/\\|@#$%^&*+=<>{}[]"\'~`' for c in token):
+        return False
+    return True
+
+
+def tokenize_with_positions(text: str) -> Tuple[List[str], List[int]]:
+    """
+    Như tokenize(), kèm vị trí của từng token (cho index vị trí).
     
-    return result
+    Vị trí chỉ đếm các token được index; tại FIELD_SEPARATOR vị trí nhảy
+    POSITION_GAP để cụm từ không nối cuối trường này với đầu trường sau.
+    """
+    tokens = []
+    positions = []
+    position = 0
+    for token in text.split():
+        if token == FIELD_SEPARATOR:
+            position += POSITION_GAP
+        elif is_index_token(token):
+            tokens.append(token)
+            positions.append(position)
+            position += 1
+    return tokens, positions
+
+
+def tokenize_fields(field_texts: List[str], with_positions: bool = False
+                    ) -> Tuple[List[str], List[int], Optional[List[int]], List[int]]:
+    """
+    Tokenize từng trường của document.
+    
+    Vị trí (nếu with_positions) nối tiếp qua các trường, mỗi trường mới
+    nhảy POSITION_GAP vị trí như tại FIELD_SEPARATOR.
+    
+    Returns:
+        tokens, token_fields (chỉ số trường của từng token),
+        token_positions (None nếu không yêu cầu), field_lengths
+    """
+    tokens = []
+    token_fields = []
+    token_positions = [] if with_positions else None
+    field_lengths = []
+    position = 0
+    for field, text in enumerate(field_texts):
+        field_tokens = tokenize(text)
+        tokens.extend(field_tokens)
+        token_fields.extend([field] * len(field_tokens))
+        field_lengths.append(len(field_tokens))
+        if with_positions:
+            if field_tokens and token_positions:
+                position += POSITION_GAP
+            token_positions.extend(range(position, position + len(field_tokens)))
+            position += len(field_tokens)
+    return tokens, token_fields, token_positions, field_lengths
 
 
 # ============================================================================
@@ -185,13 +342,144 @@ def spimi_invert(token_stream: List[Tuple[str, int]]) -> Dict[str, List[int]]:
     return result
 
 
+class BlockInverter:
+    """
+    Dictionary SPIMI của 1 block, thêm trực tiếp từng document.
+    
+    Mỗi term giữ 1 array('i') phẳng [doc_id, tf, doc_id, tf, ...] thay cho
+    defaultdict lồng nhau (mỗi posting ~8 bytes thay vì ~100+ bytes
+    Python objects), và theo dõi kích thước ước lượng để quyết định flush.
+    
+    positions=True: giữ thêm 1 array('i') vị trí phẳng mỗi term
+    (tf vị trí của từng doc, theo thứ tự postings).
+    
+    num_fields > 0 (index theo trường): mỗi posting là
+    [doc_id, tf_0, ..., tf_{num_fields-1}] (tf của term trong từng trường).
+    """
+    
+    def __init__(self, positions: bool = False, num_fields: int = 0):
+        self.postings: Dict[str, array] = {}
+        self.positions: Optional[Dict[str, array]] = {} if positions else None
+        self.num_fields = num_fields
+        self.estimated_bytes = 0
+        self.num_postings = 0
+    
+    def add_document(self, doc_id: int, tokens: List[str],
+                     token_positions: Optional[List[int]] = None,
+                     token_fields: Optional[List[int]] = None):
+        """
+        Thêm 1 document. doc_id phải tăng dần trong 1 block.
+        token_positions (từ tokenize_with_positions) bắt buộc khi positions=True;
+        token_fields (từ tokenize_fields) bắt buộc khi num_fields > 0.
+        """
+        if self.num_fields:
+            self._add_fields(doc_id, tokens, token_fields, token_positions)
+            return
+        if self.positions is not None:
+            self._add_positional(doc_id, tokens, token_positions)
+            return
+        postings = self.postings
+        for term, tf in Counter(tokens).items():
+            plist = postings.get(term)
+            if plist is None:
+                plist = postings[term] = array("i")
+                self.estimated_bytes += sys.getsizeof(term) + TERM_OVERHEAD_BYTES
+            plist.append(doc_id)
+            plist.append(tf)
+            self.num_postings += 1
+            self.estimated_bytes += POSTING_BYTES
+    
+    def _add_positional(self, doc_id: int, tokens: List[str], token_positions: List[int]):
+        if token_positions is None or len(token_positions) != len(tokens):
+            raise ValueError("token_positions must match tokens for a positional inverter")
+        doc_positions = defaultdict(list)
+        for term, position in zip(tokens, token_positions):
+            doc_positions[term].append(position)
+        
+        postings = self.postings
+        for term, term_positions in doc_positions.items():
+            plist = postings.get(term)
+            if plist is None:
+                plist = postings[term] = array("i")
+                self.positions[term] = array("i")
+                self.estimated_bytes += sys.getsizeof(term) + TERM_OVERHEAD_BYTES + 64
+            plist.append(doc_id)
+            plist.append(len(term_positions))
+            self.positions[term].extend(term_positions)
+            self.num_postings += 1
+            self.estimated_bytes += POSTING_BYTES + POSITION_BYTES * len(term_positions)
+    
+    def _add_fields(self, doc_id: int, tokens: List[str], token_fields: List[int],
+                    token_positions: Optional[List[int]]):
+        if token_fields is None or len(token_fields) != len(tokens):
+            raise ValueError("token_fields must match tokens for a field inverter")
+        positional = self.positions is not None
+        if positional and (token_positions is None or len(token_positions) != len(tokens)):
+            raise ValueError("token_positions must match tokens for a positional inverter")
+        
+        doc_tfs: Dict[str, List[int]] = {}
+        doc_positions = defaultdict(list)
+        for i, (term, field) in enumerate(zip(tokens, token_fields)):
+            tfs = doc_tfs.get(term)
+            if tfs is None:
+                tfs = doc_tfs[term] = [0] * self.num_fields
+            tfs[field] += 1
+            if positional:
+                doc_positions[term].append(token_positions[i])
+        
+        postings = self.postings
+        posting_bytes = INT_BYTES * (1 + self.num_fields)
+        for term, tfs in doc_tfs.items():
+            plist = postings.get(term)
+            if plist is None:
+                plist = postings[term] = array("i")
+                self.estimated_bytes += sys.getsizeof(term) + TERM_OVERHEAD_BYTES
+                if positional:
+                    self.positions[term] = array("i")
+                    self.estimated_bytes += 64
+            plist.append(doc_id)
+            plist.extend(tfs)
+            self.num_postings += 1
+            self.estimated_bytes += posting_bytes
+            if positional:
+                self.positions[term].extend(doc_positions[term])
+                self.estimated_bytes += POSITION_BYTES * len(doc_positions[term])
+    
+    def __len__(self):
+        return len(self.postings)
+    
+    def records(self) -> Generator:
+        """
+        Yields (term, doc_ids, tfs, positions) theo thứ tự alphabet của term
+        (tfs là ma trận n x num_fields với index theo trường).
+        """
+        stride = 1 + self.num_fields if self.num_fields else 2
+        for term in sorted(self.postings):
+            rows = np.frombuffer(self.postings[term], dtype=np.int32).reshape(-1, stride)
+            positions = None
+            if self.positions is not None:
+                positions = np.frombuffer(self.positions[term], dtype=np.int32)
+            tfs = rows[:, 1:] if self.num_fields else rows[:, 1]
+            yield term, rows[:, 0], tfs, positions
+    
+    def write(self, block_path: str) -> str:
+        """Ghi dictionary ra block file (terms theo thứ tự alphabet)."""
+        with BlockWriter(block_path, positions=self.positions is not None,
+                         num_fields=self.num_fields) as writer:
+            for term, doc_ids, tfs, positions in self.records():
+                writer.add(term, doc_ids, tfs, positions)
+        return block_path
+
+
 def write_block_to_disk(block_index: Dict[str, List[Tuple[int, int]]], 
                          block_num: int, 
                          blocks_dir: str) -> str:
     """
     Ghi một block index xuống đĩa.
     
-    Format: Mỗi block file là một pickle chứa dictionary đã sắp xếp terms.
+    Format: File block tuần tự (xem block_format.py) - mỗi record gồm term
+    và postings nén, có tiền tố độ dài, để merging.py đọc streaming
+    term-by-term thay vì load cả block vào RAM.
     Terms được sắp xếp theo thứ tự alphabet để hỗ trợ merge nhanh.
     
     Args:
@@ -203,114 +491,245 @@ def write_block_to_disk(block_index: Dict[str, List[Tuple[int, int]]],
         block_path: Đường dẫn file block đã ghi
     """
     os.makedirs(blocks_dir, exist_ok=True)
-    block_path = os.path.join(blocks_dir, f"block_{block_num:04d}.pkl")
+    block_path = os.path.join(blocks_dir, f"block_{block_num:04d}{BLOCK_EXT}")
+    
+    # write_block ghi các terms theo thứ tự alphabet
+    return write_block(block_index, block_path)
+
+
+def invert_batch(batch: List[Tuple[int, str, int]],
+                 block_num: int,
+                 blocks_dir: str,
+                 memory_budget: int = DEFAULT_MEMORY_BUDGET_MB * 1024 * 1024,
+                 positions: bool = False,
+                 fields: bool = False
+                 ) -> Tuple[List[dict], List]:
+    """
+    Xử lý trọn vẹn 1 batch: tokenize -> SPIMI-Invert từng doc -> ghi block.
+    
+    Khi dictionary vượt memory_budget (bytes, ước lượng), block hiện tại
+    được flush ngay và 1 dictionary mới bắt đầu -> 1 batch có thể sinh
+    nhiều block: block_XXXX.blk, block_XXXX_001.blk, ... (thứ tự tên file
+    vẫn là thứ tự doc_id).
+    
+    Hàm ở top-level để chạy được trong worker process (ProcessPoolExecutor
+    trên Windows dùng spawn, cần pickle được hàm).
+    
+    Args:
+        batch: List of (doc_id, text, byte_offset) - doc_id đã là ID toàn cục
+               (text là list text từng trường nếu fields)
+        block_num: Số thứ tự batch (quyết định tên file, giữ thứ tự doc_id)
+        blocks_dir: Thư mục lưu blocks
+        memory_budget: Ngân sách RAM (bytes) cho dictionary của 1 block
+        positions: Ghi kèm index vị trí (phrase / proximity queries)
+        fields: Index theo trường (tf + độ dài từng trường, cho BM25F)
+    
+    Returns:
+        blocks: Thống kê từng block đã ghi (path, docs, vocab, postings,
+                estimated_mb, rss_mb = RSS lúc flush, dictionary còn trong RAM)
+        doc_lengths: Số terms của từng doc, cùng thứ tự với batch
+                     (fields: list độ dài từng trường)
+    """
+    os.makedirs(blocks_dir, exist_ok=True)
+    blocks = []
+    doc_lengths = []
+    num_fields = len(INDEX_FIELDS) if fields else 0
+    inverter = BlockInverter(positions, num_fields)
+    block_docs = 0
+    
+    def flush():
+        nonlocal inverter, block_docs
+        suffix = f"_{len(blocks):03d}" if blocks else ""
+        block_path = os.path.join(blocks_dir, f"block_{block_num:04d}{suffix}{BLOCK_EXT}")
+        inverter.write(block_path)
+        blocks.append({
+            "path": block_path,
+            "docs": block_docs,
+            "vocab": len(inverter),
+            "postings": inverter.num_postings,
+            "estimated_mb": inverter.estimated_bytes / (1024 * 1024),
+            "rss_mb": current_rss_mb(),  # ru_maxrss chỉ tăng: không phản ánh từng block
+        })
+        # Giải phóng RAM
+        inverter = BlockInverter(positions, num_fields)
+        block_docs = 0
+        gc.collect()
     
-    # Sắp xếp terms theo alphabet
-    sorted_index = dict(sorted(block_index.items()))
+    for doc_id, text, _ in batch:
+        if fields:
+            tokens, token_fields, token_positions, field_lengths = tokenize_fields(text, positions)
+            doc_lengths.append(field_lengths)
+            inverter.add_document(doc_id, tokens, token_positions, token_fields)
+        else:
+            if positions:
+                tokens, token_positions = tokenize_with_positions(text)
+            else:
+                tokens, token_positions = tokenize(text), None
+            doc_lengths.append(len(tokens))
+            inverter.add_document(doc_id, tokens, token_positions)
+        block_docs += 1
+        
+        if inverter.estimated_bytes >= memory_budget:
+            flush()
     
-    with open(block_path, "wb") as f:
-        pickle.dump(sorted_index, f, protocol=pickle.HIGHEST_PROTOCOL)
+    if block_docs > 0:
+        flush()
     
-    return block_path
+    return blocks, doc_lengths
 
 
 def build_spimi_index(jsonl_path: str, 
                        blocks_dir: str = DEFAULT_BLOCKS_DIR,
-                       block_size: int = BLOCK_SIZE) -> Tuple[List[str], int, Dict]:
+                       block_size: int = BLOCK_SIZE,
+                       workers: int = 1,
+                       memory_budget_mb: float = DEFAULT_MEMORY_BUDGET_MB,
+                       positions: bool = False,
+                       fields: bool = True,
+                       reorder: bool = False,
+                       offsets: Optional[np.ndarray] = None,
+                       records: Optional[Iterable] = None
+                       ) -> Tuple[List[str], int, DocStoreWriter]:
     """
     Giai đoạn 1: Chia documents thành blocks và tạo partial inverted index.
     
     Quy trình:
     1. Đọc documents theo batch (block_size docs mỗi batch)
-    2. Với mỗi batch: tokenize -> tạo token stream -> SPIMI-Invert -> ghi disk
+    2. Với mỗi batch: tokenize -> SPIMI-Invert từng doc -> ghi disk mỗi khi
+       dictionary chạm memory budget (và khi hết batch)
     3. Giải phóng RAM sau mỗi block (gc.collect())
-    4. Lưu doc_offsets (doc_id -> byte_offset) thay vì metadata (tiết kiệm RAM)
+    4. Lưu doc_offsets (doc_id -> byte_offset) thay vì metadata (tiết kiệm RAM),
+       cùng doc_lengths + doc_norms dưới dạng mảng NumPy (xem doc_store.py)
+    
+    Chế độ song song (workers > 1): process chính chỉ đọc JSONL và gán doc_id
+    (toàn cục, tăng dần), mỗi batch được giao cho 1 worker process để
+    tokenize + invert + ghi block riêng. Số batch đang xử lý được giới hạn
+    ở 2 x workers để RAM không tăng theo kích thước corpus.
     
     Args:
         jsonl_path: Đường dẫn đến file JSONL
         blocks_dir: Thư mục lưu block files
-        block_size: Số documents mỗi block
+        block_size: Số documents tối đa mỗi batch
+        workers: Số worker processes (1 = chạy tuần tự như cũ)
+        memory_budget_mb: Ngân sách RAM cho dictionary của 1 block (MB)
+        positions: Build kèm index vị trí (merging.py ghi ra positions.bin)
+        fields: Index theo trường (mặc định, cho BM25F). False = 1 text
+                gộp với tên / ngành nghề lặp 2 lần như index cũ
+        reorder: Cấp lại doc_id theo tỉnh -> ngành chính -> tên (doc_reorder.py)
+                 thay vì thứ tự dòng trong JSONL
+        offsets: Chỉ index các dòng có byte offset này, doc_id = vị trí trong
+                 mảng (vd. 1 shard theo khoảng doc_id, xem shards.py)
+        records: Record đã parse sẵn (doc_id, line_no, byte_offset, doc) thay
+                 vì đọc jsonl_path (ingest.py dùng chung 1 lượt đọc)
     
     Returns:
         block_files: Danh sách đường dẫn các block files
         total_docs: Tổng số documents đã index
-        doc_lengths: Dict mapping doc_id -> document length (số terms)
+        doc_store: DocStoreWriter chứa doc_lengths / doc_offsets theo doc_id
     """
+    if reorder and (offsets is not None or records is not None):
+        raise ValueError("reorder cannot be combined with offsets or records")
+    
     print("=" * 70)
     print("  SPIMI INDEXING - Phase 1: Building Block Indexes")
+    print(f"  Workers: {workers} | Memory budget: {memory_budget_mb:,.0f} MB/block"
+          f"{' | Positions: on' if positions else ''}"
+          f"{' | Fields: ' + ', '.join(FIELD_NAMES) if fields else ''}"
+          f"{' | Reorder: on' if reorder else ''}")
     print("=" * 70)
     
     block_files = []
-    block_num = 0
     total_docs = 0
-    doc_lengths = {}      # doc_id -> số lượng terms trong document
-    doc_offsets = {}       # doc_id -> byte offset trong file JSONL
+    # doc_id -> (số terms, byte offset trong JSONL[, số terms từng trường])
+    doc_store = DocStoreWriter(FIELD_NAMES if fields else None)
+    
+    memory_budget = int(memory_budget_mb * 1024 * 1024)
     
     start_time = time.time()
     
-    for batch in read_documents(jsonl_path, batch_size=block_size):
-        block_start = time.time()
+    def collect(block_num, batch, result, block_time):
+        """Ghi nhận kết quả 1 batch (luôn theo đúng thứ tự block_num)."""
+        nonlocal total_docs
+        blocks, doc_lengths = result
+        for (doc_id, _, byte_offset), length in zip(batch, doc_lengths):
+            if fields:
+                doc_store.add(doc_id, sum(length), byte_offset, length)
+            else:
+                doc_store.add(doc_id, length, byte_offset)  # 12 bytes/doc
+        total_docs += len(batch)
         
-        # Tạo token stream cho block này
-        token_stream = []
-        for doc_id, text, byte_offset in batch:
-            tokens = tokenize(text)
-            doc_lengths[doc_id] = len(tokens)
-            doc_offsets[doc_id] = byte_offset  # Chỉ lưu byte offset (8 bytes/doc)
-            
-            for token in tokens:
-                token_stream.append((token, doc_id))
-            
-            total_docs += 1
-        
-        # SPIMI-Invert
-        block_index = spimi_invert(token_stream)
-        
-        # Ghi block xuống đĩa
-        block_path = write_block_to_disk(block_index, block_num, blocks_dir)
-        block_files.append(block_path)
-        
-        block_time = time.time() - block_start
-        vocab_size = len(block_index)
-        
-        print(f"  Block {block_num:4d} | "
+        elapsed = time.time() - start_time
+        for block in blocks:
+            block_files.append(block["path"])
+            rss = block["rss_mb"]
+            rss_str = f"{rss:.0f} MB" if rss is not None else "n/a"
+            print(f"  Block {os.path.basename(block['path']):<18} | "
+                  f"Docs: {block['docs']:>7,d} | "
+                  f"Vocab: {block['vocab']:>8,d} | "
+                  f"Dict: {block['estimated_mb']:>6.1f} MB | "
+                  f"RSS at flush: {rss_str}")
+        print(f"  Batch {block_num:4d} | "
               f"Docs: {total_docs:>10,d} | "
-              f"Vocab: {vocab_size:>8,d} | "
-              f"Time: {block_time:.1f}s")
-        
-        # Giải phóng RAM
-        del token_stream
-        del block_index
-        gc.collect()
+              f"Time: {block_time:.1f}s | "
+              f"{total_docs / max(elapsed, 1e-9):,.0f} docs/sec")
+    
+    index_dir = os.path.dirname(blocks_dir)
+    if reorder:
+        # Pass 0: khoá sắp xếp của mọi doc -> doc_id mới (+ doc_order.npy)
+        make_text = document_fields if fields else document_text
+        lines, offsets = compute_doc_order(
+            jsonl_path, has_text=lambda doc: has_index_text(make_text(doc)))
+        save_doc_order(index_dir, lines)
+        print(f"  Reordered {len(lines):,d} docs by province / industry / name "
+              f"({time.time() - start_time:.1f}s)")
+    else:
+        remove_doc_order(index_dir)
+    
+    batches = read_documents(jsonl_path, batch_size=block_size, fields=fields, offsets=offsets,
+                             records=records)
+    
+    if workers <= 1:
+        for block_num, batch in enumerate(batches):
+            block_start = time.time()
+            result = invert_batch(batch, block_num, blocks_dir, memory_budget, positions, fields)
+            collect(block_num, batch, result, time.time() - block_start)
+    else:
+        # Giới hạn số batch đang "bay" để RAM của process chính có chặn trên
+        max_in_flight = workers * 2
+        pending = deque()  # (block_num, batch, future, submit_time) theo thứ tự submit
         
-        block_num += 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for block_num, batch in enumerate(batches):
+                future = pool.submit(invert_batch, batch, block_num, blocks_dir,
+                                     memory_budget, positions, fields)
+                pending.append((block_num, batch, future, time.time()))
+                
+                while len(pending) >= max_in_flight:
+                    num, done_batch, done_future, submitted = pending.popleft()
+                    collect(num, done_batch, done_future.result(), time.time() - submitted)
+            
+            while pending:
+                num, done_batch, done_future, submitted = pending.popleft()
+                collect(num, done_batch, done_future.result(), time.time() - submitted)
     
     elapsed = time.time() - start_time
     
     print("-" * 70)
     print(f"  Phase 1 Complete!")
     print(f"  Total documents: {total_docs:,d}")
-    print(f"  Total blocks: {block_num}")
-    print(f"  Time: {elapsed:.1f}s ({total_docs / elapsed:.0f} docs/sec)")
+    print(f"  Total blocks: {len(block_files)}")
+    print(f"  Time: {elapsed:.1f}s ({total_docs / max(elapsed, 1e-9):.0f} docs/sec, {workers} workers)")
     print("=" * 70)
     
-    index_dir = os.path.dirname(blocks_dir)
-    
-    # Lưu document offsets (nhỏ gọn: chỉ dict[int, int])
-    offsets_path = os.path.join(index_dir, "doc_offsets.pkl")
-    with open(offsets_path, "wb") as f:
-        pickle.dump(doc_offsets, f, protocol=pickle.HIGHEST_PROTOCOL)
-    offsets_size = os.path.getsize(offsets_path) / (1024 * 1024)
-    print(f"  Saved doc offsets: {offsets_path} ({offsets_size:.1f} MB)")
+    if offsets is not None:
+        # Doc không có text (xếp cuối / cuối shard) vẫn giữ doc_id (khớp doc_order.npy)
+        doc_store.reserve(len(offsets))
     
-    # Lưu document lengths
-    lengths_path = os.path.join(index_dir, "doc_lengths.pkl")
-    with open(lengths_path, "wb") as f:
-        pickle.dump(doc_lengths, f, protocol=pickle.HIGHEST_PROTOCOL)
-    lengths_size = os.path.getsize(lengths_path) / (1024 * 1024)
-    print(f"  Saved doc lengths: {lengths_path} ({lengths_size:.1f} MB)")
+    # Lưu doc store dạng mảng: doc_lengths.npy, doc_offsets.npy, doc_norms.npy
+    meta = doc_store.save(index_dir)
+    print(f"  Saved doc store: {len(doc_store):,d} slots "
+          f"({meta['indexed_docs']:,d} indexed, avgdl={meta['avg_doc_length']:.1f})")
     
-    return block_files, total_docs, doc_lengths
+    return block_files, total_docs, doc_store
 
 
 # ============================================================================
@@ -318,6 +737,23 @@ def build_spimi_index(jsonl_path: str,
 # ============================================================================
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SPIMI Phase 1: build block indexes")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Số worker processes (mặc định: 1, tuần tự)")
+    parser.add_argument("--block-size", type=int, default=BLOCK_SIZE,
+                        help=f"Số documents tối đa mỗi batch (mặc định: {BLOCK_SIZE:,d})")
+    parser.add_argument("--memory-budget-mb", type=float, default=DEFAULT_MEMORY_BUDGET_MB,
+                        help=f"Ngân sách RAM cho dictionary mỗi block, MB "
+                             f"(mặc định: {DEFAULT_MEMORY_BUDGET_MB})")
+    parser.add_argument("--positions", action="store_true",
+                        help="Build kèm index vị trí (phrase / proximity queries)")
+    parser.add_argument("--no-fields", action="store_true",
+                        help="Index 1 text gộp (tên / ngành nghề lặp 2 lần) thay vì theo trường")
+    parser.add_argument("--reorder", action="store_true",
+                        help="Cấp lại doc_id theo tỉnh -> ngành chính -> tên "
+                             "(postings nhỏ hơn, truy cập tuần tự hơn)")
+    args = parser.parse_args()
+    
     # Đường dẫn mặc định
     data_dir = os.path.join(os.path.dirname(__file__), "..", "..", "data")
     jsonl_path = os.path.join(data_dir, "milestone1_fixed.jsonl")
@@ -330,11 +766,14 @@ if __name__ == "__main__":
     
     print(f"\nData file: {jsonl_path}")
     print(f"Index directory: {index_dir}")
-    print(f"Block size: {BLOCK_SIZE:,d} documents\n")
+    print(f"Block size: {args.block_size:,d} documents, "
+          f"memory budget: {args.memory_budget_mb:,.0f} MB\n")
     
     # Phase 1: Build blocks
-    block_files, total_docs, doc_lengths = build_spimi_index(
-        jsonl_path, blocks_dir, BLOCK_SIZE
+    block_files, total_docs, doc_store = build_spimi_index(
+        jsonl_path, blocks_dir, args.block_size, workers=args.workers,
+        memory_budget_mb=args.memory_budget_mb, positions=args.positions,
+        fields=not args.no_fields, reorder=args.reorder,
     )
     
     print(f"\n✓ Phase 1 done. Run merging.py next to merge blocks.")
@@ -0,0 +1,392 @@
+"""
+Prefix Autocomplete Index
+=========================
+Milestone 2 - SEG301: Search Engines & Information Retrieval
+
+Gợi ý khi đang gõ (search-as-you-type) không thể gọi /api/search cho mỗi
+phím bấm. Index phụ này trả lời "top-N hoàn thành của tiền tố p" bằng 1
+lần binary search + tối đa 1 lát cắt nhỏ:
+
+  - Mỗi nguồn (kind) là 1 mảng key đã sắp xếp (dạng bỏ dấu, chữ thường, chỉ
+    chữ / số / khoảng trắng) -> các key cùng tiền tố p nằm liền nhau
+    [lo, hi) (MmapTermDict.lower_bound)
+  - hi - lo <= SUGGEST_SCAN_LIMIT: chọn top-N trực tiếp trên lát trọng số
+  - Lớn hơn: [lo, hi) luôn là 1 "nút" của trie nén (khoảng LCP giữa các key
+    kề nhau) -> top-N của mọi nút lớn được tính sẵn lúc build
+
+2 nguồn:
+    terms   Term của term_dict (df >= SUGGEST_MIN_DF), trọng số = df;
+            các term cùng dạng bỏ dấu gộp lại, hiển thị term df lớn nhất
+    names   Tên công ty đã tách từ (company_name_seg trong JSONL), key bỏ
+            loại hình doanh nghiệp ở đầu ("công ty tnhh", "cổ phần", ...)
+            để gõ "vinam" ra "CÔNG TY CỔ PHẦN SỮA VIỆT NAM (VINAMILK)"...;
+            trọng số = số doanh nghiệp cùng key
+
+File mỗi nguồn (cạnh term_dict.bin):
+    suggest_<kind>.bin        Cùng định dạng term_dict.bin (mmap_term_dict.py),
+                              key = key gợi ý; record (offset, df, length) =
+                              (vị trí text hiển thị, trọng số, số byte)
+    suggest_<kind>_text.bin   Text hiển thị (UTF-8 nối liền)
+    suggest_<kind>_nodes.npy  int64[nút, 1 + top_n]: lo * (số key + 1) + hi
+                              (tăng dần), rồi ordinal top-N (-1 = trống)
+    suggest_<kind>.json       Số key, số nút, top_n, scan_limit
+
+Terms được tính lại mỗi lần merge / compaction; names chỉ khi có JSONL
+(merging.py truyền file dữ liệu, hoặc CLI bên dưới).
+
+Build: python src/indexer/suggest.py [index_dir] [--jsonl data/milestone1_fixed.jsonl]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Thêm project root vào path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.indexer.mmap_term_dict import MmapTermDict, TermDictWriter, TERM_DICT_FILENAME
+from src.indexer.folded_terms import fold_accents
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+SUGGEST_KINDS = ("terms", "names")
+
+# Số gợi ý tính sẵn cho mỗi nút (= số gợi ý tối đa mỗi nguồn)
+SUGGEST_TOP_N = 10
+# Khoảng key nhỏ hơn được chọn top-N trực tiếp (không cần nút tính sẵn)
+SUGGEST_SCAN_LIMIT = 512
+# Term xuất hiện ít hơn SUGGEST_MIN_DF docs không được gợi ý
+SUGGEST_MIN_DF = 2
+# Số âm tiết cuối của truy vấn được thử hoàn thành thành term
+MAX_SUGGEST_SYLLABLES = 3
+# Key tên công ty ngắn hơn không được tra (khớp quá nhiều)
+MIN_NAME_PREFIX = 2
+
+# Loại hình doanh nghiệp (dạng key) bị bỏ ở đầu tên
+LEGAL_FORMS = (
+    "cong ty", "chi nhanh", "van phong dai dien", "doanh nghiep tu nhan", "dntn",
+    "hop tac xa", "htx", "tnhh", "trach nhiem huu han", "co phan", "cp",
+    "mot thanh vien", "mtv", "hai thanh vien tro len", "2 thanh vien tro len",
+)
+
+_NON_WORD = re.compile(r"[\W_]+")
+_LEGAL_PREFIX = re.compile(r"^(?:(?:%s)(?: |$))+" % "|".join(
+    re.escape(form) for form in sorted(LEGAL_FORMS, key=len, reverse=True)))
+# Code point lớn nhất: p + _MAX_CHAR lớn hơn mọi key bắt đầu bằng p
+_MAX_CHAR = "\U0010ffff"
+
+
+def suggest_key(text: str) -> str:
+    """Key gợi ý: "Xây_Dựng (Hà-Nội)" -> "xay dung ha noi"."""
+    return _NON_WORD.sub(" ", fold_accents(text.lower())).strip()
+
+
+def name_key(text: str) -> str:
+    """Key tên công ty: bỏ loại hình ở đầu ("công ty tnhh abc" -> "abc")."""
+    return _LEGAL_PREFIX.sub("", suggest_key(text))
+
+
+def has_suggest_index(index_dir: str, kind: str = "terms") -> bool:
+    """Index có gợi ý tiền tố cho nguồn kind hay không."""
+    return os.path.exists(_path(index_dir, kind, ".json"))
+
+
+def load_suggest_meta(index_dir: str, kind: str = "terms") -> dict:
+    with open(_path(index_dir, kind, ".json"), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _path(index_dir: str, kind: str, suffix: str) -> str:
+    return os.path.join(index_dir, f"suggest_{kind}{suffix}")
+
+
+# ============================================================================
+# BUILD
+# ============================================================================
+
+def _common_prefix_len(a: str, b: str) -> int:
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def _priorities(weights: np.ndarray, ordinals: np.ndarray) -> np.ndarray:
+    """Trọng số lớn trước, hoà: key nhỏ (ordinal) trước - duy nhất cho mỗi key."""
+    return (np.minimum(weights.astype(np.int64), 2 ** 31 - 1) << 32) | (0xFFFFFFFF - ordinals)
+
+
+def _top_ordinals(priority: np.ndarray, lo: int, top_n: int) -> np.ndarray:
+    """Ordinal top_n của 1 lát priority (bắt đầu tại ordinal lo), thứ tự giảm dần."""
+    if len(priority) > top_n:
+        part = np.argpartition(-priority, top_n - 1)[:top_n]
+    else:
+        part = np.arange(len(priority))
+    return part[np.argsort(-priority[part])] + lo
+
+
+def prefix_nodes(keys: List[str], scan_limit: int) -> List[Tuple[int, int]]:
+    """
+    Các khoảng [lo, hi) > scan_limit key có cùng tiền tố chung dài nhất
+    (khoảng LCP, duyệt bottom-up bằng stack); khoảng của mọi tiền tố có >= 2
+    key đều nằm trong danh sách này. Bỏ nút gốc (tiền tố rỗng).
+    """
+    nodes = []
+    stack = [(0, 0)]  # (độ dài tiền tố chung, lo)
+    prev = keys[0] if keys else ""
+    for i in range(1, len(keys) + 1):
+        if i < len(keys):
+            key = keys[i]
+            lcp = _common_prefix_len(prev, key)
+            prev = key
+        else:
+            lcp = 0
+        lo = i - 1
+        while lcp < stack[-1][0]:
+            _, lo = stack.pop()
+            if i - lo > scan_limit:
+                nodes.append((lo, i))
+        if lcp > stack[-1][0]:
+            stack.append((lcp, lo))
+    return nodes
+
+
+def write_prefix_index(index_dir: str, kind: str, entries: Dict[str, Tuple[int, str]],
+                       top_n: int = SUGGEST_TOP_N, scan_limit: int = SUGGEST_SCAN_LIMIT,
+                       **extra_meta) -> dict:
+    """
+    Ghi index gợi ý của 1 nguồn.
+
+    Args:
+        entries: key gợi ý -> (trọng số, text hiển thị)
+
+    Returns:
+        meta (cũng được ghi ra suggest_<kind>.json)
+    """
+    keys = sorted(entries)  # thứ tự str = thứ tự byte UTF-8 (yêu cầu của TermDictWriter)
+    weights = np.fromiter((entries[key][0] for key in keys), dtype=np.int64, count=len(keys))
+
+    text_path = _path(index_dir, kind, "_text.bin")
+    with TermDictWriter(_path(index_dir, kind, ".bin")) as writer, \
+            open(text_path + ".tmp", "wb") as text_file:
+        offset = 0
+        for key, weight in zip(keys, weights.tolist()):
+            encoded = entries[key][1].encode("utf-8")
+            writer.add(key, min(weight, 2 ** 32 - 1), offset, len(encoded))
+            text_file.write(encoded)
+            offset += len(encoded)
+    os.replace(text_path + ".tmp", text_path)
+
+    priority = _priorities(weights, np.arange(len(keys), dtype=np.int64))
+    nodes = prefix_nodes(keys, scan_limit)
+    table = np.full((len(nodes), 1 + top_n), -1, dtype=np.int64)
+    for row, (lo, hi) in enumerate(sorted(nodes)):
+        top = _top_ordinals(priority[lo:hi], lo, top_n)
+        table[row, 0] = lo * (len(keys) + 1) + hi
+        table[row, 1:1 + len(top)] = top
+    nodes_path = _path(index_dir, kind, "_nodes.npy")
+    np.save(nodes_path + ".tmp.npy", table)
+    os.replace(nodes_path + ".tmp.npy", nodes_path)
+
+    meta = {"kind": kind, "num_keys": len(keys), "num_nodes": len(nodes), "top_n": top_n,
+            "scan_limit": scan_limit, **extra_meta}
+    # Ghi meta sau cùng: searcher chỉ mở index gợi ý khi meta tồn tại
+    with open(_path(index_dir, kind, ".json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def write_suggest_terms(index_dir: str, min_df: int = SUGGEST_MIN_DF) -> dict:
+    """Gợi ý term từ term_dict.bin của index (trọng số = df)."""
+    groups = {}  # key -> [tổng df, df lớn nhất, term hiển thị]
+    term_dict = MmapTermDict(os.path.join(index_dir, TERM_DICT_FILENAME))
+    try:
+        dfs = term_dict.records["df"]
+        for ordinal, term in enumerate(term_dict):
+            df = int(dfs[ordinal])
+            key = suggest_key(term)
+            if df < min_df or len(key) < 2 or key.isdigit():
+                continue
+            group = groups.get(key)
+            if group is None:
+                groups[key] = [df, df, term]
+            else:
+                group[0] += df
+                if df > group[1]:
+                    group[1], group[2] = df, term
+    finally:
+        term_dict.close()
+    entries = {key: (total, term.replace("_", " ")) for key, (total, _, term) in groups.items()}
+    return write_prefix_index(index_dir, "terms", entries, min_df=min_df)
+
+
+class NameSuggestions:
+    """
+    Gom gợi ý tên công ty từng document (company_name_seg, fallback
+    company_name). Trọng số = số doanh nghiệp cùng key; hiển thị tên gặp
+    đầu tiên. ingest.py gọi add() trong lượt đọc JSONL chung.
+    """
+
+    def __init__(self):
+        self.entries = {}  # key -> (trọng số, text hiển thị)
+
+    def add(self, doc: dict):
+        display = (doc.get("company_name") or "").strip()
+        key = name_key(doc.get("company_name_seg") or display)
+        if not display or len(key) < MIN_NAME_PREFIX:
+            return
+        weight, first = self.entries.get(key, (0, display))
+        self.entries[key] = (weight + 1, first)
+
+    def write(self, index_dir: str) -> dict:
+        return write_prefix_index(index_dir, "names", self.entries)
+
+
+def write_suggest_names(index_dir: str, jsonl_path: str) -> dict:
+    """Gợi ý tên công ty từ file JSONL (xem NameSuggestions)."""
+    names = NameSuggestions()
+    with open(jsonl_path, "rb") as f:
+        for raw_line in f:
+            line = raw_line.decode("utf-8", errors="ignore").strip()
+            if not line:
+                continue
+            try:
+                doc = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            names.add(doc)
+    return names.write(index_dir)
+
+
+# ============================================================================
+# READER
+# ============================================================================
+
+class PrefixIndex:
+    """Top-N hoàn thành theo tiền tố của 1 nguồn gợi ý (mmap)."""
+
+    def __init__(self, index_dir: str, kind: str):
+        self.meta = load_suggest_meta(index_dir, kind)
+        self.keys = MmapTermDict(_path(index_dir, kind, ".bin"))
+        self.nodes = np.load(_path(index_dir, kind, "_nodes.npy"), mmap_mode="r")
+        with open(_path(index_dir, kind, "_text.bin"), "rb") as f:
+            self.text = f.read()
+
+    def __len__(self) -> int:
+        return self.meta["num_keys"]
+
+    def _top(self, lo: int, hi: int, limit: int) -> np.ndarray:
+        if hi - lo > self.meta["scan_limit"]:
+            node_key = lo * (len(self.keys) + 1) + hi
+            row = int(np.searchsorted(self.nodes[:, 0], node_key))
+            if row < len(self.nodes) and self.nodes[row, 0] == node_key:
+                top = np.asarray(self.nodes[row, 1:1 + limit])
+                return top[top >= 0]
+        weights = self.keys.records["df"][lo:hi]
+        return _top_ordinals(_priorities(weights, np.arange(lo, hi, dtype=np.int64)), lo, limit)
+
+    def complete(self, prefix: str, limit: int = SUGGEST_TOP_N) -> List[Tuple[str, int]]:
+        """
+        Các key bắt đầu bằng prefix (đã là key gợi ý, xem suggest_key).
+
+        Returns:
+            [(text hiển thị, trọng số)] theo trọng số giảm dần
+        """
+        if not prefix or limit <= 0:
+            return []
+        lo = self.keys.lower_bound(prefix)
+        hi = self.keys.lower_bound(prefix + _MAX_CHAR)
+        if lo >= hi:
+            return []
+        results = []
+        for ordinal in self._top(lo, hi, min(limit, self.meta["top_n"])).tolist():
+            weight, offset, length = self.keys.entry(ordinal)
+            results.append((self.text[offset:offset + length].decode("utf-8"), weight))
+        return results
+
+    def close(self):
+        self.keys.close()
+        self.nodes = None
+        self.text = b""
+
+
+class Suggester:
+    """Gợi ý khi gõ: hoàn thành term cuối truy vấn + tên công ty."""
+
+    def __init__(self, index_dir: str):
+        self.indexes = {kind: PrefixIndex(index_dir, kind) for kind in SUGGEST_KINDS
+                        if has_suggest_index(index_dir, kind)}
+
+    def __len__(self) -> int:
+        return sum(len(index) for index in self.indexes.values())
+
+    def complete_terms(self, text: str, limit: int = SUGGEST_TOP_N) -> List[str]:
+        """
+        Hoàn thành 1-MAX_SUGGEST_SYLLABLES âm tiết cuối thành term (cụm dài
+        nhất có kết quả), giữ nguyên phần đầu truy vấn:
+        "công ty xay d" -> ["công ty xây dựng", ...]
+        """
+        index = self.indexes.get("terms")
+        words = _NON_WORD.sub(" ", text.lower()).split()
+        if index is None or not words:
+            return []
+        trailing = " " if text[-1:].isspace() else ""
+        keys = suggest_key(text).split()
+        for n in range(min(MAX_SUGGEST_SYLLABLES, len(words), len(keys)), 0, -1):
+            matches = index.complete(" ".join(keys[-n:]) + trailing, limit)
+            if matches:
+                head = " ".join(words[:-n])
+                return [f"{head} {display}" if head else display for display, _ in matches]
+        return []
+
+    def complete_names(self, text: str, limit: int = SUGGEST_TOP_N) -> List[str]:
+        """Tên công ty có phần tên riêng bắt đầu bằng text (bỏ loại hình ở đầu)."""
+        index = self.indexes.get("names")
+        key = name_key(text)
+        if index is None or len(key) < MIN_NAME_PREFIX:
+            return []
+        if text[-1:].isspace():
+            key += " "
+        return [display for display, _ in index.complete(key, limit)]
+
+    def suggest(self, text: str, limit: int = SUGGEST_TOP_N) -> Dict[str, List[str]]:
+        return {"terms": self.complete_terms(text, limit), "companies": self.complete_names(text, limit)}
+
+    def close(self):
+        for index in self.indexes.values():
+            index.close()
+        self.indexes = {}
+
+
+# ============================================================================
+# ENTRY POINT
+# ============================================================================
+
+if __name__ == "__main__":
+    import argparse
+    from src.ranking.bm25 import DEFAULT_INDEX_DIR
+
+    parser = argparse.ArgumentParser(description="Tính index gợi ý tiền tố (autocomplete) cho index đã merge")
+    parser.add_argument("index_dir", nargs="?", default=DEFAULT_INDEX_DIR)
+    parser.add_argument("--jsonl", help="File JSONL nguồn: thêm gợi ý tên công ty")
+    parser.add_argument("--min-df", type=int, default=SUGGEST_MIN_DF)
+    args = parser.parse_args()
+
+    start = time.time()
+    meta = write_suggest_terms(args.index_dir, args.min_df)
+    print(f"✓ Suggest terms: {meta['num_keys']:,d} keys, {meta['num_nodes']:,d} nodes "
+          f"({time.time() - start:.1f}s)")
+    if args.jsonl:
+        start = time.time()
+        meta = write_suggest_names(args.index_dir, args.jsonl)
+        print(f"✓ Suggest names: {meta['num_keys']:,d} keys, {meta['num_nodes']:,d} nodes "
+              f"({time.time() - start:.1f}s)")
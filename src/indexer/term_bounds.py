@@ -0,0 +1,200 @@
+"""
+Per-Term Score Upper Bounds (MaxScore)
+======================================
+Milestone 2 - SEG301: Search Engines & Information Retrieval
+
+Dynamic pruning (MaxScore, xem bm25.py _search_maxscore) cần cận trên điểm
+của từng term: doc chỉ khớp các term có tổng cận trên < điểm thứ k thì bỏ
+qua được mà không cần đọc postings của các term đó.
+
+Lưu điểm tối đa tính sẵn sẽ sai khi k1, b, trọng số trường (đổi lúc truy
+vấn) hoặc avgdl (segments thêm vào) thay đổi, nên lúc merge chỉ lưu thống
+kê thô của mỗi term, theo từng trường:
+    max_tf_f   = tf_f lớn nhất trong các posting của term
+    min_len_f  = |D_f| nhỏ nhất trong các doc có tf_f > 0
+Thành phần TF của BM25 tăng theo tf và giảm theo |D| (b >= 0), nên với
+tham số bất kỳ lúc truy vấn:
+    BM25:   tf_comp <= T * (k1 + 1) / (T + k1 * (1 - b + b * L / avgdl))
+            (T = max_tf, L = min_len)
+    BM25F:  tf~ <= Σ_f w_f * T_f / (1 - b_f + b_f * L_f / avglen_f)
+            tf_comp <= tf~ * (k1 + 1) / (k1 + tf~)
+cận trên điểm của term = idf * cận trên tf_comp.
+
+File:
+    term_bounds.npy   int32[num_terms, F, 2]  (max_tf_f, min_len_f) theo term
+                      ordinal (index 1 text gộp: F = 1, độ dài cả doc)
+
+Build: merging.py ghi kèm trong lúc ghi postings (TermBoundsWriter);
+       python src/indexer/term_bounds.py [index_dir] cho index có sẵn
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+# Thêm project root vào path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.indexer.postings_codec import (
+    decode_postings, read_header, num_fields_from_flags, block_size_from_flags,
+)
+from src.indexer.mmap_term_dict import MmapTermDict, TERM_DICT_FILENAME
+from src.indexer.doc_store import load_doc_store
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+TERM_BOUNDS_FILENAME = "term_bounds.npy"
+
+# Độ lệch tương đối cộng thêm vào cận trên: doc_norms lưu float32 và thứ tự
+# cộng các trường khác nhau -> điểm thật có thể vượt cận tính float64 vài ulp
+BOUND_SLACK = 1e-6
+
+
+def has_term_bounds(index_dir: str) -> bool:
+    """Index có cận trên theo term hay không."""
+    return os.path.exists(os.path.join(index_dir, TERM_BOUNDS_FILENAME))
+
+
+def remove_term_bounds(index_dir: str):
+    """Xoá cận trên (index vừa build lại -> lệch term ordinal)."""
+    path = os.path.join(index_dir, TERM_BOUNDS_FILENAME)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+# ============================================================================
+# BUILD
+# ============================================================================
+
+def term_bound_stats(doc_ids: np.ndarray, tfs: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """
+    (max_tf_f, min_len_f) của 1 postings list: int32[F, 2] (trường không có
+    posting nào: (0, 0)).
+
+    Args:
+        doc_ids, tfs: Postings (tfs: mảng n hoặc ma trận n x F)
+        lengths: Độ dài theo doc_id (doc_lengths[:, None] hoặc field_lengths)
+    """
+    tfs = np.asarray(tfs).reshape(len(doc_ids), -1)
+    stats = np.zeros((tfs.shape[1], 2), dtype=np.int32)
+    if not len(doc_ids):
+        return stats
+    present = tfs > 0
+    stats[:, 0] = tfs.max(axis=0)
+    min_lengths = np.where(present, lengths[doc_ids], np.iinfo(np.int32).max).min(axis=0)
+    stats[:, 1] = np.where(present.any(axis=0), min_lengths, 0)
+    return stats
+
+
+class TermBoundsWriter:
+    """
+    Gom (max_tf_f, min_len_f) theo thứ tự term trong lúc ghi postings
+    (merging.write_postings) -> không phải decode lại postings.bin.
+    """
+
+    def __init__(self, index_dir: str):
+        store = load_doc_store(index_dir)
+        self.lengths = store.field_lengths if store.fields else store.doc_lengths[:, None]
+        self.rows = []
+
+    def add(self, doc_ids: np.ndarray, tfs: np.ndarray):
+        self.rows.append(term_bound_stats(np.asarray(doc_ids), tfs, self.lengths))
+
+    def extend(self, bounds: np.ndarray):
+        """Nối cận trên của 1 part (merge song song theo khoảng term)."""
+        self.rows.extend(bounds)
+
+    def bounds(self) -> np.ndarray:
+        if not self.rows:
+            return np.zeros((0, self.lengths.shape[1], 2), dtype=np.int32)
+        return np.stack(self.rows)
+
+    def save(self, index_dir: str) -> int:
+        bounds = self.bounds()
+        np.save(os.path.join(index_dir, TERM_BOUNDS_FILENAME), bounds)
+        return len(bounds)
+
+
+def write_term_bounds(index_dir: str) -> int:
+    """
+    Tính cận trên cho index đã có (đọc lại postings.bin theo term ordinal
+    của term_dict.bin), vd. sau compaction hoặc index build trước khi có
+    term_bounds.npy.
+
+    Returns:
+        Số terms
+    """
+    term_dict = MmapTermDict(os.path.join(index_dir, TERM_DICT_FILENAME))
+    writer = TermBoundsWriter(index_dir)
+    try:
+        with open(os.path.join(index_dir, "postings.bin"), "rb") as postings_file:
+            header = read_header(postings_file)
+            if header is None:
+                raise ValueError(f"Legacy pickle postings in {index_dir}: "
+                                 f"run postings_codec.py to convert first")
+            num_fields = num_fields_from_flags(header[1])
+            block_size = block_size_from_flags(header[1])
+            for ordinal in range(len(term_dict)):
+                _, offset, length = term_dict.entry(ordinal)
+                postings_file.seek(offset)
+                writer.add(*decode_postings(postings_file.read(length), num_fields, block_size))
+    finally:
+        term_dict.close()
+    return writer.save(index_dir)
+
+
+# ============================================================================
+# READER
+# ============================================================================
+
+class TermBounds:
+    """Cận trên thành phần TF của từng term (theo term ordinal, mmap)."""
+
+    def __init__(self, index_dir: str):
+        self.bounds = np.load(os.path.join(index_dir, TERM_BOUNDS_FILENAME), mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self.bounds)
+
+    def tf_bound(self, ordinal: int, k1: float, b: float, avg_doc_length: float) -> float:
+        """Cận trên tf * (k1 + 1) / (tf + k1 * norm) của term (BM25)."""
+        max_tf, min_length = (float(x) for x in self.bounds[ordinal, 0])
+        if max_tf <= 0:
+            return 0.0
+        norm = 1.0 - b + b * (min_length / avg_doc_length) if avg_doc_length > 0 else 1.0
+        bound = max_tf * (k1 + 1) / (max_tf + k1 * norm)
+        return bound * (1 + BOUND_SLACK)
+
+    def field_tf_bound(self, ordinal: int, k1: float, weights: np.ndarray, b: np.ndarray,
+                       avg_field_lengths: np.ndarray) -> float:
+        """Cận trên tf~ * (k1 + 1) / (k1 + tf~) của term (BM25F, w_f / b_f / avglen_f)."""
+        stats = self.bounds[ordinal].astype(np.float64)
+        norms = 1.0 - b + b * (stats[:, 1] / avg_field_lengths)
+        field_tf = float((stats[:, 0] * (np.maximum(weights, 0) / np.maximum(norms, 1e-9))).sum())
+        bound = field_tf * (k1 + 1) / (k1 + field_tf)
+        return bound * (1 + BOUND_SLACK)
+
+    def close(self):
+        self.bounds = None
+
+
+# ============================================================================
+# ENTRY POINT
+# ============================================================================
+
+if __name__ == "__main__":
+    import argparse
+    from src.ranking.bm25 import DEFAULT_INDEX_DIR
+
+    parser = argparse.ArgumentParser(description="Tính cận trên điểm theo term (MaxScore)")
+    parser.add_argument("index_dir", nargs="?", default=DEFAULT_INDEX_DIR)
+    args = parser.parse_args()
+
+    start = time.time()
+    num_terms = write_term_bounds(args.index_dir)
+    print(f"✓ Term bounds: {num_terms:,d} terms ({time.time() - start:.1f}s)")
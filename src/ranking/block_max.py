@@ -0,0 +1,195 @@
+"""
+Block-Max WAND (Block-Max Pruning)
+==================================
+Milestone 2 - SEG301: Search Engines & Information Retrieval
+
+Cận trên theo term (MaxScore) quá lỏng cho các list dài như tên tỉnh,
+"thương_mại", "dịch_vụ": 1 posting impact cao đủ đẩy cận của cả list lên.
+Block-Max WAND dùng cận trên của TỪNG BLOCK postings (impact lớn nhất của
+block, ImpactsReader.block_max - cùng chia block với skip table) và chỉ
+decode các block còn có thể đóng góp vào top-k.
+
+WAND gốc chọn pivot theo từng posting (doc-at-a-time) - trong Python chậm
+hơn cả cộng dồn NumPy toàn bộ list, nên ở đây pivot ở mức khoảng doc_id:
+    - Các doc_id cuối block của mọi term chia trục doc_id thành các khoảng
+      (e_{j-1}, e_j]; trong 1 khoảng mỗi term chỉ có đúng 1 block có thể
+      chứa doc (block đầu tiên có last_doc_id >= e_j).
+    - Cận trên của doc trong khoảng j:
+          UB_j = Σ_t u_{t, block(t, j)} * c(số term có block phủ khoảng j)
+      (u = idf * scale * block_max, c = coordination_factor).
+    - Duyệt các khoảng theo UB giảm dần, theo lô (lô sau gấp đôi lô trước):
+      decode 1 lần (PostingsBlocks.decode_block_set) các block phủ lô, chấm
+      điểm chính xác mọi doc trong lô, cập nhật θ = điểm thứ k. Dừng khi
+      UB của khoảng tiếp theo < θ: các block chỉ phủ khoảng còn lại không
+      bao giờ được decode.
+Doc trong khoảng đã duyệt có đủ mọi term, nên top-k giống hệt chấm điểm
+trên postings đầy đủ.
+
+List ngắn (vd. "sạch", df vài trăm) chỉ có vài block nhưng mỗi block phủ
+cả dải doc_id rộng -> cận trên của mọi khoảng đều cộng thêm block max của
+nó. Vì vậy searcher (bm25.py _search_block_max) chấm điểm trước các doc
+có term list ngắn (tra list dài qua lookup, dùng chung block đã decode) và
+chỉ chạy block-max trên các list dài cho các doc còn lại.
+
+Usage: BM25Searcher(scorer="bmw") hoặc search(..., scorer="bmw")
+"""
+
+import os
+import sys
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# Thêm project root vào path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.indexer.postings_codec import PostingsBlocks
+from src.indexer.term_bounds import BOUND_SLACK
+from src.indexer.impacts import coordination_factor
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Số khoảng doc_id của lô đầu tiên (lô sau gấp đôi): lô nhỏ nâng θ sớm, lô
+# lớn dần giữ số vòng lặp Python ở mức log(số khoảng)
+FIRST_BATCH_INTERVALS = 64
+
+
+# ============================================================================
+# EVALUATOR
+# ============================================================================
+
+class BlockMaxWAND:
+    """
+    Duyệt khoảng doc_id theo cận trên block-max giảm dần (index gốc).
+
+    Attributes:
+        ends: int64[J] doc_id cuối của từng khoảng (hợp last_doc_ids mọi term)
+        bounds: float64[J] cận trên điểm (đã nhân coordination) của từng khoảng
+        total_postings: Tổng số postings của các term
+        decoded_postings: Số postings đã decode (đếm lại nếu 1 block được
+                          decode ở nhiều lô)
+    """
+
+    def __init__(self, blocks: List[PostingsBlocks], block_bounds: List[np.ndarray],
+                 num_query_tokens: int):
+        """
+        Args:
+            blocks: Skip table của từng term
+            block_bounds: Cận trên đóng góp của từng block (song song với blocks)
+            num_query_tokens: n của coordination factor
+        """
+        self.blocks = blocks
+        self.ends = np.unique(np.concatenate([pb.last_doc_ids for pb in blocks]))
+        sums = np.zeros(len(self.ends), dtype=np.float64)
+        matches = np.zeros(len(self.ends), dtype=np.int64)
+        self.covering = []  # Block của term phủ khoảng j (-1: sau block cuối)
+        for pb, bounds in zip(blocks, block_bounds):
+            covering = np.searchsorted(pb.last_doc_ids, self.ends)
+            valid = covering < pb.num_blocks
+            sums[valid] += bounds[covering[valid]]
+            matches += valid
+            self.covering.append(np.where(valid, covering, -1))
+        self.bounds = sums * coordination_factor(matches, num_query_tokens) * (1 + BOUND_SLACK)
+        self.order = np.argsort(-self.bounds, kind="stable")
+        self._negated = -self.bounds[self.order]  # tăng dần, cho searchsorted
+        self.block_starts = [np.concatenate(([0], np.cumsum(pb.counts))) for pb in blocks]
+        self.position = 0
+        self.batch_size = FIRST_BATCH_INTERVALS
+        self.decoded = [np.zeros(pb.num_blocks, dtype=bool) for pb in blocks]
+        # Postings đã decode nhưng thuộc khoảng chưa duyệt: dùng lại ở lô sau
+        self.pending = [None] * len(blocks)
+        self.total_postings = sum(pb.n for pb in blocks)
+
+    @property
+    def num_intervals(self) -> int:
+        return len(self.ends)
+
+    @property
+    def decoded_postings(self) -> int:
+        """Số postings (khác nhau) đã decode."""
+        return sum(int(pb.counts[decoded].sum()) for pb, decoded in zip(self.blocks, self.decoded))
+
+    def _decode(self, term: int, needed: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(doc_ids, positions trong cả list, khoảng) của các block needed (chưa decode)."""
+        pb, starts = self.blocks[term], self.block_starts[term]
+        if len(needed) * 8 > pb.num_blocks:
+            # Chạm nhiều block: decode cả list 1 lần, bỏ các block đã decode trước đó
+            doc_ids, _ = pb.decode_blocks(0)
+            positions = np.flatnonzero(~np.repeat(self.decoded[term], pb.counts))
+            doc_ids = doc_ids[positions]
+            self.decoded[term][:] = True
+        else:
+            doc_ids, _ = pb.decode_block_set(needed)
+            counts = pb.counts[needed]
+            positions = np.repeat(starts[needed] - (np.cumsum(counts) - counts), counts) \
+                + np.arange(len(doc_ids))
+            self.decoded[term][needed] = True
+        return doc_ids, positions, np.searchsorted(self.ends, doc_ids)
+
+    def lookup(self, term: int, doc_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Postings của term cho các doc_ids (tăng dần) - chỉ decode các block
+        chứa chúng; gọi trước next_batch (block đã decode được dùng lại).
+
+        Returns:
+            (doc_ids có term, positions trong cả list)
+        """
+        pb = self.blocks[term]
+        blocks = np.searchsorted(pb.last_doc_ids, doc_ids)
+        needed = np.unique(blocks[blocks < pb.num_blocks])
+        needed = needed[~self.decoded[term][needed]]
+        if len(needed):
+            decoded = self._decode(term, needed)
+            self.pending[term] = decoded if self.pending[term] is None else \
+                tuple(np.concatenate(arrays) for arrays in zip(self.pending[term], decoded))
+        if self.pending[term] is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        pending_ids, positions, _ = self.pending[term]
+        order = np.argsort(pending_ids, kind="stable")
+        idx = np.minimum(np.searchsorted(pending_ids, doc_ids, sorter=order), len(order) - 1)
+        found = pending_ids[order[idx]] == doc_ids
+        return doc_ids[found], positions[order[idx[found]]]
+
+    def next_batch(self, theta: float) -> Optional[List[Tuple[np.ndarray, np.ndarray]]]:
+        """
+        Lô khoảng tiếp theo có UB >= theta (hoà điểm vẫn phải duyệt: doc_id
+        nhỏ hơn thắng). Mỗi block được decode tối đa 1 lần; block chỉ phủ
+        khoảng đã duyệt hoặc bị loại không bao giờ được decode.
+
+        Returns:
+            Theo từng term: (doc_ids, positions trong cả list) của các
+            postings nằm trong lô; None khi mọi khoảng còn lại có UB < theta
+        """
+        eligible = int(np.searchsorted(self._negated, -theta, side="right"))
+        stop = min(self.position + self.batch_size, eligible)
+        if stop <= self.position:
+            return None
+        if eligible - stop <= self.batch_size:
+            stop = eligible  # Phần còn lại nhỏ: gộp luôn, bớt 1 vòng lọc
+        selected = self.order[self.position:stop]
+        self.position = stop
+        self.batch_size *= 2
+        in_batch = np.zeros(len(self.ends), dtype=bool)
+        in_batch[selected] = True
+
+        batch = []
+        for term, covering in enumerate(self.covering):
+            needed = np.unique(covering[selected])
+            needed = needed[needed >= 0]
+            needed = needed[~self.decoded[term][needed]]
+            parts = [self.pending[term]] if self.pending[term] is not None else []
+            if len(needed):
+                parts.append(self._decode(term, needed))
+            if not parts:
+                batch.append((np.empty(0, dtype=np.int64),) * 2)
+                continue
+            doc_ids, positions, intervals = (np.concatenate(arrays) for arrays in zip(*parts)) \
+                if len(parts) > 1 else parts[0]
+            keep = in_batch[intervals]
+            rest = ~keep
+            self.pending[term] = (doc_ids[rest], positions[rest], intervals[rest])
+            batch.append((doc_ids[keep], positions[keep]))
+        return batch
@@ -22,22 +22,108 @@ Lưu ý: KHÔNG sử dụng bất kỳ thư viện ranking nào có sẵn.
 Tất cả logic tính toán TF, IDF, BM25 score đều được code tay.
 
 Kiến trúc tối ưu bộ nhớ:
-    - term_dict.pkl:  Dict[str, (df, offset, length)] → ~18MB, load nhanh
-    - postings.bin:   Binary file → random access khi search
-    - doc_lengths.pkl: Dict[int, int] → ~12MB
-    - doc_offsets.pkl: Dict[int, int] → ~25MB, byte offset trong JSONL
+    - term_dict.bin:  Term dictionary front-coded, mmap → khởi động tức thì
+                      (fallback: term_dict.pkl Dict[str, (df, offset, length)])
+    - postings.bin:   Binary file nén (delta + varint) → random access khi search
+    - doc_lengths.npy: int32[doc_id] (mmap), -1 = doc không được index
+    - doc_offsets.npy: int64[doc_id] (mmap), byte offset trong JSONL
+    - doc_norms.npy:   float32[doc_id], tính sẵn 1 - b + b * |D| / avgdl
     - Metadata đọc on-demand từ file JSONL gốc (không load vào RAM)
+    - segments/:       Segments tăng dần (documents mới, xem segments.py);
+                       N, df, avgdl là thống kê TOÀN CỤC trên index gốc + segments
+    - positions.bin:   Index vị trí (tuỳ chọn, spimi.py --positions) cho
+                       phrase "..." và proximity "..."~N (xem positions.py)
+
+BM25F (index theo trường - mặc định của spimi.py): mỗi posting giữ tf từng
+trường, doc store giữ độ dài từng trường. tf của term được gộp theo trọng số
+trường, chuẩn hoá độ dài TỪNG trường rồi mới bão hoà 1 lần:
+    tf~(t, D) = Σ_f w_f * tf_f(t, D) / (1 - b_f + b_f * |D_f| / avglen_f)
+    score(D, Q) = Σ IDF(qi) * tf~ * (k1 + 1) / (k1 + tf~)
+Trọng số w_f (và b_f) chọn lúc truy vấn - đổi trọng số không cần build lại.
+Index cũ (1 text gộp) vẫn dùng công thức BM25 ở trên.
+
+Impacts 8-bit (tuỳ chọn, merging.py --impacts / impacts.py): thành phần TF
+của mỗi posting được tính sẵn và lượng tử hoá lúc index; khi k1, b và trọng
+số trường của truy vấn khớp với lúc tính, điểm chỉ còn là
+    score(D, Q) = Σ IDF(qi) * scale * impact(qi, D)
+cộng dồn bằng NumPy trên mảng điểm theo doc_id. Segments (không có impacts)
+được chấm điểm chính xác trong cùng lượt; truy vấn đổi trọng số trường quay
+về tính chính xác.
+
+Chấm điểm chính xác mặc định cũng chạy trên mảng NumPy (scorer="numpy"):
+mỗi postings list cộng dồn 1 lần vào mảng điểm / số term khớp theo doc_id
+thay vì vòng lặp Python qua từng posting (scorer="loop", để so sánh).
+
+MaxScore (scorer="maxscore", chọn được theo từng truy vấn): dùng cận trên
+điểm của từng term (term_bounds.npy ghi lúc merge, xem term_bounds.py) để
+chỉ đọc hết postings của các term "essential"; các term còn lại chỉ được
+tra qua skip table cho doc còn có thể vào top-k (xem _search_maxscore).
+Top-k giống scorer numpy (điểm lệch tối đa vài ulp do thứ tự cộng).
+
+Block-Max WAND (scorer="bmw", cần impacts): cận trên theo từng block
+postings (impact lớn nhất của block) -> chỉ decode các block còn có thể
+đóng góp vào top-k (xem block_max.py, _search_block_max).
+
+AND / minimum-should-match (search(..., min_should_match="all")): chỉ doc
+khớp đủ số term; postings được giao từ list ngắn nhất, list dài chỉ tra qua
+skip table cho ứng viên (xem _search_conjunctive). Không đủ top-k doc thoả
+-> quay về OR (coordination factor như thường).
+
+Champion lists (tuỳ chọn, merging.py --champions / champions.py): với term
+df lớn, search trả lời trước từ tầng nhanh (các posting impact cao nhất) và
+chỉ đọc postings đầy đủ khi không chứng minh được top-k (xem
+_search_champions); last_tier cho biết truy vấn được trả lời từ tầng nào.
+
+Truy vấn không dấu ("xay dung ha noi"): các âm tiết được ghép lại thành
+term có dấu qua từ điển bỏ dấu (folded_terms.py) - mỗi cụm 1 lần tra từ
+điển, rồi chấm điểm BM25 như truy vấn có dấu (xem _resolve_folded).
+
+Token gõ sai (không có trong index, vd. "vinamlik"): thay bằng term gần
+nhất trong trigram index (fuzzy_terms.py, khoảng cách sửa <= 2, df lớn
+trước); last_suggestion là câu "có phải bạn muốn tìm" tương ứng.
+
+Gợi ý khi gõ (suggest): hoàn thành tiền tố thành term / tên công ty qua
+index gợi ý tính sẵn lúc merge (suggest.py), không chạy truy vấn BM25.
 """
 
 import os
+import re
 import sys
 import json
 import math
+import mmap
 import time
 import pickle
 from typing import Dict, List, Tuple, Optional
 from collections import defaultdict
 
+import numpy as np
+
+# Thêm project root vào path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.indexer.postings_codec import (
+    decode_postings, postings_from_pairs, read_header, num_fields_from_flags,
+    block_size_from_flags, PostingsBlocks,
+)
+from src.indexer.mmap_term_dict import MmapTermDict, TERM_DICT_FILENAME
+from src.indexer.doc_store import (
+    has_doc_store, load_doc_store, doc_store_from_pickles, compute_length_norms,
+)
+from src.indexer.segments import open_segments, manifest_path, load_manifest, load_deletions
+from src.indexer.positions import PositionsReader, has_positions, match_phrase
+from src.indexer.spimi import is_index_token
+from src.indexer.impacts import (
+    ImpactsReader, has_impacts, bm25_tf_component, bm25f_field_tf, coordination_factor,
+)
+from src.indexer.champions import ChampionsReader, has_champions
+from src.indexer.term_bounds import TermBounds, has_term_bounds
+from src.indexer.folded_terms import FoldedTermDict, has_folded_terms, fold_accents
+from src.indexer.fuzzy_terms import FuzzyTermIndex, has_fuzzy_terms
+from src.indexer.suggest import Suggester, has_suggest_index, SUGGEST_KINDS, SUGGEST_TOP_N
+from src.ranking.topk import top_k_order, top_k_items, kth_largest
+from src.ranking.block_max import BlockMaxWAND
+
 try:
     from pyvi import ViTokenizer
 except ImportError:
@@ -62,6 +148,110 @@ DEFAULT_DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "data")
 DEFAULT_INDEX_DIR = os.path.join(DEFAULT_DATA_PATH, "index")
 DEFAULT_JSONL_PATH = os.path.join(DEFAULT_DATA_PATH, "milestone1_fixed.jsonl")
 
+# BM25F: trọng số mặc định từng trường (giữ đúng ưu tiên của index cũ, vốn lặp
+# text tên công ty và ngành nghề 2 lần lúc build). Ghi đè lúc truy vấn bằng
+# search(..., field_weights={...}).
+FIELD_WEIGHTS = {
+    "company_name": 2.0,
+    "address": 1.0,
+    "representative": 1.0,
+    "status": 1.0,
+    "industries": 2.0,
+}
+
+# Bộ chấm điểm trên postings đầy đủ (khi không dùng impacts):
+#   "numpy": cộng dồn điểm / số term khớp vào mảng theo doc_id bằng phép toán
+#            vector (mỗi postings list 1 lần scatter-add)
+#   "loop":  vòng lặp Python qua từng posting + defaultdict (cách cũ, để so sánh)
+#   "maxscore": như numpy nhưng bỏ qua doc không thể vào top-k (MaxScore, cần
+#            term_bounds.npy hoặc impacts; không có -> numpy)
+#   "bmw":   Block-Max WAND trên impacts: chỉ decode block còn có thể vào top-k
+#            (cần impacts khớp tham số truy vấn; không có -> numpy)
+# Điểm giống hệt nhau; chỉ thứ tự các doc đồng điểm khác (numpy: doc_id nhỏ trước).
+SCORERS = ("numpy", "loop", "maxscore", "bmw")
+
+# Tầng champion: số doc ứng viên tối đa được tra chính xác các term còn thiếu
+# (qua skip table) trước khi bỏ cuộc và đọc postings đầy đủ
+CHAMPION_RESOLVE_LIMIT = 2_000
+
+# MaxScore: chỉ tra qua skip table (thay vì đọc hết) postings list có ít nhất
+# MAXSCORE_MIN_DF postings; list ngắn hơn luôn được cộng dồn cả list
+MAXSCORE_MIN_DF = 10_000
+
+# Block-Max WAND: chỉ dùng khi truy vấn có list >= BLOCK_MAX_MIN_DF postings
+# (list ngắn decode cả list nhanh hơn chi phí chia khoảng / duyệt theo lô)
+BLOCK_MAX_MIN_DF = 10_000
+
+# AND / minimum-should-match: "all" (mọi term, như AND), số term (âm: số term
+# được phép thiếu) hoặc phần trăm "75%" / "-25%" (làm tròn xuống, như
+# Elasticsearch). None = OR (mặc định, chỉ giảm điểm doc khớp thiếu term)
+MATCH_ALL = "all"
+
+# Truy vấn không dấu: số âm tiết tối đa ghép thành 1 term (longest-match)
+MAX_FOLDED_SYLLABLES = 4
+
+# Phrase query: "cụm từ" (liền kề, đúng thứ tự) hoặc "cụm từ"~N (chen tối đa N vị trí)
+PHRASE_PATTERN = re.compile(r'"([^"]*)"(?:~(\d+))?')
+
+
+# ============================================================================
+# FIELD WEIGHTS
+# ============================================================================
+
+def parse_field_weights(text: str) -> Dict[str, float]:
+    """
+    Đọc trọng số trường dạng "company_name:3,address:0.5" (vd. từ query string).
+    
+    Raises:
+        ValueError: sai cú pháp hoặc trọng số âm
+    """
+    weights = {}
+    for item in text.split(","):
+        if not item.strip():
+            continue
+        name, sep, value = item.partition(":")
+        if not sep:
+            raise ValueError(f"Invalid field weight {item.strip()!r} (expected field:weight)")
+        weight = float(value)
+        if weight < 0:
+            raise ValueError(f"Field weight must be non-negative: {item.strip()!r}")
+        weights[name.strip()] = weight
+    return weights
+
+
+def resolve_min_should_match(spec, num_terms: int) -> int:
+    """
+    Số term tối thiểu doc phải khớp (trong num_terms term được chấm điểm),
+    kẹp trong [1, num_terms]: "all", 2, -1 (thiếu tối đa 1 term), "75%", "-25%".
+    
+    Raises:
+        ValueError: sai cú pháp
+    """
+    if isinstance(spec, str):
+        text = spec.strip().lower()
+        if text == MATCH_ALL:
+            required = num_terms
+        elif text.endswith("%"):
+            try:
+                percent = float(text[:-1])
+            except ValueError:
+                raise ValueError(f"Invalid min_should_match {spec!r}") from None
+            required = int(num_terms * abs(percent) / 100)
+            if percent < 0:
+                required = num_terms - required
+        else:
+            try:
+                required = int(text)
+            except ValueError:
+                raise ValueError(f"Invalid min_should_match {spec!r} "
+                                 f"(expected {MATCH_ALL!r}, N, -N or N%)") from None
+            required = num_terms + required if required < 0 else required
+    elif isinstance(spec, int) and not isinstance(spec, bool):
+        required = num_terms + spec if spec < 0 else spec
+    else:
+        raise ValueError(f"Invalid min_should_match {spec!r} (expected {MATCH_ALL!r}, N, -N or N%)")
+    return max(1, min(required, num_terms))
+
 
 # ============================================================================
 # BM25 SEARCH ENGINE
@@ -75,74 +265,225 @@ class BM25Searcher:
     ranked retrieval theo thuật toán BM25.
     
     Kiến trúc tối ưu bộ nhớ:
-    - Chỉ load term_dict (~18MB) + doc_lengths (~12MB) + doc_offsets (~25MB)
-    - Tổng RAM khi khởi động: ~55MB (thay vì >3GB)
+    - Term dict + doc store đều là mmap (dùng chung page cache giữa các worker)
+    - Tổng RAM khi khởi động: vài MB (thay vì >3GB)
     - Postings: đọc từ disk khi search (random access)
     - Metadata: đọc từ JSONL khi cần hiển thị (random access)
+    - Segments: documents thêm sau (incremental) được tìm cùng index gốc
     """
     
+    segments = ()         # Segments tăng dần (mặc định rỗng: chỉ index gốc)
+    positions = None      # PositionsReader của index gốc (None = không có index vị trí)
+    deletions = None      # DeletionBitmap (tombstones) hoặc None
+    fields = None         # Tên các trường (index theo trường, BM25F) hoặc None
+    impacts = None        # ImpactsReader của index gốc (None = tính điểm chính xác)
+    champions = None      # ChampionsReader (tầng nhanh cho term df lớn) hoặc None
+    term_bounds = None    # TermBounds (cận trên theo term cho MaxScore) hoặc None
+    folded = None         # FoldedTermDict (truy vấn không dấu) hoặc None
+    fuzzy = None          # FuzzyTermIndex (token gõ sai) hoặc None
+    suggester = None      # Suggester (gợi ý khi gõ) hoặc None
+    global_terms = None   # Shard: từ điển df toàn cục (sharded.py), None = term_dict
+    auto_refresh = False  # Tự reload segments khi manifest đổi (mỗi lần search)
+    scorer = "numpy"      # Bộ chấm điểm trên postings đầy đủ (xem SCORERS)
+    min_should_match = None  # Số term tối thiểu phải khớp (None = OR, xem MATCH_ALL)
+    
     def __init__(self, index_dir: str = DEFAULT_INDEX_DIR, 
                  jsonl_path: str = DEFAULT_JSONL_PATH,
-                 k1: float = K1, b: float = B):
+                 k1: float = K1, b: float = B, auto_refresh: bool = True,
+                 field_weights: Optional[Dict[str, float]] = None,
+                 field_b: Optional[Dict[str, float]] = None,
+                 use_impacts: bool = True, use_champions: bool = True,
+                 use_fuzzy: bool = True, scorer: str = "numpy", min_should_match=None):
         self.index_dir = index_dir
         self.jsonl_path = jsonl_path
         self.k1 = k1
         self.b = b
+        self.auto_refresh = auto_refresh
+        self.field_weights = {**FIELD_WEIGHTS, **(field_weights or {})}
+        self.field_b = dict(field_b or {})  # b riêng từng trường (mặc định: b)
+        self.use_impacts = use_impacts  # Dùng impacts 8-bit nếu index có và tham số khớp
+        self.use_champions = use_champions  # Trả lời từ champion lists khi chứng minh được top-k
+        self.use_fuzzy = use_fuzzy  # Sửa token gõ sai qua trigram index (nếu index có)
+        self.scorer = scorer  # Bộ chấm điểm mặc định (xem SCORERS)
+        self.min_should_match = min_should_match  # AND / minimum-should-match mặc định (None = OR)
         
         self.term_dict = None         # term -> (df, offset, length)
         self.postings_file = None     # file handle for postings.bin
-        self.doc_lengths = None       # doc_id -> document length
-        self.doc_offsets = None       # doc_id -> byte offset in JSONL
+        self.postings_compressed = True  # False nếu postings.bin là pickle cũ
+        self.positions = None         # PositionsReader (phrase / proximity queries)
+        self.impacts = None           # ImpactsReader (impacts 8-bit tính sẵn)
+        self.champions = None         # ChampionsReader (champion lists, cần impacts)
+        self.last_tier = None         # "champions" / "full": tầng trả lời truy vấn gần nhất
+        self.term_bounds = None       # TermBounds (cận trên điểm theo term, MaxScore)
+        self.last_scorer = None       # Bộ chấm điểm đã trả lời truy vấn gần nhất (tầng full)
+        self.last_decoded = None      # scorer "bmw": (postings đã decode, tổng postings) của index gốc
+        self.last_min_match = None    # Số term tối thiểu đã áp dụng (None: trả lời theo OR)
+        self.folded = None            # FoldedTermDict (truy vấn không dấu)
+        self.fuzzy = None             # FuzzyTermIndex (token gõ sai)
+        self.last_suggestion = None   # "Có phải bạn muốn tìm" của truy vấn gần nhất
+        self.suggester = None         # Suggester (gợi ý tiền tố khi gõ)
+        self.doc_lengths = None       # int32[doc_id] -> document length
+        self.doc_offsets = None       # int64[doc_id] -> byte offset in JSONL
+        self.doc_norms = None         # float32[doc_id] -> 1 - b + b * |D| / avgdl
+        self.fields = None            # Tên các trường (None = index 1 text gộp)
+        self.num_fields = 0
+        self.block_size = 0           # Postings / block (0 = entry liền, index cũ)
+        self._postings_mmap = None    # mmap postings.bin cho get_postings_blocks
+        self.field_lengths = None     # int32[doc_id, field] (mmap) -> |D_f|
+        self.avg_field_lengths = None # float64[field] -> avglen_f (toàn cục)
+        self._base_field_totals = None
         self.jsonl_file = None        # file handle for JSONL
-        self.total_docs = 0           # N
-        self.avg_doc_length = 0.0     # avgdl
+        self.total_docs = 0           # N (toàn cục: index gốc + segments)
+        self.avg_doc_length = 0.0     # avgdl (toàn cục)
         self.vocab_size = 0
+        self.segments = []            # List[Segment] theo thứ tự doc_id
+        self._base_docs = 0           # N của index gốc
+        self._base_avg_doc_length = 0.0
+        self._base_doc_norms = None   # norms theo avgdl của index gốc
+        self._base_generation = 0     # Tăng mỗi lần index gốc được compaction
+        self.deletions = None         # DeletionBitmap của doc_id đã xoá
+        self._manifest_state = None
         
         self._loaded = False
+        
+        if scorer not in SCORERS:
+            raise ValueError(f"Unknown scorer {scorer!r}, expected one of {SCORERS}")
+        if min_should_match is not None:
+            resolve_min_should_match(min_should_match, 1)  # Kiểm tra cú pháp sớm
     
     def load_index(self):
         """
         Load index files nhẹ vào RAM.
-        Tổng ~55MB: term_dict + doc_lengths + doc_offsets.
+        term_dict + doc store dạng mảng đều được mmap.
         """
         print("Loading index files...")
         load_start = time.time()
         
-        # 1. Load term dictionary (~18MB)
+        # 1. Term dictionary: ưu tiên bản mmap (term_dict.bin), khởi động tức thì
+        #    và dùng chung page cache giữa các worker. Fallback: term_dict.pkl (~18MB)
+        mmap_dict_path = os.path.join(self.index_dir, TERM_DICT_FILENAME)
         dict_path = os.path.join(self.index_dir, "term_dict.pkl")
-        if not os.path.exists(dict_path):
+        if os.path.exists(mmap_dict_path):
+            self.term_dict = MmapTermDict(mmap_dict_path)
+            dict_kind = "mmap"
+        elif os.path.exists(dict_path):
+            with open(dict_path, "rb") as f:
+                self.term_dict = pickle.load(f)
+            dict_kind = "pickle"
+        else:
             raise FileNotFoundError(
                 f"Term dictionary not found: {dict_path}\n"
                 f"Run spimi.py and merging.py first!"
             )
-        with open(dict_path, "rb") as f:
-            self.term_dict = pickle.load(f)
         self.vocab_size = len(self.term_dict)
-        print(f"  [OK] Term dictionary: {self.vocab_size:,d} terms")
+        print(f"  [OK] Term dictionary: {self.vocab_size:,d} terms ({dict_kind})")
         
         # 2. Mở postings file handle (không load)
         postings_path = os.path.join(self.index_dir, "postings.bin")
         self.postings_file = open(postings_path, "rb")
-        print(f"  [OK] Postings file opened (random access)")
-        
-        # 3. Load document lengths (~12MB) 
-        lengths_path = os.path.join(self.index_dir, "doc_lengths.pkl")
-        with open(lengths_path, "rb") as f:
-            self.doc_lengths = pickle.load(f)
-        self.total_docs = len(self.doc_lengths)
-        total_length = sum(self.doc_lengths.values())
-        self.avg_doc_length = total_length / self.total_docs if self.total_docs > 0 else 0
-        print(f"  [OK] Document lengths: {self.total_docs:,d} docs (avg: {self.avg_doc_length:.1f})")
-        
-        # 4. Load document offsets (~25MB)
-        offsets_path = os.path.join(self.index_dir, "doc_offsets.pkl")
-        if os.path.exists(offsets_path):
-            with open(offsets_path, "rb") as f:
-                self.doc_offsets = pickle.load(f)
+        header = read_header(self.postings_file)
+        self.postings_compressed = header is not None
+        self.num_fields = num_fields_from_flags(header[1]) if header is not None else 0
+        self.block_size = block_size_from_flags(header[1]) if header is not None else 0
+        postings_format = "delta+varint" if self.postings_compressed else "legacy pickle"
+        if self.num_fields:
+            postings_format += f", {self.num_fields} fields"
+        if self.block_size:
+            postings_format += f", {self.block_size}-posting blocks"
+        print(f"  [OK] Postings file opened (random access, {postings_format})")
+        
+        # Index vị trí (tuỳ chọn) - đánh chỉ số theo term ordinal của term_dict.bin
+        if has_positions(self.index_dir) and isinstance(self.term_dict, MmapTermDict):
+            self.positions = PositionsReader(self.index_dir)
+            print(f"  [OK] Positions opened (phrase / proximity queries)")
+        
+        # Impacts 8-bit (tuỳ chọn) - cũng theo term ordinal; bỏ qua nếu lệch term dict
+        if self.use_impacts and has_impacts(self.index_dir) and isinstance(self.term_dict, MmapTermDict):
+            impacts = ImpactsReader(self.index_dir)
+            if impacts.meta["num_terms"] == self.vocab_size:
+                self.impacts = impacts
+                print(f"  [OK] Impacts opened (8-bit, k1={impacts.meta['k1']}, b={impacts.meta['b']})")
+            else:
+                impacts.close()
+                print(f"  ⚠ Impacts out of date (term count mismatch): exact scoring")
+        
+        # Champion lists (tuỳ chọn) - chỉ hợp lệ với đúng bộ impacts đã dùng để tính
+        if self.impacts is not None and self.use_champions and has_champions(self.index_dir):
+            champions = ChampionsReader(self.index_dir)
+            if champions.matches(self.impacts):
+                self.champions = champions
+                print(f"  [OK] Champion lists: {champions.meta['num_terms']:,d} terms "
+                      f"({champions.meta['size']:,d} postings each)")
+            else:
+                champions.close()
+                print(f"  ⚠ Champion lists out of date (impacts changed): not used")
+        
+        # Cận trên theo term (MaxScore) - theo term ordinal; bỏ qua nếu lệch term dict
+        if has_term_bounds(self.index_dir) and isinstance(self.term_dict, MmapTermDict):
+            term_bounds = TermBounds(self.index_dir)
+            if len(term_bounds) == self.vocab_size:
+                self.term_bounds = term_bounds
+                print(f"  [OK] Term bounds opened (MaxScore)")
+            else:
+                term_bounds.close()
+                print(f"  ⚠ Term bounds out of date (term count mismatch): not used")
+        
+        # Từ điển bỏ dấu (tuỳ chọn) - theo term ordinal của term_dict.bin
+        if has_folded_terms(self.index_dir) and isinstance(self.term_dict, MmapTermDict):
+            self.folded = FoldedTermDict(self.index_dir)
+            print(f"  [OK] Folded terms: {len(self.folded):,d} keys (unaccented queries)")
+        
+        # Trigram index (tuỳ chọn) - bỏ qua nếu lệch term dict
+        if self.use_fuzzy and has_fuzzy_terms(self.index_dir) and isinstance(self.term_dict, MmapTermDict):
+            fuzzy = FuzzyTermIndex(self.index_dir, self.term_dict)
+            if fuzzy.meta.get("vocab_size") == self.vocab_size:
+                self.fuzzy = fuzzy
+                print(f"  [OK] Fuzzy terms: {len(fuzzy):,d} terms (typo-tolerant lookup)")
+            else:
+                fuzzy.close()
+                print(f"  ⚠ Fuzzy terms out of date (term count mismatch): not used")
+        
+        # Gợi ý tiền tố (tuỳ chọn) - không phụ thuộc term ordinal
+        if any(has_suggest_index(self.index_dir, kind) for kind in SUGGEST_KINDS):
+            self.suggester = Suggester(self.index_dir)
+            print(f"  [OK] Suggest: {len(self.suggester):,d} keys "
+                  f"({', '.join(self.suggester.indexes)})")
+        
+        # 3-4. Doc store: doc_lengths / doc_offsets / doc_norms dạng mảng (mmap).
+        #      Index cũ (doc_lengths.pkl / doc_offsets.pkl) được chuyển sang mảng trong RAM.
+        if has_doc_store(self.index_dir):
+            doc_store = load_doc_store(self.index_dir, b=self.b)
+            store_kind = "mmap arrays"
+        else:
+            doc_store = doc_store_from_pickles(self.index_dir, b=self.b)
+            store_kind = "legacy pickle"
+        self.doc_lengths = doc_store.doc_lengths
+        self.doc_offsets = doc_store.doc_offsets
+        self.doc_norms = doc_store.doc_norms
+        self.total_docs = doc_store.indexed_docs
+        self.avg_doc_length = doc_store.avg_doc_length
+        self._base_docs = self.total_docs
+        self._base_avg_doc_length = self.avg_doc_length
+        self._base_doc_norms = self.doc_norms
+        if self.num_fields:
+            self.fields = doc_store.fields
+            self.field_lengths = doc_store.field_lengths
+            self._base_field_totals = np.asarray(doc_store.avg_field_lengths, dtype=np.float64) \
+                * self._base_docs
+        print(f"  [OK] Document lengths: {self.total_docs:,d} docs "
+              f"(avg: {self.avg_doc_length:.1f}, {store_kind})")
+        if self.fields:
+            print(f"  [OK] Field lengths: {', '.join(self.fields)} (BM25F)")
+        if self.doc_offsets is not None:
             print(f"  [OK] Document offsets loaded (for metadata lookup)")
         else:
-            self.doc_offsets = None
-            print(f"  ⚠ doc_offsets.pkl not found (no metadata display)")
+            print(f"  ⚠ doc offsets not found (no metadata display)")
+        
+        # Segments tăng dần (nếu có) + thống kê toàn cục
+        self.load_segments()
+        if self.segments:
+            print(f"  [OK] Segments: {len(self.segments)} "
+                  f"(N={self.total_docs:,d}, avgdl={self.avg_doc_length:.1f} toàn cục)")
         
         # 5. Mở JSONL file handle ở binary mode (để byte offset khớp với SPIMI)
         if os.path.exists(self.jsonl_path):
@@ -154,10 +495,198 @@ class BM25Searcher:
         
         self._loaded = True
     
-    def _get_postings(self, term: str) -> Optional[List[Tuple[int, int]]]:
+    def load_segments(self):
+        """
+        (Re)load segments từ manifest và tính lại thống kê toàn cục:
+            N = N_gốc + Σ N_segment,  avgdl = Σ |D| / N
+        Length norms của index gốc được tính lại nếu avgdl thay đổi.
+        
+        Doc đã xoá (tombstone) vẫn được tính vào N / df / avgdl cho tới khi
+        compaction ghi lại postings; lúc search chúng chỉ bị lọc khỏi kết quả.
+        """
+        self._manifest_state = self._manifest_version()
+        
+        for segment in self.segments:
+            segment.close()
+        self.segments = open_segments(self.index_dir)
+        if self._manifest_state is not None:
+            manifest = load_manifest(self.index_dir)
+            self._base_generation = manifest.get("base_generation", 0)
+            self.deletions = load_deletions(self.index_dir, manifest)
+        else:
+            self.deletions = None
+        
+        total_docs = self._base_docs + sum(seg.indexed_docs for seg in self.segments)
+        total_length = self._base_avg_doc_length * self._base_docs \
+            + sum(seg.total_length for seg in self.segments)
+        self.total_docs = total_docs
+        self.avg_doc_length = total_length / total_docs if total_docs > 0 else 0.0
+        
+        if self.fields:
+            field_totals = self._base_field_totals.copy()
+            for segment in self.segments:
+                field_totals += segment.total_field_lengths
+            self.avg_field_lengths = field_totals / total_docs if total_docs > 0 \
+                else np.zeros(len(self.fields))
+        
+        if self.segments:
+            self.doc_norms = compute_length_norms(self.doc_lengths, self.avg_doc_length, self.b)
+            for segment in self.segments:
+                segment.set_collection_stats(self.avg_doc_length, self.b)
+        else:
+            self.doc_norms = self._base_doc_norms
+    
+    def refresh_segments(self) -> bool:
+        """
+        Reload segments + deletes nếu manifest đã thay đổi (add / delete / merge).
+        Index gốc đã được compaction (base_generation đổi) -> load lại toàn bộ.
+        Trả về True nếu reload.
+        """
+        if self._manifest_version() == self._manifest_state:
+            return False
+        if load_manifest(self.index_dir).get("base_generation", 0) != self._base_generation:
+            self.close()
+            self.load_index()
+        else:
+            self.load_segments()
+        return True
+    
+    def _manifest_version(self):
+        """(mtime, inode, size) của segments.json - manifest được ghi bằng os.replace."""
+        try:
+            st = os.stat(manifest_path(self.index_dir))
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_ino, st.st_size
+    
+    def _document_frequency(self, term: str) -> int:
+        """df toàn cục của term: index gốc (hoặc mọi shard) + tất cả segments."""
+        terms = self.term_dict if self.global_terms is None else self.global_terms
+        entry = terms.get(term)
+        df = entry[0] if entry is not None else 0
+        for segment in self.segments:
+            df += segment.df(term)
+        return df
+    
+    def _iter_postings(self, term: str, with_impacts: bool = False):
+        """
+        Postings của term trên index gốc rồi từng segment (doc_id tăng dần).
+        
+        Yields:
+            (doc_ids, tfs, doc_norms, doc_start, impacts): doc_norms đánh chỉ số
+            theo doc_id - doc_start (index theo trường: field_lengths);
+            impacts là mảng uint8 song song với doc_ids nếu with_impacts và
+            nguồn có impacts tính sẵn (chỉ index gốc), ngược lại None
+        """
+        impacts = None
+        if with_impacts:
+            ordinal = self.term_dict.ordinal(term)
+            postings = None
+            if ordinal is not None:
+                _, offset, length = self.term_dict.entry(ordinal)
+                self.postings_file.seek(offset)
+                postings = decode_postings(self.postings_file.read(length), self.num_fields,
+                                           self.block_size)
+                impacts = self.impacts.get(ordinal)
+        else:
+            postings = self._get_postings(term)
+        if postings is not None:
+            norms = self.field_lengths if self.fields else self.doc_norms
+            yield postings[0], postings[1], norms, 0, impacts
+        for segment in self.segments:
+            postings = segment.get_postings(term)
+            if postings is not None:
+                norms = segment.field_lengths if self.fields else segment.doc_norms
+                yield postings[0], postings[1], norms, segment.doc_start, None
+    
+    def _impacts_usable(self, field_params) -> bool:
+        """
+        Impacts của index gốc được tính với đúng k1, b (và w_f, b_f) hiện tại
+        và avgdl / avglen_f gần với thống kê toàn cục (segments làm lệch ->
+        tính chính xác để index gốc và segments cùng thang điểm).
+        """
+        if self.impacts is None:
+            return False
+        if field_params is None:
+            return self.impacts.matches(self.k1, self.b, avg_doc_length=self.avg_doc_length)
+        w, b, _ = field_params
+        return self.impacts.matches(self.k1, self.b, self.fields, w, b,
+                                    avg_field_lengths=self.avg_field_lengths)
+    
+    def _field_params(self, field_weights: Optional[Dict[str, float]] = None
+                      ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (w_f, b_f, avglen_f) theo thứ tự cột của field_lengths.
+        
+        Raises:
+            ValueError: tên trường không có trong index
+        """
+        weights = {**self.field_weights, **(field_weights or {})}
+        unknown = (set(weights) | set(self.field_b)) - set(self.fields) - set(FIELD_WEIGHTS)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))} "
+                             f"(index fields: {', '.join(self.fields)})")
+        w = np.array([weights.get(name, 1.0) for name in self.fields], dtype=np.float64)
+        b = np.array([self.field_b.get(name, self.b) for name in self.fields], dtype=np.float64)
+        # Trường rỗng trên toàn corpus: tf luôn 0, tránh chia cho 0
+        avg = np.where(self.avg_field_lengths > 0, self.avg_field_lengths, 1.0)
+        return w, b, avg
+    
+    def compute_field_tf(self, tfs: np.ndarray, field_lengths: np.ndarray,
+                         field_params: Tuple[np.ndarray, np.ndarray, np.ndarray]) -> np.ndarray:
+        """
+        tf~ của BM25F cho nhiều postings cùng lúc:
+            tf~ = Σ_f w_f * tf_f / (1 - b_f + b_f * |D_f| / avglen_f)
+        
+        Args:
+            tfs: Ma trận n x F tf theo trường
+            field_lengths: Ma trận n x F độ dài trường của các doc tương ứng
+            field_params: (w_f, b_f, avglen_f) từ _field_params
+        """
+        return bm25f_field_tf(tfs, field_lengths, *field_params)
+    
+    @property
+    def has_positions(self) -> bool:
+        """Phrase / proximity query dùng được trên toàn bộ index (gốc + segments)."""
+        return self.positions is not None and all(seg.positions is not None for seg in self.segments)
+    
+    def _get_positional_postings(self, term: str):
+        """(doc_ids, tfs, positions) của term trong index gốc (None nếu không có)."""
+        ordinal = self.term_dict.ordinal(term)
+        if ordinal is None:
+            return None
+        _, offset, length = self.term_dict.entry(ordinal)
+        self.postings_file.seek(offset)
+        doc_ids, tfs = decode_postings(self.postings_file.read(length), self.num_fields, self.block_size)
+        return doc_ids, tfs, self.positions.get(ordinal, tfs)
+    
+    def match_phrase(self, tokens: List[str], slop: int = 0) -> np.ndarray:
+        """
+        doc_ids (tăng dần) chứa các tokens theo đúng thứ tự, chen giữa tối đa
+        slop vị trí - đánh giá trực tiếp trên index vị trí của index gốc và
+        từng segment.
+        """
+        sources = [self._get_positional_postings] + [seg.get_positional_postings for seg in self.segments]
+        matched = []
+        for get_postings in sources:
+            terms = []
+            for token in tokens:
+                postings = get_postings(token)
+                if postings is None:
+                    break
+                terms.append(postings)
+            else:
+                matched.append(match_phrase(terms, slop))
+        return np.concatenate(matched) if matched else np.empty(0, dtype=np.int32)
+    
+    def _get_postings(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
         """
         Đọc postings list cho 1 term từ binary file.
         Random file seek O(1).
+        
+        Returns:
+            (doc_ids, tfs): 2 mảng NumPy cùng độ dài, doc_ids tăng dần.
+            Index cũ (pickle) cũng được chuyển về cùng dạng này.
         """
         if term not in self.term_dict:
             return None
@@ -165,23 +694,50 @@ class BM25Searcher:
         df, offset, length = self.term_dict[term]
         self.postings_file.seek(offset)
         postings_bytes = self.postings_file.read(length)
-        return pickle.loads(postings_bytes)
+        if self.postings_compressed:
+            return decode_postings(postings_bytes, self.num_fields, self.block_size)
+        return postings_from_pairs(pickle.loads(postings_bytes))
+    
+    def get_postings_blocks(self, term: str) -> Optional[PostingsBlocks]:
+        """
+        Skip table của term trong index gốc: nhảy tới doc_id bất kỳ và chỉ
+        decode các block cần (postings.bin được mmap, không đọc cả list).
+        None nếu không có term hoặc postings là pickle cũ.
+        """
+        entry = self.term_dict.get(term)
+        if entry is None or not self.postings_compressed:
+            return None
+        if self._postings_mmap is None:
+            self._postings_mmap = mmap.mmap(self.postings_file.fileno(), 0, access=mmap.ACCESS_READ)
+        _, offset, length = entry
+        return PostingsBlocks(memoryview(self._postings_mmap)[offset:offset + length],
+                              self.num_fields, self.block_size)
+    
+    def _read_doc_line(self, doc_id: int) -> Optional[bytes]:
+        """Dòng JSON gốc của document: JSONL gốc hoặc docs.jsonl của segment."""
+        for segment in self.segments:
+            if segment.contains_doc(doc_id):
+                return segment.read_doc_line(doc_id)
+        
+        if self.doc_offsets is None or not self.jsonl_file:
+            return None
+        if not 0 <= doc_id < len(self.doc_offsets):
+            return None
+        byte_offset = int(self.doc_offsets[doc_id])
+        if byte_offset < 0:
+            return None
+        self.jsonl_file.seek(byte_offset)
+        return self.jsonl_file.readline()
     
     def _get_doc_metadata(self, doc_id: int) -> dict:
         """
         Đọc metadata của 1 document từ file JSONL gốc.
         Sử dụng byte offset để seek trực tiếp (không scan toàn bộ file).
         """
-        if not self.doc_offsets or not self.jsonl_file:
-            return {}
-        
-        if doc_id not in self.doc_offsets:
-            return {}
-        
         try:
-            byte_offset = self.doc_offsets[doc_id]
-            self.jsonl_file.seek(byte_offset)
-            raw_line = self.jsonl_file.readline()
+            raw_line = self._read_doc_line(doc_id)
+            if raw_line is None:
+                return {}
             line = raw_line.decode("utf-8", errors="ignore")
             doc = json.loads(line)
             
@@ -221,10 +777,10 @@ class BM25Searcher:
         Công thức IDF theo BM25 (Robertson-Sparck Jones):
             IDF(t) = log((N - df(t) + 0.5) / (df(t) + 0.5) + 1)
         """
-        if term not in self.term_dict:
+        df = self._document_frequency(term)
+        if df == 0:
             return 0.0
         
-        df = self.term_dict[term][0]
         N = self.total_docs
         idf = math.log((N - df + 0.5) / (df + 0.5) + 1)
         return idf
@@ -240,7 +796,10 @@ class BM25Searcher:
         tf_component = (tf * (self.k1 + 1)) / (tf + self.k1 * length_norm)
         return tf_component
     
-    def search(self, query: str, top_k: int = 10) -> List[Tuple[int, float, dict]]:
+    def search(self, query: str, top_k: int = 10,
+               field_weights: Optional[Dict[str, float]] = None,
+               scorer: Optional[str] = None,
+               min_should_match=None) -> List[Tuple[int, float, dict]]:
         """
         Tìm kiếm và xếp hạng documents theo BM25.
         
@@ -253,108 +812,806 @@ class BM25Searcher:
         Tối ưu: Skip terms quá phổ biến (df > 30% corpus) vì:
         - IDF rất thấp → đóng góp score không đáng kể
         - Postings list cực lớn (hàng triệu entries) → unpickle rất chậm
+        
+        Phrase "..." / proximity "..."~N (cần index vị trí): chỉ giữ documents
+        khớp mọi cụm từ; các từ trong cụm vẫn được chấm điểm BM25 như thường.
+        
+        field_weights: trọng số trường cho riêng truy vấn này (BM25F, vd.
+        {"company_name": 3.0}); trường không nêu giữ trọng số mặc định.
+        Bị bỏ qua với index 1 text gộp.
+        
+        Impacts 8-bit (nếu có và tham số khớp): postings index gốc dùng điểm
+        tính sẵn, cộng dồn + top-k trên mảng NumPy theo doc_id.
+        
+        scorer: bộ chấm điểm cho riêng truy vấn này (xem SCORERS), mặc định
+        self.scorer. last_scorer cho biết bộ nào đã trả lời ("maxscore" quay
+        về "numpy" khi index không có cận trên, "bmw" khi không dùng được impacts).
+        
+        min_should_match: chỉ trả về doc khớp ít nhất bấy nhiêu query term
+        (MATCH_ALL = AND, xem resolve_min_should_match), mặc định
+        self.min_should_match. Postings được giao từ list ngắn nhất (tra list
+        dài qua skip table, xem _search_conjunctive); nếu < top_k doc thoả
+        thì quay về OR. last_min_match = số term đã áp dụng (None: OR).
         """
+        scorer = scorer or self.scorer
+        if scorer not in SCORERS:
+            raise ValueError(f"Unknown scorer {scorer!r}, expected one of {SCORERS}")
         if not self._loaded:
             self.load_index()
+        elif self.auto_refresh:
+            self.refresh_segments()
         
         search_start = time.time()
+        self.last_suggestion = None
+        
+        field_params = self._field_params(field_weights) if self.fields else None
         
-        query_tokens = self._tokenize_query(query)
+        phrases, query_text = self._parse_phrases(query)
+        query_tokens = self._tokenize_query(query_text)
         if not query_tokens:
             return []
         
+        # Token gõ sai -> term gần nhất trong index
+        corrections = self._fuzzy_corrections(query_tokens)
+        if corrections:
+            query_tokens = list(dict.fromkeys(corrections.get(t, (t, 0))[0] for t in query_tokens))
+            self.last_suggestion = self._suggestion(query_text, corrections)
+        
+        # Phrase / proximity: tập doc_id được phép (lọc TRƯỚC khi truncate postings)
+        allowed = None
+        if phrases and not self.has_positions:
+            print("  ⚠ No positional index (build with spimi.py --positions): "
+                  "phrases treated as plain terms")
+        elif phrases:
+            for tokens, slop in phrases:
+                matched = self.match_phrase(tokens, slop)
+                allowed = matched if allowed is None else np.intersect1d(allowed, matched, assume_unique=True)
+            if not allowed.size:
+                self.last_match_count = 0
+                return []
+        
         # Ngưỡng df tối đa: term xuất hiện > 80% corpus mới bị bỏ qua (thay vì 30%)
         # Vì các từ như "xây dựng" rất quan trọng nhưng lại phổ biến trong dữ liệu doanh nghiệp.
         max_df = int(self.total_docs * 0.8)
+        scored_terms, skipped_terms = self._scored_terms(query_tokens, max_df)
         
-        # Precompute constants for the hot loop
-        doc_scores = defaultdict(float)
-        skipped_terms = []
-        k1 = self.k1
-        b = self.b
-        avgdl = self.avg_doc_length
-        k1_plus_1 = k1 + 1
+        deletions = self.deletions if self.deletions is not None and self.deletions.count else None
+        use_impacts = self._impacts_usable(field_params)
         
-        # Coordination Factor: Đếm xem mỗi doc_id chứa bao nhiêu query terms khác nhau
-        # để ưu tiên các kết quả khớp NHIỀU từ khoá hơn (tránh việc chỉ khớp 1 từ rồi trồi lên đầu).
-        doc_term_matches = defaultdict(int)
+        # AND / minimum-should-match: giao postings; không đủ top_k doc -> OR
+        tiered = None
+        self.last_min_match = None
+        if min_should_match is None:
+            min_should_match = self.min_should_match
+        if min_should_match is not None and top_k > 0:
+            required = resolve_min_should_match(min_should_match, len(scored_terms))
+            if required > 1:
+                tiered = self._search_conjunctive(scored_terms, required, top_k, field_params,
+                                                  deletions, allowed, use_impacts)
+                if tiered is not None:
+                    self.last_min_match = required
         
+        # Tầng champion: trả lời ngay nếu chứng minh được top-k, ngược lại postings đầy đủ
+        if tiered is None and use_impacts and self.champions is not None and top_k > 0:
+            tiered = self._search_champions(scored_terms, top_k, field_params, deletions, allowed)
+        self.last_tier = "champions" if tiered is not None and self.last_min_match is None else "full"
+        self.last_scorer = None if tiered is not None else scorer
+        self.last_decoded = None
+        
+        if tiered is None and scorer == "maxscore":
+            tiered = self._search_maxscore(scored_terms, top_k, field_params, deletions,
+                                           allowed, use_impacts)
+            if tiered is None:
+                self.last_scorer = scorer = "numpy"
+        elif tiered is None and scorer == "bmw":
+            tiered = self._search_block_max(scored_terms, top_k, field_params, deletions,
+                                            allowed, use_impacts)
+            if tiered is None:
+                self.last_scorer = scorer = "numpy"
+        
+        if tiered is not None:
+            top_docs, match_count = tiered
+        else:
+            top_docs, match_count = self._search_full(scored_terms, top_k, field_params,
+                                                      deletions, allowed, use_impacts, scorer)
+        
+        # Gắn metadata (đọc on-demand từ JSONL)
+        results = []
+        for doc_id, score in top_docs:
+            metadata = self._get_doc_metadata(doc_id)
+            results.append((doc_id, score, metadata))
+        
+        search_time = time.time() - search_start
+        
+        print(f"\n  Query: \"{query}\"")
+        print(f"  Tokens: {query_tokens}")
+        if skipped_terms:
+            print(f"  Skipped (too common): {', '.join(skipped_terms)}")
+        if self.last_suggestion:
+            print(f"  Did you mean: {self.last_suggestion}")
+        self.last_match_count = match_count
+        if self.last_min_match is not None:
+            matched_label = f" (>= {self.last_min_match}/{len(scored_terms)} terms)"
+        else:
+            matched_label = " (champion lists)" if self.last_tier == "champions" else ""
+        print(f"  Documents matched: {self.last_match_count:,}{matched_label}")
+        print(f"  Search time: {search_time*1000:.1f}ms")
+        
+        return results
+    
+    def _scored_terms(self, query_tokens: List[str], max_df: int):
+        """
+        Các term được chấm điểm: [(term, df, idf)] theo thứ tự query, và các
+        term bị bỏ vì quá phổ biến (df > max_df, chỉ khi query > 2 tokens).
+        """
+        scored_terms = []
+        skipped_terms = []
         for term in query_tokens:
-            if term not in self.term_dict:
+            df = self._document_frequency(term)
+            if df == 0:
                 continue
             
-            df = self.term_dict[term][0]
-            
             # Skip terms quá phổ biến (df > 80%)
             if df > max_df and len(query_tokens) > 2:
                 skipped_terms.append(f"{term}(df={df:,d})")
                 continue
             
             idf = self.compute_idf(term)
-            if idf <= 0:
-                continue
-            
-            postings = self._get_postings(term)
+            if idf > 0:
+                scored_terms.append((term, df, idf))
+        return scored_terms, skipped_terms
+    
+    @staticmethod
+    def _filter_postings(doc_ids, tfs, impacts, deletions, allowed):
+        """Bỏ doc đã xoá và doc không khớp phrase (impacts có thể None)."""
+        keep = None
+        if deletions is not None:
+            live = deletions.live_mask(doc_ids)
+            if not live.all():
+                keep = live
+        if allowed is not None:
+            in_allowed = np.isin(doc_ids, allowed, assume_unique=True)
+            keep = in_allowed if keep is None else keep & in_allowed
+        if keep is None:
+            return doc_ids, tfs, impacts
+        return doc_ids[keep], tfs[keep], impacts[keep] if impacts is not None else None
+    
+    def _term_contributions(self, idf, doc_ids, tfs, doc_norms, doc_start, impacts,
+                            field_params) -> np.ndarray:
+        """Đóng góp điểm của 1 postings list cho từng doc_id của nó."""
+        if impacts is not None:
+            # Index gốc: đóng góp = idf * scale * impact (không tính lại TF)
+            return (idf * self.impacts.scale) * impacts
+        local_ids = doc_ids - doc_start if doc_start else doc_ids
+        if field_params is not None:
+            field_tfs = self.compute_field_tf(tfs, doc_norms[local_ids], field_params)
+            return idf * (field_tfs * (self.k1 + 1) / (self.k1 + field_tfs))
+        return idf * bm25_tf_component(tfs, doc_norms[local_ids], self.k1)
+    
+    def _accumulate_dense(self, dense_scores, dense_matches, idf, doc_ids, tfs, doc_norms,
+                          doc_start, impacts, field_params):
+        """Cộng đóng góp của 1 postings list vào mảng điểm / số term khớp theo doc_id."""
+        dense_scores[doc_ids] += self._term_contributions(idf, doc_ids, tfs, doc_norms, doc_start,
+                                                          impacts, field_params)
+        dense_matches[doc_ids] += 1
+    
+    def _accumulate_segments(self, dense_scores, dense_matches, term: str, idf: float,
+                             field_params, deletions, allowed):
+        """Cộng dồn postings của term trên mọi segment (tính chính xác, không impacts)."""
+        for segment in self.segments:
+            postings = segment.get_postings(term)
             if postings is None:
                 continue
-            
-            # Truncate postings nếu quá lớn (tối ưu tốc độ)
+            seg_ids, seg_tfs, _ = self._filter_postings(postings[0], postings[1], None,
+                                                        deletions, allowed)
+            if len(seg_ids):
+                norms = segment.field_lengths if self.fields else segment.doc_norms
+                self._accumulate_dense(dense_scores, dense_matches, idf, seg_ids, seg_tfs,
+                                       norms, segment.doc_start, None, field_params)
+    
+    def _doc_space(self) -> int:
+        """Kích thước mảng theo doc_id (index gốc + segments)."""
+        return max([len(self.doc_lengths)] + [seg.doc_end for seg in self.segments])
+    
+    def _dense_accumulators(self, num_terms: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Mảng điểm (float64) + số term khớp theo doc_id. Số term khớp là uint8
+        khi đủ chứa (< 256 term): 1 byte/doc thay vì 4 khi zero-fill 1.8M doc.
+        Điểm giữ float64 để cộng dồn giống hệt từng bước của vòng lặp Python.
+        """
+        doc_space = self._doc_space()
+        match_dtype = np.uint8 if num_terms < 256 else np.int32
+        return np.zeros(doc_space, dtype=np.float64), np.zeros(doc_space, dtype=match_dtype)
+    
+    @staticmethod
+    def _dense_top_k(dense_scores, dense_matches, num_query_tokens: int, top_k: int):
+        """Coordination factor + top-k trên mảng (hoà điểm: doc_id nhỏ trước)."""
+        matched_ids = np.flatnonzero(dense_matches)
+        scores = dense_scores[matched_ids]
+        if num_query_tokens > 0:
+            scores *= coordination_factor(dense_matches[matched_ids], num_query_tokens)
+        order = top_k_order(scores, top_k, matched_ids)
+        return list(zip(matched_ids[order].tolist(), scores[order].tolist())), len(matched_ids)
+    
+    def _search_full(self, scored_terms, top_k: int, field_params, deletions, allowed,
+                     use_impacts: bool, scorer: str = "numpy"):
+        """
+        Chấm điểm trên postings đầy đủ (cắt MAX_MATCHES postings mỗi term).
+        
+        Impacts hoặc scorer="numpy": term-at-a-time trên mảng dense theo
+        doc_id (_accumulate_dense); scorer="loop": vòng lặp Python theo posting.
+        
+        Returns:
+            (top_docs [(doc_id, score)], số doc khớp)
+        """
+        # Precompute constants for the hot loop
+        doc_scores = defaultdict(float)
+        k1 = self.k1
+        k1_plus_1 = k1 + 1
+        
+        # Coordination Factor: Đếm xem mỗi doc_id chứa bao nhiêu query terms khác nhau
+        # để ưu tiên các kết quả khớp NHIỀU từ khoá hơn (tránh việc chỉ khớp 1 từ rồi trồi lên đầu).
+        doc_term_matches = defaultdict(int)
+        
+        # Impacts 8-bit / scorer numpy: cộng dồn điểm / số term khớp trên mảng theo doc_id
+        dense = use_impacts or scorer != "loop"
+        if dense:
+            dense_scores, dense_matches = self._dense_accumulators(len(scored_terms))
+        
+        for term, df, idf in scored_terms:
+            # Truncate postings nếu quá lớn (tối ưu tốc độ), tính trên cả các segments
             MAX_MATCHES = 400000
-            if len(postings) > MAX_MATCHES:
-                postings = postings[:MAX_MATCHES]
-            
-            if not postings:
-                continue
+            remaining = MAX_MATCHES
             
-            # Hot loop - Optimized: Inlined compute_tf_component
-            for doc_id, tf in postings:
-                doc_length = self.doc_lengths.get(doc_id, avgdl)
-                # BM25 TF component
-                length_norm = 1 - b + b * (doc_length / avgdl)
-                tf_comp = (tf * k1_plus_1) / (tf + k1 * length_norm)
+            for doc_ids, tfs, doc_norms, doc_start, impacts in self._iter_postings(term, use_impacts):
+                # Bỏ doc đã xoá TRƯỚC khi truncate để không mất chỗ của doc còn sống
+                doc_ids, tfs, impacts = self._filter_postings(doc_ids, tfs, impacts, deletions, allowed)
                 
-                doc_scores[doc_id] += idf * tf_comp
-                doc_term_matches[doc_id] += 1
+                if len(doc_ids) > remaining:
+                    doc_ids = doc_ids[:remaining]
+                    tfs = tfs[:remaining]
+                    if impacts is not None:
+                        impacts = impacts[:remaining]
+                remaining -= len(doc_ids)
+                
+                if not len(doc_ids):
+                    continue
+                
+                if dense:
+                    self._accumulate_dense(dense_scores, dense_matches, idf, doc_ids, tfs,
+                                           doc_norms, doc_start, impacts, field_params)
+                    continue
+                
+                local_ids = doc_ids - doc_start if doc_start else doc_ids
+                
+                if field_params is not None:
+                    # BM25F: tf~ gộp các trường (vectorized), bão hoà 1 lần
+                    field_tfs = self.compute_field_tf(tfs, doc_norms[local_ids], field_params)
+                    tf_comps = field_tfs * k1_plus_1 / (k1 + field_tfs)
+                    for doc_id, tf_comp in zip(doc_ids.tolist(), tf_comps.tolist()):
+                        doc_scores[doc_id] += idf * tf_comp
+                        doc_term_matches[doc_id] += 1
+                    continue
+                
+                # Length norm tính sẵn theo doc_id: 1 lần gather thay vì dict.get mỗi posting
+                length_norms = doc_norms[local_ids].tolist()
+                
+                # Hot loop - Optimized: Inlined compute_tf_component
+                for doc_id, tf, length_norm in zip(doc_ids.tolist(), tfs.tolist(), length_norms):
+                    # BM25 TF component
+                    tf_comp = (tf * k1_plus_1) / (tf + k1 * length_norm)
+                    
+                    doc_scores[doc_id] += idf * tf_comp
+                    doc_term_matches[doc_id] += 1
         
-        # Lọc ra danh sách các valid tokens thực sự được đưa vào chấm điểm
-        valid_tokens = []
-        for t in query_tokens:
-            if t not in self.term_dict:
-                continue
-            df = self.term_dict[t][0]
-            if df > max_df and len(query_tokens) > 2:
-                continue
-            if self.compute_idf(t) > 0:
-                valid_tokens.append(t)
+        num_query_tokens = len(scored_terms)
+        if dense:
+            return self._dense_top_k(dense_scores, dense_matches, num_query_tokens, top_k)
         
-        num_query_tokens = len(valid_tokens)
         if num_query_tokens > 0:
             for doc_id in doc_scores:
-                n_matched = doc_term_matches[doc_id]
-                coordination_factor = n_matched / num_query_tokens
-                doc_scores[doc_id] *= (coordination_factor ** 1.5)
+                doc_scores[doc_id] *= coordination_factor(doc_term_matches[doc_id], num_query_tokens)
         
-        # Top-k
-        sorted_docs = sorted(doc_scores.items(), key=lambda x: x[1], reverse=True)
-        top_docs = sorted_docs[:top_k]
+        # Top-k (heap k phần tử thay vì sắp xếp mọi doc khớp)
+        return top_k_items(doc_scores.items(), top_k, key=lambda x: x[1]), len(doc_scores)
+    
+    def _search_champions(self, scored_terms, top_k: int, field_params, deletions, allowed):
+        """
+        Tầng champion (impacts + champion lists, không cắt MAX_MATCHES).
         
-        # Gắn metadata (đọc on-demand từ JSONL)
-        results = []
-        for doc_id, score in top_docs:
-            metadata = self._get_doc_metadata(doc_id)
-            results.append((doc_id, score, metadata))
+        Term có champion list chỉ đóng góp các posting trong list; doc ngoài
+        list đóng góp tối đa u_t = idf * scale * floor_t cho term đó. Với mỗi
+        doc ứng viên (c = coordination_factor):
+            cận dưới = S * c(M)                (term chưa biết coi như không có)
+            cận trên = (S + Σ u_t) * c(M + số term chưa biết)
+        Doc không nằm trong list nào: cận trên = Σ u_t * c(số term champion).
         
-        search_time = time.time() - search_start
+        Ứng viên có cận trên >= điểm thứ k (theo cận dưới) được tra chính xác
+        các term còn thiếu qua skip table (PostingsBlocks.find_postings). Sau
+        đó nếu mọi doc chưa biết hết vẫn có cận trên < điểm thứ k thì top-k là
+        chính xác.
         
-        print(f"\n  Query: \"{query}\"")
-        print(f"  Tokens: {query_tokens}")
-        if skipped_terms:
-            print(f"  Skipped (too common): {', '.join(skipped_terms)}")
-        self.last_match_count = len(doc_scores)
-        print(f"  Documents matched: {self.last_match_count:,}")
-        print(f"  Search time: {search_time*1000:.1f}ms")
+        Returns:
+            (top_docs, số doc khớp ước lượng) hoặc None nếu không chứng minh
+            được top-k (-> postings đầy đủ)
+        """
+        num_query_tokens = len(scored_terms)
+        doc_space = self._doc_space()
+        base_docs = len(self.doc_lengths)
+        dense_scores, dense_matches = self._dense_accumulators(num_query_tokens)
+        scale = self.impacts.scale
+        tiers = []  # (term, ordinal, idf, u_t, known: bool[doc_space])
         
-        return results
+        champions = [self.champions.get(self.term_dict.ordinal(term)) for term, _, _ in scored_terms]
+        if all(champion is None for champion in champions):
+            return None  # Không có term df lớn: postings đầy đủ cũng nhanh như vậy
+        
+        for (term, df, idf), champion in zip(scored_terms, champions):
+            if champion is None:
+                for doc_ids, tfs, doc_norms, doc_start, impacts in self._iter_postings(term, True):
+                    doc_ids, tfs, impacts = self._filter_postings(doc_ids, tfs, impacts, deletions, allowed)
+                    if len(doc_ids):
+                        self._accumulate_dense(dense_scores, dense_matches, idf, doc_ids, tfs,
+                                               doc_norms, doc_start, impacts, field_params)
+                continue
+            
+            doc_ids, impacts, floor = champion
+            doc_ids, _, impacts = self._filter_postings(doc_ids, doc_ids, impacts, deletions, allowed)
+            dense_scores[doc_ids] += (idf * scale) * impacts
+            dense_matches[doc_ids] += 1
+            known = np.zeros(doc_space, dtype=bool)
+            known[doc_ids] = True
+            known[base_docs:] = True  # segments: luôn đọc postings đầy đủ
+            tiers.append((term, self.term_dict.ordinal(term), idf, idf * scale * floor, known))
+            for segment in self.segments:
+                postings = segment.get_postings(term)
+                if postings is None:
+                    continue
+                seg_ids, seg_tfs, _ = self._filter_postings(postings[0], postings[1], None,
+                                                            deletions, allowed)
+                if len(seg_ids):
+                    norms = segment.field_lengths if self.fields else segment.doc_norms
+                    self._accumulate_dense(dense_scores, dense_matches, idf, seg_ids, seg_tfs,
+                                           norms, segment.doc_start, None, field_params)
+        
+        def bounds(ids):
+            unknown_sum = np.zeros(len(ids))
+            unknown_count = np.zeros(len(ids), dtype=np.int32)
+            for _, _, _, bound, known in tiers:
+                missing = ~known[ids]
+                unknown_sum += bound * missing
+                unknown_count += missing
+            scores = dense_scores[ids]
+            matches = dense_matches[ids]
+            lower = scores * coordination_factor(matches, num_query_tokens)
+            upper = (scores + unknown_sum) \
+                * coordination_factor(matches + unknown_count, num_query_tokens)
+            return lower, upper, unknown_count
+        
+        candidates = np.flatnonzero(dense_matches)
+        if len(candidates) < top_k:
+            return None
+        lower, upper, unknown_count = bounds(candidates)
+        threshold = kth_largest(lower, top_k)
+        outside = sum(bound for _, _, _, bound, _ in tiers) \
+            * coordination_factor(len(tiers), num_query_tokens)
+        # Tra thêm chỉ nâng điểm thứ k tới tối đa điểm thứ k theo cận trên: bỏ cuộc sớm nếu vẫn không đủ
+        if threshold <= 0 or outside > kth_largest(upper, top_k):
+            return None
+        
+        # Tra chính xác các term còn thiếu của ứng viên sát ngưỡng
+        resolve = candidates[(unknown_count > 0) & (upper >= threshold)]
+        if len(resolve) > CHAMPION_RESOLVE_LIMIT:
+            return None
+        for term, ordinal, idf, _, known in tiers:
+            targets = resolve[~known[resolve]]
+            if not len(targets):
+                continue
+            positions = self.get_postings_blocks(term).find_postings(targets)
+            found = positions >= 0
+            term_impacts = self.impacts.get(ordinal)
+            dense_scores[targets[found]] += (idf * scale) * term_impacts[positions[found]]
+            dense_matches[targets[found]] += 1
+            known[targets] = True
+        
+        lower, upper, unknown_count = bounds(candidates)
+        threshold = kth_largest(lower, top_k)
+        pending = unknown_count > 0
+        if pending.any() and upper[pending].max() >= threshold:
+            return None
+        # 1 term: doc ngoài list có impact = floor có doc_id lớn hơn mọi doc cùng
+        # impact trong list (select_champions) -> hoà điểm vẫn xếp sau, được phép bằng
+        if outside > threshold or (outside == threshold and num_query_tokens > 1):
+            return None
+        
+        exact_ids = candidates[~pending]
+        scores = lower[~pending]
+        order = top_k_order(scores, top_k, exact_ids)
+        top_docs = list(zip(exact_ids[order].tolist(), scores[order].tolist()))
+        return top_docs, self._match_count_lower_bound(len(candidates), scored_terms)
+    
+    def _split_by_df(self, scored_terms, min_df: int):
+        """
+        (list ngắn, list dài) các term có trong index gốc theo df của index
+        gốc (< min_df: ngắn), mỗi phần tử (term, idf, ordinal). Dùng cho các
+        tầng cắt tỉa (MaxScore, Block-Max WAND): không có list dài thì cộng
+        dồn hết cũng nhanh như vậy -> caller trả None (scorer numpy).
+        """
+        short_terms, long_terms = [], []
+        for term, _, idf in scored_terms:
+            entry = self.term_dict.get(term)
+            if entry is not None:
+                (short_terms if entry[0] < min_df else long_terms).append(
+                    (term, idf, self.term_dict.ordinal(term)))
+        return short_terms, long_terms
+    
+    @staticmethod
+    def _match_count_lower_bound(seen: int, scored_terms) -> int:
+        """
+        Số doc khớp khi tầng cắt tỉa không đọc hết postings (không đếm chính
+        xác được): cận dưới = max(số doc đã gặp, df lớn nhất).
+        """
+        return max(seen, max(df for _, df, _ in scored_terms))
+    
+    def _term_upper_bound(self, ordinal: int, idf: float, field_params, use_impacts: bool) -> float:
+        """Cận trên đóng góp của 1 term (index gốc) cho 1 doc bất kỳ."""
+        if use_impacts:
+            impacts = self.impacts.get(ordinal)
+            return (idf * self.impacts.scale) * float(impacts.max()) if impacts.size else 0.0
+        if field_params is not None:
+            return idf * self.term_bounds.field_tf_bound(ordinal, self.k1, *field_params)
+        return idf * self.term_bounds.tf_bound(ordinal, self.k1, self.b, self.avg_doc_length)
+    
+    def _probe_term(self, term: str, ordinal: int, idf: float, targets: np.ndarray,
+                    field_params, use_impacts: bool) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Đóng góp của term cho các doc targets (index gốc, tăng dần) qua skip
+        table: chỉ decode các block chứa targets. Nhiều targets (chạm phần
+        lớn các block): decode cả list 1 lần và lọc bằng mặt nạ theo doc_id.
+        
+        Returns:
+            (doc_ids có term, đóng góp tương ứng)
+        """
+        blocks = self.get_postings_blocks(term)
+        if len(targets) * 8 > blocks.num_blocks:
+            doc_ids, tfs = blocks.decode_blocks(0)
+            wanted = np.zeros(self._doc_space(), dtype=bool)
+            wanted[targets] = True
+            found = wanted[doc_ids]
+            doc_ids, tfs = doc_ids[found], tfs[found]
+            impacts = self.impacts.get(ordinal)[found] if use_impacts else None
+        elif use_impacts:
+            positions = blocks.find_postings(targets)
+            found = positions >= 0
+            doc_ids, impacts = targets[found], self.impacts.get(ordinal)[positions[found]]
+        else:
+            positions, tfs = blocks.lookup(targets)
+            found = positions >= 0
+            doc_ids, tfs = targets[found], tfs[found]
+        if use_impacts:
+            return doc_ids, (idf * self.impacts.scale) * impacts
+        if field_params is not None:
+            field_tfs = self.compute_field_tf(tfs, self.field_lengths[doc_ids], field_params)
+            return doc_ids, idf * (field_tfs * (self.k1 + 1) / (self.k1 + field_tfs))
+        return doc_ids, idf * bm25_tf_component(tfs, self.doc_norms[doc_ids], self.k1)
+    
+    def _search_maxscore(self, scored_terms, top_k: int, field_params, deletions, allowed,
+                         use_impacts: bool):
+        """
+        MaxScore trên mảng dense theo doc_id (không cắt MAX_MATCHES).
+        
+        U_t = cận trên đóng góp của term t cho 1 doc (term_bounds.npy, hoặc
+        impact lớn nhất của term khi dùng impacts); c = coordination_factor.
+        Term có list ngắn (< MAXSCORE_MIN_DF, _split_by_df) được cộng dồn trước, các term
+        còn lại được xét theo U_t giảm dần:
+        - Term "essential" được cộng dồn cả postings list (như scorer numpy).
+        - Khi còn lại các term R: doc chưa gặp chỉ có thể khớp R nên điểm
+          <= Σ_R U_t * c(|R|). Nếu giá trị này < θ (điểm thứ k theo cận dưới
+          S * c(M) của các doc đã gặp) thì dừng: các term trong R không cần
+          đọc hết, chỉ tra (PostingsBlocks.lookup) cho ứng viên có cận trên
+              (S + Σ U_t chưa tra) * c(M + số term chưa tra) >= θ
+          ứng viên còn lại bị loại (không thể vào top-k).
+        Để θ tăng sớm, trước mỗi lần kiểm tra top_k ứng viên có cận trên cao
+        nhất được tra đủ mọi term còn lại (điểm chính xác).
+        
+        Term (và doc) của segments không có cận trên: luôn đọc postings đầy đủ.
+        
+        Returns:
+            (top_docs, số doc khớp ước lượng) hoặc None nếu index không có cận
+            trên / skip table hoặc không có list dài (-> scorer numpy)
+        """
+        if top_k <= 0 or not self.postings_compressed or (self.term_bounds is None and not use_impacts):
+            return None
+        short_terms, long_terms = self._split_by_df(scored_terms, MAXSCORE_MIN_DF)
+        if not long_terms:
+            return None
+        num_query_tokens = len(scored_terms)
+        base_docs = len(self.doc_lengths)
+        dense_scores, dense_matches = self._dense_accumulators(num_query_tokens)
+        # Doc đã có điểm chính xác (hoặc đã bị loại): không cộng / tra thêm
+        done = np.zeros(len(dense_scores), dtype=bool)
+        done[base_docs:] = True  # segments: luôn đọc postings đầy đủ
+        base_norms = self.field_lengths if self.fields else self.doc_norms
+        
+        for term, _, idf in scored_terms:
+            self._accumulate_segments(dense_scores, dense_matches, term, idf, field_params,
+                                      deletions, allowed)
+        # (U_t, term, ordinal, idf); list dài theo U_t giảm dần
+        short_terms, long_terms = (
+            [(self._term_upper_bound(ordinal, idf, field_params, use_impacts), term, ordinal, idf)
+             for term, idf, ordinal in group]
+            for group in (short_terms, long_terms))
+        long_terms.sort(key=lambda x: -x[0])
+        terms = short_terms + long_terms
+        
+        def threshold():
+            """θ = điểm thứ k theo cận dưới (0 nếu chưa đủ k doc)."""
+            candidates = np.flatnonzero(dense_matches)
+            lower = dense_scores[candidates] * coordination_factor(dense_matches[candidates], num_query_tokens)
+            return kth_largest(lower, top_k)
+        
+        def pending_bounds(rest):
+            """Doc đã gặp nhưng chưa chính xác + cận trên nếu khớp mọi term trong rest."""
+            pending = np.flatnonzero((dense_matches > 0) & ~done)
+            upper = (dense_scores[pending] + sum(u for u, _, _, _ in rest)) \
+                * coordination_factor(dense_matches[pending] + len(rest), num_query_tokens)
+            return pending, upper
+        
+        def probe(targets, term, ordinal, idf):
+            doc_ids, contributions = self._probe_term(term, ordinal, idf, targets,
+                                                      field_params, use_impacts)
+            dense_scores[doc_ids] += contributions
+            dense_matches[doc_ids] += 1
+        
+        # Term essential: cộng dồn cả postings list cho tới khi các term còn
+        # lại không thể đưa doc chưa gặp vào top-k
+        essential = 0
+        while essential < len(terms):
+            rest = terms[essential:]
+            # Chỉ dừng được sau khi đã cộng dồn mọi list ngắn (và đã có ứng viên)
+            if essential and essential >= len(short_terms):
+                outside = sum(u for u, _, _, _ in rest) * coordination_factor(len(rest), num_query_tokens)
+                theta = threshold()
+                if outside >= theta:
+                    pending, upper = pending_bounds(rest)
+                    exact = np.flatnonzero(done & (dense_matches > 0))
+                    exact_lower = dense_scores[exact] \
+                        * coordination_factor(dense_matches[exact], num_query_tokens)
+                    # Tra thêm chỉ nâng θ tới tối đa điểm thứ k theo cận trên: bỏ qua nếu vẫn không dừng được
+                    if outside < kth_largest(np.concatenate((upper, exact_lower)), top_k):
+                        best = pending[top_k_order(upper, top_k)]
+                        for _, term, ordinal, idf in rest:
+                            probe(best, term, ordinal, idf)
+                        done[best] = True
+                        theta = threshold()
+                if outside < theta:
+                    break
+            _, term, ordinal, idf = rest[0]
+            doc_ids, tfs = self._get_postings(term)
+            impacts = self.impacts.get(ordinal) if use_impacts else None
+            doc_ids, tfs, impacts = self._filter_postings(doc_ids, tfs, impacts, deletions, allowed)
+            keep = ~done[doc_ids]
+            if not keep.all():
+                doc_ids, tfs = doc_ids[keep], tfs[keep]
+                impacts = impacts[keep] if impacts is not None else None
+            if len(doc_ids):
+                self._accumulate_dense(dense_scores, dense_matches, idf, doc_ids, tfs,
+                                       base_norms, 0, impacts, field_params)
+            essential += 1
+        
+        # Term không essential: chỉ tra cho ứng viên còn có thể vào top-k
+        rest = terms[essential:]
+        for i, (_, term, ordinal, idf) in enumerate(rest):
+            pending, upper = pending_bounds(rest[i:])
+            alive = upper >= threshold()
+            done[pending[~alive]] = True
+            if alive.any():
+                probe(pending[alive], term, ordinal, idf)
+        
+        top_docs, match_count = self._dense_top_k(dense_scores, dense_matches, num_query_tokens, top_k)
+        if rest:  # Doc chỉ khớp term không essential không được đếm
+            match_count = self._match_count_lower_bound(match_count, scored_terms)
+        return top_docs, match_count
+    
+    def _search_block_max(self, scored_terms, top_k: int, field_params, deletions, allowed,
+                          use_impacts: bool):
+        """
+        Block-Max WAND trên impacts (không cắt MAX_MATCHES, xem block_max.py).
+        
+        Term có list ngắn (< BLOCK_MAX_MIN_DF, _split_by_df) được cộng dồn trước, các doc
+        gặp được tra (BlockMaxWAND.lookup) đủ các list dài -> điểm chính xác.
+        Doc còn lại chỉ có thể khớp list dài: cận trên của 1 block = idf *
+        scale * impact lớn nhất của block, các khoảng doc_id được duyệt theo
+        cận trên giảm dần, θ = điểm thứ k của các doc đã chấm (mọi doc đã chấm
+        đều có điểm chính xác). Segments (không có impacts) luôn được cộng dồn
+        cả list từ đầu.
+        
+        Returns:
+            (top_docs, số doc khớp ước lượng) hoặc None nếu không dùng được
+            impacts / skip table hoặc không có list dài (-> scorer numpy)
+        """
+        if top_k <= 0 or not use_impacts or not self.postings_compressed:
+            return None
+        short_terms, long_terms = self._split_by_df(scored_terms, BLOCK_MAX_MIN_DF)
+        if not long_terms:
+            return None
+        num_query_tokens = len(scored_terms)
+        dense_scores, dense_matches = self._dense_accumulators(num_query_tokens)
+        for term, _, idf in scored_terms:
+            self._accumulate_segments(dense_scores, dense_matches, term, idf, field_params,
+                                      deletions, allowed)
+        
+        def accumulate(doc_ids, idf, impacts):
+            """Cộng dồn 1 phần postings (theo impacts), trả về doc_ids đã cộng."""
+            doc_ids, impacts, _ = self._filter_postings(doc_ids, impacts, None, deletions, allowed)
+            if len(doc_ids):
+                self._accumulate_dense(dense_scores, dense_matches, idf, doc_ids, None,
+                                       None, 0, impacts, None)
+            return doc_ids
+        
+        base_docs = len(self.doc_lengths)
+        for term, idf, ordinal in short_terms:
+            accumulate(self._get_postings(term)[0], idf, self.impacts.get(ordinal))
+        # Doc của list ngắn: tra đủ list dài -> điểm chính xác, bỏ qua ở các lô sau
+        done = np.zeros(len(dense_scores), dtype=bool)
+        if short_terms:
+            done[:base_docs] = dense_matches[:base_docs] > 0
+        evaluator = BlockMaxWAND(
+            [self.get_postings_blocks(term) for term, _, _ in long_terms],
+            [(idf * self.impacts.scale) * self.impacts.block_max(ordinal, self.block_size)
+             for _, idf, ordinal in long_terms],
+            num_query_tokens)
+        seen = np.flatnonzero(done)
+        if len(seen):
+            for i, (_, idf, ordinal) in enumerate(long_terms):
+                doc_ids, positions = evaluator.lookup(i, seen)
+                accumulate(doc_ids, idf, self.impacts.get(ordinal)[positions])
+        
+        def best_of(doc_ids):
+            """top-k của các doc_ids (không trùng), theo điểm cuối cùng."""
+            scores = dense_scores[doc_ids] * coordination_factor(dense_matches[doc_ids], num_query_tokens)
+            return doc_ids[top_k_order(scores, top_k, doc_ids)]
+        
+        # Top-k hiện tại (mọi doc đã chấm đều có điểm chính xác) -> θ
+        best = best_of(np.flatnonzero(dense_matches))
+        while True:
+            theta = float(dense_scores[best[-1]]
+                          * coordination_factor(dense_matches[best[-1]], num_query_tokens)) \
+                if len(best) >= top_k else 0.0
+            batch = evaluator.next_batch(theta)
+            if batch is None:
+                break
+            scored = []
+            for (_, idf, ordinal), (doc_ids, positions) in zip(long_terms, batch):
+                keep = ~done[doc_ids]
+                doc_ids = accumulate(doc_ids[keep], idf, self.impacts.get(ordinal)[positions[keep]])
+                if len(doc_ids):
+                    scored.append(doc_ids)
+            # Doc vào top-k mới nằm trong top-k của best hoặc của list 1 term
+            # (doc_ids mỗi term không trùng) -> không cần unique cả lô
+            best = best_of(np.unique(np.concatenate([best] + [best_of(ids) for ids in scored])))
+        
+        short_postings = sum(self.term_dict.get(term)[0] for term, _, _ in short_terms)
+        self.last_decoded = (evaluator.decoded_postings + short_postings,
+                             evaluator.total_postings + short_postings)
+        top_docs, match_count = self._dense_top_k(dense_scores, dense_matches, num_query_tokens, top_k)
+        if evaluator.decoded_postings < evaluator.total_postings:  # Block không decode không được đếm
+            match_count = self._match_count_lower_bound(match_count, scored_terms)
+        return top_docs, match_count
+    
+    def _search_conjunctive(self, scored_terms, min_match: int, top_k: int, field_params,
+                            deletions, allowed, use_impacts: bool):
+        """
+        AND / minimum-should-match: chỉ doc khớp >= min_match trong n term.
+        
+        Doc khớp >= min_match term phải nằm trong ít nhất 1 trong n -
+        min_match + 1 list ngắn nhất (AND: chỉ list ngắn nhất) -> các list
+        này được đọc hết làm tập ứng viên. Các list còn lại (df tăng dần)
+        chỉ được tra cho ứng viên: index gốc qua skip table (_probe_term, chỉ
+        decode block chứa ứng viên), segments / postings pickle cũ bằng tìm
+        nhị phân trên list đã decode. Sau mỗi list, ứng viên không còn đủ
+        term để đạt min_match bị loại -> tập ứng viên thu hẹp dần.
+        
+        Điểm = BM25 (impacts nếu dùng được) * coordination như OR (AND: c = 1),
+        không cắt MAX_MATCHES.
+        
+        Returns:
+            (top_docs, số doc thoả) hoặc None nếu < top_k doc thoả (-> OR)
+        """
+        num_query_tokens = len(scored_terms)
+        by_df = sorted(scored_terms, key=lambda x: x[1])
+        num_seeds = num_query_tokens - min_match + 1
+        
+        # Ứng viên: hợp các list ngắn nhất (đọc hết, kể cả segments)
+        seed_ids, seed_scores = [], []
+        for term, _, idf in by_df[:num_seeds]:
+            for doc_ids, tfs, doc_norms, doc_start, impacts in self._iter_postings(term, use_impacts):
+                doc_ids, tfs, impacts = self._filter_postings(doc_ids, tfs, impacts, deletions, allowed)
+                if len(doc_ids):
+                    seed_ids.append(doc_ids)
+                    seed_scores.append(self._term_contributions(idf, doc_ids, tfs, doc_norms,
+                                                                doc_start, impacts, field_params))
+        if not seed_ids:
+            return None
+        candidates, slots = np.unique(np.concatenate(seed_ids), return_inverse=True)
+        scores = np.bincount(slots, weights=np.concatenate(seed_scores), minlength=len(candidates))
+        matches = np.bincount(slots, minlength=len(candidates))
+        
+        def probe_decoded(targets, offset, doc_ids, tfs, doc_norms, doc_start, idf):
+            """Tìm nhị phân targets trong list đã decode -> (vị trí ứng viên, đóng góp)."""
+            if not len(doc_ids):
+                return
+            idx = np.minimum(np.searchsorted(doc_ids, targets), len(doc_ids) - 1)
+            found = np.flatnonzero(doc_ids[idx] == targets)
+            idx = idx[found]
+            hits.append(offset + found)
+            contributions.append(self._term_contributions(idf, doc_ids[idx], tfs[idx], doc_norms,
+                                                          doc_start, None, field_params))
+        
+        base_docs = len(self.doc_lengths)
+        rest = by_df[num_seeds:]
+        for i, (term, _, idf) in enumerate(rest):
+            # Ứng viên còn đạt được min_match nếu khớp mọi list còn lại
+            alive = matches + (len(rest) - i) >= min_match
+            if not alive.all():
+                candidates, scores, matches = candidates[alive], scores[alive], matches[alive]
+            if len(candidates) < top_k:
+                return None  # Tập ứng viên chỉ thu hẹp: không thể đủ top_k
+            hits, contributions = [], []
+            num_base = int(np.searchsorted(candidates, base_docs))
+            if num_base and self.term_dict.get(term) is not None:
+                if self.postings_compressed:
+                    ordinal = self.term_dict.ordinal(term) if use_impacts else None
+                    doc_ids, values = self._probe_term(term, ordinal, idf, candidates[:num_base],
+                                                       field_params, use_impacts)
+                    hits.append(np.searchsorted(candidates[:num_base], doc_ids))
+                    contributions.append(values)
+                else:
+                    doc_ids, tfs = self._get_postings(term)
+                    probe_decoded(candidates[:num_base], 0, doc_ids, tfs,
+                                  self.field_lengths if self.fields else self.doc_norms, 0, idf)
+            for segment in self.segments:
+                lo, hi = np.searchsorted(candidates, [segment.doc_start, segment.doc_end])
+                postings = segment.get_postings(term) if hi > lo else None
+                if postings is not None:
+                    probe_decoded(candidates[lo:hi], lo, postings[0], postings[1],
+                                  segment.field_lengths if self.fields else segment.doc_norms,
+                                  segment.doc_start, idf)
+            for found, values in zip(hits, contributions):
+                scores[found] += values
+                matches[found] += 1
+        
+        satisfied = matches >= min_match
+        if np.count_nonzero(satisfied) < top_k:
+            return None
+        candidates, scores = candidates[satisfied], scores[satisfied]
+        scores *= coordination_factor(matches[satisfied], num_query_tokens)
+        order = top_k_order(scores, top_k, candidates)
+        return list(zip(candidates[order].tolist(), scores[order].tolist())), len(candidates)
+    
+    def _parse_phrases(self, query: str) -> Tuple[List[Tuple[List[str], int]], str]:
+        """
+        Tách các cụm "..." / "..."~N khỏi query.
+        
+        Returns:
+            phrases: [(tokens theo thứ tự, slop), ...]
+            query_text: Query với cú pháp phrase đã bỏ (các từ trong cụm được giữ lại)
+        """
+        phrases = []
+        for match in PHRASE_PATTERN.finditer(query):
+            tokens = self._phrase_tokens(match.group(1))
+            if tokens:
+                phrases.append((tokens, int(match.group(2) or 0)))
+        if phrases:
+            query = PHRASE_PATTERN.sub(lambda m: f" {m.group(1)} ", query)
+        return phrases, query
+    
+    def _phrase_tokens(self, text: str) -> List[str]:
+        """Tokens của 1 cụm từ, giữ thứ tự và lặp (khác _tokenize_query)."""
+        text = re.sub(r'[^\w\s_]', ' ', text).lower()
+        if ViTokenizer:
+            text = ViTokenizer.tokenize(text)
+        return [token for token in text.split() if is_index_token(token)]
     
     def _tokenize_query(self, query: str) -> List[str]:
         """
@@ -365,20 +1622,24 @@ class BM25Searcher:
         import re
         query_clean = re.sub(r'[^\w\s_]', ' ', query)
         
-        if ViTokenizer:
-            q_lower = ViTokenizer.tokenize(query_clean.lower())
-            q_upper = ViTokenizer.tokenize(query_clean.upper()).lower()
-            q_uni = query_clean.lower().replace("_", " ")
+        # Truy vấn không dấu: PyVi không tách từ được -> ghép âm tiết qua từ điển bỏ dấu
+        if self.folded is not None and fold_accents(query_clean) == query_clean:
+            tokens = self._resolve_folded(query_clean)
         else:
-            q_lower = query_clean.lower()
-            q_upper = ""
-            q_uni = ""
-            
-        combined = f"{q_lower} {q_upper} {q_uni}"
-        tokens = combined.split()
+            if ViTokenizer:
+                q_lower = ViTokenizer.tokenize(query_clean.lower())
+                q_upper = ViTokenizer.tokenize(query_clean.upper()).lower()
+                q_uni = query_clean.lower().replace("_", " ")
+            else:
+                q_lower = query_clean.lower()
+                q_upper = ""
+                q_uni = ""
+                
+            combined = f"{q_lower} {q_upper} {q_uni}"
+            tokens = combined.split()
         
         result = []
-        for token in set(tokens):
+        for token in dict.fromkeys(tokens):  # khử trùng lặp, giữ thứ tự
             if len(token) <= 1 and not token.isdigit():
                 continue
             if all(c in '.,;:!?()-_/\\|@#$%^&*+=<>{}[]"\'~`' for c in token):
@@ -386,6 +1647,119 @@ class BM25Searcher:
             result.append(token)
         return result
     
+    def _fuzzy_corrections(self, query_tokens: List[str]) -> Dict[str, Tuple[str, int]]:
+        """
+        Token không có trong index -> (term gần nhất, khoảng cách sửa).
+        
+        Bỏ qua token mà mọi âm tiết đã nằm trong 1 token khớp khác (vd.
+        "dựng" khi đã có "xây_dựng" - biến thể tách từ của PyVi). Âm tiết
+        chưa biết được thử trước ghép với âm tiết liền sau / liền trước
+        ("thuogn mai" -> "thương_mại"); token đơn chỉ được sửa khi có âm tiết
+        không tồn tại trong index (không phải chỉ lệch tách từ).
+        """
+        if self.fuzzy is None:
+            return {}
+        known = [self._document_frequency(token) > 0 for token in query_tokens]
+        known_syllables = set()
+        for token, is_known in zip(query_tokens, known):
+            if is_known:
+                known_syllables.update(token.split("_"))
+        
+        corrections = {}
+        for i, token in enumerate(query_tokens):
+            if known[i] or token in corrections:
+                continue
+            if all(syllable in known_syllables for syllable in token.split("_")):
+                continue
+            if "_" not in token:
+                for j in (i + 1, i - 1):
+                    if 0 <= j < len(query_tokens) and "_" not in query_tokens[j]:
+                        first, second = sorted((i, j))
+                        pair = f"{query_tokens[first]}_{query_tokens[second]}"
+                        matches = self.fuzzy.lookup(pair, limit=1)
+                        if matches:
+                            corrections[query_tokens[first]] = matches[0][:2]
+                            corrections[query_tokens[second]] = matches[0][:2]
+                            break
+                if token in corrections:
+                    continue
+            if not self.fuzzy.is_known_syllables(token):
+                matches = self.fuzzy.lookup(token, limit=1)
+                if matches:
+                    corrections[token] = matches[0][:2]
+        return corrections
+    
+    @staticmethod
+    def _suggestion(query_text: str, corrections: Dict[str, Tuple[str, int]]) -> Optional[str]:
+        """Truy vấn đã sửa chính tả (None nếu chỉ khác dấu)."""
+        suggestion = " ".join(query_text.lower().replace("_", " ").split())
+        changed = False
+        replaced = {}  # 2 token cùng sửa thành 1 từ ghép: thay cả cụm
+        for token, (term, distance) in corrections.items():
+            if distance > 0:
+                replaced.setdefault(term, []).append(token)
+        for term, tokens in replaced.items():
+            phrase = " ".join(t.replace("_", " ") for t in tokens)
+            pattern = rf"(?<!\w){re.escape(phrase)}(?!\w)"
+            suggestion, count = re.subn(pattern, term.replace("_", " "), suggestion)
+            changed = changed or count > 0
+        return suggestion if changed else None
+    
+    def did_you_mean(self, query: str) -> Optional[str]:
+        """Câu "có phải bạn muốn tìm" cho query (không chạy search)."""
+        if not self._loaded:
+            self.load_index()
+        _, query_text = self._parse_phrases(query)
+        corrections = self._fuzzy_corrections(self._tokenize_query(query_text))
+        return self._suggestion(query_text, corrections) if corrections else None
+    
+    def suggest(self, prefix: str, limit: int = SUGGEST_TOP_N) -> Dict[str, List[str]]:
+        """
+        Gợi ý khi gõ cho prefix (không chạy search).
+        
+        Returns:
+            {"terms": [truy vấn với cụm cuối đã hoàn thành], "companies": [tên công ty]}
+        """
+        if not self._loaded:
+            self.load_index()
+        elif self.auto_refresh:
+            self.refresh_segments()
+        if self.suggester is None:
+            return {"terms": [], "companies": []}
+        return self.suggester.suggest(prefix, limit)
+    
+    def _resolve_folded(self, query_clean: str) -> List[str]:
+        """
+        Ghép các âm tiết của truy vấn không dấu thành term của index:
+        longest-match tối đa MAX_FOLDED_SYLLABLES âm tiết, mỗi cụm chọn term
+        df lớn nhất trong (term có dấu cùng dạng bỏ dấu, chính cụm đó).
+        Âm tiết không ghép được giữ nguyên.
+        
+        "xay dung ha noi" -> ["xây_dựng", "hà_nội"]
+        """
+        syllables = query_clean.lower().replace("_", " ").split()
+        terms = self.term_dict if self.global_terms is None else self.global_terms
+        tokens = []
+        i = 0
+        while i < len(syllables):
+            for n in range(min(MAX_FOLDED_SYLLABLES, len(syllables) - i), 0, -1):
+                key = "_".join(syllables[i:i + n])
+                best_term, best_df = None, 0
+                folded = self.folded.best(key)
+                if folded is not None:
+                    best_term, best_df = terms.term_at(folded[0]), folded[1]
+                native_df = self._document_frequency(key)
+                if native_df > best_df:
+                    best_term = key
+                if best_term is not None:
+                    tokens.append(best_term)
+                    i += n
+                    break
+            else:
+                tokens.append(syllables[i])
+                i += 1
+        return tokens
+    
     def get_stats(self) -> dict:
         """Trả về thống kê về index."""
         if not self._loaded:
@@ -396,10 +1770,51 @@ class BM25Searcher:
             "avg_document_length": self.avg_doc_length,
             "k1": self.k1,
             "b": self.b,
+            "segments": len(self.segments),
+            "deleted_documents": self.deletions.count if self.deletions is not None else 0,
+            "fields": list(self.fields) if self.fields else None,
+            "impacts": f"{self.impacts.meta['bits']}-bit" if self.impacts is not None else None,
+            "champion_terms": self.champions.meta["num_terms"] if self.champions is not None else 0,
+            "folded_terms": len(self.folded) if self.folded is not None else 0,
+            "fuzzy_terms": len(self.fuzzy) if self.fuzzy is not None else 0,
+            "suggest_keys": len(self.suggester) if self.suggester is not None else 0,
         }
     
     def close(self):
         """Đóng file handles."""
+        for segment in self.segments:
+            segment.close()
+        self.segments = []
+        if self.positions is not None:
+            self.positions.close()
+            self.positions = None
+        if self.impacts is not None:
+            self.impacts.close()
+            self.impacts = None
+        if self.champions is not None:
+            self.champions.close()
+            self.champions = None
+        if self.term_bounds is not None:
+            self.term_bounds.close()
+            self.term_bounds = None
+        if self.folded is not None:
+            self.folded.close()
+            self.folded = None
+        if self.fuzzy is not None:
+            self.fuzzy.close()
+            self.fuzzy = None
+        if self.suggester is not None:
+            self.suggester.close()
+            self.suggester = None
+        if isinstance(getattr(self, "term_dict", None), MmapTermDict):
+            self.term_dict.close()
+        if getattr(self, "_postings_mmap", None) is not None:
+            try:
+                self._postings_mmap.close()
+            except BufferError:
+                # Vẫn còn PostingsBlocks trỏ vào mmap -> để GC tự giải phóng
+                pass
+            self._postings_mmap = None
         if self.postings_file:
             self.postings_file.close()
             self.postings_file = None
@@ -14,6 +14,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspa
 
 from src.ranking.bm25 import BM25Searcher
 from src.ranking.vector import VectorSearcher
+from src.ranking.topk import top_k_items
 
 class HybridSearcher:
     """
@@ -65,9 +66,8 @@ class HybridSearcher:
         for rank, (doc_id, score) in enumerate(vector_results, 1):
             combined_scores[doc_id] = combined_scores.get(doc_id, 0) + (1 - alpha) * (1 / (k + rank))
             
-        # Sort top-k
-        sorted_ids = sorted(combined_scores.items(), key=lambda x: x[1], reverse=True)
-        top_ids = sorted_ids[:top_k]
+        # Top-k (heap k phần tử, không sắp xếp toàn bộ)
+        top_ids = top_k_items(combined_scores.items(), top_k, key=lambda x: x[1])
         
         # Gắn metadata
         results = []
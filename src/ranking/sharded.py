@@ -0,0 +1,342 @@
+"""
+Sharded BM25 Search (Scatter-Gather)
+====================================
+Milestone 2 - SEG301: Search Engines & Information Retrieval
+
+Tìm kiếm trên index chia shard theo khoảng doc_id (src/indexer/shards.py):
+
+    ShardSearcher     BM25Searcher của 1 shard: postings / doc store cục bộ,
+                      nhưng N, avgdl, avglen_f và df (IDF, coordination,
+                      truy vấn không dấu, sửa chính tả) lấy từ thống kê TOÀN
+                      CỤC trong shards_dir -> điểm của 1 doc giống hệt search
+                      trên index không chia
+    ShardedSearcher   Coordinator: mỗi shard chạy trong 1 worker process
+                      riêng (giao tiếp qua Pipe). Truy vấn được gửi tới mọi
+                      shard cùng lúc (scatter), mỗi shard trả top-k của nó
+                      kèm metadata, coordinator gộp thành top-k chung
+                      (gather; hoà điểm: doc_id nhỏ trước)
+
+1 truy vấn dùng tới N core, và RAM / page cache mỗi process chỉ cần chứa 1
+shard (các worker có thể chuyển sang máy khác với cùng giao thức lệnh).
+Gợi ý khi gõ chạy ngay trong coordinator trên index gợi ý toàn cục.
+
+Giới hạn: shard không nhận segments / xoá (add_documents, delete_documents
+chỉ áp dụng cho index không chia) - build lại shards để cập nhật.
+
+Usage:
+    python src/ranking/sharded.py [shards_dir] [--in-process]
+"""
+
+import os
+import sys
+import time
+import argparse
+import contextlib
+import multiprocessing
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Thêm project root vào path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.indexer.mmap_term_dict import MmapTermDict, TERM_DICT_FILENAME
+from src.indexer.doc_store import compute_length_norms
+from src.indexer.shards import load_shards_meta, DEFAULT_SHARDS_DIR
+from src.indexer.folded_terms import FoldedTermDict, has_folded_terms
+from src.indexer.fuzzy_terms import FuzzyTermIndex, has_fuzzy_terms
+from src.indexer.suggest import Suggester, has_suggest_index, SUGGEST_KINDS, SUGGEST_TOP_N
+from src.ranking.bm25 import BM25Searcher, DEFAULT_JSONL_PATH, display_results
+from src.ranking.topk import top_k_items
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Lệnh coordinator -> worker: tên lệnh -> method của ShardSearcher
+SHARD_METHODS = {
+    "search": "search_shard",
+    "stats": "get_stats",
+}
+
+
+# ============================================================================
+# SHARD
+# ============================================================================
+
+class ShardSearcher(BM25Searcher):
+    """
+    BM25Searcher trên 1 shard với thống kê collection toàn cục.
+
+    Kết quả dùng doc_id cục bộ (như BM25Searcher); search_shard đổi sang
+    doc_id toàn cục. Impacts / champion lists không dùng (tính theo thống kê
+    cục bộ), auto refresh tắt (shard không có segments).
+    """
+
+    def __init__(self, shards_dir: str, shard: dict,
+                 jsonl_path: str = DEFAULT_JSONL_PATH, **kwargs):
+        kwargs.update(use_impacts=False, use_champions=False, auto_refresh=False)
+        super().__init__(index_dir=os.path.join(shards_dir, shard["name"]),
+                         jsonl_path=jsonl_path, **kwargs)
+        self.shards_dir = shards_dir
+        self.doc_start = shard["doc_start"]
+        self.doc_end = shard["doc_end"]
+        self._shards_meta = None
+
+    def load_index(self):
+        self._shards_meta = load_shards_meta(self.shards_dir)
+        super().load_index()
+
+        # df + index tra cứu toàn cục (theo term ordinal của từ điển toàn cục)
+        self.global_terms = MmapTermDict(os.path.join(self.shards_dir, TERM_DICT_FILENAME))
+        if has_folded_terms(self.shards_dir):
+            self.folded = FoldedTermDict(self.shards_dir)
+        if self.use_fuzzy and has_fuzzy_terms(self.shards_dir):
+            self.fuzzy = FuzzyTermIndex(self.shards_dir, self.global_terms)
+        print(f"  [OK] Global statistics: {len(self.global_terms):,d} terms, "
+              f"N={self.total_docs:,d}, avgdl={self.avg_doc_length:.1f}")
+
+    def load_segments(self):
+        """Thống kê toàn cục từ shards.json thay cho thống kê của riêng shard."""
+        super().load_segments()
+        meta = self._shards_meta
+        total_docs = meta["total_docs"]
+        self.total_docs = total_docs
+        self.avg_doc_length = meta["total_length"] / total_docs if total_docs > 0 else 0.0
+        if self.fields:
+            self.avg_field_lengths = np.asarray(meta["field_totals"], dtype=np.float64) / total_docs \
+                if total_docs > 0 else np.zeros(len(self.fields))
+        self.doc_norms = compute_length_norms(self.doc_lengths, self.avg_doc_length, self.b)
+
+    def search_shard(self, query: str, top_k: int = 10,
+                     field_weights: Optional[Dict[str, float]] = None) -> dict:
+        """
+        Top-k của shard với doc_id toàn cục.
+
+        Returns:
+            {"results": [(doc_id, score, metadata)], "match_count": số doc khớp,
+             "suggestion": "có phải bạn muốn tìm" hoặc None}
+        """
+        self.last_match_count = 0
+        results = self.search(query, top_k, field_weights)
+        return {
+            "results": [(doc_id + self.doc_start, score, meta) for doc_id, score, meta in results],
+            "match_count": self.last_match_count,
+            "suggestion": self.last_suggestion,
+        }
+
+    def close(self):
+        super().close()
+        if self.global_terms is not None:
+            self.global_terms.close()
+            self.global_terms = None
+
+
+def _shard_worker(conn, shards_dir: str, shard: dict, jsonl_path: str, searcher_kwargs: dict):
+    """
+    Vòng lặp của 1 worker process: load shard rồi trả lời từng lệnh
+    (command, args) của coordinator bằng ("ok", kết quả) / ("error", exception).
+    Log của BM25Searcher bị tắt (coordinator in 1 dòng mỗi truy vấn).
+    """
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        searcher = ShardSearcher(shards_dir, shard, jsonl_path, **searcher_kwargs)
+        try:
+            searcher.load_index()
+            conn.send(("ok", searcher.get_stats()))
+        except Exception as e:
+            conn.send(("error", e))
+            return
+        while True:
+            try:
+                command, args = conn.recv()
+            except EOFError:
+                break
+            if command == "close":
+                break
+            try:
+                if command not in SHARD_METHODS:
+                    raise ValueError(f"Unknown shard command: {command!r}")
+                conn.send(("ok", getattr(searcher, SHARD_METHODS[command])(*args)))
+            except Exception as e:
+                conn.send(("error", e))
+        searcher.close()
+    conn.close()
+
+
+# ============================================================================
+# COORDINATOR
+# ============================================================================
+
+class ShardedSearcher:
+    """
+    Scatter-gather trên các shard của shards_dir.
+
+    processes=True: mỗi shard 1 worker process (song song). False: các
+    ShardSearcher chạy lần lượt trong process hiện tại (debug / đo overhead).
+    searcher_kwargs (k1, b, field_weights, ...) được truyền cho mọi shard.
+    """
+
+    def __init__(self, shards_dir: str = DEFAULT_SHARDS_DIR,
+                 jsonl_path: str = DEFAULT_JSONL_PATH,
+                 processes: bool = True, **searcher_kwargs):
+        self.shards_dir = shards_dir
+        self.jsonl_path = jsonl_path
+        self.processes = processes
+        self.searcher_kwargs = searcher_kwargs
+        self.meta = None
+        self.shards = []              # processes: [(Process, Connection)]; ngược lại [ShardSearcher]
+        self.suggester = None         # Suggester trên index gợi ý toàn cục
+        self.last_match_count = 0
+        self.last_suggestion = None
+        self._loaded = False
+
+    def load_index(self):
+        """Khởi động các shard (song song nếu processes) + index gợi ý."""
+        print("Loading sharded index...")
+        load_start = time.time()
+        self.meta = load_shards_meta(self.shards_dir)
+        shards = self.meta["shards"]
+
+        if self.processes:
+            for shard in shards:
+                parent_conn, child_conn = multiprocessing.Pipe()
+                process = multiprocessing.Process(
+                    target=_shard_worker, daemon=True,
+                    args=(child_conn, self.shards_dir, shard, self.jsonl_path, self.searcher_kwargs))
+                process.start()
+                child_conn.close()
+                self.shards.append((process, parent_conn))
+            stats = self._gather()
+        else:
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                for shard in shards:
+                    searcher = ShardSearcher(self.shards_dir, shard, self.jsonl_path,
+                                             **self.searcher_kwargs)
+                    searcher.load_index()
+                    self.shards.append(searcher)
+            stats = [searcher.get_stats() for searcher in self.shards]
+
+        for shard, shard_stats in zip(shards, stats):
+            print(f"  [OK] {shard['name']}: doc_id [{shard['doc_start']:,d}, {shard['doc_end']:,d}) "
+                  f"| {shard_stats['vocabulary_size']:,d} terms")
+        if any(has_suggest_index(self.shards_dir, kind) for kind in SUGGEST_KINDS):
+            self.suggester = Suggester(self.shards_dir)
+        print(f"  [OK] {len(shards)} shards ({'processes' if self.processes else 'in-process'}), "
+              f"N={self.meta['total_docs']:,d}")
+        print(f"  Load time: {time.time() - load_start:.1f}s")
+        self._loaded = True
+
+    def _gather(self) -> list:
+        """Nhận 1 reply từ mọi worker (theo thứ tự shard); raise lỗi đầu tiên."""
+        replies = []
+        error = None
+        for _, conn in self.shards:
+            status, reply = conn.recv()
+            if status == "error" and error is None:
+                error = reply
+            replies.append(reply)
+        if error is not None:
+            raise error
+        return replies
+
+    def _scatter(self, command: str, args: tuple = ()) -> list:
+        """Gửi lệnh tới mọi shard rồi gom kết quả (worker chạy song song)."""
+        if not self.processes:
+            method = SHARD_METHODS[command]
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                return [getattr(searcher, method)(*args) for searcher in self.shards]
+        for _, conn in self.shards:
+            conn.send((command, args))
+        return self._gather()
+
+    def search(self, query: str, top_k: int = 10,
+               field_weights: Optional[Dict[str, float]] = None) -> List[Tuple[int, float, dict]]:
+        """
+        Top-k toàn cục: mỗi shard trả top-k của nó, gộp theo (điểm giảm dần,
+        doc_id tăng dần). Kết quả cùng dạng BM25Searcher.search (doc_id toàn cục).
+        """
+        if not self._loaded:
+            self.load_index()
+        search_start = time.time()
+        replies = self._scatter("search", (query, top_k, field_weights))
+
+        candidates = (result for reply in replies for result in reply["results"])
+        results = top_k_items(candidates, top_k, key=lambda result: (result[1], -result[0]))
+        self.last_match_count = sum(reply["match_count"] for reply in replies)
+        # Sửa chính tả dùng từ điển toàn cục: mọi shard cho cùng 1 gợi ý
+        self.last_suggestion = next((reply["suggestion"] for reply in replies if reply["suggestion"]),
+                                    None)
+
+        search_time = time.time() - search_start
+        print(f"\n  Query: \"{query}\"")
+        if self.last_suggestion:
+            print(f"  Did you mean: {self.last_suggestion}")
+        print(f"  Documents matched: {self.last_match_count:,} ({len(replies)} shards)")
+        print(f"  Search time: {search_time*1000:.1f}ms")
+        return results
+
+    def suggest(self, prefix: str, limit: int = SUGGEST_TOP_N) -> Dict[str, List[str]]:
+        """Gợi ý khi gõ (index gợi ý toàn cục, không hỏi các shard)."""
+        if not self._loaded:
+            self.load_index()
+        if self.suggester is None:
+            return {"terms": [], "companies": []}
+        return self.suggester.suggest(prefix, limit)
+
+    def get_stats(self) -> dict:
+        if not self._loaded:
+            self.load_index()
+        shard_stats = self._scatter("stats")
+        return {
+            "total_documents": self.meta["total_docs"],
+            "vocabulary_size": self.meta["num_terms"],
+            "avg_document_length": self.meta["total_length"] / max(self.meta["total_docs"], 1),
+            "shards": len(shard_stats),
+            "shard_documents": [shard["indexed_docs"] for shard in self.meta["shards"]],
+            "shard_vocabulary": [stats["vocabulary_size"] for stats in shard_stats],
+            "suggest_keys": len(self.suggester) if self.suggester is not None else 0,
+        }
+
+    def close(self):
+        """Dừng các worker và đóng file handles."""
+        for shard in self.shards:
+            if isinstance(shard, ShardSearcher):
+                shard.close()
+                continue
+            process, conn = shard
+            try:
+                conn.send(("close", ()))
+            except (BrokenPipeError, OSError):
+                pass
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+            conn.close()
+        self.shards = []
+        if self.suggester is not None:
+            self.suggester.close()
+            self.suggester = None
+        self._loaded = False
+
+    def __del__(self):
+        self.close()
+
+
+# ============================================================================
+# ENTRY POINT
+# ============================================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search trên index chia shard (scatter-gather)")
+    parser.add_argument("shards_dir", nargs="?", default=DEFAULT_SHARDS_DIR)
+    parser.add_argument("--jsonl", default=DEFAULT_JSONL_PATH)
+    parser.add_argument("--in-process", action="store_true",
+                        help="Chạy các shard lần lượt trong process hiện tại")
+    args = parser.parse_args()
+
+    searcher = ShardedSearcher(args.shards_dir, args.jsonl, processes=not args.in_process)
+    searcher.load_index()
+    for q in ("công_ty công_nghệ thông_tin", "bất_động_sản hà_nội", "xuất_khẩu thủy_sản"):
+        display_results(searcher.search(q, top_k=5), q)
+    searcher.close()
@@ -0,0 +1,75 @@
+"""
+Top-k Selection
+===============
+Milestone 2 - SEG301: Search Engines & Information Retrieval
+
+search() chỉ trả 10-100 kết quả nhưng tập doc khớp có thể tới hàng trăm
+nghìn (1.8M với term phổ biến): sắp xếp toàn bộ rồi cắt [:k] tốn
+O(n log n) cho các phần tử bị bỏ đi. Hai cách chọn top-k ở đây chỉ tốn
+O(n) (+ O(k log k) để xếp k phần tử được chọn):
+
+    top_k_order(scores, k, doc_ids)
+        Mảng NumPy: np.partition tìm điểm lớn thứ k, giữ các phần tử lớn hơn
+        + đủ số doc_id nhỏ nhất trong nhóm bằng điểm đó, rồi chỉ xếp k phần
+        tử. Kết quả giống hệt np.lexsort((doc_ids, -scores))[:k].
+
+    top_k_items(items, k, key)
+        Iterable Python (dict.items(), list kết quả): heap giới hạn k phần
+        tử (heapq.nlargest). Kết quả giống hệt sorted(items, key=key,
+        reverse=True)[:k], kể cả thứ tự các phần tử đồng điểm.
+
+    kth_largest(values, k)
+        Chỉ giá trị lớn thứ k (np.partition): ngưỡng θ của các tầng cắt tỉa.
+"""
+
+import heapq
+from typing import Callable, Iterable, List, Optional
+
+import numpy as np
+
+
+def top_k_order(scores: np.ndarray, k: int, doc_ids: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Chỉ số của k phần tử điểm cao nhất, theo (điểm giảm dần, doc_id tăng dần).
+
+    Args:
+        scores: Điểm của từng phần tử
+        k: Số phần tử cần lấy
+        doc_ids: Khoá phá hoà điểm (mặc định: chính chỉ số phần tử)
+
+    Returns:
+        order: int[min(k, n)], dùng như np.lexsort((doc_ids, -scores))[:k]
+    """
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.intp)
+    tie_keys = doc_ids if doc_ids is not None else np.arange(n)
+    if k < n:
+        # Điểm lớn thứ k: mọi phần tử lớn hơn chắc chắn vào top-k, nhóm bằng
+        # điểm đó chỉ lấy đủ chỗ còn lại theo doc_id nhỏ nhất
+        kth = np.partition(scores, n - k)[n - k]
+        above = np.flatnonzero(scores > kth)
+        ties = np.flatnonzero(scores == kth)
+        need = k - len(above)
+        if len(ties) > need:
+            ties = ties[np.argpartition(tie_keys[ties], need - 1)[:need]]
+        candidates = np.concatenate([above, ties])
+    else:
+        candidates = np.arange(n)
+    order = np.lexsort((tie_keys[candidates], -scores[candidates]))
+    return candidates[order]
+
+
+def kth_largest(values: np.ndarray, k: int) -> float:
+    """Giá trị lớn thứ k của values (0.0 nếu có ít hơn k phần tử, k > 0)."""
+    n = len(values)
+    if n < k:
+        return 0.0
+    return np.partition(values, n - k)[n - k]
+
+
+def top_k_items(items: Iterable, k: int, key: Callable) -> List:
+    """k phần tử có key lớn nhất, giống sorted(items, key=key, reverse=True)[:k]."""
+    if k <= 0:
+        return []
+    return heapq.nlargest(k, items, key=key)
@@ -23,6 +23,9 @@ from sentence_transformers import SentenceTransformer
 import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
+from src.indexer.segments import load_deletions, manifest_path
+from src.indexer.doc_reorder import load_doc_order, doc_ids_for_lines
+
 # Paths
 DEFAULT_DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "data")
 DEFAULT_VECTOR_INDEX_PATH = os.path.join(DEFAULT_DATA_PATH, "index", "vector_faiss.index")
@@ -64,6 +67,8 @@ class VectorSearcher:
         self.model = None
         self.index = None
         self.doc_ids = None # Map FAISS index to doc_id
+        self.deletions = None  # DeletionBitmap: doc_id đã xoá (tombstones)
+        self._manifest_state = None
         
         self._loaded = False
         
@@ -93,11 +98,30 @@ class VectorSearcher:
         
         with open(self.doc_ids_path, "rb") as f:
             self.doc_ids = pickle.load(f)
+        
+        # Index BM25 build với --reorder: vector index vẫn dùng số dòng JSONL
+        doc_order = load_doc_order(os.path.dirname(self.index_path))
+        if doc_order is not None:
+            self.doc_ids = doc_ids_for_lines(doc_order, self.doc_ids).tolist()
+            print(f"  Mapped JSONL line numbers to reordered doc_ids")
             
         print(f"Loaded FAISS index with {self.index.ntotal} vectors.")
+        self._refresh_deletions()
         self._loaded = True
         return True
 
+    def _refresh_deletions(self):
+        """Reload deletion bitmap (cùng thư mục index) nếu manifest đã đổi."""
+        path = manifest_path(os.path.dirname(self.index_path))
+        try:
+            st = os.stat(path)
+            state = (st.st_mtime_ns, st.st_ino, st.st_size)
+        except FileNotFoundError:
+            state = None
+        if state != self._manifest_state:
+            self._manifest_state = state
+            self.deletions = load_deletions(os.path.dirname(self.index_path)) if state else None
+
     def search(self, query: str, top_k: int = 10) -> List[Tuple[int, float]]:
         """
         Tìm kiếm top-k dùng vector similarity.
@@ -113,16 +137,163 @@ class VectorSearcher:
         query_vector = self.model.encode([query])
         faiss.normalize_L2(query_vector) # Dùng Inner Product (Cosine similarity sau khi normalize)
         
-        # Search FAISS (IVF: chỉ quét nprobe clusters, Flat: quét toàn bộ)
-        distances, indices = self.index.search(query_vector, top_k)
+        self._refresh_deletions()
+        deletions = self.deletions if self.deletions is not None and self.deletions.count else None
         
-        results = []
-        for dist, idx in zip(distances[0], indices[0]):
-            if idx != -1:
-                doc_id = self.doc_ids[idx]
-                results.append((doc_id, float(dist)))
-                
-        return results
+        # Search FAISS (IVF: chỉ quét nprobe clusters, Flat: quét toàn bộ).
+        # Có doc đã xoá: lấy dư (x2 mỗi lần) cho tới khi đủ top_k doc còn sống.
+        k = top_k
+        while True:
+            distances, indices = self.index.search(query_vector, k)
+            
+            results = []
+            for dist, idx in zip(distances[0], indices[0]):
+                if idx != -1:
+                    doc_id = self.doc_ids[idx]
+                    if deletions is not None and deletions.is_deleted(doc_id):
+                        continue
+                    results.append((doc_id, float(dist)))
+            
+            if deletions is None or len(results) >= top_k or k >= self.index.ntotal:
+                return results[:top_k]
+            k = min(k * 2, self.index.ntotal)
+
+def embedding_text(doc: dict) -> str:
+    """Văn bản encode của 1 doanh nghiệp: 5 trường thông tin nối thành câu."""
+    name = doc.get("company_name", "") or ""
+    industry = doc.get("industries_str_seg", "") or doc.get("industries_str", "") or ""
+    address = doc.get("address", "") or ""
+    rep = doc.get("representative", "") or ""
+    status = doc.get("status", "") or ""
+    
+    text_parts = []
+    if name: text_parts.append(f"Tên công ty: {name}.")
+    if industry: text_parts.append(f"Ngành nghề kinh doanh: {industry.replace('_', ' ')}.")
+    if address: text_parts.append(f"Địa chỉ: {address}.")
+    if rep: text_parts.append(f"Người đại diện: {rep}.")
+    if status: text_parts.append(f"Trạng thái hoạt động: {status}.")
+    
+    text = " ".join(text_parts).strip()
+    if not text:
+        text = "Không có thông tin doanh nghiệp."
+    return text
+
+
+class VectorIndexWriter:
+    """
+    Encode văn bản theo chunk ngay trong lúc đọc (create_vector_index, hoặc
+    lượt đọc JSONL chung của src/indexer/ingest.py), rồi train + ghi FAISS
+    index ở save().
+    """
+    
+    CHUNK_SIZE = 50000
+    
+    def __init__(self, model_name: str = MODEL_NAME):
+        self.model = SentenceTransformer(model_name, device=DEVICE)
+        self.dimension = self.model.get_sentence_embedding_dimension()
+        self.doc_ids = []  # doc_id là line number
+        self.texts = []
+        self.all_embeddings_chunks = []
+    
+    def __len__(self):
+        return len(self.doc_ids)
+    
+    def add(self, line_no: int, doc: dict):
+        self.texts.append(embedding_text(doc))
+        self.doc_ids.append(line_no)
+        if len(self.texts) >= self.CHUNK_SIZE:
+            print(f"  Encoding chunk of {len(self.texts)} documents (Total read: {len(self)})...")
+            self._encode_chunk()
+    
+    def _encode_chunk(self):
+        embeddings = self.model.encode(self.texts, batch_size=128, show_progress_bar=True)
+        embeddings = np.array(embeddings).astype('float32')
+        faiss.normalize_L2(embeddings)
+        self.all_embeddings_chunks.append(embeddings)
+        self.texts = []
+        import gc
+        gc.collect()
+    
+    def save(self, output_index_path: str, output_doc_ids_path: str):
+        """
+        Encode phần còn lại, train IVF quantizer (hoặc Flat nếu ít vectors),
+        add toàn bộ vectors và ghi index + doc_ids ra đĩa.
+        """
+        if len(self.texts) > 0:
+            print(f"  Encoding final chunk of {len(self.texts)} documents...")
+            self._encode_chunk()
+        dimension = self.dimension
+        
+        # Gộp tất cả embeddings
+        print(f"\n[Phase 2/3] Concatenating {len(self.all_embeddings_chunks)} chunks...")
+        all_embeddings = np.vstack(self.all_embeddings_chunks)
+        total_vectors = all_embeddings.shape[0]
+        print(f"  Total vectors: {total_vectors}")
+        
+        # Giải phóng chunks
+        self.all_embeddings_chunks = []
+        import gc
+        gc.collect()
+        
+        # ===========================================================================
+        # PHASE 2: Train IVF quantizer
+        # ===========================================================================
+        nlist = min(NLIST, total_vectors // 39)  # Đảm bảo ít nhất 39 vectors/cluster
+        
+        if total_vectors < 10000:
+            # Dataset quá nhỏ → fallback về Flat (brute-force)
+            print(f"  Dataset too small ({total_vectors} vectors), using Flat index...")
+            index = faiss.IndexFlatIP(dimension)
+            index.add(all_embeddings)
+        else:
+            print(f"  Training IVF quantizer with {nlist} clusters on {total_vectors} vectors...")
+            quantizer = faiss.IndexFlatIP(dimension)  # Quantizer dùng exact search
+            index = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+            
+            # Lấy training sample (tối đa 200k vectors để train nhanh)
+            max_train = min(200000, total_vectors)
+            if total_vectors > max_train:
+                train_indices = np.random.choice(total_vectors, max_train, replace=False)
+                train_data = all_embeddings[train_indices]
+            else:
+                train_data = all_embeddings
+            
+            train_start = time.time()
+            index.train(train_data)
+            print(f"  Training completed in {time.time() - train_start:.1f}s")
+            
+            # ===========================================================================
+            # PHASE 3: Add vectors vào IVF index
+            # ===========================================================================
+            print(f"\n[Phase 3/3] Adding {total_vectors} vectors to IVF index...")
+            add_start = time.time()
+            
+            # Add theo batch để tránh OOM
+            ADD_BATCH = 100000
+            for start_idx in range(0, total_vectors, ADD_BATCH):
+                end_idx = min(start_idx + ADD_BATCH, total_vectors)
+                index.add(all_embeddings[start_idx:end_idx])
+                print(f"  Added {end_idx}/{total_vectors} vectors...")
+            
+            print(f"  Add completed in {time.time() - add_start:.1f}s")
+            
+            # Set nprobe mặc định
+            index.nprobe = NPROBE
+        
+        # ===========================================================================
+        # SAVE
+        # ===========================================================================
+        print(f"\nSaving FAISS index to {output_index_path}...")
+        faiss.write_index(index, output_index_path)
+        
+        with open(output_doc_ids_path, "wb") as f:
+            pickle.dump(self.doc_ids, f)
+        
+        print(f"Done! Index type: {'IVFFlat' if total_vectors >= 10000 else 'Flat'}")
+        print(f"  Total vectors: {total_vectors}")
+        print(f"  Clusters (nlist): {nlist if total_vectors >= 10000 else 'N/A'}")
+        print(f"  Search probes (nprobe): {NPROBE}")
+
 
 def create_vector_index(jsonl_path: str, output_index_path: str, output_doc_ids_path: str, max_docs: Optional[int] = None):
     """
@@ -135,143 +306,28 @@ def create_vector_index(jsonl_path: str, output_index_path: str, output_doc_ids_
     4. Add toàn bộ vectors vào IVF index
     5. Ghi index ra đĩa
     """
-    model = SentenceTransformer(MODEL_NAME, device=DEVICE)
-    dimension = model.get_sentence_embedding_dimension()
-    
-    doc_ids = []
-    CHUNK_SIZE = 50000
-    count = 0
+    writer = VectorIndexWriter()
     
     # ===========================================================================
     # PHASE 1: Encode tất cả vectors, lưu tạm vào list numpy arrays
     # ===========================================================================
-    all_embeddings_chunks = []
-    texts = []
-    
     print(f"[Phase 1/3] Reading and encoding data from {jsonl_path}...")
     with open(jsonl_path, "r", encoding="utf-8") as f:
         for i, line in enumerate(f):
-            if max_docs is not None and count >= max_docs:
+            if max_docs is not None and len(writer) >= max_docs:
                 break
             try:
                 doc = json.loads(line)
-                name = doc.get("company_name", "") or ""
-                industry = doc.get("industries_str_seg", "") or doc.get("industries_str", "") or ""
-                address = doc.get("address", "") or ""
-                rep = doc.get("representative", "") or ""
-                status = doc.get("status", "") or ""
-                
-                text_parts = []
-                if name: text_parts.append(f"Tên công ty: {name}.")
-                if industry: text_parts.append(f"Ngành nghề kinh doanh: {industry.replace('_', ' ')}.")
-                if address: text_parts.append(f"Địa chỉ: {address}.")
-                if rep: text_parts.append(f"Người đại diện: {rep}.")
-                if status: text_parts.append(f"Trạng thái hoạt động: {status}.")
-                
-                text = " ".join(text_parts).strip()
-                if not text:
-                    text = "Không có thông tin doanh nghiệp."
-                
-                texts.append(text)
-                doc_ids.append(i) # doc_id là line number
-                count += 1
-                
-                if count % 10000 == 0:
-                    print(f"  Read {count} documents...")
+                writer.add(i, doc)
                 
-                if len(texts) >= CHUNK_SIZE:
-                    print(f"  Encoding chunk of {len(texts)} documents (Total read: {count})...")
-                    embeddings = model.encode(texts, batch_size=128, show_progress_bar=True)
-                    embeddings = np.array(embeddings).astype('float32')
-                    faiss.normalize_L2(embeddings)
-                    all_embeddings_chunks.append(embeddings)
-                    texts = []
-                    import gc
-                    gc.collect()
+                if len(writer) % 10000 == 0:
+                    print(f"  Read {len(writer)} documents...")
                     
             except Exception as e:
                 print(f"Error parsing line {i}: {e}")
                 continue
-                
-    if len(texts) > 0:
-        print(f"  Encoding final chunk of {len(texts)} documents...")
-        embeddings = model.encode(texts, batch_size=128, show_progress_bar=True)
-        embeddings = np.array(embeddings).astype('float32')
-        faiss.normalize_L2(embeddings)
-        all_embeddings_chunks.append(embeddings)
-        texts = []
-        import gc
-        gc.collect()
-    
-    # Gộp tất cả embeddings
-    print(f"\n[Phase 2/3] Concatenating {len(all_embeddings_chunks)} chunks...")
-    all_embeddings = np.vstack(all_embeddings_chunks)
-    total_vectors = all_embeddings.shape[0]
-    print(f"  Total vectors: {total_vectors}")
-    
-    # Giải phóng chunks
-    del all_embeddings_chunks
-    import gc
-    gc.collect()
-    
-    # ===========================================================================
-    # PHASE 2: Train IVF quantizer
-    # ===========================================================================
-    nlist = min(NLIST, total_vectors // 39)  # Đảm bảo ít nhất 39 vectors/cluster
-    
-    if total_vectors < 10000:
-        # Dataset quá nhỏ → fallback về Flat (brute-force)
-        print(f"  Dataset too small ({total_vectors} vectors), using Flat index...")
-        index = faiss.IndexFlatIP(dimension)
-        index.add(all_embeddings)
-    else:
-        print(f"  Training IVF quantizer with {nlist} clusters on {total_vectors} vectors...")
-        quantizer = faiss.IndexFlatIP(dimension)  # Quantizer dùng exact search
-        index = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss.METRIC_INNER_PRODUCT)
-        
-        # Lấy training sample (tối đa 200k vectors để train nhanh)
-        max_train = min(200000, total_vectors)
-        if total_vectors > max_train:
-            train_indices = np.random.choice(total_vectors, max_train, replace=False)
-            train_data = all_embeddings[train_indices]
-        else:
-            train_data = all_embeddings
-        
-        train_start = time.time()
-        index.train(train_data)
-        print(f"  Training completed in {time.time() - train_start:.1f}s")
-        
-        # ===========================================================================
-        # PHASE 3: Add vectors vào IVF index
-        # ===========================================================================
-        print(f"\n[Phase 3/3] Adding {total_vectors} vectors to IVF index...")
-        add_start = time.time()
-        
-        # Add theo batch để tránh OOM
-        ADD_BATCH = 100000
-        for start_idx in range(0, total_vectors, ADD_BATCH):
-            end_idx = min(start_idx + ADD_BATCH, total_vectors)
-            index.add(all_embeddings[start_idx:end_idx])
-            print(f"  Added {end_idx}/{total_vectors} vectors...")
-        
-        print(f"  Add completed in {time.time() - add_start:.1f}s")
-        
-        # Set nprobe mặc định
-        index.nprobe = NPROBE
-    
-    # ===========================================================================
-    # SAVE
-    # ===========================================================================
-    print(f"\nSaving FAISS index to {output_index_path}...")
-    faiss.write_index(index, output_index_path)
-    
-    with open(output_doc_ids_path, "wb") as f:
-        pickle.dump(doc_ids, f)
     
-    print(f"Done! Index type: {'IVFFlat' if total_vectors >= 10000 else 'Flat'}")
-    print(f"  Total vectors: {total_vectors}")
-    print(f"  Clusters (nlist): {nlist if total_vectors >= 10000 else 'N/A'}")
-    print(f"  Search probes (nprobe): {NPROBE}")
+    writer.save(output_index_path, output_doc_ids_path)
 
 if __name__ == "__main__":
     # Test indexing
@@ -18,7 +18,7 @@ import sys
 # Thêm project root vào path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.ranking.bm25 import BM25Searcher, display_results
+from src.ranking.bm25 import BM25Searcher, MATCH_ALL, display_results
 
 
 BANNER = r"""
@@ -52,6 +52,8 @@ HELP_TEXT = """
     :help          Trợ giúp
     :stats         Thống kê index
     :top N         Đặt số kết quả (mặc định 10)
+    :and           Bật / tắt chế độ AND (doc phải chứa mọi từ khoá;
+                   quay về OR khi không đủ kết quả)
     :quit          Thoát
 """
 
@@ -122,6 +124,11 @@ def main():
                 print("   ⚠️ :top N (ví dụ: :top 20)\n")
             continue
         
+        if query.lower() == ":and":
+            searcher.min_should_match = None if searcher.min_should_match else MATCH_ALL
+            print(f"   ✅ Chế độ: {'AND' if searcher.min_should_match else 'OR'}\n")
+            continue
+        
         results = searcher.search(query, top_k=top_k)
         display_results(results, query)
     
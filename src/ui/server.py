@@ -18,8 +18,10 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 import uvicorn
 
-from src.ranking.bm25 import BM25Searcher
+from src.ranking.bm25 import BM25Searcher, parse_field_weights
 from src.ranking.vector import VectorSearcher
+from src.ranking.topk import top_k_items
+from src.indexer.suggest import SUGGEST_TOP_N
 
 # ============================================================================
 # INIT APP
@@ -83,9 +85,9 @@ def _meta_to_dict(meta: dict) -> dict:
     }
 
 
-def hybrid_search(query: str, top_k: int = 10, alpha: float = 0.65):
+def hybrid_search(query: str, top_k: int = 10, alpha: float = 0.65, field_weights=None):
     pool = max(top_k * 3, 50)
-    bm25_results = bm25_searcher.search(query, top_k=pool)
+    bm25_results = bm25_searcher.search(query, top_k=pool, field_weights=field_weights)
     vector_results = vector_searcher.search(query, top_k=pool) if vector_loaded else []
 
     k = 60
@@ -95,7 +97,7 @@ def hybrid_search(query: str, top_k: int = 10, alpha: float = 0.65):
     for rank, (doc_id, score) in enumerate(vector_results, 1):
         combined[doc_id] = combined.get(doc_id, 0) + (1 - alpha) * (1 / (k + rank))
 
-    sorted_ids = sorted(combined.items(), key=lambda x: x[1], reverse=True)[:top_k]
+    sorted_ids = top_k_items(combined.items(), top_k, key=lambda x: x[1])
     results = []
     for doc_id, rrf_score in sorted_ids:
         meta = bm25_searcher._get_doc_metadata(doc_id)
@@ -118,10 +120,20 @@ async def api_search(
     mode: str = Query("hybrid", description="bm25 | vector | hybrid"),
     top_k: int = Query(10, ge=1, le=2000),
     alpha: float = Query(0.65, ge=0.0, le=1.0),
+    fields: str = Query("", description="Trọng số trường BM25F, vd. company_name:3,address:0.5"),
 ):
     if not q.strip():
         return {"error": "Empty query", "results": [], "time_ms": 0}
 
+    # Trọng số trường chọn lúc truy vấn (index theo trường), không cần build lại
+    try:
+        field_weights = parse_field_weights(fields) or None
+    except ValueError as e:
+        return {"error": str(e), "results": [], "time_ms": 0}
+    unknown = set(field_weights or ()) - set(bm25_searcher.fields or field_weights or ())
+    if unknown:
+        return {"error": f"Unknown fields: {', '.join(sorted(unknown))}", "results": [], "time_ms": 0}
+
     import re
     import json
     # 1. Nhận diện định danh (MST) để quét nguyên thuỷ
@@ -175,7 +187,7 @@ async def api_search(
             }
 
     if mode == "bm25":
-        raw = bm25_searcher.search(q, top_k=max(top_k * 3, 50))
+        raw = bm25_searcher.search(q, top_k=max(top_k * 3, 50), field_weights=field_weights)
         results = [
             {"doc_id": doc_id, "score": round(score, 4), **_meta_to_dict(meta)}
             for doc_id, score, meta in raw
@@ -187,12 +199,27 @@ async def api_search(
             meta = bm25_searcher._get_doc_metadata(doc_id)
             results.append({"doc_id": doc_id, "score": round(score, 4), **_meta_to_dict(meta)})
     else:
-        results = hybrid_search(q, top_k=top_k, alpha=alpha)
+        results = hybrid_search(q, top_k=top_k, alpha=alpha, field_weights=field_weights)
+    
+    # "Có phải bạn muốn tìm": token gõ sai đã được BM25 sửa qua trigram index
+    did_you_mean = bm25_searcher.last_suggestion if mode != "vector" else bm25_searcher.did_you_mean(q)
         
     # 2. Áp dụng Exact Match Boost (Tôn trọng tuyệt đối Tên danh tính & Địa chỉ)
     q_lower = q_clean.lower()
     q_words_list = q_lower.split()
     q_words = len(q_words_list)
+    
+    # Có index vị trí: doc trong pool chứa đúng cụm từ (tên / địa chỉ / ngành) -
+    # tra thẳng index vị trí, không chạy thêm 1 lượt search. Vẫn giữ so chuỗi
+    # bên dưới: PyVi có thể tách cụm khác lúc index, truy vấn không dấu không khớp phrase
+    phrase_ids = set()
+    if (mode != "vector" and q_words >= 2 and results
+            and bm25_searcher.has_positions and '"' not in q_clean):
+        phrase_tokens = bm25_searcher._phrase_tokens(q_clean)
+        if len(phrase_tokens) >= 2:
+            pool = {r["doc_id"] for r in results}
+            phrase_ids = pool.intersection(bm25_searcher.match_phrase(phrase_tokens).tolist())
+    
     if q_words >= 2 and results:
         max_score = max(r["score"] for r in results)
         q_words_set = set(q_words_list)
@@ -204,6 +231,8 @@ async def api_search(
             # Ưu tiên theo tên công ty
             if comp_name == q_lower:
                 boost_factor += 1.0    # Khớp tuyệt đối tên công ty
+            elif r["doc_id"] in phrase_ids:
+                boost_factor += 0.5    # Khớp chính xác cụm từ (tên / địa chỉ / ngành)
             elif f" {q_lower} " in f" {comp_name} ":
                 boost_factor += 0.5    # Khớp chính xác cụm từ khóa bên trong tên
             else:
@@ -224,7 +253,7 @@ async def api_search(
                 r["score"] = max_score + (max_score * boost_factor) + (r["score"] * 0.1)
 
     # Re-sort in case Exact Matches were boosted
-    results = sorted(results, key=lambda x: x["score"], reverse=True)[:top_k]
+    results = top_k_items(results, top_k, key=lambda x: x["score"])
     
     elapsed = (time.time() - start) * 1000
 
@@ -241,6 +270,22 @@ async def api_search(
         "results": results,
         "total": true_total,
         "time_ms": round(elapsed, 1),
+        "did_you_mean": did_you_mean,
+    }
+
+
+@app.get("/api/suggest")
+async def api_suggest(
+    q: str = Query("", description="Tiền tố đang gõ"),
+    limit: int = Query(8, ge=1, le=SUGGEST_TOP_N),
+):
+    # Gợi ý khi gõ: chỉ tra index gợi ý tính sẵn (suggest.py), không chạy BM25
+    start = time.perf_counter()
+    suggestions = bm25_searcher.suggest(q, limit) if q.strip() else {"terms": [], "companies": []}
+    return {
+        "query": q,
+        **suggestions,
+        "time_ms": round((time.perf_counter() - start) * 1000, 3),
     }
 
 
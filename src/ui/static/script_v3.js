@@ -14,11 +14,23 @@ document.addEventListener('DOMContentLoaded', () => {
 
     const input = document.getElementById('search-input');
     input.addEventListener('keydown', (e) => {
-        if (e.key === 'Enter') performSearch();
+        if (e.key === 'ArrowDown' || e.key === 'ArrowUp') {
+            if (suggestItems.length) {
+                e.preventDefault();
+                moveSuggestion(e.key === 'ArrowDown' ? 1 : -1);
+            }
+        } else if (e.key === 'Escape') {
+            hideSuggestions();
+        } else if (e.key === 'Enter') {
+            if (suggestActive >= 0) pickSuggestion(suggestActive);
+            else performSearch();
+        }
     });
     input.addEventListener('input', () => {
         document.getElementById('clear-btn').style.display = input.value ? 'block' : 'none';
+        scheduleSuggest();
     });
+    input.addEventListener('blur', hideSuggestions);
     input.focus();
 });
 
@@ -44,6 +56,7 @@ function quickSearch(query) {
 }
 
 function clearSearch() {
+    hideSuggestions();
     const input = document.getElementById('search-input');
     input.value = '';
     input.focus();
@@ -59,6 +72,7 @@ function clearSearch() {
 
 async function performSearch() {
     const query = document.getElementById('search-input').value.trim();
+    hideSuggestions();
     if (!query) return;
 
     currentQuery = query;
@@ -103,6 +117,82 @@ async function performSearch() {
     }
 }
 
+// ============================================================================
+// Suggest (gợi ý khi gõ)
+// ============================================================================
+
+const SUGGEST_DELAY_MS = 80;
+let suggestTimer = null;
+let suggestSeq = 0;       // Bỏ qua phản hồi của phím bấm cũ
+let suggestItems = [];
+let suggestActive = -1;
+
+function scheduleSuggest() {
+    clearTimeout(suggestTimer);
+    suggestTimer = setTimeout(fetchSuggestions, SUGGEST_DELAY_MS);
+}
+
+async function fetchSuggestions() {
+    const query = document.getElementById('search-input').value;
+    const seq = ++suggestSeq;
+    if (!query.trim()) {
+        hideSuggestions();
+        return;
+    }
+    try {
+        const params = new URLSearchParams({ q: query, limit: 8 });
+        const res = await fetch(`/api/suggest?${params}`);
+        const data = await res.json();
+        if (seq === suggestSeq) renderSuggestions(data);
+    } catch (err) {
+        console.error(err);
+    }
+}
+
+function renderSuggestions(data) {
+    const groups = [['Từ khoá', data.terms || []], ['Doanh nghiệp', data.companies || []]];
+    suggestItems = [];
+    suggestActive = -1;
+    let html = '';
+    groups.forEach(([label, items]) => {
+        if (!items.length) return;
+        html += `<div class="suggest-group">${label}</div>`;
+        items.forEach(text => {
+            html += `<div class="suggest-item" onmousedown="event.preventDefault(); pickSuggestion(${suggestItems.length});">${esc(text)}</div>`;
+            suggestItems.push(text);
+        });
+    });
+    const box = document.getElementById('suggest-box');
+    box.innerHTML = html;
+    box.style.display = suggestItems.length ? 'block' : 'none';
+}
+
+function hideSuggestions() {
+    clearTimeout(suggestTimer);
+    suggestSeq++;
+    suggestItems = [];
+    suggestActive = -1;
+    const box = document.getElementById('suggest-box');
+    box.style.display = 'none';
+    box.innerHTML = '';
+}
+
+function moveSuggestion(step) {
+    // -1 = không chọn gợi ý nào (giữ nguyên text đang gõ)
+    let next = suggestActive + step;
+    if (next < -1) next = suggestItems.length - 1;
+    if (next >= suggestItems.length) next = -1;
+    suggestActive = next;
+    document.querySelectorAll('#suggest-box .suggest-item').forEach((item, i) => {
+        item.classList.toggle('active', i === suggestActive);
+    });
+}
+
+function pickSuggestion(index) {
+    const text = suggestItems[index];
+    if (text !== undefined) quickSearch(text);
+}
+
 let allResults = [];
 let filteredResults = [];
 let currentQuery = '';
@@ -168,8 +258,11 @@ function renderResults(data) {
 
     // Summary
     const displayCount = data.results ? data.results.length : 0;
+    const didYouMean = data.did_you_mean
+        ? `<div class="did-you-mean">Có phải bạn muốn tìm: <a href="#" onclick="quickSearch(this.textContent); return false;">${esc(data.did_you_mean)}</a></div>`
+        : '';
     document.getElementById('results-summary').innerHTML =
-        `Khoảng <strong>${fmt(data.total)}</strong> kết quả (hiển thị ${displayCount}). Phản hồi trong <strong>${data.time_ms}ms</strong> <span class="mode-badge">${modeLabel}</span>`;
+        `Khoảng <strong>${fmt(data.total)}</strong> kết quả (hiển thị ${displayCount}). Phản hồi trong <strong>${data.time_ms}ms</strong> <span class="mode-badge">${modeLabel}</span>${didYouMean}`;
 
     loadMore();
     document.getElementById('results-section').style.display = 'block';
@@ -0,0 +1,128 @@
+"""
+Benchmark: BM25Searcher.search vs Block-Max WAND
+=================================================
+Chạy bộ truy vấn của tests/benchmark.py (TEST_QUERIES) với:
+  - search:  BM25Searcher.search hiện tại (tham số mặc định: impacts, champion
+             lists nếu index có, scorer numpy)
+  - bmw:     BM25Searcher(scorer="bmw"): Block-Max WAND trên impacts, chỉ
+             decode block còn có thể vào top-k (src/ranking/block_max.py)
+
+Báo cáo mỗi truy vấn: số doc khớp, tỉ lệ postings đã decode của bmw (trên
+tổng postings các term của truy vấn, index gốc), latency median (đã
+warm-up) và top-k có giống hệt không. Tổng kết: p50 / p99 latency của 2
+cách và tỉ lệ postings decode trên các truy vấn bmw trả lời (truy vấn không
+có list >= BLOCK_MAX_MIN_DF quay về numpy - decode cả list, cột "numpy").
+
+Block max chỉ chặt khi postings có impact cao dồn vào 1 số block, vd. index
+build với --reorder (doc_id theo tỉnh -> ngành -> tên); doc_id ngẫu nhiên
+thì block nào cũng có posting gần impact lớn nhất của term.
+
+Nếu index chưa có impacts, chúng được tính vào 1 thư mục tạm (symlink tới
+các file của index) - index gốc không bị sửa.
+
+Usage:
+    python tests/benchmark_block_max.py [index_dir] [jsonl_path] [--top-k 10] [--runs 5]
+"""
+
+import os
+import io
+import ast
+import sys
+import shutil
+import argparse
+import contextlib
+
+import numpy as np
+
+# Thêm project root vào path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.ranking.bm25 import BM25Searcher
+from benchmark_impacts import RUNS, JSONL_PATH, INDEX_DIR, _with_impacts_dir, _timed_search
+
+
+def load_test_queries():
+    """
+    TEST_QUERIES của tests/benchmark.py - đọc qua ast thay vì import (import
+    benchmark.py ghi đè benchmark_output.txt và cần FAISS cho vector search).
+    """
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark.py")
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(getattr(t, "id", None) == "TEST_QUERIES"
+                                                for t in node.targets):
+            return [item["query"] for item in ast.literal_eval(node.value)]
+    raise ValueError(f"TEST_QUERIES not found in {path}")
+
+
+def run_benchmark(index_dir: str, jsonl_path: str, queries, top_k: int = 10, runs: int = RUNS):
+    print("=" * 80)
+    print("  BENCHMARK — BM25Searcher.search vs Block-Max WAND (scorer=\"bmw\")")
+    print("=" * 80)
+    print(f"  Index: {index_dir}")
+
+    impacts_dir, tmp_dir = _with_impacts_dir(index_dir)
+    searchers = {}
+    try:
+        searchers["search"] = BM25Searcher(index_dir=impacts_dir, jsonl_path=jsonl_path,
+                                           auto_refresh=False)
+        searchers["bmw"] = BM25Searcher(index_dir=impacts_dir, jsonl_path=jsonl_path,
+                                        auto_refresh=False, use_champions=False, scorer="bmw")
+        for searcher in searchers.values():
+            with contextlib.redirect_stdout(io.StringIO()):
+                searcher.load_index()
+
+        print(f"  Queries: {len(queries)} (tests/benchmark.py) | top-k: {top_k} | runs: {runs}")
+        print(f"\n  {'Query':<32} {'Matched':>9} {'Decoded':>8} {'search ms':>10} {'bmw ms':>8} "
+              f"{'Speedup':>8} {'Same':>5}")
+        print(f"  {'-' * 32} {'-' * 9} {'-' * 8} {'-' * 10} {'-' * 8} {'-' * 8} {'-' * 5}")
+
+        times = {name: [] for name in searchers}
+        decoded_total = postings_total = fallbacks = 0
+        same = 0
+        for query in queries:
+            expected, search_ms = _timed_search(searchers["search"], query, top_k, runs)
+            actual, bmw_ms = _timed_search(searchers["bmw"], query, top_k, runs)
+            times["search"].append(search_ms)
+            times["bmw"].append(bmw_ms)
+            identical = [d for d, _ in expected] == [d for d, _ in actual] \
+                and all(abs(a - b) <= 1e-9 for (_, a), (_, b) in zip(expected, actual))
+            same += identical
+            if searchers["bmw"].last_decoded is not None:
+                decoded, total = searchers["bmw"].last_decoded
+                decoded_total += decoded
+                postings_total += total
+                decoded_label = f"{decoded / max(total, 1):.0%}"
+            else:
+                fallbacks += 1
+                decoded_label = "numpy"
+            print(f"  {query[:32]:<32} {searchers['search'].last_match_count:>9,d} {decoded_label:>8} "
+                  f"{search_ms:>10.1f} {bmw_ms:>8.1f} {search_ms / max(bmw_ms, 1e-9):>7.1f}x "
+                  f"{'yes' if identical else 'NO':>5}")
+    finally:
+        for searcher in searchers.values():
+            searcher.close()
+        if tmp_dir is not None:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print("-" * 80)
+    for name, label in (("search", "BM25Searcher.search"), ("bmw", "Block-Max WAND")):
+        p50, p99 = np.percentile(times[name], [50, 99])
+        print(f"  {label:<22} p50 {p50:7.1f} ms | p99 {p99:7.1f} ms | total {sum(times[name]):8.1f} ms")
+    print(f"  Postings decoded:      {decoded_total:,d} / {postings_total:,d} "
+          f"({decoded_total / max(postings_total, 1):.1%}, {len(queries) - fallbacks} bmw queries; "
+          f"{fallbacks} fell back to numpy)")
+    print(f"  Identical top-{top_k}:     {same}/{len(queries)} queries")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency + postings decode: search vs Block-Max WAND")
+    parser.add_argument("index_dir", nargs="?", default=INDEX_DIR)
+    parser.add_argument("jsonl_path", nargs="?", default=JSONL_PATH)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=RUNS)
+    args = parser.parse_args()
+    run_benchmark(args.index_dir, args.jsonl_path, load_test_queries(), args.top_k, args.runs)
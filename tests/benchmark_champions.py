@@ -0,0 +1,147 @@
+"""
+Benchmark: Champion Lists vs Full Postings
+===========================================
+Chạy cùng bộ truy vấn với 2 BM25Searcher (cùng impacts 8-bit) trên cùng index:
+  - Full:      postings đầy đủ của mọi term (cắt MAX_MATCHES như cũ)
+  - Champions: tầng champion trước, postings đầy đủ khi không chứng minh
+               được top-k (xem src/indexer/champions.py)
+
+Báo cáo:
+  - Tier:        truy vấn được trả lời từ champion lists hay postings đầy đủ
+  - Overlap@k:   |top-k full ∩ top-k champions| / k (recall của tầng nhanh)
+  - Latency:     median trên nhiều lần chạy mỗi truy vấn (đã warm-up)
+
+Nếu index chưa có impacts / champion lists, chúng được tính vào 1 thư mục
+tạm (symlink tới các file của index) - index gốc không bị sửa.
+
+Usage:
+    python tests/benchmark_champions.py [index_dir] [jsonl_path] [--queries file]
+        [--top-k 10] [--size 5000] [--min-df 50000]
+"""
+
+import os
+import io
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import contextlib
+
+# Thêm project root vào path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.indexer.impacts import has_impacts, write_impacts
+from src.indexer.champions import (
+    has_champions, write_champions, CHAMPION_SIZE, CHAMPION_MIN_DF, CHAMPIONS_FILES,
+    CHAMPIONS_META_FILENAME,
+)
+from src.ranking.bm25 import BM25Searcher, K1, B, FIELD_WEIGHTS
+from benchmark_impacts import QUERIES, RUNS, INDEX_DIR, JSONL_PATH, _timed_search
+
+CHAMPION_NAMES = set(CHAMPIONS_FILES.values()) | {CHAMPIONS_META_FILENAME}
+
+
+def _with_champions_dir(index_dir: str, size: int, min_df: int, rebuild: bool):
+    """(thư mục có champion lists, thư mục tạm cần xoá hoặc None)."""
+    if has_champions(index_dir) and not rebuild:
+        return index_dir, None
+    tmp_dir = tempfile.mkdtemp()
+    for name in os.listdir(index_dir):
+        if name not in CHAMPION_NAMES:
+            os.symlink(os.path.abspath(os.path.join(index_dir, name)), os.path.join(tmp_dir, name))
+    start = time.perf_counter()
+    if not has_impacts(tmp_dir):
+        write_impacts(tmp_dir, K1, B, FIELD_WEIGHTS)
+    meta = write_champions(tmp_dir, size, min_df)
+    print(f"  Built champion lists in temp dir: {meta['num_terms']:,d} terms, "
+          f"{meta['num_postings']:,d} postings ({time.perf_counter() - start:.1f}s)")
+    return tmp_dir, tmp_dir
+
+
+def _open(index_dir: str, jsonl_path: str, use_champions: bool) -> BM25Searcher:
+    searcher = BM25Searcher(index_dir=index_dir, jsonl_path=jsonl_path,
+                            auto_refresh=False, use_champions=use_champions)
+    with contextlib.redirect_stdout(io.StringIO()):
+        searcher.load_index()
+    return searcher
+
+
+def run_benchmark(index_dir: str, jsonl_path: str, queries, top_k: int = 10, runs: int = RUNS,
+                  size: int = CHAMPION_SIZE, min_df: int = CHAMPION_MIN_DF, rebuild: bool = False):
+    print("=" * 80)
+    print("  BENCHMARK — Champion Lists vs Full Postings")
+    print("=" * 80)
+    print(f"  Index: {index_dir}")
+
+    champions_dir, tmp_dir = _with_champions_dir(index_dir, size, min_df, rebuild)
+    try:
+        full = _open(champions_dir, jsonl_path, use_champions=False)
+        tiered = _open(champions_dir, jsonl_path, use_champions=True)
+        if tiered.champions is None:
+            print("  ERROR: champion lists could not be opened (impacts out of date?)")
+            return
+
+        print(f"  Queries: {len(queries)} | top-k: {top_k} | runs: {runs}")
+        print(f"\n  {'Query':<32} {'Full ms':>8} {'Tier ms':>8} {'Tier':>10} {'Overlap':>8}")
+        print(f"  {'-' * 32} {'-' * 8} {'-' * 8} {'-' * 10} {'-' * 8}")
+
+        overlaps, answered, same_order = [], 0, 0
+        full_times, tier_times = [], []
+        for query in queries:
+            full_results, full_ms = _timed_search(full, query, top_k, runs)
+            tier_results, tier_ms = _timed_search(tiered, query, top_k, runs)
+            full_times.append(full_ms)
+            tier_times.append(tier_ms)
+            answered += tiered.last_tier == "champions"
+
+            full_ids = [doc_id for doc_id, _ in full_results]
+            tier_ids = [doc_id for doc_id, _ in tier_results]
+            if full_ids or tier_ids:
+                overlap = len(set(full_ids) & set(tier_ids)) / max(len(full_ids), len(tier_ids))
+            else:
+                overlap = 1.0
+            overlaps.append(overlap)
+            same_order += full_ids == tier_ids
+            print(f"  {query[:32]:<32} {full_ms:>8.1f} {tier_ms:>8.1f} "
+                  f"{tiered.last_tier:>10} {overlap:>8.2f}")
+
+        full.close()
+        tiered.close()
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir)
+
+    print("-" * 80)
+    print(f"  Answered from champion lists: {answered}/{len(queries)} queries")
+    print(f"  Mean overlap@{top_k}:            {statistics.mean(overlaps):.3f} "
+          f"(same order: {same_order}/{len(queries)})")
+    full_total, tier_total = sum(full_times), sum(tier_times)
+    print(f"  Total latency (ms):          full {full_total:.1f} | tiered {tier_total:.1f} "
+          f"({full_total / max(tier_total, 1e-9):.2f}x)")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall + latency: champion lists vs full postings")
+    parser.add_argument("index_dir", nargs="?", default=INDEX_DIR)
+    parser.add_argument("jsonl_path", nargs="?", default=JSONL_PATH)
+    parser.add_argument("--queries", help="File truy vấn, mỗi dòng 1 truy vấn")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=RUNS)
+    parser.add_argument("--size", type=int, default=CHAMPION_SIZE,
+                        help="Số posting mỗi champion list")
+    parser.add_argument("--min-df", type=int, default=CHAMPION_MIN_DF,
+                        help="Chỉ term có df >= min-df mới có champion list")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Tính lại champion lists (thư mục tạm) với --size / --min-df")
+    args = parser.parse_args()
+
+    queries = QUERIES
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    run_benchmark(args.index_dir, args.jsonl_path, queries, args.top_k, args.runs,
+                  args.size, args.min_df, args.rebuild)
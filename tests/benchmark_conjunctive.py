@@ -0,0 +1,97 @@
+"""
+Benchmark: OR vs AND / Minimum-Should-Match
+===========================================
+Chạy bộ truy vấn của tests/benchmark.py (TEST_QUERIES) với:
+  - or:   BM25Searcher.search mặc định (OR, doc khớp thiếu term bị giảm điểm
+          bởi coordination factor)
+  - and:  BM25Searcher(min_should_match=...) (mặc định "all" = AND): giao
+          postings từ list ngắn nhất, list dài chỉ tra qua skip table; quay
+          về OR khi < top-k doc thoả (xem BM25Searcher._search_conjunctive)
+
+Báo cáo mỗi truy vấn: số doc khớp OR / số doc thoả, latency median (đã
+warm-up) của 2 cách và cách đã trả lời ("or" = quay về OR). Tổng kết:
+p50 / p99 / tổng latency, tính riêng các truy vấn được trả lời bằng giao.
+
+Usage:
+    python tests/benchmark_conjunctive.py [index_dir] [jsonl_path] [--mode all] [--top-k 10] [--runs 5]
+"""
+
+import os
+import io
+import sys
+import argparse
+import contextlib
+
+import numpy as np
+
+# Thêm project root vào path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.ranking.bm25 import BM25Searcher, MATCH_ALL
+from benchmark_impacts import RUNS, JSONL_PATH, INDEX_DIR, _timed_search
+from benchmark_block_max import load_test_queries
+
+
+def run_benchmark(index_dir: str, jsonl_path: str, queries, mode=MATCH_ALL,
+                  top_k: int = 10, runs: int = RUNS):
+    print("=" * 80)
+    print(f"  BENCHMARK — BM25 OR vs min_should_match={mode!r}")
+    print("=" * 80)
+    print(f"  Index: {index_dir}")
+
+    searchers = {}
+    try:
+        searchers["or"] = BM25Searcher(index_dir=index_dir, jsonl_path=jsonl_path, auto_refresh=False)
+        searchers["and"] = BM25Searcher(index_dir=index_dir, jsonl_path=jsonl_path,
+                                        auto_refresh=False, min_should_match=mode)
+        for searcher in searchers.values():
+            with contextlib.redirect_stdout(io.StringIO()):
+                searcher.load_index()
+
+        print(f"  Queries: {len(queries)} | top-k: {top_k} | runs: {runs}")
+        print(f"\n  {'Query':<32} {'OR hits':>9} {'AND hits':>9} {'OR ms':>8} {'AND ms':>8} "
+              f"{'Speedup':>8} {'Answer':>7}")
+        print(f"  {'-' * 32} {'-' * 9} {'-' * 9} {'-' * 8} {'-' * 8} {'-' * 8} {'-' * 7}")
+
+        times = {name: [] for name in searchers}
+        answered = []  # (or ms, and ms) của truy vấn được trả lời bằng giao
+        for query in queries:
+            _, or_ms = _timed_search(searchers["or"], query, top_k, runs)
+            _, and_ms = _timed_search(searchers["and"], query, top_k, runs)
+            times["or"].append(or_ms)
+            times["and"].append(and_ms)
+            conjunctive = searchers["and"].last_min_match is not None
+            if conjunctive:
+                answered.append((or_ms, and_ms))
+            hits = f"{searchers['and'].last_match_count:>9,d}" if conjunctive else f"{'-':>9}"
+            print(f"  {query[:32]:<32} {searchers['or'].last_match_count:>9,d} {hits} "
+                  f"{or_ms:>8.1f} {and_ms:>8.1f} {or_ms / max(and_ms, 1e-9):>7.1f}x "
+                  f"{'and' if conjunctive else 'or':>7}")
+    finally:
+        for searcher in searchers.values():
+            searcher.close()
+
+    print("-" * 80)
+    for name, label in (("or", "OR"), ("and", f"min_should_match={mode}")):
+        p50, p99 = np.percentile(times[name], [50, 99])
+        print(f"  {label:<24} p50 {p50:7.1f} ms | p99 {p99:7.1f} ms | total {sum(times[name]):8.1f} ms")
+    if answered:
+        or_ms, and_ms = (np.array(values) for values in zip(*answered))
+        print(f"  Answered by intersection: {len(answered)}/{len(queries)} queries | "
+              f"median OR {np.median(or_ms):.1f} ms -> {np.median(and_ms):.1f} ms "
+              f"({or_ms.sum() / max(and_ms.sum(), 1e-9):.2f}x total)")
+    else:
+        print(f"  Answered by intersection: 0/{len(queries)} queries (all fell back to OR)")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency: BM25 OR vs AND / minimum-should-match")
+    parser.add_argument("index_dir", nargs="?", default=INDEX_DIR)
+    parser.add_argument("jsonl_path", nargs="?", default=JSONL_PATH)
+    parser.add_argument("--mode", default=MATCH_ALL, help='"all", N, -N hoặc N%% (mặc định: all)')
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=RUNS)
+    args = parser.parse_args()
+    run_benchmark(args.index_dir, args.jsonl_path, load_test_queries(), args.mode, args.top_k, args.runs)
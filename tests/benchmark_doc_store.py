@@ -0,0 +1,150 @@
+"""
+Benchmark: Doc Store (pickle dict vs NumPy arrays)
+===================================================
+So sánh load time, RSS và tốc độ tra cứu length-norm trong hot loop BM25:
+  - Trước: doc_lengths.pkl + doc_offsets.pkl (Dict[int, int])
+  - Sau:   doc_lengths.npy + doc_offsets.npy + doc_norms.npy (mmap)
+
+Mỗi biến thể chạy trong 1 subprocess riêng để đo RSS sạch.
+Nếu index chỉ có định dạng mới, bản pickle được dựng lại vào thư mục tạm.
+
+Usage:
+    python tests/benchmark_doc_store.py [index_dir]
+"""
+
+import os
+import sys
+import json
+import time
+import pickle
+import shutil
+import tempfile
+import subprocess
+
+import numpy as np
+
+# Thêm project root vào path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.indexer.doc_store import (
+    has_doc_store, load_doc_store, doc_store_from_pickles, EMPTY_DOC,
+)
+
+INDEX_DIR = os.path.join(PROJECT_ROOT, "data", "index")
+NUM_LOOKUPS = 400_000   # ~ số postings của 1 term phổ biến
+
+
+def _rss_mb() -> float:
+    """RSS hiện tại (MB). Linux: /proc; nơi khác: peak RSS qua resource."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        return float("nan")
+
+
+def _child(variant: str, index_dir: str):
+    """Chạy trong subprocess: load 1 biến thể, đo và in JSON."""
+    rss_before = _rss_mb()
+    t0 = time.perf_counter()
+    if variant == "pickle":
+        with open(os.path.join(index_dir, "doc_lengths.pkl"), "rb") as f:
+            doc_lengths = pickle.load(f)
+        with open(os.path.join(index_dir, "doc_offsets.pkl"), "rb") as f:
+            doc_offsets = pickle.load(f)
+        num_docs = max(doc_lengths) + 1 if doc_lengths else 0
+        avgdl = sum(doc_lengths.values()) / max(len(doc_lengths), 1)
+    else:
+        store = load_doc_store(index_dir)
+        num_docs = len(store)
+        avgdl = store.avg_doc_length
+    load_time = time.perf_counter() - t0
+    rss_after = _rss_mb()
+
+    # Tra cứu length norm cho NUM_LOOKUPS doc_ids tăng dần (giống 1 postings list)
+    rng = np.random.default_rng(42)
+    doc_ids = np.sort(rng.choice(max(num_docs, 1), size=min(NUM_LOOKUPS, num_docs), replace=False))
+    b = 0.4
+    t0 = time.perf_counter()
+    if variant == "pickle":
+        total = 0.0
+        for doc_id in doc_ids.tolist():
+            doc_length = doc_lengths.get(doc_id, avgdl)
+            total += 1 - b + b * (doc_length / avgdl)
+    else:
+        total = float(sum(store.doc_norms[doc_ids].tolist()))
+    lookup_time = time.perf_counter() - t0
+
+    print(json.dumps({
+        "load_ms": load_time * 1000,
+        "rss_mb": rss_after - rss_before,
+        "lookup_ms": lookup_time * 1000,
+        "lookups": int(doc_ids.size),
+    }))
+
+
+def _run_child(variant: str, index_dir: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", variant, index_dir],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def run_benchmark(index_dir: str = INDEX_DIR):
+    print("=" * 80)
+    print("  BENCHMARK — Doc Store: pickle dict vs NumPy arrays")
+    print("=" * 80)
+
+    tmp_dir = None
+    pickle_dir = array_dir = index_dir
+    has_pickles = os.path.exists(os.path.join(index_dir, "doc_lengths.pkl"))
+
+    if not has_doc_store(index_dir) or not has_pickles:
+        # Dựng định dạng còn thiếu vào thư mục tạm từ cùng dữ liệu
+        tmp_dir = tempfile.mkdtemp()
+        if has_doc_store(index_dir):
+            store = load_doc_store(index_dir)
+            pickle_dir = tmp_dir
+            lengths = {i: int(v) for i, v in enumerate(store.doc_lengths.tolist()) if v != EMPTY_DOC}
+            offsets = {i: int(v) for i, v in enumerate(store.doc_offsets.tolist()) if v != EMPTY_DOC}
+            with open(os.path.join(tmp_dir, "doc_lengths.pkl"), "wb") as f:
+                pickle.dump(lengths, f, protocol=pickle.HIGHEST_PROTOCOL)
+            with open(os.path.join(tmp_dir, "doc_offsets.pkl"), "wb") as f:
+                pickle.dump(offsets, f, protocol=pickle.HIGHEST_PROTOCOL)
+        else:
+            from src.indexer.doc_store import write_doc_store
+            store = doc_store_from_pickles(index_dir)
+            array_dir = tmp_dir
+            write_doc_store(tmp_dir, store.doc_lengths, store.doc_offsets)
+
+    try:
+        before = _run_child("pickle", pickle_dir)
+        after = _run_child("arrays", array_dir)
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir)
+
+    print(f"  Index: {index_dir}")
+    print(f"  Lookups per run: {after['lookups']:,d}")
+    print(f"\n  {'Metric':<30} {'Pickle dict':>15} {'NumPy arrays':>15}")
+    print(f"  {'-' * 30} {'-' * 15} {'-' * 15}")
+    print(f"  {'Load time (ms)':<30} {before['load_ms']:>15.1f} {after['load_ms']:>15.1f}")
+    print(f"  {'RSS after load (MB)':<30} {before['rss_mb']:>15.1f} {after['rss_mb']:>15.1f}")
+    print(f"  {'Length-norm lookups (ms)':<30} {before['lookup_ms']:>15.1f} {after['lookup_ms']:>15.1f}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 4 and sys.argv[1] == "--child":
+        _child(sys.argv[2], sys.argv[3])
+    else:
+        run_benchmark(sys.argv[1] if len(sys.argv) > 1 else INDEX_DIR)
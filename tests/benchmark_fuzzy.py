@@ -0,0 +1,154 @@
+"""
+Benchmark: Fuzzy Term Lookup (Trigram Index)
+=============================================
+Lấy mẫu term của index (df >= min_df, dài >= 4 ký tự), tạo lỗi gõ tổng hợp
+(thay / xoá / chèn 1 ký tự hoặc hoán vị 2 ký tự kề, seed cố định) rồi tra
+trên toàn bộ vocabulary (src/indexer/fuzzy_terms.py).
+
+Báo cáo:
+  - Recall@1 / @5:  term gốc đứng đầu / nằm trong 5 gợi ý
+  - Latency:        median / p95 / max mỗi lần tra (ms)
+  - Kích thước:     số trigram, số posting, dung lượng file trên đĩa
+
+Nếu index chưa có trigram index, nó được tính vào 1 thư mục tạm (symlink
+tới các file của index) - index gốc không bị sửa.
+
+Usage:
+    python tests/benchmark_fuzzy.py [index_dir] [--samples 1000] [--seed 301]
+        [--min-df 2] [--rebuild]
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import statistics
+
+import numpy as np
+
+# Thêm project root vào path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.indexer.mmap_term_dict import MmapTermDict, TERM_DICT_FILENAME
+from src.indexer.fuzzy_terms import (
+    has_fuzzy_terms, write_fuzzy_terms, FuzzyTermIndex, FUZZY_MIN_DF,
+    FUZZY_GRAMS_FILENAME, FUZZY_POSTINGS_FILENAME, FUZZY_SYLLABLES_FILENAME, FUZZY_META_FILENAME,
+)
+from benchmark_impacts import INDEX_DIR
+
+FUZZY_NAMES = {FUZZY_GRAMS_FILENAME, FUZZY_POSTINGS_FILENAME, FUZZY_SYLLABLES_FILENAME,
+               FUZZY_META_FILENAME}
+ALPHABET = "abcdefghijklmnopqrstuvwxyz"
+
+
+def _with_fuzzy_dir(index_dir: str, min_df: int, rebuild: bool):
+    """(thư mục có trigram index, thư mục tạm cần xoá hoặc None)."""
+    if has_fuzzy_terms(index_dir) and not rebuild:
+        return index_dir, None
+    tmp_dir = tempfile.mkdtemp()
+    for name in os.listdir(index_dir):
+        if name not in FUZZY_NAMES:
+            os.symlink(os.path.abspath(os.path.join(index_dir, name)), os.path.join(tmp_dir, name))
+    start = time.perf_counter()
+    meta = write_fuzzy_terms(tmp_dir, min_df)
+    print(f"  Built trigram index in temp dir: {meta['num_terms']:,d} terms "
+          f"({time.perf_counter() - start:.1f}s)")
+    return tmp_dir, tmp_dir
+
+
+def make_typo(term: str, rng: random.Random) -> str:
+    """1 lỗi gõ ngẫu nhiên (không đụng dấu "_" giữa các âm tiết)."""
+    positions = [i for i, c in enumerate(term) if c != "_"]
+    i = rng.choice(positions)
+    kind = rng.choice(("substitute", "delete", "insert", "transpose"))
+    if kind == "substitute":
+        return term[:i] + rng.choice(ALPHABET.replace(term[i], "")) + term[i + 1:]
+    if kind == "delete":
+        return term[:i] + term[i + 1:]
+    if kind == "insert":
+        return term[:i] + rng.choice(ALPHABET) + term[i:]
+    if i + 1 < len(term) and term[i + 1] != "_" and term[i + 1] != term[i]:
+        return term[:i] + term[i + 1] + term[i] + term[i + 2:]
+    return term[:i] + term[i + 1:]
+
+
+def sample_terms(index_dir: str, samples: int, min_df: int, rng: random.Random):
+    term_dict = MmapTermDict(os.path.join(index_dir, TERM_DICT_FILENAME))
+    try:
+        dfs = np.asarray(term_dict.records["df"])
+        ordinals = np.flatnonzero(dfs >= min_df).tolist()
+        rng.shuffle(ordinals)
+        terms = []
+        for ordinal in ordinals:
+            term = term_dict.term_at(ordinal)
+            if len(term) >= 4 and not term.isdigit():
+                terms.append(term)
+                if len(terms) == samples:
+                    break
+        return terms
+    finally:
+        term_dict.close()
+
+
+def run_benchmark(index_dir: str, samples: int = 1000, seed: int = 301,
+                  min_df: int = FUZZY_MIN_DF, rebuild: bool = False):
+    print("=" * 80)
+    print("  BENCHMARK — Fuzzy Term Lookup (Trigram Index)")
+    print("=" * 80)
+    print(f"  Index: {index_dir}")
+
+    fuzzy_dir, tmp_dir = _with_fuzzy_dir(index_dir, min_df, rebuild)
+    try:
+        rng = random.Random(seed)
+        terms = sample_terms(fuzzy_dir, samples, max(min_df, 1), rng)
+        typos = [make_typo(term, rng) for term in terms]
+        fuzzy = FuzzyTermIndex(fuzzy_dir)
+        meta = fuzzy.meta
+        size_mb = sum(os.path.getsize(os.path.join(fuzzy_dir, name)) for name in FUZZY_NAMES) / 1e6
+        print(f"  Vocabulary: {meta['vocab_size']:,d} terms | indexed: {meta['num_terms']:,d} "
+              f"(df >= {meta['min_df']}) | trigrams: {meta['num_grams']:,d} | "
+              f"postings: {meta['num_postings']:,d} | {size_mb:.1f} MB")
+        print(f"  Samples: {len(terms)} | seed: {seed}")
+
+        for term in terms[:20]:  # warm-up page cache
+            fuzzy.lookup(term)
+
+        times, top1, top5 = [], 0, 0
+        for term, typo in zip(terms, typos):
+            start = time.perf_counter()
+            matches = fuzzy.lookup(typo)
+            times.append((time.perf_counter() - start) * 1000)
+            suggested = [match for match, _, _ in matches]
+            top1 += bool(suggested) and suggested[0] == term
+            top5 += term in suggested
+        fuzzy.close()
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir)
+
+    if not times:
+        print("  No terms to sample")
+        return
+    times.sort()
+    print("-" * 80)
+    print(f"  Recall@1: {top1 / len(terms):.3f} | Recall@5: {top5 / len(terms):.3f}")
+    print(f"  Latency (ms): median {statistics.median(times):.2f} | "
+          f"p95 {times[int(0.95 * (len(times) - 1))]:.2f} | max {times[-1]:.2f}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall + latency: tra term gần đúng trên trigram index")
+    parser.add_argument("index_dir", nargs="?", default=INDEX_DIR)
+    parser.add_argument("--samples", type=int, default=1000, help="Số term lấy mẫu")
+    parser.add_argument("--seed", type=int, default=301)
+    parser.add_argument("--min-df", type=int, default=FUZZY_MIN_DF,
+                        help="Chỉ term có df >= min-df được index / lấy mẫu")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Tính lại trigram index (thư mục tạm) với --min-df")
+    args = parser.parse_args()
+    run_benchmark(args.index_dir, args.samples, args.seed, args.min_df, args.rebuild)
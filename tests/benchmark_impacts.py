@@ -0,0 +1,166 @@
+"""
+Benchmark: Exact BM25 vs Precomputed 8-bit Impacts
+===================================================
+Chạy cùng bộ truy vấn với 2 BM25Searcher trên cùng index:
+  - Exact:   tính lại idf * tf * (k1 + 1) / (tf + k1 * norm) mỗi posting
+  - Impacts: idf * scale * impact (impacts.bin, xem src/indexer/impacts.py)
+
+Độ lệch xếp hạng (ranking drift) so với exact:
+  - Overlap@k:      |top-k exact ∩ top-k impacts| / k
+  - Same order:     tỉ lệ truy vấn có top-k giống hệt (cả thứ tự)
+  - Max score err:  sai lệch điểm tuyệt đối lớn nhất trên các doc chung
+Latency: median trên nhiều lần chạy mỗi truy vấn (đã warm-up page cache).
+
+Nếu index chưa có impacts, chúng được tính vào 1 thư mục tạm (symlink tới
+các file của index) - index gốc không bị sửa.
+
+Usage:
+    python tests/benchmark_impacts.py [index_dir] [jsonl_path] [--queries file] [--top-k 10]
+"""
+
+import os
+import io
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import contextlib
+
+# Thêm project root vào path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.indexer.impacts import has_impacts, write_impacts, IMPACTS_FILENAME
+from src.ranking.bm25 import BM25Searcher, K1, B, FIELD_WEIGHTS
+
+INDEX_DIR = os.path.join(PROJECT_ROOT, "data", "index")
+JSONL_PATH = os.path.join(PROJECT_ROOT, "data", "milestone1_fixed.jsonl")
+RUNS = 5
+
+QUERIES = [
+    "công ty xây dựng hà nội",
+    "thương mại dịch vụ",
+    "phần mềm",
+    "công_ty tnhh",
+    "bán buôn thiết bị điện tử",
+    "vận tải hàng hoá đường bộ",
+    "bất_động_sản hà_nội",
+    "xuất_khẩu thủy_sản",
+    "công_ty công_nghệ thông_tin",
+    "nhà hàng ăn uống",
+    "sản xuất đồ gỗ nội thất",
+    "tư vấn du học",
+]
+
+
+def _with_impacts_dir(index_dir: str):
+    """(thư mục có impacts, thư mục tạm cần xoá hoặc None)."""
+    if has_impacts(index_dir):
+        return index_dir, None
+    tmp_dir = tempfile.mkdtemp()
+    for name in os.listdir(index_dir):
+        os.symlink(os.path.abspath(os.path.join(index_dir, name)), os.path.join(tmp_dir, name))
+    start = time.perf_counter()
+    meta = write_impacts(tmp_dir, K1, B, FIELD_WEIGHTS)
+    size_mb = os.path.getsize(os.path.join(tmp_dir, IMPACTS_FILENAME)) / (1024 * 1024)
+    print(f"  Built impacts in temp dir: {meta['num_postings']:,d} postings, "
+          f"{size_mb:.1f} MB ({time.perf_counter() - start:.1f}s)")
+    return tmp_dir, tmp_dir
+
+
+def _open(index_dir: str, jsonl_path: str, use_impacts: bool) -> BM25Searcher:
+    searcher = BM25Searcher(index_dir=index_dir, jsonl_path=jsonl_path,
+                            auto_refresh=False, use_impacts=use_impacts)
+    with contextlib.redirect_stdout(io.StringIO()):
+        searcher.load_index()
+    return searcher
+
+
+def _timed_search(searcher: BM25Searcher, query: str, top_k: int, runs: int):
+    """(kết quả [(doc_id, score)], median latency ms)."""
+    times = []
+    results = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        searcher.search(query, top_k)  # warm-up
+        for _ in range(runs):
+            start = time.perf_counter()
+            results = searcher.search(query, top_k)
+            times.append((time.perf_counter() - start) * 1000)
+    return [(doc_id, score) for doc_id, score, _ in results], statistics.median(times)
+
+
+def run_benchmark(index_dir: str, jsonl_path: str, queries, top_k: int = 10, runs: int = RUNS):
+    print("=" * 80)
+    print("  BENCHMARK — Exact BM25 vs 8-bit Impacts")
+    print("=" * 80)
+    print(f"  Index: {index_dir}")
+
+    impacts_dir, tmp_dir = _with_impacts_dir(index_dir)
+    try:
+        exact = _open(impacts_dir, jsonl_path, use_impacts=False)
+        approx = _open(impacts_dir, jsonl_path, use_impacts=True)
+        if approx.impacts is None:
+            print("  ERROR: impacts could not be opened (out of date?)")
+            return
+        if not approx._impacts_usable(approx._field_params() if approx.fields else None):
+            print("  ⚠ Impacts built with different k1 / b / field weights: both runs are exact")
+
+        print(f"  Queries: {len(queries)} | top-k: {top_k} | runs: {runs}")
+        print(f"\n  {'Query':<32} {'Exact ms':>9} {'Impact ms':>10} {'Overlap':>8} {'Max err':>9}")
+        print(f"  {'-' * 32} {'-' * 9} {'-' * 10} {'-' * 8} {'-' * 9}")
+
+        overlaps, same_order, max_errors = [], 0, []
+        exact_times, approx_times = [], []
+        for query in queries:
+            exact_results, exact_ms = _timed_search(exact, query, top_k, runs)
+            approx_results, approx_ms = _timed_search(approx, query, top_k, runs)
+            exact_times.append(exact_ms)
+            approx_times.append(approx_ms)
+
+            exact_ids = [doc_id for doc_id, _ in exact_results]
+            approx_ids = [doc_id for doc_id, _ in approx_results]
+            if exact_ids or approx_ids:
+                overlap = len(set(exact_ids) & set(approx_ids)) / max(len(exact_ids), len(approx_ids))
+            else:
+                overlap = 1.0
+            overlaps.append(overlap)
+            same_order += exact_ids == approx_ids
+            exact_scores = dict(exact_results)
+            errors = [abs(score - exact_scores[doc_id])
+                      for doc_id, score in approx_results if doc_id in exact_scores]
+            max_errors.append(max(errors, default=0.0))
+            print(f"  {query[:32]:<32} {exact_ms:>9.1f} {approx_ms:>10.1f} "
+                  f"{overlap:>8.2f} {max_errors[-1]:>9.4f}")
+
+        exact.close()
+        approx.close()
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir)
+
+    print("-" * 80)
+    print(f"  Mean overlap@{top_k}:      {statistics.mean(overlaps):.3f}")
+    print(f"  Same top-{top_k} order:     {same_order}/{len(queries)} queries")
+    print(f"  Max score error:       {max(max_errors):.4f}")
+    exact_total, approx_total = sum(exact_times), sum(approx_times)
+    print(f"  Total latency (ms):    exact {exact_total:.1f} | impacts {approx_total:.1f} "
+          f"({exact_total / max(approx_total, 1e-9):.2f}x)")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ranking drift + latency: exact BM25 vs 8-bit impacts")
+    parser.add_argument("index_dir", nargs="?", default=INDEX_DIR)
+    parser.add_argument("jsonl_path", nargs="?", default=JSONL_PATH)
+    parser.add_argument("--queries", help="File truy vấn, mỗi dòng 1 truy vấn")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=RUNS)
+    args = parser.parse_args()
+
+    queries = QUERIES
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    run_benchmark(args.index_dir, args.jsonl_path, queries, args.top_k, args.runs)
@@ -0,0 +1,93 @@
+"""
+Benchmark: Single-Pass Ingestion vs Separate Passes
+====================================================
+Build cùng các artifact (SPIMI + merge, gợi ý tên công ty, map MST) theo 2
+cách vào thư mục tạm:
+
+  - Separate:    spimi.py + merging.py (đọc lại JSONL cho gợi ý tên)
+                 + build_mst_index.py - 3 lượt đọc file
+  - Single-pass: ingest.py - 1 lượt đọc, record đã parse chia cho mọi sink
+
+Báo cáo wall time từng bước, tổng, và số lượt đọc JSONL. Vector index
+không được đo (cần sentence_transformers + faiss; thời gian encode áp đảo
+và không đổi giữa 2 cách).
+
+Usage:
+    python tests/benchmark_ingest.py [jsonl_path] [--workers 1] [--runs 3]
+"""
+
+import os
+import io
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import contextlib
+
+# Thêm project root vào path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.indexer.spimi import build_spimi_index
+from src.indexer.merging import merge_blocks
+from src.indexer.build_mst_index import build_mst_index, MST_INDEX_FILENAME
+from src.indexer.ingest import ingest
+from benchmark_impacts import JSONL_PATH
+
+
+def _timed(fn, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def separate_passes(jsonl_path: str, index_dir: str, workers: int) -> dict:
+    blocks_dir = os.path.join(index_dir, "blocks")
+    times = {
+        "spimi": _timed(build_spimi_index, jsonl_path, blocks_dir, workers=workers),
+        "merge": _timed(merge_blocks, blocks_dir, index_dir, workers=workers, jsonl_path=jsonl_path),
+        "mst": _timed(build_mst_index, jsonl_path, os.path.join(index_dir, MST_INDEX_FILENAME)),
+    }
+    shutil.rmtree(blocks_dir, ignore_errors=True)
+    return times
+
+
+def run_benchmark(jsonl_path: str, workers: int = 1, runs: int = 3):
+    print("=" * 80)
+    print("  BENCHMARK — Single-Pass Ingestion")
+    print("=" * 80)
+    size_mb = os.path.getsize(jsonl_path) / (1024 * 1024)
+    print(f"  Data: {jsonl_path} ({size_mb:.1f} MB) | workers: {workers} | runs: {runs}")
+
+    separate, single = [], []
+    for _ in range(runs):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            separate.append(separate_passes(jsonl_path, os.path.join(tmp_dir, "separate"), workers))
+            single.append(_timed(ingest, jsonl_path, os.path.join(tmp_dir, "ingest"), workers=workers))
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    print(f"\n  {'Step':<36} {'median s':>10}")
+    print(f"  {'-' * 36} {'-' * 10}")
+    for step in ("spimi", "merge", "mst"):
+        print(f"  {'separate: ' + step:<36} {statistics.median(t[step] for t in separate):>10.2f}")
+    separate_total = statistics.median(sum(t.values()) for t in separate)
+    single_total = statistics.median(single)
+    print("-" * 80)
+    print(f"  Separate passes (3 JSONL reads):  {separate_total:>8.2f} s")
+    print(f"  Single pass     (1 JSONL read):   {single_total:>8.2f} s "
+          f"({separate_total / max(single_total, 1e-9):.2f}x)")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Wall time: ingest.py vs các script build riêng")
+    parser.add_argument("jsonl_path", nargs="?", default=JSONL_PATH)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    run_benchmark(args.jsonl_path, args.workers, args.runs)
@@ -0,0 +1,122 @@
+"""
+Benchmark: Exhaustive vs MaxScore BM25 Scoring
+===============================================
+Chạy cùng bộ truy vấn với 2 bộ chấm điểm chính xác của BM25Searcher:
+  - numpy:    cộng dồn mọi postings list của truy vấn (exhaustive)
+  - maxscore: cận trên theo term (term_bounds.npy) -> chỉ đọc hết list
+              "essential", list còn lại tra qua skip table cho doc còn có
+              thể vào top-k (xem BM25Searcher._search_maxscore)
+
+Báo cáo mỗi truy vấn: số doc khớp (exhaustive), latency median (đã warm-up)
+của 2 bộ chấm điểm, top-k có giống nhau không (doc_id theo thứ tự; điểm
+lệch <= 1e-9) và bộ nào đã trả lời (maxscore quay về numpy khi truy vấn
+không có list >= MAXSCORE_MIN_DF postings).
+
+Nếu index chưa có term_bounds.npy (build trước khi merge ghi kèm), chúng
+được tính vào 1 thư mục tạm (symlink tới các file của index) - index gốc
+không bị sửa.
+
+Usage:
+    python tests/benchmark_maxscore.py [index_dir] [jsonl_path] [--queries file] [--top-k 10]
+"""
+
+import os
+import io
+import sys
+import time
+import argparse
+import shutil
+import tempfile
+import statistics
+import contextlib
+
+# Thêm project root vào path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.indexer.term_bounds import has_term_bounds, write_term_bounds
+from src.ranking.bm25 import BM25Searcher
+from benchmark_impacts import QUERIES, RUNS, JSONL_PATH, INDEX_DIR, _timed_search
+
+
+def _with_bounds_dir(index_dir: str):
+    """(thư mục có term_bounds.npy, thư mục tạm cần xoá hoặc None)."""
+    if has_term_bounds(index_dir):
+        return index_dir, None
+    tmp_dir = tempfile.mkdtemp()
+    for name in os.listdir(index_dir):
+        os.symlink(os.path.abspath(os.path.join(index_dir, name)), os.path.join(tmp_dir, name))
+    start = time.perf_counter()
+    num_terms = write_term_bounds(tmp_dir)
+    print(f"  Built term bounds in temp dir: {num_terms:,d} terms "
+          f"({time.perf_counter() - start:.1f}s)")
+    return tmp_dir, tmp_dir
+
+
+def _same_top_k(expected, actual) -> bool:
+    return ([doc_id for doc_id, _ in expected] == [doc_id for doc_id, _ in actual]
+            and all(abs(a - b) <= 1e-9 for (_, a), (_, b) in zip(expected, actual)))
+
+
+def run_benchmark(index_dir: str, jsonl_path: str, queries, top_k: int = 10, runs: int = RUNS):
+    print("=" * 80)
+    print("  BENCHMARK — BM25 scoring: exhaustive (numpy) vs MaxScore")
+    print("=" * 80)
+    print(f"  Index: {index_dir}")
+
+    bounds_dir, tmp_dir = _with_bounds_dir(index_dir)
+    searchers = {}
+    try:
+        for scorer in ("numpy", "maxscore"):
+            searchers[scorer] = BM25Searcher(index_dir=bounds_dir, jsonl_path=jsonl_path,
+                                             auto_refresh=False, use_impacts=False, scorer=scorer)
+            with contextlib.redirect_stdout(io.StringIO()):
+                searchers[scorer].load_index()
+
+        print(f"  Queries: {len(queries)} | top-k: {top_k} | runs: {runs}")
+        print(f"\n  {'Query':<32} {'Matched':>9} {'NumPy ms':>9} {'MaxSc ms':>9} {'Speedup':>8} "
+              f"{'Same':>5} {'Scorer':>9}")
+        print(f"  {'-' * 32} {'-' * 9} {'-' * 9} {'-' * 9} {'-' * 8} {'-' * 5} {'-' * 9}")
+
+        times = {scorer: [] for scorer in searchers}
+        same = 0
+        for query in queries:
+            expected, numpy_ms = _timed_search(searchers["numpy"], query, top_k, runs)
+            actual, maxscore_ms = _timed_search(searchers["maxscore"], query, top_k, runs)
+            times["numpy"].append(numpy_ms)
+            times["maxscore"].append(maxscore_ms)
+            identical = _same_top_k(expected, actual)
+            same += identical
+            print(f"  {query[:32]:<32} {searchers['numpy'].last_match_count:>9,d} {numpy_ms:>9.1f} "
+                  f"{maxscore_ms:>9.1f} {numpy_ms / max(maxscore_ms, 1e-9):>7.1f}x "
+                  f"{'yes' if identical else 'NO':>5} {searchers['maxscore'].last_scorer:>9}")
+    finally:
+        for searcher in searchers.values():
+            searcher.close()
+        if tmp_dir is not None:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    numpy_total, maxscore_total = sum(times["numpy"]), sum(times["maxscore"])
+    print("-" * 80)
+    print(f"  Median latency (ms):   numpy {statistics.median(times['numpy']):.1f} | "
+          f"maxscore {statistics.median(times['maxscore']):.1f}")
+    print(f"  Total latency (ms):    numpy {numpy_total:.1f} | maxscore {maxscore_total:.1f} "
+          f"({numpy_total / max(maxscore_total, 1e-9):.2f}x)")
+    print(f"  Identical top-{top_k}:     {same}/{len(queries)} queries")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency: BM25 exhaustive vs MaxScore")
+    parser.add_argument("index_dir", nargs="?", default=INDEX_DIR)
+    parser.add_argument("jsonl_path", nargs="?", default=JSONL_PATH)
+    parser.add_argument("--queries", help="File truy vấn, mỗi dòng 1 truy vấn")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=RUNS)
+    args = parser.parse_args()
+
+    queries = QUERIES
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    run_benchmark(args.index_dir, args.jsonl_path, queries, args.top_k, args.runs)
@@ -0,0 +1,118 @@
+"""
+Benchmark: Postings Codec (pickle vs delta+varint)
+===================================================
+So sánh 2 định dạng postings.bin trên index thật:
+  - Kích thước (bytes) của từng postings list và toàn bộ index
+  - Thời gian decode mỗi term (pickle.loads vs decode_postings)
+
+Chạy được với cả index cũ (pickle) lẫn index mới (nén): định dạng còn lại
+được dựng lại trong RAM từ cùng postings list để so sánh công bằng.
+
+Usage:
+    python tests/benchmark_postings.py [index_dir] [num_terms]
+"""
+
+import os
+import sys
+import time
+import pickle
+
+# Thêm project root vào path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.indexer.postings_codec import (
+    decode_postings, encode_postings, postings_from_pairs, read_header, num_fields_from_flags,
+    block_size_from_flags,
+)
+
+INDEX_DIR = os.path.join(PROJECT_ROOT, "data", "index")
+NUM_TERMS = 200      # Số term có df lớn nhất đưa vào benchmark
+REPEAT = 5           # Số lần decode lặp lại, lấy min
+
+
+def _best_time(fn, data, repeat=REPEAT):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(data)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def run_benchmark(index_dir: str = INDEX_DIR, num_terms: int = NUM_TERMS):
+    print("=" * 90)
+    print("  BENCHMARK — Postings Codec: pickle vs delta+varint")
+    print("=" * 90)
+
+    with open(os.path.join(index_dir, "term_dict.pkl"), "rb") as f:
+        term_dict = pickle.load(f)
+
+    postings_file = open(os.path.join(index_dir, "postings.bin"), "rb")
+    header = read_header(postings_file)
+    compressed = header is not None
+    num_fields = num_fields_from_flags(header[1]) if compressed else 0
+    block_size = block_size_from_flags(header[1]) if compressed else 0
+    print(f"  Index: {index_dir} ({'delta+varint' if compressed else 'pickle'})")
+    print(f"  Vocabulary: {len(term_dict):,d} terms")
+
+    # Chọn các term có df lớn nhất (đây là các term gây latency cao)
+    terms = sorted(term_dict, key=lambda t: term_dict[t][0], reverse=True)[:num_terms]
+
+    header = f"  {'Term':<25} {'DF':>10} {'Pickle KB':>10} {'Varint KB':>10} {'Pickle ms':>10} {'Varint ms':>10} {'Speedup':>8}"
+    print("\n" + header)
+    print("  " + "-" * (len(header) - 2))
+
+    total_pickle_bytes = 0
+    total_varint_bytes = 0
+    total_pickle_time = 0.0
+    total_varint_time = 0.0
+
+    for i, term in enumerate(terms):
+        df, offset, length = term_dict[term]
+        postings_file.seek(offset)
+        raw = postings_file.read(length)
+
+        if compressed:
+            varint_bytes = raw
+            doc_ids, tfs = decode_postings(raw, num_fields, block_size)
+            pickle_bytes = pickle.dumps(list(zip(doc_ids.tolist(), tfs.tolist())),
+                                        protocol=pickle.HIGHEST_PROTOCOL)
+        else:
+            pickle_bytes = raw
+            varint_bytes = encode_postings(*postings_from_pairs(pickle.loads(raw)))
+
+        t_pickle = _best_time(pickle.loads, pickle_bytes)
+        t_varint = _best_time(lambda data: decode_postings(data, num_fields, block_size),
+                              varint_bytes)
+
+        total_pickle_bytes += len(pickle_bytes)
+        total_varint_bytes += len(varint_bytes)
+        total_pickle_time += t_pickle
+        total_varint_time += t_varint
+
+        if i < 20:
+            print(f"  {term[:25]:<25} {df:>10,d} {len(pickle_bytes) / 1024:>10.1f} "
+                  f"{len(varint_bytes) / 1024:>10.1f} {t_pickle * 1000:>10.2f} "
+                  f"{t_varint * 1000:>10.2f} {t_pickle / max(t_varint, 1e-9):>7.1f}x")
+
+    postings_file.close()
+    n = len(terms)
+
+    print("\n" + "=" * 90)
+    print(f"  SUMMARY ({n} terms with highest df)")
+    print("=" * 90)
+    print(f"  {'Metric':<35} {'Pickle':>15} {'Delta+Varint':>15}")
+    print(f"  {'-' * 35} {'-' * 15} {'-' * 15}")
+    print(f"  {'Total size (MB)':<35} {total_pickle_bytes / 2**20:>15.2f} {total_varint_bytes / 2**20:>15.2f}")
+    print(f"  {'Avg decode time / term (ms)':<35} {total_pickle_time / n * 1000:>15.3f} {total_varint_time / n * 1000:>15.3f}")
+    print(f"  Compression ratio: {total_pickle_bytes / max(total_varint_bytes, 1):.2f}x | "
+          f"Decode speedup: {total_pickle_time / max(total_varint_time, 1e-9):.2f}x")
+    print(f"  postings.bin on disk: {os.path.getsize(os.path.join(index_dir, 'postings.bin')) / 2**20:.1f} MB")
+    print("=" * 90)
+
+
+if __name__ == "__main__":
+    index_dir = sys.argv[1] if len(sys.argv) > 1 else INDEX_DIR
+    num_terms = int(sys.argv[2]) if len(sys.argv) > 2 else NUM_TERMS
+    run_benchmark(index_dir, num_terms)
@@ -0,0 +1,97 @@
+"""
+Benchmark: Python-Loop vs Vectorized (NumPy) BM25 Scoring
+==========================================================
+Chạy cùng bộ truy vấn với 2 bộ chấm điểm của BM25Searcher trên postings
+đầy đủ (không impacts):
+  - loop:  vòng lặp Python qua từng (doc_id, tf) + defaultdict
+  - numpy: cộng dồn vào mảng điểm / số term khớp theo doc_id (scatter-add)
+
+Báo cáo mỗi truy vấn: số doc khớp, latency median (đã warm-up) của 2 bộ
+chấm điểm, và top-k có giống hệt không (doc_id + điểm; hoà điểm được so
+theo tập doc vì 2 bộ xếp doc đồng điểm khác nhau).
+
+Usage:
+    python tests/benchmark_scorers.py [index_dir] [jsonl_path] [--queries file] [--top-k 10]
+"""
+
+import os
+import io
+import sys
+import argparse
+import statistics
+import contextlib
+from itertools import groupby
+
+# Thêm project root vào path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.ranking.bm25 import BM25Searcher, SCORERS
+from benchmark_impacts import QUERIES, RUNS, JSONL_PATH, INDEX_DIR, _timed_search
+
+
+def _ties_as_sets(results):
+    """[(score, {doc_id, ...})] theo thứ tự điểm (so top-k bỏ qua thứ tự hoà điểm)."""
+    return [(score, {doc_id for doc_id, _ in group})
+            for score, group in groupby(results, key=lambda x: x[1])]
+
+
+def run_benchmark(index_dir: str, jsonl_path: str, queries, top_k: int = 10, runs: int = RUNS):
+    print("=" * 80)
+    print("  BENCHMARK — BM25 scoring: Python loop vs NumPy")
+    print("=" * 80)
+    print(f"  Index: {index_dir}")
+
+    searchers = {}
+    for scorer in SCORERS:
+        searchers[scorer] = BM25Searcher(index_dir=index_dir, jsonl_path=jsonl_path,
+                                         auto_refresh=False, use_impacts=False, scorer=scorer)
+        with contextlib.redirect_stdout(io.StringIO()):
+            searchers[scorer].load_index()
+
+    print(f"  Queries: {len(queries)} | top-k: {top_k} | runs: {runs}")
+    print(f"\n  {'Query':<32} {'Matched':>9} {'Loop ms':>9} {'NumPy ms':>9} {'Speedup':>8} {'Same':>5}")
+    print(f"  {'-' * 32} {'-' * 9} {'-' * 9} {'-' * 9} {'-' * 8} {'-' * 5}")
+
+    times = {scorer: [] for scorer in SCORERS}
+    same = 0
+    for query in queries:
+        loop_results, loop_ms = _timed_search(searchers["loop"], query, top_k, runs)
+        numpy_results, numpy_ms = _timed_search(searchers["numpy"], query, top_k, runs)
+        times["loop"].append(loop_ms)
+        times["numpy"].append(numpy_ms)
+        # Doc cuối top-k có thể đồng điểm với doc ngoài top-k: bỏ nhóm điểm cuối khỏi so sánh tập
+        expected, actual = _ties_as_sets(loop_results), _ties_as_sets(numpy_results)
+        identical = (expected[:-1] == actual[:-1]
+                     and [score for score, _ in expected] == [score for score, _ in actual])
+        same += identical
+        print(f"  {query[:32]:<32} {searchers['numpy'].last_match_count:>9,d} {loop_ms:>9.1f} "
+              f"{numpy_ms:>9.1f} {loop_ms / max(numpy_ms, 1e-9):>7.1f}x {'yes' if identical else 'NO':>5}")
+
+    for searcher in searchers.values():
+        searcher.close()
+
+    loop_total, numpy_total = sum(times["loop"]), sum(times["numpy"])
+    print("-" * 80)
+    print(f"  Median latency (ms):   loop {statistics.median(times['loop']):.1f} | "
+          f"numpy {statistics.median(times['numpy']):.1f}")
+    print(f"  Total latency (ms):    loop {loop_total:.1f} | numpy {numpy_total:.1f} "
+          f"({loop_total / max(numpy_total, 1e-9):.2f}x)")
+    print(f"  Identical top-{top_k}:     {same}/{len(queries)} queries")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency: BM25 vòng lặp Python vs NumPy")
+    parser.add_argument("index_dir", nargs="?", default=INDEX_DIR)
+    parser.add_argument("jsonl_path", nargs="?", default=JSONL_PATH)
+    parser.add_argument("--queries", help="File truy vấn, mỗi dòng 1 truy vấn")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=RUNS)
+    args = parser.parse_args()
+
+    queries = QUERIES
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    run_benchmark(args.index_dir, args.jsonl_path, queries, args.top_k, args.runs)
@@ -0,0 +1,97 @@
+"""
+Benchmark: Sharded Search Latency vs Shard Count
+=================================================
+Build index chia shard theo khoảng doc_id (src/indexer/shards.py) cho mỗi
+số shard vào thư mục tạm, rồi chạy cùng bộ truy vấn qua ShardedSearcher
+(mỗi shard 1 worker process, src/ranking/sharded.py).
+
+Báo cáo (mỗi số shard):
+  - Build:       thời gian build shards
+  - Latency:     median mỗi truy vấn (đã warm-up) + tổng
+  - Top-k:       số truy vấn có top-k (doc_id + điểm) giống hệt 1 shard
+
+Tăng tốc phụ thuộc số core: N shard chỉ chạy song song thực sự khi máy có
+>= N core rảnh (os.cpu_count() được in ra).
+
+Usage:
+    python tests/benchmark_shards.py [jsonl_path] [--shards 1 2 4] [--top-k 10] [--runs 5]
+"""
+
+import os
+import io
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import contextlib
+
+# Thêm project root vào path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.indexer.shards import build_shards
+from src.ranking.sharded import ShardedSearcher
+from benchmark_impacts import QUERIES, RUNS, JSONL_PATH, _timed_search
+
+
+def run_benchmark(jsonl_path: str, shard_counts, queries, top_k: int = 10, runs: int = RUNS):
+    print("=" * 80)
+    print("  BENCHMARK — Sharded Search (scatter-gather)")
+    print("=" * 80)
+    print(f"  Data: {jsonl_path} | CPU cores: {os.cpu_count()} | runs: {runs}")
+
+    latencies = {}  # số shard -> [ms mỗi truy vấn]
+    rankings = {}   # số shard -> [top-k mỗi truy vấn]
+    for num_shards in shard_counts:
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                build_shards(jsonl_path, tmp_dir, num_shards)
+            build_time = time.perf_counter() - start
+
+            searcher = ShardedSearcher(tmp_dir, jsonl_path)
+            with contextlib.redirect_stdout(io.StringIO()):
+                searcher.load_index()
+            results = [_timed_search(searcher, query, top_k, runs) for query in queries]
+            searcher.close()
+        finally:
+            shutil.rmtree(tmp_dir)
+        rankings[num_shards] = [ranking for ranking, _ in results]
+        latencies[num_shards] = [latency for _, latency in results]
+        print(f"  {num_shards} shard(s): built in {build_time:.1f}s")
+
+    counts = list(shard_counts)
+    print(f"\n  {'Query':<32}" + "".join(f" {f'{n} shard ms':>12}" for n in counts))
+    print(f"  {'-' * 32}" + f" {'-' * 12}" * len(counts))
+    for i, query in enumerate(queries):
+        print(f"  {query[:32]:<32}" + "".join(f" {latencies[n][i]:>12.1f}" for n in counts))
+
+    reference = rankings[counts[0]]
+    print("-" * 80)
+    for n in counts:
+        same = sum(ranking == expected for ranking, expected in zip(rankings[n], reference))
+        print(f"  {n:>3} shard(s): median {statistics.median(latencies[n]):>8.1f} ms | "
+              f"total {sum(latencies[n]):>8.1f} ms | "
+              f"speedup {sum(latencies[counts[0]]) / max(sum(latencies[n]), 1e-9):.2f}x | "
+              f"top-{top_k} identical {same}/{len(queries)}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency theo số shard: scatter-gather BM25")
+    parser.add_argument("jsonl_path", nargs="?", default=JSONL_PATH)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4],
+                        help="Các số shard cần đo (mặc định: 1 2 4)")
+    parser.add_argument("--queries", help="File truy vấn (mỗi dòng 1 truy vấn)")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=RUNS)
+    args = parser.parse_args()
+
+    queries = QUERIES
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    run_benchmark(args.jsonl_path, args.shards, queries, args.top_k, args.runs)
@@ -0,0 +1,140 @@
+"""
+Benchmark: Prefix Autocomplete (/api/suggest)
+==============================================
+Mô phỏng người dùng gõ từng ký tự: mỗi truy vấn mẫu (và các term / tên
+công ty lấy mẫu từ index gợi ý) được tách thành mọi tiền tố "c", "cô",
+"côn", ... và gọi Suggester.suggest cho từng tiền tố
+(src/indexer/suggest.py).
+
+Báo cáo:
+  - Kích thước:  số key, số nút top-N tính sẵn, dung lượng file
+  - Latency:     median / p95 / max mỗi lần gợi ý (ms, đã warm-up)
+
+Nếu index chưa có index gợi ý, nó được tính vào 1 thư mục tạm (symlink tới
+các file của index) - index gốc không bị sửa. --jsonl: kèm gợi ý tên công ty.
+
+Usage:
+    python tests/benchmark_suggest.py [index_dir] [--jsonl file] [--samples 300] [--rebuild]
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import statistics
+
+# Thêm project root vào path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.indexer.suggest import (
+    has_suggest_index, write_suggest_terms, write_suggest_names, Suggester, SUGGEST_KINDS,
+)
+from benchmark_impacts import QUERIES, INDEX_DIR
+
+LIMIT = 8
+
+
+def _suggest_files(kind: str):
+    return {f"suggest_{kind}{suffix}" for suffix in (".bin", "_text.bin", "_nodes.npy", ".json")}
+
+
+SUGGEST_NAMES = set().union(*(_suggest_files(kind) for kind in SUGGEST_KINDS))
+
+
+def _with_suggest_dir(index_dir: str, jsonl_path: str, rebuild: bool):
+    """(thư mục có index gợi ý, thư mục tạm cần xoá hoặc None)."""
+    if has_suggest_index(index_dir) and not rebuild and not jsonl_path:
+        return index_dir, None
+    tmp_dir = tempfile.mkdtemp()
+    for name in os.listdir(index_dir):
+        if name not in SUGGEST_NAMES:
+            os.symlink(os.path.abspath(os.path.join(index_dir, name)), os.path.join(tmp_dir, name))
+    start = time.perf_counter()
+    meta = write_suggest_terms(tmp_dir)
+    print(f"  Built term suggestions in temp dir: {meta['num_keys']:,d} keys "
+          f"({time.perf_counter() - start:.1f}s)")
+    if jsonl_path:
+        start = time.perf_counter()
+        meta = write_suggest_names(tmp_dir, jsonl_path)
+        print(f"  Built name suggestions in temp dir: {meta['num_keys']:,d} keys "
+              f"({time.perf_counter() - start:.1f}s)")
+    return tmp_dir, tmp_dir
+
+
+def _sample_texts(suggester: Suggester, samples: int, rng: random.Random):
+    """Text hiển thị lấy mẫu đều trên từng nguồn gợi ý."""
+    texts = []
+    for index in suggester.indexes.values():
+        ordinals = sorted(rng.sample(range(len(index)), min(samples, len(index))))
+        for ordinal in ordinals:
+            _, offset, length = index.keys.entry(ordinal)
+            texts.append(index.text[offset:offset + length].decode("utf-8"))
+    return texts
+
+
+def run_benchmark(index_dir: str, jsonl_path: str = None, samples: int = 300,
+                  seed: int = 301, rebuild: bool = False):
+    print("=" * 80)
+    print("  BENCHMARK — Prefix Autocomplete")
+    print("=" * 80)
+    print(f"  Index: {index_dir}")
+
+    suggest_dir, tmp_dir = _with_suggest_dir(index_dir, jsonl_path, rebuild)
+    try:
+        suggester = Suggester(suggest_dir)
+        for kind, index in suggester.indexes.items():
+            size_mb = sum(os.path.getsize(os.path.join(suggest_dir, name))
+                          for name in _suggest_files(kind)) / 1e6
+            print(f"  {kind:<6} {index.meta['num_keys']:>10,d} keys | "
+                  f"{index.meta['num_nodes']:>8,d} precomputed nodes | {size_mb:.1f} MB")
+
+        texts = QUERIES + _sample_texts(suggester, samples, random.Random(seed))
+        prefixes = [text[:i] for text in texts for i in range(1, len(text) + 1)]
+        for prefix in prefixes[:200]:  # warm-up page cache
+            suggester.suggest(prefix, LIMIT)
+
+        times, empty = [], 0
+        for prefix in prefixes:
+            start = time.perf_counter()
+            result = suggester.suggest(prefix, LIMIT)
+            times.append((time.perf_counter() - start) * 1000)
+            empty += not (result["terms"] or result["companies"])
+
+        print(f"\n  {'Query':<32} {'Prefixes':>8} {'Max ms':>8}  First suggestion (full query)")
+        print(f"  {'-' * 32} {'-' * 8} {'-' * 8}  {'-' * 26}")
+        for query in QUERIES:
+            query_times = []
+            for i in range(1, len(query) + 1):
+                start = time.perf_counter()
+                suggester.suggest(query[:i], LIMIT)
+                query_times.append((time.perf_counter() - start) * 1000)
+            result = suggester.suggest(query, LIMIT)
+            first = (result["terms"] or result["companies"] or ["-"])[0]
+            print(f"  {query[:32]:<32} {len(query):>8} {max(query_times):>8.2f}  {first[:40]}")
+        suggester.close()
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir)
+
+    times.sort()
+    print("-" * 80)
+    print(f"  Prefixes: {len(prefixes):,d} (no suggestion: {empty:,d})")
+    print(f"  Latency (ms): median {statistics.median(times):.3f} | "
+          f"p95 {times[int(0.95 * (len(times) - 1))]:.3f} | max {times[-1]:.3f}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency: gợi ý khi gõ trên index gợi ý tiền tố")
+    parser.add_argument("index_dir", nargs="?", default=INDEX_DIR)
+    parser.add_argument("--jsonl", help="File JSONL nguồn: tính kèm gợi ý tên công ty (thư mục tạm)")
+    parser.add_argument("--samples", type=int, default=300, help="Số text lấy mẫu mỗi nguồn")
+    parser.add_argument("--seed", type=int, default=301)
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Tính lại index gợi ý (thư mục tạm)")
+    args = parser.parse_args()
+    run_benchmark(args.index_dir, args.jsonl, args.samples, args.seed, args.rebuild)
@@ -0,0 +1,77 @@
+"""
+Benchmark: Full Sort vs Partial Top-k Selection
+================================================
+Microbenchmark cho bước cuối của search(): chọn top-k trong tập doc khớp
+có kích thước từ 1k tới 1.8M (toàn corpus).
+
+  - Array (scorer numpy / impacts):   np.lexsort(...)[:k]  vs  top_k_order
+  - Dict  (scorer loop, hybrid RRF):  sorted(...)[:k]      vs  top_k_items
+
+Điểm mô phỏng BM25: phân phối lệch, làm tròn 4 chữ số để có nhiều doc đồng
+điểm như thực tế (cùng tf + cùng độ dài). Mỗi ô là median của nhiều lần
+chạy; cột "same" kiểm tra 2 cách cho cùng kết quả.
+
+Usage:
+    python tests/benchmark_topk.py [--sizes 1000 10000 ...] [--top-k 10 100] [--runs 5]
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+import numpy as np
+
+# Thêm project root vào path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.ranking.topk import top_k_order, top_k_items
+
+SIZES = [1_000, 10_000, 100_000, 400_000, 1_000_000, 1_800_000]
+
+
+def _median_ms(fn, runs: int):
+    times = []
+    result = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(times)
+
+
+def run_benchmark(sizes, top_ks, runs: int = 5, seed: int = 0):
+    print("=" * 80)
+    print("  BENCHMARK — Top-k selection: full sort vs partial")
+    print("=" * 80)
+    rng = np.random.default_rng(seed)
+    print(f"  {'Matched':>10} {'k':>4} | {'lexsort ms':>10} {'partial ms':>10} {'x':>6} | "
+          f"{'sorted ms':>10} {'heap ms':>9} {'x':>6} | same")
+    print(f"  {'-' * 10} {'-' * 4} + {'-' * 10} {'-' * 10} {'-' * 6} + {'-' * 10} {'-' * 9} {'-' * 6} + ----")
+    for n in sizes:
+        doc_ids = np.sort(rng.choice(max(n * 2, 1_800_000), n, replace=False))
+        scores = np.round(rng.gamma(2.0, 2.0, n), 4)
+        items = dict(zip(doc_ids.tolist(), scores.tolist()))
+        for k in top_ks:
+            full, full_ms = _median_ms(lambda: np.lexsort((doc_ids, -scores))[:k], runs)
+            part, part_ms = _median_ms(lambda: top_k_order(scores, k, doc_ids), runs)
+            by_sort, sort_ms = _median_ms(
+                lambda: sorted(items.items(), key=lambda x: x[1], reverse=True)[:k], runs)
+            by_heap, heap_ms = _median_ms(
+                lambda: top_k_items(items.items(), k, key=lambda x: x[1]), runs)
+            same = np.array_equal(full, part) and by_sort == by_heap
+            print(f"  {n:>10,d} {k:>4} | {full_ms:>10.2f} {part_ms:>10.2f} "
+                  f"{full_ms / max(part_ms, 1e-9):>5.1f}x | {sort_ms:>10.2f} {heap_ms:>9.2f} "
+                  f"{sort_ms / max(heap_ms, 1e-9):>5.1f}x | {'yes' if same else 'NO'}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Microbenchmark chọn top-k: sắp xếp toàn bộ vs partial")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--top-k", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    run_benchmark(args.sizes, args.top_k, args.runs)
@@ -0,0 +1,62 @@
+"""
+Shared Index Fixtures for Unit Tests
+====================================
+Build 1 index nhỏ (docs.jsonl -> SPIMI -> merge, tuỳ chọn impacts) và mở
+BM25Searcher trên đó. Mỗi file test chỉ giữ make_doc / DOCS của riêng nó.
+"""
+
+import io
+import os
+import sys
+import json
+import contextlib
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.indexer.spimi import build_spimi_index
+from src.indexer.merging import merge_blocks
+from src.indexer.impacts import write_impacts
+from src.ranking.bm25 import BM25Searcher, K1, B, FIELD_WEIGHTS
+
+
+def build_index(index_dir: str, docs, merge_workers: int = 1, impacts: bool = False,
+                **spimi_kwargs) -> str:
+    """
+    Build index gốc vào index_dir.
+
+    Args:
+        docs: List documents (ghi ra index_dir/docs.jsonl) hoặc đường dẫn
+              1 file JSONL có sẵn (vd. data_sample/sample.jsonl)
+        merge_workers: Số process của merge_blocks
+        impacts: Ghi thêm impacts 8-bit (K1, B, FIELD_WEIGHTS mặc định)
+        **spimi_kwargs: Truyền cho build_spimi_index (block_size, fields,
+                        positions, ...)
+
+    Returns:
+        jsonl_path: File JSONL của index (cho BM25Searcher)
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    if isinstance(docs, str):
+        jsonl_path = docs
+    else:
+        jsonl_path = os.path.join(index_dir, "docs.jsonl")
+        with open(jsonl_path, "w", encoding="utf-8") as f:
+            for doc in docs:
+                f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+    blocks_dir = os.path.join(index_dir, "blocks")
+    with contextlib.redirect_stdout(io.StringIO()):
+        build_spimi_index(jsonl_path, blocks_dir, **spimi_kwargs)
+        merge_blocks(blocks_dir, index_dir, workers=merge_workers)
+        if impacts:
+            write_impacts(index_dir, K1, B, FIELD_WEIGHTS)
+    return jsonl_path
+
+
+def open_searcher(index_dir: str, jsonl_path: str, **kwargs) -> BM25Searcher:
+    """BM25Searcher đã load_index (không tự reload segments, không in log)."""
+    kwargs.setdefault("auto_refresh", False)
+    searcher = BM25Searcher(index_dir, jsonl_path, **kwargs)
+    with contextlib.redirect_stdout(io.StringIO()):
+        searcher.load_index()
+    return searcher
@@ -0,0 +1,203 @@
+"""
+Unit Tests for Block-Max WAND
+==============================
+"""
+
+import io
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import contextlib
+from unittest import mock
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.indexer.postings_codec import encode_postings, PostingsBlocks
+from src.indexer.segments import add_documents, delete_documents
+from src.ranking.block_max import BlockMaxWAND
+from index_fixtures import build_index, open_searcher
+
+
+CITIES = ["hà_nội", "đà_nẵng", "huế", "cần_thơ"]
+TRADES = ["xây_dựng", "vận_tải", "thương_mại", "in ấn", "du_lịch"]
+
+
+def make_doc(i):
+    """
+    Doc theo dải doc_id (như index đã sắp xếp lại): mỗi dải 1 ngành / tỉnh
+    lặp nhiều lần hơn -> block max khác nhau giữa các block của cùng term.
+    """
+    trade = TRADES[(i // 150) % 5]
+    city = CITIES[(i // 400) % 4]
+    return {
+        "company_name_seg": f"công_ty {trade} số{i}" + f" {trade}" * (i % 4),
+        "address_seg": f"đường {i % 7} {city}" + " phường" * (i % 5),
+        "industries_str_seg": f"{TRADES[i % 5]} dịch_vụ" + " thương_mại" * (i % 3 == 0),
+    }
+
+
+DOCS = [make_doc(i) for i in range(1200)]
+NEW_DOCS = [make_doc(i) for i in range(7, 40, 3)]
+QUERIES = ["công_ty", "dịch_vụ thương_mại", "xây_dựng hà_nội", "công_ty vận_tải huế",
+           "in ấn đà_nẵng", "du_lịch cần_thơ dịch_vụ", "số7 công_ty", "thương_mại xây_dựng vận_tải"]
+
+
+class TestBlockMaxWAND(unittest.TestCase):
+    """Duyệt khoảng doc_id trên skip table tổng hợp."""
+
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.lists = []
+        for n in (3000, 700, 40):
+            doc_ids = np.sort(rng.choice(10_000, n, replace=False))
+            tfs = rng.integers(1, 5, n)
+            self.lists.append((doc_ids, PostingsBlocks(encode_postings(doc_ids, tfs, 64), block_size=64)))
+
+    def evaluator(self, bounds=None):
+        blocks = [pb for _, pb in self.lists]
+        bounds = bounds or [np.ones(pb.num_blocks) for pb in blocks]
+        return BlockMaxWAND(blocks, bounds, len(blocks))
+
+    def test_all_postings_once(self):
+        for first_batch in (1, 64):
+            with mock.patch("src.ranking.block_max.FIRST_BATCH_INTERVALS", first_batch):
+                evaluator = self.evaluator()
+                seen = [[] for _ in self.lists]
+                while (batch := evaluator.next_batch(0.0)) is not None:
+                    for term, (doc_ids, positions) in enumerate(batch):
+                        self.assertEqual(doc_ids.tolist(), self.lists[term][0][positions].tolist())
+                        seen[term].append(doc_ids)
+                for (doc_ids, _), parts in zip(self.lists, seen):
+                    self.assertEqual(np.sort(np.concatenate(parts)).tolist(), doc_ids.tolist())
+                self.assertEqual(evaluator.decoded_postings, evaluator.total_postings)
+
+    def test_lookup_reuses_decoded_blocks(self):
+        evaluator = self.evaluator()
+        targets = np.unique(np.concatenate([self.lists[2][0], np.arange(0, 10_000, 97)]))
+        for term, (doc_ids, _) in enumerate(self.lists):
+            found, positions = evaluator.lookup(term, targets)
+            self.assertEqual(found.tolist(), np.intersect1d(doc_ids, targets).tolist())
+            self.assertEqual(doc_ids[positions].tolist(), found.tolist())
+        # Lô sau vẫn trả mọi postings đúng 1 lần, không decode lại
+        decoded = evaluator.decoded_postings
+        seen = [[] for _ in self.lists]
+        while (batch := evaluator.next_batch(0.0)) is not None:
+            for term, (doc_ids, _) in enumerate(batch):
+                seen[term].append(doc_ids)
+        for (doc_ids, _), parts in zip(self.lists, seen):
+            self.assertEqual(np.sort(np.concatenate(parts)).tolist(), doc_ids.tolist())
+        self.assertGreaterEqual(evaluator.decoded_postings, decoded)
+        self.assertEqual(evaluator.decoded_postings, evaluator.total_postings)
+
+    def test_bounds_hold(self):
+        rng = np.random.default_rng(5)
+        bounds = [rng.random(pb.num_blocks) for _, pb in self.lists]
+        evaluator = self.evaluator(bounds)
+        n = len(self.lists)
+        for (doc_ids, pb), term_bounds in zip(self.lists, bounds):
+            intervals = np.searchsorted(evaluator.ends, doc_ids)
+            # Doc khớp đủ mọi term vẫn <= cận trên của khoảng chứa nó
+            block_of = np.searchsorted(pb.last_doc_ids, doc_ids)
+            self.assertTrue(np.all(term_bounds[block_of] * (1 / n) ** 1.5 <= evaluator.bounds[intervals]))
+
+    def test_prunes_low_intervals(self):
+        bounds = [np.linspace(0.1, 1.0, pb.num_blocks) for _, pb in self.lists]
+        with mock.patch("src.ranking.block_max.FIRST_BATCH_INTERVALS", 4):
+            evaluator = self.evaluator(bounds)
+            theta = float(np.quantile(evaluator.bounds, 0.98))
+            yielded = 0
+            while (batch := evaluator.next_batch(theta)) is not None:
+                for doc_ids, _ in batch:
+                    self.assertTrue(np.all(evaluator.bounds[np.searchsorted(evaluator.ends, doc_ids)] >= theta))
+                    yielded += len(doc_ids)
+        self.assertLess(yielded, evaluator.decoded_postings)
+        self.assertLess(evaluator.decoded_postings, evaluator.total_postings)
+
+
+class TestBlockMaxSearch(unittest.TestCase):
+    """scorer="bmw" cho cùng top-k / điểm với chấm điểm trên postings đầy đủ (impacts)."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.test_dir = tempfile.mkdtemp()
+        cls.index_dir = os.path.join(cls.test_dir, "index")
+        cls.jsonl_path = build_index(cls.index_dir, DOCS, impacts=True, block_size=400)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.test_dir)
+
+    def open_searcher(self, index_dir):
+        return open_searcher(index_dir, self.jsonl_path, use_champions=False)
+
+    def _ranked(self, searcher, query, top_k, scorer, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = searcher.search(query, top_k, scorer=scorer, **kwargs)
+        return [(doc_id, score) for doc_id, score, _ in results]
+
+    def assert_same_top_k(self, searcher, **kwargs):
+        pruned = 0
+        # 0: mọi list đều chạy block-max; 450: list ngắn (tỉnh, "du_lịch", "số7") cộng dồn trước
+        for min_df in (0, 450):
+            for first_batch in (1, 64):
+                with mock.patch("src.ranking.bm25.BLOCK_MAX_MIN_DF", min_df), \
+                        mock.patch("src.ranking.block_max.FIRST_BATCH_INTERVALS", first_batch):
+                    for query in QUERIES:
+                        for top_k in (1, 3, 10, 50):
+                            expected = self._ranked(searcher, query, top_k, "numpy", **kwargs)
+                            ranked = self._ranked(searcher, query, top_k, "bmw", **kwargs)
+                            if searcher.last_scorer != "bmw":
+                                continue  # Mọi list đều ngắn -> numpy
+                            # Thứ tự cộng theo doc khác numpy -> điểm lệch ở bit cuối
+                            self.assertEqual([d for d, _ in ranked], [d for d, _ in expected],
+                                             (query, top_k, min_df))
+                            np.testing.assert_allclose([s for _, s in ranked],
+                                                       [s for _, s in expected], rtol=1e-12)
+                            decoded, total = searcher.last_decoded
+                            pruned += decoded < total
+        return pruned
+
+    def test_matches_full_scoring(self):
+        searcher = self.open_searcher(self.index_dir)
+        try:
+            self.assertIsNotNone(searcher.impacts)
+            self.assertGreater(self.assert_same_top_k(searcher), 0)
+        finally:
+            searcher.close()
+
+    def test_segments_and_deletions(self):
+        index_dir = os.path.join(self.test_dir, "live")
+        shutil.copytree(self.index_dir, index_dir)
+        with contextlib.redirect_stdout(io.StringIO()):
+            add_documents(index_dir, NEW_DOCS)
+            delete_documents(index_dir, [0, 5, 17, 300, 301])
+        searcher = self.open_searcher(index_dir)
+        try:
+            self.assertTrue(searcher.segments)
+            self.assert_same_top_k(searcher)
+        finally:
+            searcher.close()
+
+    def test_falls_back_without_impacts(self):
+        searcher = self.open_searcher(self.index_dir)
+        try:
+            # Đổi trọng số trường: impacts không khớp -> tính chính xác (numpy)
+            with mock.patch("src.ranking.bm25.BLOCK_MAX_MIN_DF", 0):
+                expected = self._ranked(searcher, "công_ty xây_dựng", 10, "numpy",
+                                        field_weights={"address": 3.0})
+                ranked = self._ranked(searcher, "công_ty xây_dựng", 10, "bmw",
+                                      field_weights={"address": 3.0})
+            self.assertEqual(ranked, expected)
+            self.assertEqual(searcher.last_scorer, "numpy")
+            self.assertIsNone(searcher.last_decoded)
+        finally:
+            searcher.close()
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,147 @@
+"""
+Unit Tests for Champion Lists
+==============================
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.indexer.champions import (
+    select_champions, has_champions, write_champions, ChampionsReader,
+)
+from src.indexer.impacts import write_impacts
+from src.indexer.spimi import build_spimi_index
+from src.indexer.merging import merge_blocks
+from src.indexer.segments import add_documents, delete_documents, compact_base
+from src.ranking.bm25 import BM25Searcher, K1, B, FIELD_WEIGHTS
+
+
+CITIES = ["hà_nội", "đà_nẵng", "huế"]
+TRADES = ["xây_dựng", "vận_tải", "thương_mại", "in ấn"]
+
+
+def make_doc(i):
+    """Doc độ dài / số lần lặp khác nhau -> impact khác nhau giữa các posting."""
+    trade = TRADES[i % 4]
+    return {
+        "company_name_seg": f"công_ty {trade} số{i}" + " công_ty" * (i % 3),
+        "address_seg": f"đường {i % 7} {CITIES[i % 3]}" + " phường" * (i % 5),
+        "industries_str_seg": f"{trade} " * (1 + i % 2) + "dịch_vụ",
+    }
+
+
+DOCS = [make_doc(i) for i in range(60)]
+
+QUERIES = ["công_ty", "dịch_vụ", "hà_nội", "công_ty xây_dựng", "dịch_vụ vận_tải huế",
+           "công_ty dịch_vụ", "số7 công_ty", "in ấn đà_nẵng"]
+
+
+class TestSelectChampions(unittest.TestCase):
+    """Test chọn champion list và floor."""
+
+    def test_select(self):
+        impacts = np.array([5, 9, 5, 7, 5, 9, 1], dtype=np.uint8)
+        positions, floor = select_champions(impacts, 4)
+        # Hoà impact 5: posting đứng trước được chọn
+        self.assertEqual(positions.tolist(), [0, 1, 3, 5])
+        self.assertEqual(floor, 5)
+
+        positions, floor = select_champions(impacts, 10)
+        self.assertEqual(positions.tolist(), list(range(7)))
+        self.assertEqual(floor, 0)
+
+
+class TestChampionsSearch(unittest.TestCase):
+    """Tầng champion vs postings đầy đủ (cùng impacts)."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.index_dir = os.path.join(self.test_dir, "index")
+        os.makedirs(self.index_dir)
+        self.jsonl_path = os.path.join(self.index_dir, "docs.jsonl")
+        with open(self.jsonl_path, "w", encoding="utf-8") as f:
+            for doc in DOCS:
+                f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+        blocks_dir = os.path.join(self.index_dir, "blocks")
+        build_spimi_index(self.jsonl_path, blocks_dir, block_size=16)
+        merge_blocks(blocks_dir, self.index_dir)
+        write_impacts(self.index_dir, K1, B, FIELD_WEIGHTS)
+        write_champions(self.index_dir, size=8, min_df=15)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def _search(self, query, use_champions=True, top_k=3):
+        searcher = BM25Searcher(index_dir=self.index_dir, jsonl_path=self.jsonl_path,
+                                use_champions=use_champions)
+        searcher.load_index()
+        results = [(doc_id, score) for doc_id, score, _ in searcher.search(query, top_k=top_k)]
+        tier = searcher.last_tier
+        searcher.close()
+        return results, tier
+
+    def assertSameAsFull(self, query, top_k=3):
+        full, full_tier = self._search(query, use_champions=False, top_k=top_k)
+        tiered, tier = self._search(query, top_k=top_k)
+        self.assertEqual(full_tier, "full")
+        self.assertEqual([d for d, _ in tiered], [d for d, _ in full], query)
+        for (_, score), (_, expected) in zip(tiered, full):
+            self.assertAlmostEqual(score, expected, places=9)
+        return tier
+
+    def test_reader(self):
+        self.assertTrue(has_champions(self.index_dir))
+        reader = ChampionsReader(self.index_dir)
+        self.assertEqual(reader.meta["size"], 8)
+        self.assertGreater(reader.meta["num_terms"], 0)
+        for i in range(reader.meta["num_terms"]):
+            doc_ids, impacts, floor = reader.get(int(reader.terms[i]))
+            self.assertEqual(len(doc_ids), 8)
+            self.assertTrue(np.all(np.diff(doc_ids) > 0))
+            self.assertLessEqual(floor, int(impacts.min()))
+        self.assertIsNone(reader.get(None))
+        reader.close()
+
+    def test_same_top_k_as_full(self):
+        tiers = [self.assertSameAsFull(query, top_k) for query in QUERIES for top_k in (1, 3, 10)]
+        self.assertIn("champions", tiers)
+
+    def test_fallback_when_top_k_not_proven(self):
+        # top-k lớn hơn champion list: không chứng minh được -> postings đầy đủ
+        self.assertEqual(self.assertSameAsFull("công_ty", top_k=40), "full")
+
+    def test_segments_and_deletes(self):
+        add_documents(self.index_dir, [make_doc(100), make_doc(101)])
+        full, _ = self._search("công_ty", use_champions=False, top_k=2)
+        delete_documents(self.index_dir, [full[0][0]])
+        for query in QUERIES:
+            self.assertSameAsFull(query)
+        self.assertNotIn(full[0][0], [d for d, _ in self._search("công_ty")[0]])
+
+    def test_compaction_rebuilds_champions(self):
+        delete_documents(self.index_dir, [0, 1, 2])
+        compact_base(self.index_dir)
+        self.assertTrue(has_champions(self.index_dir))
+        searcher = BM25Searcher(index_dir=self.index_dir, jsonl_path=self.jsonl_path)
+        searcher.load_index()
+        self.assertIsNotNone(searcher.champions)
+        searcher.close()
+        for query in QUERIES:
+            self.assertSameAsFull(query)
+
+    def test_merge_removes_stale_champions(self):
+        merge_blocks(os.path.join(self.index_dir, "blocks"), self.index_dir)
+        self.assertFalse(has_champions(self.index_dir))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,184 @@
+"""
+Unit Tests for AND / Minimum-Should-Match Queries
+==================================================
+"""
+
+import io
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import contextlib
+from unittest import mock
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.indexer.impacts import write_impacts
+from src.indexer.segments import add_documents, delete_documents
+from src.ranking.bm25 import BM25Searcher, K1, B, FIELD_WEIGHTS, resolve_min_should_match
+from index_fixtures import build_index, open_searcher
+
+
+CITIES = ["hà_nội", "đà_nẵng", "huế"]
+TRADES = ["xây_dựng", "vận_tải", "thương_mại", "bất_động_sản", "du_lịch"]
+
+
+def make_doc(i):
+    """Ngành trong tên (theo dải doc_id) và trong ngành nghề (theo i % 5) khác nhau."""
+    trade = TRADES[(i // 90) % 5]
+    return {
+        "company_name_seg": f"công_ty {trade} số{i}" + f" {trade}" * (i % 3),
+        "address_seg": f"đường {i % 7} {CITIES[(i // 130) % 3]}" + " phường" * (i % 4),
+        "industries_str_seg": f"{TRADES[i % 5]} dịch_vụ" + " thương_mại" * (i % 6 == 0),
+    }
+
+
+DOCS = [make_doc(i) for i in range(900)]
+NEW_DOCS = [make_doc(i) for i in range(3, 60, 4)]
+QUERIES = ["bất_động_sản hà_nội", "công_ty xây_dựng hà_nội", "xây_dựng vận_tải huế",
+           "thương_mại dịch_vụ đà_nẵng du_lịch", "số7 công_ty", "số7 số8 hà_nội",
+           "du_lịch cần_thơ"]
+MODES = ["all", -1, "50%", 2, "-25%"]
+
+
+class TestResolveMinShouldMatch(unittest.TestCase):
+    """Cú pháp min_should_match (như Elasticsearch)."""
+
+    def test_values(self):
+        cases = [("all", 4, 4), ("ALL", 1, 1), (2, 4, 2), (9, 4, 4), (-1, 4, 3), (-9, 4, 1),
+                 ("3", 4, 3), ("-1", 4, 3), ("75%", 4, 3), ("50%", 3, 1), ("-25%", 4, 3),
+                 ("-50%", 3, 2), ("0%", 4, 1), ("all", 0, 1)]
+        for spec, num_terms, expected in cases:
+            self.assertEqual(resolve_min_should_match(spec, num_terms), expected, (spec, num_terms))
+
+    def test_invalid(self):
+        for spec in ("and", "x%", 1.5, True, ""):
+            with self.assertRaises(ValueError):
+                resolve_min_should_match(spec, 3)
+        with self.assertRaises(ValueError):
+            BM25Searcher("unused", "unused.jsonl", min_should_match="most")
+
+
+class TestConjunctiveSearch(unittest.TestCase):
+    """Kết quả AND / min_should_match = các doc thoả của OR, cùng điểm và thứ tự."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.test_dir = tempfile.mkdtemp()
+        cls.index_dir = os.path.join(cls.test_dir, "index")
+        cls.jsonl_path = build_index(cls.index_dir, DOCS, block_size=300)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.test_dir)
+
+    def open_searcher(self, index_dir, **kwargs):
+        return open_searcher(index_dir, self.jsonl_path, **kwargs)
+
+    def _ranked(self, searcher, query, top_k, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = searcher.search(query, top_k, **kwargs)
+        return [(doc_id, score) for doc_id, score, _ in results]
+
+    def _term_counts(self, searcher, query):
+        """(n, số term khớp theo doc_id) tính thẳng từ postings (term > 80% corpus bị bỏ như search)."""
+        scored_terms, _ = searcher._scored_terms(searcher._tokenize_query(query),
+                                                 int(searcher.total_docs * 0.8))
+        counts = np.zeros(searcher._doc_space(), dtype=np.int64)
+        for term, _, _ in scored_terms:
+            for doc_ids, _, _, _, _ in searcher._iter_postings(term):
+                counts[doc_ids] += 1
+        return len(scored_terms), counts
+
+    def assert_filtered_or(self, searcher, **kwargs):
+        answered = fallbacks = 0
+        for query in QUERIES:
+            num_terms, counts = self._term_counts(searcher, query)
+            everything = self._ranked(searcher, query, len(counts), min_should_match=None, **kwargs)
+            for mode in MODES:
+                required = resolve_min_should_match(mode, num_terms)
+                satisfied = [(d, s) for d, s in everything if counts[d] >= required]
+                for top_k in (1, 3, 10):
+                    ranked = self._ranked(searcher, query, top_k, min_should_match=mode, **kwargs)
+                    if required <= 1 or len(satisfied) < top_k:
+                        # Không đủ top_k doc thoả (hoặc không yêu cầu gì) -> OR
+                        self.assertIsNone(searcher.last_min_match)
+                        self.assertEqual(ranked, everything[:top_k], (query, mode, top_k))
+                        fallbacks += required > 1
+                        continue
+                    answered += 1
+                    self.assertEqual(searcher.last_min_match, required)
+                    self.assertEqual(searcher.last_match_count, len(satisfied))
+                    expected = satisfied[:top_k]
+                    self.assertEqual([d for d, _ in ranked], [d for d, _ in expected], (query, mode, top_k))
+                    # Cộng theo df tăng dần thay vì thứ tự query -> lệch tối đa vài ulp
+                    np.testing.assert_allclose([s for _, s in ranked], [s for _, s in expected], rtol=1e-12)
+        self.assertGreater(answered, 0)
+        self.assertGreater(fallbacks, 0)
+
+    def test_matches_filtered_or(self):
+        searcher = self.open_searcher(self.index_dir, use_impacts=False)
+        try:
+            self.assert_filtered_or(searcher)
+            self.assert_filtered_or(searcher, field_weights={"company_name": 4.0, "address": 0.5})
+        finally:
+            searcher.close()
+
+    def test_impacts(self):
+        index_dir = os.path.join(self.test_dir, "impacts")
+        shutil.copytree(self.index_dir, index_dir)
+        write_impacts(index_dir, K1, B, FIELD_WEIGHTS)
+        searcher = self.open_searcher(index_dir)
+        try:
+            self.assertIsNotNone(searcher.impacts)
+            self.assert_filtered_or(searcher)
+        finally:
+            searcher.close()
+
+    def test_segments_and_deletions(self):
+        index_dir = os.path.join(self.test_dir, "live")
+        shutil.copytree(self.index_dir, index_dir)
+        with contextlib.redirect_stdout(io.StringIO()):
+            add_documents(index_dir, NEW_DOCS)
+            delete_documents(index_dir, [0, 7, 130, 131, 903])
+        searcher = self.open_searcher(index_dir, use_impacts=False)
+        try:
+            self.assertTrue(searcher.segments)
+            self.assert_filtered_or(searcher)
+        finally:
+            searcher.close()
+
+    def test_skip_table_lookup(self):
+        searcher = self.open_searcher(self.index_dir, use_impacts=False)
+        try:
+            self.assertGreater(searcher.get_postings_blocks("công_ty").num_blocks, 1)
+            # List ngắn ("số7") làm ứng viên: list dài chỉ được tra qua skip table
+            with mock.patch.object(BM25Searcher, "_probe_term", wraps=searcher._probe_term) as probe:
+                ranked = self._ranked(searcher, "số7 công_ty", 1, min_should_match="all")
+            self.assertEqual([d for d, _ in ranked], [7])
+            self.assertEqual(probe.call_count, 1)
+            self.assertEqual(probe.call_args[0][3].tolist(), [7])
+        finally:
+            searcher.close()
+
+    def test_default_from_constructor(self):
+        searcher = self.open_searcher(self.index_dir, use_impacts=False, min_should_match="all")
+        try:
+            _, counts = self._term_counts(searcher, "bất_động_sản hà_nội")
+            ranked = self._ranked(searcher, "bất_động_sản hà_nội", 10)
+            self.assertEqual(searcher.last_min_match, 2)
+            self.assertEqual(len(ranked), 10)
+            self.assertTrue(all(counts[d] == 2 for d, _ in ranked))
+            # Tham số của truy vấn ghi đè mặc định (1 term = OR)
+            self._ranked(searcher, "bất_động_sản hà_nội", 10, min_should_match=1)
+            self.assertIsNone(searcher.last_min_match)
+        finally:
+            searcher.close()
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
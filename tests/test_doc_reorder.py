@@ -0,0 +1,129 @@
+"""
+Unit Tests for Doc-ID Reassignment
+===================================
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.indexer.doc_reorder import (
+    province_of, main_industry_code, document_sort_key, load_doc_order, has_doc_order,
+    doc_ids_for_lines,
+)
+from src.indexer.doc_store import load_doc_store, EMPTY_DOC
+from src.indexer.spimi import build_spimi_index
+from src.indexer.merging import merge_blocks
+from src.ranking.bm25 import BM25Searcher
+
+
+PROVINCES = ["Hà Nội", "Đà Nẵng", "Hồ Chí Minh"]
+INDUSTRIES = [("4100", "Xây dựng nhà các loại"), ("4933", "Vận tải hàng hóa bằng đường bộ"),
+              ("4620", "Bán buôn nông, lâm sản")]
+
+
+def make_doc(i):
+    province = PROVINCES[i % 3]
+    code, name = INDUSTRIES[i % 5 % 3]
+    return {
+        "company_name": f"CÔNG TY TNHH SỐ {i}",
+        "company_name_seg": f"công_ty tnhh số{i}",
+        "address": f"Số {i}, {province}",
+        "address_seg": f"số {i} , {province.lower().replace(' ', '_')}",
+        "industries_detail": [{"code": "9999", "name": "Khác"},
+                              {"code": code, "name": f"{name} (Ngành chính)"}],
+        "industries_str_seg": name.lower(),
+    }
+
+
+class TestSortKey(unittest.TestCase):
+    """Test khoá sắp xếp tỉnh -> ngành chính -> tên."""
+
+    def test_sort_key(self):
+        doc = make_doc(4)
+        self.assertEqual(province_of(doc["address"]), "đà nẵng")
+        self.assertEqual(main_industry_code(doc), "4933")
+        self.assertEqual(document_sort_key(doc), ("đà nẵng", "4933", "công ty tnhh số 4"))
+        self.assertEqual(main_industry_code({"industries_detail": [{"code": "0111"}]}), "0111")
+        self.assertEqual(document_sort_key({}), ("", "", ""))
+
+    def test_doc_ids_for_lines(self):
+        doc_order = np.array([3, 0, 2])
+        self.assertEqual(doc_ids_for_lines(doc_order, [0, 1, 2, 3]).tolist(), [1, -1, 2, 0])
+
+
+class TestReorderedIndex(unittest.TestCase):
+    """Index build với --reorder so với thứ tự crawl."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.jsonl_path = os.path.join(self.test_dir, "docs.jsonl")
+        with open(self.jsonl_path, "w", encoding="utf-8") as f:
+            for i in range(30):
+                f.write(json.dumps(make_doc(i), ensure_ascii=False) + "\n")
+                if i == 10:
+                    f.write("\n")  # dòng rỗng: không có doc_id
+                    f.write(json.dumps({"company_name": "RỖNG"}, ensure_ascii=False) + "\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def _build(self, name, reorder):
+        index_dir = os.path.join(self.test_dir, name)
+        blocks_dir = os.path.join(index_dir, "blocks")
+        build_spimi_index(self.jsonl_path, blocks_dir, block_size=7, reorder=reorder)
+        merge_blocks(blocks_dir, index_dir)
+        return index_dir
+
+    def _search(self, index_dir, query):
+        searcher = BM25Searcher(index_dir=index_dir, jsonl_path=self.jsonl_path)
+        searcher.load_index()
+        results = sorted((round(score, 6), meta["company_name"])
+                         for _, score, meta in searcher.search(query, top_k=100))
+        searcher.close()
+        return results
+
+    def test_doc_order_and_offsets(self):
+        index_dir = self._build("reordered", reorder=True)
+        doc_order = load_doc_order(index_dir)
+        store = load_doc_store(index_dir)
+        with open(self.jsonl_path, "rb") as f:
+            lines = f.readlines()
+
+        self.assertEqual(len(doc_order), len(store))
+        self.assertEqual(sorted(doc_order.tolist()), [i for i, line in enumerate(lines) if line.strip()])
+        keys = []
+        for doc_id, line_no in enumerate(doc_order.tolist()):
+            if store.doc_lengths[doc_id] == EMPTY_DOC:
+                continue
+            offset = int(store.doc_offsets[doc_id])
+            self.assertEqual(offset, sum(len(line) for line in lines[:line_no]))
+            keys.append(document_sort_key(json.loads(lines[line_no])))
+        self.assertEqual(keys, sorted(keys))
+        # Doc không có text xếp cuối
+        self.assertEqual(int(store.doc_lengths[-1]), EMPTY_DOC)
+
+    def test_same_results_as_crawl_order(self):
+        crawl_dir = self._build("crawl", reorder=False)
+        reordered_dir = self._build("reordered", reorder=True)
+        self.assertFalse(has_doc_order(crawl_dir))
+        for query in ["xây_dựng", "đà_nẵng vận_tải", "số7", "tnhh hà_nội"]:
+            self.assertEqual(self._search(crawl_dir, query), self._search(reordered_dir, query))
+
+    def test_rebuild_without_reorder_removes_doc_order(self):
+        index_dir = self._build("index", reorder=True)
+        self.assertTrue(has_doc_order(index_dir))
+        self._build("index", reorder=False)
+        self.assertFalse(has_doc_order(index_dir))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,78 @@
+"""
+Unit Tests for Array-Backed Document Store
+===========================================
+"""
+
+import os
+import sys
+import shutil
+import pickle
+import tempfile
+import unittest
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.indexer.doc_store import (
+    DocStoreWriter, EMPTY_DOC, load_doc_store, doc_store_from_pickles, compute_length_norms,
+)
+
+
+class TestDocStore(unittest.TestCase):
+    """Test ghi/đọc doc_lengths, doc_offsets, doc_norms dạng mảng."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_sentinel_for_skipped_docs(self):
+        writer = DocStoreWriter()
+        writer.add(0, 10, 0)
+        writer.add(3, 30, 500)  # doc 1, 2 bị bỏ qua (dòng rỗng)
+        writer.save(self.test_dir, b=0.75)
+
+        store = load_doc_store(self.test_dir, b=0.75)
+        self.assertEqual(store.doc_lengths.tolist(), [10, EMPTY_DOC, EMPTY_DOC, 30])
+        self.assertEqual(store.doc_offsets.tolist(), [0, EMPTY_DOC, EMPTY_DOC, 500])
+        self.assertEqual(store.indexed_docs, 2)
+        self.assertAlmostEqual(store.avg_doc_length, 20.0)
+
+    def test_norms_match_bm25_formula(self):
+        writer = DocStoreWriter()
+        for doc_id, length in enumerate([10, 20, 30, 40]):
+            writer.add(doc_id, length, doc_id * 100)
+        writer.save(self.test_dir, b=0.4)
+
+        store = load_doc_store(self.test_dir, b=0.4)
+        avgdl = 25.0
+        expected = [1 - 0.4 + 0.4 * (l / avgdl) for l in [10, 20, 30, 40]]
+        np.testing.assert_allclose(store.doc_norms, expected, rtol=1e-6)
+
+        # b khác lúc build -> norms được tính lại
+        store = load_doc_store(self.test_dir, b=0.75)
+        expected = [1 - 0.75 + 0.75 * (l / avgdl) for l in [10, 20, 30, 40]]
+        np.testing.assert_allclose(store.doc_norms, expected, rtol=1e-6)
+
+    def test_empty_doc_norm_is_neutral(self):
+        norms = compute_length_norms(np.array([EMPTY_DOC, 50]), 50.0, 0.4)
+        self.assertEqual(norms.tolist(), [1.0, 1.0])
+
+    def test_legacy_pickles(self):
+        with open(os.path.join(self.test_dir, "doc_lengths.pkl"), "wb") as f:
+            pickle.dump({0: 4, 2: 8}, f)
+        with open(os.path.join(self.test_dir, "doc_offsets.pkl"), "wb") as f:
+            pickle.dump({0: 0, 2: 77}, f)
+
+        store = doc_store_from_pickles(self.test_dir)
+        self.assertEqual(store.doc_lengths.tolist(), [4, EMPTY_DOC, 8])
+        self.assertEqual(store.doc_offsets.tolist(), [0, EMPTY_DOC, 77])
+        self.assertEqual(store.indexed_docs, 2)
+        self.assertAlmostEqual(store.avg_doc_length, 6.0)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,118 @@
+"""
+Unit Tests for Field-Aware Index (BM25F)
+=========================================
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.indexer.spimi import tokenize_fields, FIELD_NAMES, POSITION_GAP
+from src.indexer.doc_store import load_doc_store
+from src.indexer.segments import add_documents, postings_num_fields
+from src.ranking.bm25 import BM25Searcher, parse_field_weights
+from index_fixtures import build_index
+
+
+DOCS = [
+    {"company_name_seg": "công_ty xây_dựng hoà_bình", "address_seg": "hà_nội",
+     "industries_str_seg": "xây_dựng nhà các loại"},
+    {"company_name_seg": "công_ty thương_mại an_phát", "address_seg": "đường xây_dựng đà_nẵng",
+     "representative_seg": "nguyễn văn an"},
+    {"company_name_seg": "công_ty vận_tải hoà_bình", "address_seg": "hà_nội",
+     "status_seg": "đang hoạt_động", "industries_str_seg": "vận_tải hàng_hoá"},
+    {},
+    {"company_name_seg": "doanh_nghiệp tư_nhân an_phát", "industries_str_seg": "thương_mại"},
+]
+
+QUERIES = ["xây_dựng", "hoà_bình hà_nội", "an_phát thương_mại", "vận_tải"]
+
+
+class TestTokenizeFields(unittest.TestCase):
+    """Test tokenize theo trường."""
+
+    def test_fields_and_positions(self):
+        tokens, token_fields, positions, lengths = tokenize_fields(
+            ["công_ty abc", "", "hà_nội"], with_positions=True)
+        self.assertEqual(tokens, ["công_ty", "abc", "hà_nội"])
+        self.assertEqual(token_fields, [0, 0, 2])
+        self.assertEqual(positions, [0, 1, POSITION_GAP + 2])
+        self.assertEqual(lengths, [2, 0, 1])
+
+
+class TestBM25F(unittest.TestCase):
+    """BM25F trên index theo trường: trọng số trường chọn lúc truy vấn."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.index_dir = os.path.join(self.test_dir, "fields")
+        self.jsonl_path = build_index(self.index_dir, DOCS, block_size=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def _search(self, index_dir, jsonl_path, query, **kwargs):
+        field_weights = kwargs.pop("field_weights", None)
+        searcher = BM25Searcher(index_dir=index_dir, jsonl_path=jsonl_path, **kwargs)
+        searcher.load_index()
+        results = [(doc_id, round(score, 9))
+                   for doc_id, score, _ in searcher.search(query, top_k=10, field_weights=field_weights)]
+        searcher.close()
+        return results
+
+    def test_field_lengths(self):
+        self.assertEqual(postings_num_fields(self.index_dir), len(FIELD_NAMES))
+        store = load_doc_store(self.index_dir)
+        self.assertEqual(store.fields, list(FIELD_NAMES))
+        self.assertEqual(store.field_lengths[0].tolist(), [3, 1, 0, 0, 4])
+        self.assertEqual(store.doc_lengths.tolist(), [8, 9, 8, -1, 4])
+
+    def test_matches_duplicated_text_without_length_norm(self):
+        # b = 0: tf~ = 2 tf_name + tf_address + ... + 2 tf_industries = tf của index cũ
+        legacy_dir = os.path.join(self.test_dir, "legacy")
+        legacy_jsonl = build_index(legacy_dir, DOCS, block_size=2, fields=False)
+        no_norm = {name: 0.0 for name in FIELD_NAMES}
+        for query in QUERIES:
+            self.assertEqual(
+                self._search(self.index_dir, self.jsonl_path, query, field_b=no_norm),
+                self._search(legacy_dir, legacy_jsonl, query, b=0.0),
+                query,
+            )
+
+    def test_query_time_weights(self):
+        default = self._search(self.index_dir, self.jsonl_path, "xây_dựng")
+        self.assertEqual([doc_id for doc_id, _ in default], [0, 1])
+        boosted = self._search(self.index_dir, self.jsonl_path, "xây_dựng",
+                               field_weights={"company_name": 0.0, "industries": 0.0, "address": 5.0})
+        self.assertEqual([doc_id for doc_id, _ in boosted], [1, 0])
+
+    def test_unknown_field(self):
+        with self.assertRaises(ValueError):
+            self._search(self.index_dir, self.jsonl_path, "xây_dựng", field_weights={"email": 1.0})
+
+    def test_parse_field_weights(self):
+        self.assertEqual(parse_field_weights("company_name:3, address:0.5,"),
+                         {"company_name": 3.0, "address": 0.5})
+        with self.assertRaises(ValueError):
+            parse_field_weights("company_name")
+        with self.assertRaises(ValueError):
+            parse_field_weights("address:-1")
+
+    def test_segments_match_full_rebuild(self):
+        inc_dir = os.path.join(self.test_dir, "incremental")
+        inc_jsonl = build_index(inc_dir, DOCS[:2], block_size=2)
+        add_documents(inc_dir, DOCS[2:])
+        self.assertEqual(postings_num_fields(os.path.join(inc_dir, "segments", "seg_000001")),
+                         len(FIELD_NAMES))
+        for query in QUERIES:
+            self.assertEqual(self._search(inc_dir, inc_jsonl, query),
+                             self._search(self.index_dir, self.jsonl_path, query), query)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,106 @@
+"""
+Unit Tests for the Accent-Folded Term Dictionary
+=================================================
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.indexer.folded_terms import fold_accents, has_folded_terms, FoldedTermDict
+from src.indexer.spimi import build_spimi_index
+from src.indexer.merging import merge_blocks
+from src.indexer.segments import add_documents, delete_documents, compact_base
+from src.ranking.bm25 import BM25Searcher
+
+
+DOCS = [
+    {"company_name_seg": "công_ty xây_dựng hoà_bình", "address_seg": "hà_nội",
+     "industries_str_seg": "xây_dựng nhà các loại"},
+    {"company_name_seg": "công_ty thương_mại an_phát", "address_seg": "đà_nẵng",
+     "industries_str_seg": "bán buôn"},
+    {"company_name_seg": "công_ty vận_tải hoà_bình", "address_seg": "hà_nội",
+     "industries_str_seg": "vận_tải hàng_hoá"},
+    {"company_name_seg": "cửa_hàng bán lẻ", "address_seg": "hà_nội"},
+    {"company_name_seg": "bàn ghế bàn_ghế", "address_seg": "huế"},
+    {"company_name_seg": "abc group xây_dựng", "address_seg": "hà_nội"},
+]
+
+
+class TestFoldAccents(unittest.TestCase):
+    """Test bỏ dấu tiếng Việt."""
+
+    def test_fold(self):
+        self.assertEqual(fold_accents("Xây_Dựng Đà_Nẵng"), "Xay_Dung Da_Nang")
+        self.assertEqual(fold_accents("hoà_bình ngõ 5"), "hoa_binh ngo 5")
+        self.assertEqual(fold_accents("abc group"), "abc group")
+
+
+class TestFoldedSearch(unittest.TestCase):
+    """Truy vấn không dấu vs có dấu trên cùng index."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.index_dir = os.path.join(self.test_dir, "index")
+        os.makedirs(self.index_dir)
+        self.jsonl_path = os.path.join(self.index_dir, "docs.jsonl")
+        with open(self.jsonl_path, "w", encoding="utf-8") as f:
+            for doc in DOCS:
+                f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+        blocks_dir = os.path.join(self.index_dir, "blocks")
+        build_spimi_index(self.jsonl_path, blocks_dir, block_size=2)
+        merge_blocks(blocks_dir, self.index_dir)
+        self.searcher = BM25Searcher(index_dir=self.index_dir, jsonl_path=self.jsonl_path)
+        self.searcher.load_index()
+
+    def tearDown(self):
+        self.searcher.close()
+        shutil.rmtree(self.test_dir)
+
+    def _search(self, query):
+        return [(doc_id, round(score, 9)) for doc_id, score, _ in self.searcher.search(query, top_k=10)]
+
+    def test_reader(self):
+        self.assertTrue(has_folded_terms(self.index_dir))
+        folded = FoldedTermDict(self.index_dir)
+        ordinal, df = folded.best("ha_noi")
+        self.assertEqual(self.searcher.term_dict.term_at(ordinal), "hà_nội")
+        self.assertEqual(df, 4)
+        self.assertIsNone(folded.variants("abc"))  # term không dấu không cần gom
+        folded.close()
+
+    def test_resolve_compounds(self):
+        tokenize = self.searcher._tokenize_query
+        self.assertEqual(tokenize("cong ty xay dung ha noi"), ["công_ty", "xây_dựng", "hà_nội"])
+        self.assertEqual(tokenize("Hoa Binh"), ["hoà_bình"])
+        self.assertEqual(tokenize("abc xay dung"), ["abc", "xây_dựng"])
+        # "ban": chọn term có df lớn nhất trong bán / bàn
+        self.assertEqual(tokenize("ban ghe"), ["bàn_ghế"])
+        self.assertEqual(tokenize("ban le"), ["bán", "lẻ"])
+        self.assertEqual(tokenize("khong co"), ["khong", "co"])
+
+    def test_same_results_as_accented(self):
+        for accented, unaccented in [("công_ty xây_dựng hà_nội", "cong ty xay dung ha noi"),
+                                     ("vận_tải hoà_bình", "van tai hoa binh"),
+                                     ("abc xây_dựng", "ABC xay dung")]:
+            self.assertEqual(self._search(unaccented), self._search(accented))
+            self.assertTrue(self._search(unaccented))
+
+    def test_compaction_rebuilds_folded_terms(self):
+        add_documents(self.index_dir, [{"company_name_seg": "vận_tải huế"}])
+        delete_documents(self.index_dir, [0, 5])
+        self.assertEqual(self._search("van tai hue"), self._search("vận_tải huế"))
+        compact_base(self.index_dir)
+        self.assertTrue(has_folded_terms(self.index_dir))
+        self.assertEqual(self._search("xay dung"), [])
+        self.assertEqual(self._search("van tai"), self._search("vận_tải"))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
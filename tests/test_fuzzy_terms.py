@@ -0,0 +1,165 @@
+"""
+Unit Tests for Fuzzy Term Lookup
+=================================
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.indexer.fuzzy_terms import (
+    edit_distance, auto_distance, term_grams, has_fuzzy_terms, load_fuzzy_meta,
+    write_fuzzy_terms, FuzzyTermIndex,
+)
+from src.indexer.spimi import build_spimi_index
+from src.indexer.merging import merge_blocks
+from src.indexer.segments import add_documents, delete_documents, compact_base
+from src.ranking.bm25 import BM25Searcher
+
+
+DOCS = [
+    {"company_name_seg": "công_ty vinamilk", "address_seg": "hà_nội",
+     "industries_str_seg": "sữa thương_mại"},
+    {"company_name_seg": "vinamilk chi_nhánh", "address_seg": "hà_nội",
+     "industries_str_seg": "sữa"},
+    {"company_name_seg": "công_ty xây_dựng hoà_bình", "address_seg": "đà_nẵng",
+     "industries_str_seg": "xây_dựng nhà các loại"},
+    {"company_name_seg": "công_ty thương_mại an_phát", "address_seg": "đà_nẵng",
+     "industries_str_seg": "thương_mại dịch_vụ"},
+    {"company_name_seg": "vinamik", "address_seg": "huế"},  # lỗi trong dữ liệu, df 1
+    {"company_name_seg": "hợp_tác_xã 12345", "address_seg": "12345 huế"},
+]
+
+
+class TestEditDistance(unittest.TestCase):
+    """Test khoảng cách sửa (OSA) và ngưỡng theo độ dài."""
+
+    def test_distance(self):
+        self.assertEqual(edit_distance("vinamilk", "vinamilk"), 0)
+        self.assertEqual(edit_distance("vinamlik", "vinamilk"), 1)  # hoán vị
+        self.assertEqual(edit_distance("vinamik", "vinamilk"), 1)
+        self.assertEqual(edit_distance("vinamilkk", "vinamilk"), 1)
+        self.assertEqual(edit_distance("xay_dunh", "xay_dung"), 1)
+        self.assertEqual(edit_distance("ab", "ba", limit=2), 1)
+
+    def test_limit(self):
+        self.assertEqual(edit_distance("kitten", "sitting", limit=2), 3)
+        self.assertEqual(edit_distance("kitten", "sitting", limit=3), 3)
+        self.assertEqual(edit_distance("a", "abcd", limit=1), 2)
+
+    def test_auto_distance(self):
+        self.assertEqual([auto_distance(n) for n in (1, 2, 3, 5, 6, 20)], [0, 0, 1, 1, 2, 2])
+
+    def test_grams(self):
+        self.assertEqual(term_grams("abc"), ["$ab", "abc", "bc$"])
+        self.assertEqual(term_grams("aaaa"), ["$aa", "aaa", "aa$"])
+
+
+class TestFuzzySearch(unittest.TestCase):
+    """Trigram index + sửa token gõ sai trong BM25Searcher."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.index_dir = os.path.join(self.test_dir, "index")
+        os.makedirs(self.index_dir)
+        self.jsonl_path = os.path.join(self.index_dir, "docs.jsonl")
+        with open(self.jsonl_path, "w", encoding="utf-8") as f:
+            for doc in DOCS:
+                f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+        blocks_dir = os.path.join(self.index_dir, "blocks")
+        build_spimi_index(self.jsonl_path, blocks_dir, block_size=2)
+        merge_blocks(blocks_dir, self.index_dir)
+        self.searcher = self._open()
+
+    def tearDown(self):
+        self.searcher.close()
+        shutil.rmtree(self.test_dir)
+
+    def _open(self, **kwargs):
+        searcher = BM25Searcher(index_dir=self.index_dir, jsonl_path=self.jsonl_path, **kwargs)
+        searcher.load_index()
+        return searcher
+
+    def _search(self, query, searcher=None):
+        searcher = searcher or self.searcher
+        return [(doc_id, round(score, 9)) for doc_id, score, _ in searcher.search(query, top_k=10)]
+
+    def test_lookup(self):
+        self.assertTrue(has_fuzzy_terms(self.index_dir))
+        fuzzy = FuzzyTermIndex(self.index_dir)
+        self.assertEqual(fuzzy.lookup("vinamlik")[0], ("vinamilk", 1, 2))
+        # Có dấu / không dấu cùng khoảng cách
+        self.assertEqual(fuzzy.lookup("thuong_mai")[0], ("thương_mại", 0, 2))
+        self.assertEqual(fuzzy.lookup("thuogn_mại")[0], ("thương_mại", 1, 2))
+        # df < FUZZY_MIN_DF ("vinamik"), term toàn số và token quá ngắn không được gợi ý
+        self.assertNotIn("vinamik", [term for term, _, _ in fuzzy.lookup("vinamik")])
+        self.assertEqual(fuzzy.lookup("12346"), [])
+        self.assertEqual(fuzzy.lookup("hn"), [])
+        self.assertEqual(fuzzy.lookup("zzzzzzzz"), [])
+        self.assertTrue(fuzzy.is_known_syllables("xây"))
+        self.assertTrue(fuzzy.is_known_syllables("dung"))
+        self.assertFalse(fuzzy.is_known_syllables("dugn"))
+        fuzzy.close()
+
+    def test_search_corrects_typos(self):
+        for typo, query, suggestion in [
+            ("vinamlik", "vinamilk", "vinamilk"),
+            ("xây_dựng hà_nộii", "xây_dựng hà_nội", "xây dựng hà nội"),
+            # Âm tiết gõ sai được ghép với âm tiết kề thành từ ghép
+            ("thuogn mai", "thương_mại", "thương mại"),
+        ]:
+            expected = self._search(query)
+            self.assertTrue(expected)
+            self.assertEqual(self._search(typo), expected)
+            self.assertEqual(self.searcher.last_suggestion, suggestion)
+
+    def test_no_correction_for_known_tokens(self):
+        self.searcher.search("vinamilk hà_nội", top_k=10)
+        self.assertIsNone(self.searcher.last_suggestion)
+        # Âm tiết có thật (chỉ lệch tách từ) không bị "sửa" thành từ khác
+        self.assertEqual(self.searcher._fuzzy_corrections(["xây"]), {})
+        self.assertEqual(self.searcher._fuzzy_corrections(["zzzz"]), {})
+        self.assertIsNone(self.searcher.did_you_mean("vinamilk"))
+        self.assertEqual(self.searcher.did_you_mean("Vinamlik hà_nội"), "vinamilk hà nội")
+
+    def test_disabled(self):
+        searcher = self._open(use_fuzzy=False)
+        self.assertIsNone(searcher.fuzzy)
+        self.assertEqual(self._search("vinamlik", searcher), [])
+        self.assertIsNone(searcher.last_suggestion)
+        searcher.close()
+
+    def test_stale_index_ignored(self):
+        merge_blocks(os.path.join(self.index_dir, "blocks"), self.index_dir)
+        meta = load_fuzzy_meta(self.index_dir)
+        meta["vocab_size"] += 1
+        with open(os.path.join(self.index_dir, "fuzzy_terms.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        searcher = self._open()
+        self.assertIsNone(searcher.fuzzy)
+        searcher.close()
+
+    def test_compaction_rebuilds_fuzzy_terms(self):
+        write_fuzzy_terms(self.index_dir, min_df=1)
+        fuzzy = FuzzyTermIndex(self.index_dir)
+        self.assertEqual(fuzzy.lookup("vinamik")[0], ("vinamik", 0, 1))
+        fuzzy.close()
+        add_documents(self.index_dir, [{"company_name_seg": "vinamilk"}])
+        delete_documents(self.index_dir, [4])
+        compact_base(self.index_dir)
+        self.assertEqual(load_fuzzy_meta(self.index_dir)["min_df"], 1)
+        searcher = self._open()
+        self.assertIsNotNone(searcher.fuzzy)
+        self.assertEqual(searcher.fuzzy.lookup("vinamik")[0][0], "vinamilk")
+        self.assertEqual(self._search("vinamik", searcher), self._search("vinamilk", searcher))
+        searcher.close()
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,141 @@
+"""
+Unit Tests for Precomputed 8-bit Impacts
+=========================================
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.indexer.impacts import (
+    quantize, impact_scale, has_impacts, ImpactsReader, IMPACT_MAX,
+)
+from src.indexer.merging import merge_blocks
+from src.indexer.segments import add_documents, delete_documents, compact_base
+from src.ranking.bm25 import BM25Searcher, K1, B
+from index_fixtures import build_index
+
+
+DOCS = [
+    {"company_name_seg": "công_ty xây_dựng hoà_bình", "address_seg": "hà_nội",
+     "industries_str_seg": "xây_dựng nhà các loại"},
+    {"company_name_seg": "công_ty thương_mại an_phát", "address_seg": "đường xây_dựng đà_nẵng"},
+    {"company_name_seg": "công_ty vận_tải hoà_bình", "address_seg": "hà_nội",
+     "industries_str_seg": "vận_tải hàng_hoá"},
+    {},
+    {"company_name_seg": "doanh_nghiệp tư_nhân an_phát xây_dựng", "industries_str_seg": "thương_mại"},
+    {"company_name_seg": "công_ty xây_dựng xây_dựng số_một", "address_seg": "hà_nội hà_nội"},
+]
+
+QUERIES = ["xây_dựng", "hoà_bình hà_nội", "an_phát thương_mại", "công_ty xây_dựng hà_nội"]
+
+
+class TestQuantize(unittest.TestCase):
+    """Test lượng tử hoá 8 bit."""
+
+    def test_bounds_and_error(self):
+        scale = impact_scale(K1)
+        values = np.linspace(0, K1 + 1, 1000)
+        impacts = quantize(values, scale)
+        self.assertEqual(impacts.dtype, np.uint8)
+        self.assertEqual(int(impacts.min()), 1)
+        self.assertEqual(int(impacts.max()), IMPACT_MAX)
+        errors = np.abs(impacts * scale - values)[values >= scale]
+        self.assertLessEqual(errors.max(), scale / 2 + 1e-12)
+
+
+class TestImpactsSearch(unittest.TestCase):
+    """Impacts vs tính chính xác trên index theo trường và index 1 text gộp."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.index_dir = os.path.join(self.test_dir, "fields")
+        self.jsonl_path = build_index(self.index_dir, DOCS, impacts=True, block_size=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def _search(self, index_dir, query, use_impacts=True, **kwargs):
+        searcher = BM25Searcher(index_dir=index_dir, jsonl_path=self.jsonl_path,
+                                use_impacts=use_impacts)
+        searcher.load_index()
+        results = [(doc_id, score) for doc_id, score, _ in searcher.search(query, top_k=10, **kwargs)]
+        searcher.close()
+        return results
+
+    def assertClose(self, index_dir, query, delta=0.02, **kwargs):
+        exact = self._search(index_dir, query, use_impacts=False, **kwargs)
+        approx = self._search(index_dir, query, **kwargs)
+        self.assertEqual(sorted(d for d, _ in exact), sorted(d for d, _ in approx), query)
+        exact_scores = dict(exact)
+        for doc_id, score in approx:
+            self.assertAlmostEqual(score, exact_scores[doc_id], delta=delta)
+
+    def test_reader(self):
+        self.assertTrue(has_impacts(self.index_dir))
+        reader = ImpactsReader(self.index_dir)
+        self.assertTrue(reader.matches(K1, B, reader.meta["fields"],
+                                       reader.meta["field_weights"], reader.meta["field_b"]))
+        self.assertFalse(reader.matches(K1 + 0.5, B))
+        self.assertEqual(reader.meta["num_postings"], int(reader.offsets[-1] - reader.offsets[0]))
+        reader.close()
+
+    def test_close_to_exact(self):
+        plain_dir = os.path.join(self.test_dir, "plain")
+        build_index(plain_dir, DOCS, impacts=True, block_size=2, fields=False)
+        for query in QUERIES:
+            self.assertClose(self.index_dir, query)
+            self.assertClose(plain_dir, query)
+
+    def test_other_weights_fall_back_to_exact(self):
+        weights = {"address": 5.0}
+        exact = self._search(self.index_dir, "xây_dựng", use_impacts=False, field_weights=weights)
+        self.assertEqual(self._search(self.index_dir, "xây_dựng", field_weights=weights), exact)
+
+    def test_segments_deletes_and_compaction(self):
+        add_documents(self.index_dir, [DOCS[0], DOCS[5]])
+        delete_documents(self.index_dir, [1, 5])
+        # 2 docs thêm vào 5 docs làm lệch avglen_f so với lúc tính impacts -> tính chính xác
+        for query in QUERIES:
+            self.assertEqual(self._search(self.index_dir, query),
+                             self._search(self.index_dir, query, use_impacts=False), query)
+        self.assertNotIn(5, [d for d, _ in self._search(self.index_dir, "xây_dựng")])
+
+        compact_base(self.index_dir)
+        searcher = BM25Searcher(index_dir=self.index_dir, jsonl_path=self.jsonl_path)
+        searcher.load_index()
+        self.assertIsNotNone(searcher.impacts)  # tính lại theo term dict mới
+        searcher.close()
+        for query in QUERIES:
+            self.assertClose(self.index_dir, query)
+
+    def test_stale_avg_length(self):
+        reader = ImpactsReader(self.index_dir)
+        meta = reader.meta
+        avg = np.array(meta["avg_field_lengths"])
+        args = (K1, B, meta["fields"], meta["field_weights"], meta["field_b"])
+        self.assertTrue(reader.matches(*args, avg_field_lengths=avg * 1.005))
+        self.assertFalse(reader.matches(*args, avg_field_lengths=avg * 1.1))
+        reader.close()
+        plain_dir = os.path.join(self.test_dir, "plain")
+        build_index(plain_dir, DOCS, impacts=True, block_size=2, fields=False)
+        reader = ImpactsReader(plain_dir)
+        avgdl = reader.meta["avg_doc_length"]
+        self.assertTrue(reader.matches(K1, B, avg_doc_length=avgdl))
+        self.assertFalse(reader.matches(K1, B, avg_doc_length=avgdl * 1.1))
+        reader.close()
+
+    def test_merge_removes_stale_impacts(self):
+        merge_blocks(os.path.join(self.index_dir, "blocks"), self.index_dir)
+        self.assertFalse(has_impacts(self.index_dir))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
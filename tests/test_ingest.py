@@ -0,0 +1,136 @@
+"""
+Unit Tests for Single-Pass Ingestion
+=====================================
+"""
+
+import io
+import json
+import os
+import sys
+import pickle
+import shutil
+import filecmp
+import tempfile
+import unittest
+import contextlib
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.indexer.ingest import ingest, tap_records, MstSink
+from src.indexer.spimi import build_spimi_index, iter_records
+from src.indexer.merging import merge_blocks
+from src.indexer.build_mst_index import build_mst_index, MST_INDEX_FILENAME
+from src.indexer.suggest import PrefixIndex
+
+
+SAMPLE_JSONL = os.path.join(os.path.dirname(__file__), "..", "data_sample", "sample.jsonl")
+SAME_FILES = ["term_dict.bin", "postings.bin", "doc_lengths.npy", "doc_offsets.npy",
+              "doc_field_lengths.npy", "folded_terms.bin", "fuzzy_grams.bin",
+              "suggest_terms.bin", "suggest_names.bin"]
+
+
+class TestIterRecords(unittest.TestCase):
+    """Test điểm đọc chung iter_records / tap_records."""
+
+    def test_line_numbers_and_offsets(self):
+        with tempfile.NamedTemporaryFile("wb", suffix=".jsonl", delete=False) as f:
+            f.write(b'{"a": 1}\n\n{broken\n{"b": 2}\n')
+        try:
+            records = list(iter_records(f.name))
+        finally:
+            os.remove(f.name)
+        self.assertEqual([(doc_id, line_no, offset) for doc_id, line_no, offset, _ in records],
+                         [(0, 0, 0), (1, 3, 18)])
+        self.assertEqual(records[1][3], {"b": 2})
+
+    def test_tap_records_feeds_every_sink(self):
+        class Sink:
+            def __init__(self):
+                self.seen = []
+
+            def add(self, doc_id, line_no, byte_offset, doc):
+                self.seen.append(doc_id)
+
+        sinks = [Sink(), Sink()]
+        records = [(0, 0, 0, {}), (1, 1, 10, {})]
+        self.assertEqual(list(tap_records(iter(records), sinks)), records)
+        self.assertEqual([sink.seen for sink in sinks], [[0, 1], [0, 1]])
+
+
+class TestMstSink(unittest.TestCase):
+    """MstSink cho cùng map MST -> byte offset với build_mst_index.py."""
+
+    def test_matches_build_mst_index(self):
+        docs = [{"tax_code": "0101234567"}, {"tax_code": 312345678}, {"tax_code": " 0202 "},
+                {"tax_code": ""}, {"company_name": "không có mst"}, {"tax_code": "0101234567"}]
+        test_dir = tempfile.mkdtemp()
+        try:
+            jsonl_path = os.path.join(test_dir, "docs.jsonl")
+            lines = [(json.dumps(doc, ensure_ascii=False) + "\n").encode("utf-8") for doc in docs]
+            offsets = [sum(len(line) for line in lines[:i]) for i in range(len(lines))]
+            with open(jsonl_path, "wb") as f:
+                f.writelines(lines)
+            index_path = os.path.join(test_dir, MST_INDEX_FILENAME)
+            with contextlib.redirect_stdout(io.StringIO()):
+                build_mst_index(jsonl_path, index_path)
+            with open(index_path, "rb") as f:
+                expected = pickle.load(f)
+            sink = MstSink()
+            for record in iter_records(jsonl_path):
+                sink.add(*record)
+        finally:
+            shutil.rmtree(test_dir)
+        self.assertEqual(sink.mst_dict, expected)
+        # Khoá luôn là chuỗi (server.py: q_clean in mst_index), MST lặp -> dòng sau cùng
+        self.assertEqual(sink.mst_dict, {"0101234567": offsets[5], "312345678": offsets[1],
+                                         "0202": offsets[2]})
+
+
+class TestIngest(unittest.TestCase):
+    """1 lượt đọc cho ra đúng các file của từng script chạy riêng."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.test_dir = tempfile.mkdtemp()
+        cls.separate_dir = os.path.join(cls.test_dir, "separate")
+        cls.ingest_dir = os.path.join(cls.test_dir, "ingest")
+        blocks_dir = os.path.join(cls.separate_dir, "blocks")
+        with contextlib.redirect_stdout(io.StringIO()):
+            build_spimi_index(SAMPLE_JSONL, blocks_dir, block_size=30)
+            merge_blocks(blocks_dir, cls.separate_dir, jsonl_path=SAMPLE_JSONL)
+            build_mst_index(SAMPLE_JSONL, os.path.join(cls.separate_dir, MST_INDEX_FILENAME))
+            cls.stats = ingest(SAMPLE_JSONL, cls.ingest_dir, block_size=30)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.test_dir)
+
+    def test_index_files_identical(self):
+        match, mismatch, errors = filecmp.cmpfiles(self.separate_dir, self.ingest_dir,
+                                                   SAME_FILES, shallow=False)
+        self.assertEqual(mismatch, [])
+        self.assertEqual(errors, [])
+        self.assertFalse(os.path.exists(os.path.join(self.ingest_dir, "blocks")))
+
+    def test_mst_index(self):
+        with open(os.path.join(self.separate_dir, MST_INDEX_FILENAME), "rb") as f:
+            expected = pickle.load(f)
+        with open(os.path.join(self.ingest_dir, MST_INDEX_FILENAME), "rb") as f:
+            mst_dict = pickle.load(f)
+        self.assertEqual(mst_dict, expected)
+        self.assertEqual(self.stats["mst"], len(expected))
+
+    def test_name_suggestions(self):
+        names = PrefixIndex(self.ingest_dir, "names")
+        expected = PrefixIndex(self.separate_dir, "names")
+        try:
+            self.assertGreater(len(names), 0)
+            self.assertEqual(names.complete("xay", 10), expected.complete("xay", 10))
+        finally:
+            names.close()
+            expected.close()
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,181 @@
+"""
+Unit Tests for Term Upper Bounds + MaxScore
+============================================
+"""
+
+import io
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import contextlib
+from unittest import mock
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.indexer.impacts import write_impacts
+from src.indexer.segments import add_documents, delete_documents
+from src.indexer.term_bounds import (
+    has_term_bounds, write_term_bounds, TERM_BOUNDS_FILENAME,
+)
+from src.ranking.bm25 import K1, B, FIELD_WEIGHTS
+from index_fixtures import build_index, open_searcher
+
+
+SAMPLE_JSONL = os.path.join(os.path.dirname(__file__), "..", "data_sample", "sample.jsonl")
+QUERIES = ["công ty xây dựng", "thương mại dịch vụ", "hà nội", "phan mem",
+           "vận tải hàng hoá", "công ty tnhh thương mại dịch vụ xây dựng hà nội"]
+NEW_DOCS = [
+    {"company_name_seg": "công_ty xây_dựng hà_nội mới", "address_seg": "hà_nội"},
+    {"company_name_seg": "công_ty thương_mại dịch_vụ vận_tải", "industries_str_seg": "vận_tải"},
+]
+
+
+class TestTermBounds(unittest.TestCase):
+    """term_bounds.npy được ghi lúc merge và là cận trên thật sự."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.test_dir = tempfile.mkdtemp()
+        cls.fields_dir = os.path.join(cls.test_dir, "fields")
+        cls.text_dir = os.path.join(cls.test_dir, "text")
+        build_index(cls.fields_dir, SAMPLE_JSONL, block_size=30)
+        build_index(cls.text_dir, SAMPLE_JSONL, block_size=30, fields=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.test_dir)
+
+    def test_written_by_merge(self):
+        for index_dir in (self.fields_dir, self.text_dir):
+            self.assertTrue(has_term_bounds(index_dir))
+            merged = np.load(os.path.join(index_dir, TERM_BOUNDS_FILENAME))
+            # Tính lại từ postings.bin cho cùng kết quả
+            rebuilt_dir = os.path.join(self.test_dir, "rebuilt")
+            shutil.copytree(index_dir, rebuilt_dir)
+            try:
+                write_term_bounds(rebuilt_dir)
+                rebuilt = np.load(os.path.join(rebuilt_dir, TERM_BOUNDS_FILENAME))
+            finally:
+                shutil.rmtree(rebuilt_dir)
+            np.testing.assert_array_equal(merged, rebuilt)
+
+    def test_parallel_merge(self):
+        parallel_dir = os.path.join(self.test_dir, "parallel")
+        build_index(parallel_dir, SAMPLE_JSONL, merge_workers=2, block_size=30)
+        np.testing.assert_array_equal(np.load(os.path.join(parallel_dir, TERM_BOUNDS_FILENAME)),
+                                      np.load(os.path.join(self.fields_dir, TERM_BOUNDS_FILENAME)))
+
+    def assert_bounds_hold(self, searcher, field_weights=None):
+        field_params = searcher._field_params(field_weights) if searcher.fields else None
+        for ordinal, term in enumerate(searcher.term_dict):
+            bound = searcher._term_upper_bound(ordinal, 1.0, field_params, False)
+            doc_ids, tfs = searcher._get_postings(term)
+            if field_params is not None:
+                field_tfs = searcher.compute_field_tf(tfs, searcher.field_lengths[doc_ids], field_params)
+                scores = field_tfs * (K1 + 1) / (K1 + field_tfs)
+            else:
+                norms = searcher.doc_norms[doc_ids].astype(np.float64)
+                scores = tfs * (K1 + 1) / (tfs + K1 * norms)
+            self.assertLessEqual(scores.max(), bound, term)
+
+    def test_bounds_hold(self):
+        for index_dir in (self.fields_dir, self.text_dir):
+            searcher = open_searcher(index_dir, SAMPLE_JSONL, use_impacts=False)
+            try:
+                self.assertIsNotNone(searcher.term_bounds)
+                self.assert_bounds_hold(searcher)
+                if searcher.fields:
+                    self.assert_bounds_hold(searcher, {"company_name": 5.0, "address": 0.2})
+            finally:
+                searcher.close()
+
+
+class TestMaxScore(unittest.TestCase):
+    """scorer="maxscore" cho cùng top-k với scorer="numpy"."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.test_dir = tempfile.mkdtemp()
+        build_index(os.path.join(cls.test_dir, "fields"), SAMPLE_JSONL, block_size=30)
+        build_index(os.path.join(cls.test_dir, "text"), SAMPLE_JSONL, block_size=30, fields=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.test_dir)
+
+    def _ranked(self, searcher, query, top_k, scorer, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = searcher.search(query, top_k, scorer=scorer, **kwargs)
+        return [(doc_id, score) for doc_id, score, _ in results]
+
+    def assert_same_top_k(self, searcher, **kwargs):
+        # MAXSCORE_MIN_DF = 0: mọi list đều được tra qua skip table; 30: trộn list ngắn / dài
+        for min_df in (0, 30):
+            with mock.patch("src.ranking.bm25.MAXSCORE_MIN_DF", min_df):
+                for query in QUERIES:
+                    for top_k in (1, 3, 10, 50):
+                        expected = self._ranked(searcher, query, top_k, "numpy", **kwargs)
+                        ranked = self._ranked(searcher, query, top_k, "maxscore", **kwargs)
+                        if not min_df:
+                            self.assertEqual(searcher.last_scorer, "maxscore")
+                        self.assertEqual([doc_id for doc_id, _ in ranked],
+                                         [doc_id for doc_id, _ in expected], (query, top_k))
+                        # Thứ tự cộng các term khác nhau -> lệch tối đa vài ulp
+                        np.testing.assert_allclose([score for _, score in ranked],
+                                                   [score for _, score in expected], rtol=1e-12)
+
+    def test_matches_numpy(self):
+        for name in ("fields", "text"):
+            searcher = open_searcher(os.path.join(self.test_dir, name), SAMPLE_JSONL, use_impacts=False)
+            try:
+                self.assert_same_top_k(searcher)
+                if name == "fields":
+                    self.assert_same_top_k(searcher, field_weights={"company_name": 4.0, "address": 0.5})
+            finally:
+                searcher.close()
+
+    def test_impacts(self):
+        index_dir = os.path.join(self.test_dir, "impacts")
+        shutil.copytree(os.path.join(self.test_dir, "fields"), index_dir)
+        write_impacts(index_dir, K1, B, FIELD_WEIGHTS)
+        searcher = open_searcher(index_dir, SAMPLE_JSONL)
+        try:
+            self.assertIsNotNone(searcher.impacts)
+            self.assert_same_top_k(searcher)
+        finally:
+            searcher.close()
+
+    def test_segments_and_deletions(self):
+        index_dir = os.path.join(self.test_dir, "live")
+        shutil.copytree(os.path.join(self.test_dir, "fields"), index_dir)
+        with contextlib.redirect_stdout(io.StringIO()):
+            add_documents(index_dir, NEW_DOCS)
+            delete_documents(index_dir, [0, 5, 17])
+        searcher = open_searcher(index_dir, SAMPLE_JSONL, use_impacts=False)
+        try:
+            self.assertTrue(searcher.segments)
+            self.assert_same_top_k(searcher)
+        finally:
+            searcher.close()
+
+    def test_falls_back_without_bounds(self):
+        index_dir = os.path.join(self.test_dir, "no_bounds")
+        shutil.copytree(os.path.join(self.test_dir, "text"), index_dir)
+        os.remove(os.path.join(index_dir, TERM_BOUNDS_FILENAME))
+        searcher = open_searcher(index_dir, SAMPLE_JSONL, use_impacts=False)
+        try:
+            with mock.patch("src.ranking.bm25.MAXSCORE_MIN_DF", 0):
+                expected = self._ranked(searcher, "công ty xây dựng", 10, "numpy")
+                self.assertEqual(self._ranked(searcher, "công ty xây dựng", 10, "maxscore"), expected)
+            self.assertEqual(searcher.last_scorer, "numpy")
+        finally:
+            searcher.close()
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
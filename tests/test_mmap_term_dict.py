@@ -0,0 +1,85 @@
+"""
+Unit Tests for Memory-Mapped Term Dictionary
+=============================================
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.indexer.mmap_term_dict import TermDictWriter, MmapTermDict, write_term_dict
+
+
+class TestMmapTermDict(unittest.TestCase):
+    """Test ghi/đọc term_dict.bin."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, "term_dict.bin")
+        # Đủ nhiều terms để trải trên nhiều block front-coding
+        self.term_dict = {}
+        for i, term in enumerate(sorted({
+            "công_ty", "công_nghệ", "công_nghiệp", "xây_dựng", "xây_lắp",
+            "hà_nội", "hà_nam", "dịch_vụ", "thương_mại", "abc", "đà_nẵng",
+            *[f"term{j:03d}" for j in range(60)],
+        })):
+            self.term_dict[term] = (i + 1, i * 100, 50 + i)
+        write_term_dict(self.term_dict, self.path)
+        self.mmap_dict = MmapTermDict(self.path)
+
+    def tearDown(self):
+        self.mmap_dict.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_lookup_all_terms(self):
+        for term, entry in self.term_dict.items():
+            self.assertIn(term, self.mmap_dict)
+            self.assertEqual(self.mmap_dict[term], entry)
+
+    def test_missing_terms(self):
+        for term in ["", "a", "công", "công_ty_x", "zzz", "term0600"]:
+            self.assertNotIn(term, self.mmap_dict)
+            self.assertIsNone(self.mmap_dict.get(term))
+        with self.assertRaises(KeyError):
+            self.mmap_dict["không_có"]
+
+    def test_len_and_sorted_iteration(self):
+        self.assertEqual(len(self.mmap_dict), len(self.term_dict))
+        self.assertEqual(list(self.mmap_dict), sorted(self.term_dict))
+
+    def test_ordinal_roundtrip(self):
+        for i, term in enumerate(sorted(self.term_dict)):
+            self.assertEqual(self.mmap_dict.ordinal(term), i)
+            self.assertEqual(self.mmap_dict.term_at(i), term)
+
+    def test_lower_bound_prefix_range(self):
+        terms = sorted(self.term_dict)
+        for probe in ["", "a", "công", "công_ty", "công_tz", "term05", "zzz", "đ"]:
+            expected = sum(term.encode("utf-8") < probe.encode("utf-8") for term in terms)
+            self.assertEqual(self.mmap_dict.lower_bound(probe), expected, probe)
+        lo = self.mmap_dict.lower_bound("công_ngh")
+        hi = self.mmap_dict.lower_bound("công_ngh\U0010ffff")
+        self.assertEqual(terms[lo:hi], ["công_nghiệp", "công_nghệ"])
+
+    def test_rejects_unsorted_input(self):
+        writer = TermDictWriter(os.path.join(self.test_dir, "bad.bin"))
+        writer.add("b", 1, 0, 1)
+        with self.assertRaises(ValueError):
+            writer.add("a", 1, 1, 1)
+
+    def test_empty_dictionary(self):
+        path = os.path.join(self.test_dir, "empty.bin")
+        write_term_dict({}, path)
+        empty = MmapTermDict(path)
+        self.assertEqual(len(empty), 0)
+        self.assertNotIn("công_ty", empty)
+        empty.close()
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,154 @@
+"""
+Unit Tests for Positional Index (Phrase / Proximity Queries)
+=============================================================
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.indexer.positions import (
+    encode_positions, decode_positions, reorder_positions, match_phrase, has_positions,
+)
+from src.indexer.spimi import (
+    tokenize, tokenize_with_positions, POSITION_GAP,
+)
+from src.indexer.segments import add_documents, merge_segments, load_manifest
+from src.ranking.bm25 import BM25Searcher
+from index_fixtures import build_index
+
+
+def postings(docs):
+    """{doc_id: [positions]} -> (doc_ids, tfs, positions) như trong index."""
+    doc_ids = sorted(docs)
+    tfs = [len(docs[d]) for d in doc_ids]
+    flat = [p for d in doc_ids for p in docs[d]]
+    return np.array(doc_ids, np.int32), np.array(tfs, np.int32), np.array(flat, np.int32)
+
+
+class TestPositionsCodec(unittest.TestCase):
+    """Test mã hoá vị trí (delta trong từng doc + varint)."""
+
+    def test_roundtrip(self):
+        tfs = [3, 1, 2]
+        positions = [0, 5, 300, 7, 2, 100000]
+        decoded = decode_positions(encode_positions(tfs, positions), tfs)
+        self.assertEqual(decoded.tolist(), positions)
+
+    def test_rejects_wrong_count(self):
+        with self.assertRaises(ValueError):
+            encode_positions([2], [1, 2, 3])
+
+    def test_reorder(self):
+        tfs = np.array([2, 1, 3])
+        positions = np.array([1, 4, 9, 0, 2, 5])
+        reordered = reorder_positions(tfs, positions, np.array([2, 0, 1]))
+        self.assertEqual(reordered.tolist(), [0, 2, 5, 1, 4, 9])
+
+    def test_tokenize_with_positions(self):
+        text = "công_ty a xây_dựng | hà_nội ... số_1"
+        tokens, positions = tokenize_with_positions(text)
+        self.assertEqual(tokens, tokenize(text))
+        self.assertEqual(positions, [0, 1, POSITION_GAP + 2, POSITION_GAP + 3])
+
+
+class TestMatchPhrase(unittest.TestCase):
+    """Test phrase / proximity matching trên (doc_ids, tfs, positions)."""
+
+    def setUp(self):
+        # doc 1: "a b c", doc 2: "a x b", doc 3: "b a", doc 4: "a ... a b"
+        self.a = postings({1: [0], 2: [0], 3: [1], 4: [0, 7]})
+        self.b = postings({1: [1], 2: [2], 3: [0], 4: [8]})
+        self.c = postings({1: [2]})
+
+    def test_exact_phrase(self):
+        self.assertEqual(match_phrase([self.a, self.b]).tolist(), [1, 4])
+        self.assertEqual(match_phrase([self.a, self.b, self.c]).tolist(), [1])
+
+    def test_order_matters(self):
+        self.assertEqual(match_phrase([self.b, self.a]).tolist(), [3])
+
+    def test_slop(self):
+        self.assertEqual(match_phrase([self.a, self.b], slop=1).tolist(), [1, 2, 4])
+
+    def test_repeated_term(self):
+        self.assertEqual(match_phrase([self.a, self.a], slop=10).tolist(), [4])
+
+    def test_single_term(self):
+        self.assertEqual(match_phrase([self.c]).tolist(), [1])
+
+
+DOCS = [
+    {"company_name_seg": "công_ty xây_dựng hoà_bình", "address_seg": "hà_nội"},
+    {"company_name_seg": "công_ty hoà_bình xây_dựng", "address_seg": "hà_nội"},
+    {"company_name_seg": "công_ty xây_dựng số_một hoà_bình", "address_seg": "đà_nẵng"},
+    {"company_name_seg": "công_ty thương_mại hoà_bình", "address_seg": "xây_dựng"},
+    {},
+    {"company_name_seg": "công_ty vận_tải xây_dựng", "address_seg": "hoà_bình hà_nội"},
+]
+
+
+class TestPhraseSearch(unittest.TestCase):
+    """Phrase query end-to-end: SPIMI --positions -> merge -> BM25Searcher."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.index_dir = os.path.join(self.test_dir, "index")
+        self.jsonl_path = build_index(self.index_dir, DOCS, block_size=2, positions=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def _doc_ids(self, index_dir, jsonl_path, query):
+        searcher = BM25Searcher(index_dir=index_dir, jsonl_path=jsonl_path)
+        searcher.load_index()
+        doc_ids = sorted(doc_id for doc_id, _, _ in searcher.search(query, top_k=10))
+        searcher.close()
+        return doc_ids
+
+    def test_phrase_and_proximity(self):
+        self.assertTrue(has_positions(self.index_dir))
+        self.assertEqual(self._doc_ids(self.index_dir, self.jsonl_path, '"xây_dựng hoà_bình"'), [0])
+        self.assertEqual(self._doc_ids(self.index_dir, self.jsonl_path, '"xây_dựng hoà_bình"~1'), [0, 2])
+        self.assertEqual(self._doc_ids(self.index_dir, self.jsonl_path, 'hà_nội "công_ty hoà_bình"'), [1])
+
+    def test_phrase_does_not_cross_fields(self):
+        # doc 5: "... xây_dựng | hoà_bình ..." - 2 trường khác nhau
+        self.assertEqual(self._doc_ids(self.index_dir, self.jsonl_path, '"xây_dựng hoà_bình"~5'), [0, 2])
+
+    def test_plain_query_unchanged(self):
+        plain_dir = os.path.join(self.test_dir, "plain")
+        plain_jsonl = build_index(plain_dir, DOCS, block_size=2)
+        self.assertFalse(has_positions(plain_dir))
+        self.assertEqual(self._doc_ids(self.index_dir, self.jsonl_path, "xây_dựng hoà_bình"),
+                         self._doc_ids(plain_dir, plain_jsonl, "xây_dựng hoà_bình"))
+
+    def test_parallel_merge_positions_identical(self):
+        parallel_dir = os.path.join(self.test_dir, "parallel")
+        build_index(parallel_dir, DOCS, merge_workers=2, block_size=2, positions=True)
+        for filename in ("positions.bin", "positions_offsets.npy", "postings.bin"):
+            with open(os.path.join(self.index_dir, filename), "rb") as f1, \
+                    open(os.path.join(parallel_dir, filename), "rb") as f2:
+                self.assertEqual(f1.read(), f2.read(), filename)
+
+    def test_segments_keep_positions(self):
+        name, doc_ids = add_documents(self.index_dir, [DOCS[0], DOCS[2]])
+        self.assertEqual(doc_ids, [6, 7])
+        add_documents(self.index_dir, [DOCS[1]])
+        self.assertEqual(self._doc_ids(self.index_dir, self.jsonl_path, '"xây_dựng hoà_bình"'), [0, 6])
+
+        names = [meta["name"] for meta in load_manifest(self.index_dir)["segments"]]
+        merge_segments(self.index_dir, names)
+        self.assertEqual(self._doc_ids(self.index_dir, self.jsonl_path, '"xây_dựng hoà_bình"~1'),
+                         [0, 2, 6, 7])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,243 @@
+"""
+Unit Tests for Postings Codec (Delta + Varint)
+===============================================
+"""
+
+import io
+import os
+import sys
+import shutil
+import pickle
+import tempfile
+import unittest
+import contextlib
+from unittest import mock
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.indexer.postings_codec import (
+    encode_varints, decode_varints, encode_postings, decode_postings,
+    write_header, read_header, convert_pickle_index, HEADER_SIZE,
+    PostingsBlocks, blocks_flags, block_size_from_flags,
+)
+
+
+class TestVarint(unittest.TestCase):
+    """Test varint encode/decode."""
+
+    def test_roundtrip(self):
+        values = [0, 1, 127, 128, 300, 16383, 16384, 2**31, 2**40]
+        decoded = decode_varints(encode_varints(values))
+        self.assertEqual(decoded.tolist(), values)
+
+    def test_small_values_one_byte(self):
+        data = encode_varints([0, 5, 127])
+        self.assertEqual(len(data), 3)
+
+    def test_known_encoding(self):
+        # 300 = 0b100101100 -> 0xAC 0x02 (ví dụ kinh điển của protobuf)
+        self.assertEqual(encode_varints([300]), b"\xac\x02")
+
+    def test_truncated_stream(self):
+        with self.assertRaises(ValueError):
+            decode_varints(b"\xac")
+
+
+class TestPostingsCodec(unittest.TestCase):
+    """Test postings list encode/decode."""
+
+    def test_roundtrip(self):
+        doc_ids = [3, 4, 10, 1000, 250000, 1800000]
+        tfs = [1, 2, 1, 7, 300, 1]
+        out_ids, out_tfs = decode_postings(encode_postings(doc_ids, tfs))
+        self.assertEqual(out_ids.tolist(), doc_ids)
+        self.assertEqual(out_tfs.tolist(), tfs)
+
+    def test_empty_list(self):
+        out_ids, out_tfs = decode_postings(encode_postings([], []))
+        self.assertEqual(len(out_ids), 0)
+        self.assertEqual(len(out_tfs), 0)
+
+    def test_smaller_than_pickle(self):
+        doc_ids = np.arange(0, 100000, 7)
+        tfs = np.ones_like(doc_ids)
+        encoded = encode_postings(doc_ids, tfs)
+        pickled = pickle.dumps(list(zip(doc_ids.tolist(), tfs.tolist())),
+                               protocol=pickle.HIGHEST_PROTOCOL)
+        self.assertLess(len(encoded), len(pickled))
+
+    def test_rejects_unsorted(self):
+        with self.assertRaises(ValueError):
+            encode_postings([5, 3], [1, 1])
+
+    def test_field_roundtrip(self):
+        doc_ids = [2, 9, 40, 41, 70000]
+        tfs = np.array([[1, 0, 0, 0, 0],
+                        [0, 0, 0, 0, 300],
+                        [2, 1, 0, 0, 1],
+                        [0, 0, 7, 0, 0],
+                        [0, 4, 0, 0, 9]])
+        encoded = encode_postings(doc_ids, tfs)
+        out_ids, out_tfs = decode_postings(encoded, num_fields=5)
+        self.assertEqual(out_ids.tolist(), doc_ids)
+        self.assertEqual(out_tfs.tolist(), tfs.tolist())
+        # Posting 1 trường, tf nhỏ: 1 byte như postings thường
+        single = np.zeros((3, 5), dtype=np.int64)
+        single[:, 3] = 1
+        self.assertEqual(len(encode_postings([1, 2, 3], single)),
+                         len(encode_postings([1, 2, 3], [1, 1, 1])))
+
+
+class TestBlockedPostings(unittest.TestCase):
+    """Test postings chia block + skip table."""
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.doc_ids = np.sort(rng.choice(1_000_000, 1000, replace=False))
+        self.tfs = rng.integers(1, 300, 1000)
+        self.field_tfs = np.zeros((1000, 5), dtype=np.int64)
+        self.field_tfs[np.arange(1000), rng.integers(0, 5, 1000)] = self.tfs
+        self.field_tfs[::7, 4] += 2  # 1 số posting nhiều trường
+
+    def test_roundtrip(self):
+        for tfs, num_fields in ((self.tfs, 0), (self.field_tfs, 5)):
+            encoded = encode_postings(self.doc_ids, tfs, block_size=64)
+            out_ids, out_tfs = decode_postings(encoded, num_fields, block_size=64)
+            self.assertEqual(out_ids.tolist(), self.doc_ids.tolist())
+            self.assertEqual(out_tfs.tolist(), tfs.tolist())
+
+    def test_short_list_unchanged(self):
+        self.assertEqual(encode_postings(self.doc_ids[:64], self.tfs[:64], block_size=64),
+                         encode_postings(self.doc_ids[:64], self.tfs[:64]))
+
+    def test_skip_table(self):
+        blocks = PostingsBlocks(encode_postings(self.doc_ids, self.tfs, 64), block_size=64)
+        self.assertEqual(blocks.num_blocks, 16)
+        self.assertEqual(blocks.last_doc_ids.tolist(), self.doc_ids[63::64].tolist() + [self.doc_ids[-1]])
+        self.assertEqual(blocks.max_tfs[0], self.tfs[:64].max())
+        doc_ids, tfs = blocks.decode_blocks(3, 5)
+        self.assertEqual(doc_ids.tolist(), self.doc_ids[192:320].tolist())
+        self.assertEqual(tfs.tolist(), self.tfs[192:320].tolist())
+
+    def test_decode_from(self):
+        for tfs, num_fields in ((self.tfs, 0), (self.field_tfs, 5)):
+            blocks = PostingsBlocks(encode_postings(self.doc_ids, tfs, 64), num_fields, 64)
+            for target in (0, int(self.doc_ids[500]), int(self.doc_ids[500]) + 1, 10**7):
+                first = int(np.searchsorted(self.doc_ids, target))
+                doc_ids, out_tfs = blocks.decode_from(target)
+                self.assertEqual(doc_ids.tolist(), self.doc_ids[first:].tolist())
+                self.assertEqual(out_tfs.tolist(), tfs[first:].tolist())
+
+    def test_decode_block_set(self):
+        for tfs, num_fields in ((self.tfs, 0), (self.field_tfs, 5)):
+            blocks = PostingsBlocks(encode_postings(self.doc_ids, tfs, 64), num_fields, 64)
+            doc_ids, out_tfs = blocks.decode_block_set([0, 3, 4, 15])
+            wanted = np.r_[0:64, 192:320, 960:1000]
+            self.assertEqual(doc_ids.tolist(), self.doc_ids[wanted].tolist())
+            self.assertEqual(out_tfs.tolist(), tfs[wanted].tolist())
+
+    def test_lookup(self):
+        missing = np.setdiff1d(np.arange(0, 1_000_000, 997), self.doc_ids)[:20]
+        for tfs, num_fields in ((self.tfs, 0), (self.field_tfs, 5)):
+            blocks = PostingsBlocks(encode_postings(self.doc_ids, tfs, 64), num_fields, 64)
+            # Ít doc (chỉ decode vài block) và nhiều doc (decode cả list)
+            for present in (np.array([5, 200, 999]), np.arange(0, 1000, 3)):
+                targets = np.union1d(self.doc_ids[present], missing)
+                positions, found_tfs = blocks.lookup(targets)
+                expected = np.full(len(targets), -1)
+                expected[np.isin(targets, self.doc_ids)] = present
+                self.assertEqual(positions.tolist(), expected.tolist())
+                self.assertEqual(blocks.find_postings(targets).tolist(), expected.tolist())
+                self.assertEqual(found_tfs[positions >= 0].tolist(), tfs[present].tolist())
+                self.assertFalse(found_tfs[positions < 0].any())
+
+    def test_flags(self):
+        self.assertEqual(block_size_from_flags(blocks_flags(128)), 128)
+        self.assertEqual(block_size_from_flags(0), 0)
+        with self.assertRaises(ValueError):
+            blocks_flags(100)
+
+
+class TestConverter(unittest.TestCase):
+    """Test chuyển đổi index pickle cũ sang định dạng nén."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    LISTS = {
+        "apple": [(1, 2), (2, 1)],
+        "banana": [(1, 1), (3, 1), (900, 4)],
+    }
+
+    def _write_pickle_index(self):
+        term_dict = {}
+        with open(os.path.join(self.test_dir, "postings.bin"), "wb") as f:
+            for term, postings in self.LISTS.items():
+                data = pickle.dumps(postings)
+                term_dict[term] = (len(postings), f.tell(), len(data))
+                f.write(data)
+        with open(os.path.join(self.test_dir, "term_dict.pkl"), "wb") as f:
+            pickle.dump(term_dict, f)
+
+    def _assert_converted(self):
+        with open(os.path.join(self.test_dir, "term_dict.pkl"), "rb") as f:
+            new_dict = pickle.load(f)
+        with open(os.path.join(self.test_dir, "postings.bin"), "rb") as f:
+            self.assertIsNotNone(read_header(f))
+            block_size = block_size_from_flags(read_header(f)[1])
+            for term, postings in self.LISTS.items():
+                df, offset, length = new_dict[term]
+                self.assertEqual(df, len(postings))
+                self.assertGreaterEqual(offset, HEADER_SIZE)
+                f.seek(offset)
+                doc_ids, tfs = decode_postings(f.read(length), block_size=block_size)
+                self.assertEqual(list(zip(doc_ids.tolist(), tfs.tolist())), postings)
+        self.assertEqual(sorted(os.listdir(self.test_dir)),
+                         ["postings.bin", "term_dict.bin", "term_dict.pkl"])
+
+    def test_convert_pickle_index(self):
+        self._write_pickle_index()
+        convert_pickle_index(self.test_dir)
+        self._assert_converted()
+
+    def test_convert_resumes_after_interruption(self):
+        self._write_pickle_index()
+        real_replace = os.replace
+
+        def crash_on_postings(src, dst):
+            if os.path.basename(dst) == "postings.bin":
+                raise KeyboardInterrupt
+            real_replace(src, dst)
+
+        # Ngắt sau khi 2 từ điển đã mang offset mới, postings.bin vẫn là pickle
+        with mock.patch("os.replace", side_effect=crash_on_postings), \
+                contextlib.redirect_stdout(io.StringIO()):
+            with self.assertRaises(KeyboardInterrupt):
+                convert_pickle_index(self.test_dir)
+        with open(os.path.join(self.test_dir, "postings.bin"), "rb") as f:
+            self.assertIsNone(read_header(f))
+        with contextlib.redirect_stdout(io.StringIO()):
+            convert_pickle_index(self.test_dir)
+        self._assert_converted()
+
+    def test_header_detects_legacy(self):
+        path = os.path.join(self.test_dir, "legacy.bin")
+        with open(path, "wb") as f:
+            f.write(pickle.dumps([(1, 1)]))
+        with open(path, "rb") as f:
+            self.assertIsNone(read_header(f))
+
+        with open(path, "wb") as f:
+            write_header(f)
+        with open(path, "rb") as f:
+            self.assertEqual(read_header(f), (1, 0))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,97 @@
+"""
+Unit Tests for the Vectorized (NumPy) BM25 Scorer
+==================================================
+"""
+
+import io
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import contextlib
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.indexer.spimi import build_spimi_index
+from src.indexer.merging import merge_blocks
+from src.indexer.segments import add_documents, delete_documents
+from src.ranking.bm25 import BM25Searcher
+
+
+SAMPLE_JSONL = os.path.join(os.path.dirname(__file__), "..", "data_sample", "sample.jsonl")
+QUERIES = ["công ty xây dựng", "thương mại dịch vụ", "hà nội", "phan mem",
+           "vận tải hàng hoá", "công ty tnhh thương mại dịch vụ xây dựng hà nội"]
+NEW_DOCS = [
+    {"company_name_seg": "công_ty xây_dựng hà_nội mới", "address_seg": "hà_nội"},
+    {"company_name_seg": "công_ty thương_mại dịch_vụ vận_tải", "industries_str_seg": "vận_tải"},
+]
+
+
+class TestNumpyScorer(unittest.TestCase):
+    """scorer="numpy" cho cùng điểm, cùng số doc khớp với vòng lặp Python."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.test_dir = tempfile.mkdtemp()
+        cls.searchers = []
+        for name, fields in (("fields", True), ("text", False)):
+            index_dir = os.path.join(cls.test_dir, name)
+            with contextlib.redirect_stdout(io.StringIO()):
+                build_spimi_index(SAMPLE_JSONL, os.path.join(index_dir, "blocks"),
+                                  block_size=30, fields=fields)
+                merge_blocks(os.path.join(index_dir, "blocks"), index_dir)
+            searcher = BM25Searcher(index_dir, SAMPLE_JSONL, use_impacts=False)
+            with contextlib.redirect_stdout(io.StringIO()):
+                searcher.load_index()
+            cls.searchers.append(searcher)
+
+    @classmethod
+    def tearDownClass(cls):
+        for searcher in cls.searchers:
+            searcher.close()
+        shutil.rmtree(cls.test_dir)
+
+    def _ranked(self, searcher, query, scorer, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = searcher.search(query, 1000, scorer=scorer, **kwargs)
+        return [(doc_id, score) for doc_id, score, _ in results], searcher.last_match_count
+
+    def assert_identical(self, searcher, **kwargs):
+        for query in QUERIES:
+            expected, expected_count = self._ranked(searcher, query, "loop", **kwargs)
+            ranked, match_count = self._ranked(searcher, query, "numpy", **kwargs)
+            self.assertEqual(match_count, expected_count, query)
+            # Cùng điểm (bit-for-bit); hoà điểm: numpy xếp doc_id nhỏ trước
+            self.assertEqual([score for _, score in ranked], [score for _, score in expected], query)
+            self.assertEqual(ranked, sorted(expected, key=lambda x: (-x[1], x[0])), query)
+
+    def test_matches_python_loop(self):
+        for searcher in self.searchers:
+            self.assert_identical(searcher)
+        self.assert_identical(self.searchers[0], field_weights={"company_name": 4.0, "address": 0.5})
+
+    def test_segments_and_deletions(self):
+        index_dir = os.path.join(self.test_dir, "live")
+        shutil.copytree(os.path.join(self.test_dir, "fields"), index_dir)
+        with contextlib.redirect_stdout(io.StringIO()):
+            add_documents(index_dir, NEW_DOCS)
+            delete_documents(index_dir, [0, 5, 17])
+            searcher = BM25Searcher(index_dir, SAMPLE_JSONL, use_impacts=False)
+            searcher.load_index()
+        try:
+            self.assertTrue(searcher.segments)
+            self.assert_identical(searcher)
+        finally:
+            searcher.close()
+
+    def test_unknown_scorer(self):
+        with self.assertRaises(ValueError):
+            BM25Searcher(scorer="nope")
+        with self.assertRaises(ValueError):
+            self.searchers[0].search("hà nội", scorer="nope")
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
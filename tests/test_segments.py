@@ -0,0 +1,249 @@
+"""
+Unit Tests for Incremental Segments
+====================================
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.indexer.segments import (
+    add_documents, load_manifest, merge_segments, maybe_merge, TieredMergePolicy,
+    delete_documents, update_document, compact, load_deletions,
+)
+from src.ranking.bm25 import BM25Searcher
+from index_fixtures import build_index
+
+
+WORDS = ["xây_dựng", "thương_mại", "dịch_vụ", "phần_mềm", "vận_tải", "thủy_sản", "điện_tử"]
+CITIES = ["hà_nội", "đà_nẵng", "hải_phòng"]
+QUERIES = ["xây_dựng hà_nội", "phần_mềm", "dịch_vụ vận_tải đà_nẵng", "thủy_sản", "công_ty mới"]
+
+
+def make_doc(i: int) -> dict:
+    return {
+        "company_name": f"Công ty {i}",
+        "company_name_seg": f"công_ty {WORDS[i % len(WORDS)]} số{i}" + (" mới" if i >= 30 else ""),
+        "address_seg": CITIES[i % len(CITIES)],
+        "industries_str_seg": " ".join(WORDS[(i + j) % len(WORDS)] for j in range(i % 4)),
+    }
+
+
+class TestSegments(unittest.TestCase):
+    """Index gốc + segments phải cho kết quả giống hệt 1 index build lại từ đầu."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.docs = [make_doc(i) for i in range(40)]
+
+        self.full_dir = os.path.join(self.test_dir, "full")
+        self.full_jsonl = build_index(self.full_dir, self.docs, block_size=10)
+
+        self.inc_dir = os.path.join(self.test_dir, "incremental")
+        self.inc_jsonl = build_index(self.inc_dir, self.docs[:25], block_size=10)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def _search_all(self, index_dir, jsonl_path):
+        searcher = BM25Searcher(index_dir=index_dir, jsonl_path=jsonl_path)
+        searcher.load_index()
+        results = {
+            q: [(doc_id, round(score, 9)) for doc_id, score, _ in searcher.search(q, top_k=40)]
+            for q in QUERIES
+        }
+        stats = (searcher.total_docs, round(searcher.avg_doc_length, 9))
+        searcher.close()
+        return results, stats
+
+    def _add_in_batches(self):
+        for start in range(25, 40, 5):
+            name, doc_ids = add_documents(self.inc_dir, self.docs[start:start + 5])
+            self.assertEqual(doc_ids, list(range(start, start + 5)))
+
+    def test_segments_match_full_rebuild(self):
+        self._add_in_batches()
+        self.assertEqual(len(load_manifest(self.inc_dir)["segments"]), 3)
+        self.assertEqual(self._search_all(self.inc_dir, self.inc_jsonl),
+                         self._search_all(self.full_dir, self.full_jsonl))
+
+    def test_merge_keeps_results(self):
+        self._add_in_batches()
+        expected = self._search_all(self.full_dir, self.full_jsonl)
+
+        names = [meta["name"] for meta in load_manifest(self.inc_dir)["segments"]]
+        merged = merge_segments(self.inc_dir, names)
+        manifest = load_manifest(self.inc_dir)
+        self.assertEqual([m["name"] for m in manifest["segments"]], [merged["name"]])
+        self.assertEqual((merged["doc_start"], merged["doc_end"]), (25, 40))
+        self.assertEqual(self._search_all(self.inc_dir, self.inc_jsonl), expected)
+
+    def test_metadata_from_segment(self):
+        add_documents(self.inc_dir, [make_doc(99)])
+        searcher = BM25Searcher(index_dir=self.inc_dir, jsonl_path=self.inc_jsonl)
+        searcher.load_index()
+        self.assertEqual(searcher._get_doc_metadata(25)["company_name"], "Công ty 99")
+        self.assertEqual(searcher._get_doc_metadata(3)["company_name"], "Công ty 3")
+        searcher.close()
+
+    def test_searcher_picks_up_new_segments(self):
+        searcher = BM25Searcher(index_dir=self.inc_dir, jsonl_path=self.inc_jsonl)
+        searcher.load_index()
+        self.assertEqual(searcher.search("mới"), [])
+
+        add_documents(self.inc_dir, self.docs[30:32])
+        results = searcher.search("mới")
+        self.assertEqual(sorted(doc_id for doc_id, _, _ in results), [25, 26])
+        searcher.close()
+
+
+class TestDeletes(TestSegments):
+    """Tombstones lọc kết quả ngay; compaction cho kết quả như build lại."""
+
+    DELETED = [1, 4, 9, 17, 26, 33, 38]
+
+    def _without_deleted(self, results):
+        return {q: [r for r in hits if r[0] not in self.DELETED] for q, hits in results.items()}
+
+    def test_deleted_docs_excluded(self):
+        self._add_in_batches()
+        self.assertEqual(delete_documents(self.inc_dir, self.DELETED), len(self.DELETED))
+        self.assertEqual(delete_documents(self.inc_dir, self.DELETED[:2]), 0)
+        self.assertEqual(load_deletions(self.inc_dir).count, len(self.DELETED))
+
+        # N / df / avgdl giữ nguyên tới khi compaction -> điểm của doc còn lại không đổi
+        results, stats = self._search_all(self.inc_dir, self.inc_jsonl)
+        full_results, full_stats = self._search_all(self.full_dir, self.full_jsonl)
+        self.assertEqual(results, self._without_deleted(full_results))
+        self.assertEqual(stats, full_stats)
+
+    def test_delete_unknown_doc(self):
+        with self.assertRaises(ValueError):
+            delete_documents(self.inc_dir, [25])
+
+    def test_update_moves_document(self):
+        searcher = BM25Searcher(index_dir=self.inc_dir, jsonl_path=self.inc_jsonl)
+        searcher.load_index()
+        self.assertIn(7, [doc_id for doc_id, _, _ in searcher.search("xây_dựng")])
+
+        new_id = update_document(self.inc_dir, 7, make_doc(31))
+        self.assertEqual(new_id, 25)
+        self.assertEqual([doc_id for doc_id, _, _ in searcher.search("mới")], [25])
+        self.assertNotIn(7, [doc_id for doc_id, _, _ in searcher.search("xây_dựng")])
+        self.assertEqual(searcher._get_doc_metadata(25)["company_name"], "Công ty 31")
+        searcher.close()
+
+    def test_compaction_matches_rebuild(self):
+        self._add_in_batches()
+        searcher = BM25Searcher(index_dir=self.inc_dir, jsonl_path=self.inc_jsonl)
+        searcher.load_index()
+        before = searcher.search("xây_dựng hà_nội", top_k=40)
+
+        delete_documents(self.inc_dir, self.DELETED)
+        compacted = compact(self.inc_dir, threshold=0.0)
+        self.assertEqual(compacted[0], "base")
+        self.assertEqual(len(compacted), 4)
+        self.assertEqual(load_manifest(self.inc_dir)["base_generation"], 1)
+
+        # Build lại từ đầu, doc đã xoá thành dòng rỗng (giữ nguyên không gian doc_id)
+        rebuilt_dir = os.path.join(self.test_dir, "rebuilt")
+        rebuilt_jsonl = build_index(rebuilt_dir, [
+            {} if i in self.DELETED else doc for i, doc in enumerate(self.docs)
+        ], block_size=10)
+        self.assertEqual(self._search_all(self.inc_dir, self.inc_jsonl),
+                         self._search_all(rebuilt_dir, rebuilt_jsonl))
+
+        # Searcher đang mở tự load lại index gốc sau compaction
+        after = searcher.search("xây_dựng hà_nội", top_k=40)
+        self.assertNotEqual(before, after)
+        self.assertEqual(searcher.total_docs, 40 - len(self.DELETED))
+        searcher.close()
+
+    def test_compaction_threshold(self):
+        self._add_in_batches()
+        delete_documents(self.inc_dir, [30])
+        self.assertEqual(compact(self.inc_dir, threshold=0.5), [])
+        segment = load_manifest(self.inc_dir)["segments"][1]["name"]
+        self.assertEqual(compact(self.inc_dir, threshold=0.1), [segment])
+
+
+class TestPostingsBlocks(unittest.TestCase):
+    """Skip table trên index thật: list dài hơn 1 block ở index gốc và segment."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.index_dir = os.path.join(self.test_dir, "index")
+        self.jsonl_path = build_index(self.index_dir, [make_doc(i) for i in range(300)], block_size=10)
+        add_documents(self.index_dir, [make_doc(i) for i in range(300, 500)])
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_decode_from_matches_full_postings(self):
+        searcher = BM25Searcher(index_dir=self.index_dir, jsonl_path=self.jsonl_path)
+        searcher.load_index()
+        segment = searcher.segments[0]
+        for source, get_postings in ((searcher.get_postings_blocks, searcher._get_postings),
+                                     (segment.get_postings_blocks, segment.get_postings)):
+            doc_ids, tfs = get_postings("công_ty")
+            blocks = source("công_ty")
+            self.assertGreater(blocks.num_blocks, 1)
+            self.assertEqual(blocks.last_doc_ids[-1], doc_ids[-1])
+            target = int(doc_ids[len(doc_ids) // 2]) + 1
+            part_ids, part_tfs = blocks.decode_from(target)
+            self.assertEqual(part_ids.tolist(), doc_ids[doc_ids >= target].tolist())
+            self.assertEqual(part_tfs.tolist(), tfs[doc_ids >= target].tolist())
+        self.assertIsNone(searcher.get_postings_blocks("không_có"))
+        searcher.close()
+
+
+class TestTieredMergePolicy(unittest.TestCase):
+    """Test chọn segments cần gộp."""
+
+    def _segments(self, sizes):
+        metas, start = [], 0
+        for i, size in enumerate(sizes):
+            metas.append({"name": f"s{i}", "doc_start": start, "doc_end": start + size})
+            start += size
+        return metas
+
+    def test_merges_run_of_same_tier(self):
+        policy = TieredMergePolicy(merge_factor=3, min_segment_docs=10)
+        self.assertIsNone(policy.find_merge(self._segments([5, 5])))
+        self.assertEqual(policy.find_merge(self._segments([500, 5, 5, 5])), ["s1", "s2", "s3"])
+        # Khác tier xen giữa -> không gộp (chỉ gộp segments liền kề)
+        self.assertIsNone(policy.find_merge(self._segments([5, 5, 50, 5])))
+
+    def test_tier_grows_with_size(self):
+        policy = TieredMergePolicy(merge_factor=10, min_segment_docs=100)
+        tiers = [policy.tier({"doc_start": 0, "doc_end": n}) for n in [10, 100, 999, 1000, 10_000]]
+        self.assertEqual(tiers, [0, 1, 1, 2, 3])
+
+
+class TestMaybeMerge(unittest.TestCase):
+    """maybe_merge gộp theo policy cho tới khi ổn định."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_cascading_merges(self):
+        for i in range(9):
+            add_documents(self.test_dir, [make_doc(i)])
+        policy = TieredMergePolicy(merge_factor=3, min_segment_docs=2)
+        self.assertEqual(maybe_merge(self.test_dir, policy), 4)
+        segments = load_manifest(self.test_dir)["segments"]
+        self.assertEqual([(m["doc_start"], m["doc_end"]) for m in segments], [(0, 9)])
+        remaining = os.listdir(os.path.join(self.test_dir, "segments"))
+        self.assertEqual(remaining, [segments[0]["name"]])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,120 @@
+"""
+Unit Tests for Doc-Range Shards and Scatter-Gather Search
+==========================================================
+"""
+
+import io
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import contextlib
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.indexer.mmap_term_dict import MmapTermDict, TERM_DICT_FILENAME
+from src.indexer.shards import shard_ranges, document_offsets, build_shards, load_shards_meta
+from src.indexer.spimi import build_spimi_index
+from src.indexer.merging import merge_blocks
+from src.ranking.bm25 import BM25Searcher
+from src.ranking.sharded import ShardedSearcher
+
+
+SAMPLE_JSONL = os.path.join(os.path.dirname(__file__), "..", "data_sample", "sample.jsonl")
+QUERIES = ["công ty xây dựng", "thương mại dịch vụ", "hà nội", "phan mem", "vận tải hàng hoá"]
+
+
+class TestShardRanges(unittest.TestCase):
+    """Test chia khoảng doc_id."""
+
+    def test_ranges_cover_all_docs(self):
+        self.assertEqual(shard_ranges(10, 3), [(0, 3), (3, 7), (7, 10)])
+        self.assertEqual(shard_ranges(2, 3), [(0, 1), (1, 1), (1, 2)])
+        self.assertEqual(shard_ranges(5, 1), [(0, 5)])
+
+    def test_document_offsets_skip_invalid_lines(self):
+        with tempfile.NamedTemporaryFile("wb", suffix=".jsonl", delete=False) as f:
+            f.write(b'{"a": 1}\n\n{broken\n{"b": 2}\n')
+        try:
+            self.assertEqual(document_offsets(f.name).tolist(), [0, 18])
+        finally:
+            os.remove(f.name)
+
+
+class TestShardedSearch(unittest.TestCase):
+    """3 shard vs index không chia: cùng top-k, cùng điểm, cùng số doc khớp."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.test_dir = tempfile.mkdtemp()
+        cls.index_dir = os.path.join(cls.test_dir, "index")
+        cls.shards_dir = os.path.join(cls.test_dir, "shards")
+        with contextlib.redirect_stdout(io.StringIO()):
+            build_spimi_index(SAMPLE_JSONL, os.path.join(cls.index_dir, "blocks"), block_size=30)
+            merge_blocks(os.path.join(cls.index_dir, "blocks"), cls.index_dir)
+            build_shards(SAMPLE_JSONL, cls.shards_dir, num_shards=3, block_size=30)
+        cls.reference = BM25Searcher(cls.index_dir, SAMPLE_JSONL, use_impacts=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            cls.reference.load_index()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.reference.close()
+        shutil.rmtree(cls.test_dir)
+
+    def assert_same_results(self, sharded: ShardedSearcher, **kwargs):
+        for query in QUERIES:
+            with contextlib.redirect_stdout(io.StringIO()):
+                expected = self.reference.search(query, 10, **kwargs)
+                results = sharded.search(query, 10, **kwargs)
+            self.assertEqual([doc_id for doc_id, _, _ in results],
+                             [doc_id for doc_id, _, _ in expected], query)
+            for (_, score, meta), (_, expected_score, expected_meta) in zip(results, expected):
+                self.assertAlmostEqual(score, expected_score, places=9)
+                self.assertEqual(meta, expected_meta)
+            self.assertEqual(sharded.last_match_count, self.reference.last_match_count, query)
+            self.assertEqual(sharded.last_suggestion, self.reference.last_suggestion, query)
+
+    def test_global_statistics(self):
+        meta = load_shards_meta(self.shards_dir)
+        self.assertEqual([shard["doc_start"] for shard in meta["shards"]], [0, 33, 67])
+        self.assertEqual(meta["total_docs"], self.reference.total_docs)
+        global_terms = MmapTermDict(os.path.join(self.shards_dir, TERM_DICT_FILENAME))
+        try:
+            self.assertEqual(len(global_terms), self.reference.vocab_size)
+            for term in ("xây_dựng", "hà_nội", "dịch_vụ"):
+                self.assertEqual(global_terms[term][0], self.reference.term_dict[term][0])
+        finally:
+            global_terms.close()
+
+    def test_in_process_matches_single_index(self):
+        sharded = ShardedSearcher(self.shards_dir, SAMPLE_JSONL, processes=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            sharded.load_index()
+        try:
+            self.assert_same_results(sharded)
+            self.assert_same_results(sharded, field_weights={"company_name": 4.0})
+        finally:
+            sharded.close()
+
+    def test_worker_processes(self):
+        sharded = ShardedSearcher(self.shards_dir, SAMPLE_JSONL)
+        with contextlib.redirect_stdout(io.StringIO()):
+            sharded.load_index()
+        try:
+            self.assert_same_results(sharded)
+            self.assertEqual(sharded.get_stats()["shards"], 3)
+            # Lỗi trong worker được raise lại ở coordinator, worker vẫn chạy tiếp
+            with self.assertRaises(ValueError):
+                sharded.search("hà nội", field_weights={"nope": 1.0})
+            self.assertEqual(sharded.suggest("xay")["terms"], self.reference.suggest("xay")["terms"])
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertTrue(sharded.search("hà nội"))
+        finally:
+            sharded.close()
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -7,14 +7,18 @@ import os
 import sys
 import json
 import shutil
-import pickle
 import tempfile
 import unittest
 
 # Add project root to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
-from src.indexer.spimi import tokenize, spimi_invert, write_block_to_disk
+from src.indexer.spimi import (
+    tokenize, spimi_invert, write_block_to_disk, build_spimi_index, BlockInverter,
+)
+from src.indexer.block_format import read_block, list_block_files, BlockWriter
+from src.indexer.merging import merge_blocks, plan_term_ranges
+from src.indexer.mmap_term_dict import MmapTermDict
 
 
 class TestTokenize(unittest.TestCase):
@@ -95,8 +99,7 @@ class TestWriteBlock(unittest.TestCase):
         
         self.assertTrue(os.path.exists(path))
         
-        with open(path, "rb") as f:
-            loaded = pickle.load(f)
+        loaded = read_block(path)
         
         self.assertEqual(loaded["apple"], [(1, 2), (2, 1)])
         self.assertEqual(loaded["banana"], [(1, 1), (3, 1)])
@@ -110,12 +113,170 @@ class TestWriteBlock(unittest.TestCase):
         
         path = write_block_to_disk(block_index, 0, self.test_dir)
         
-        with open(path, "rb") as f:
-            loaded = pickle.load(f)
+        loaded = read_block(path)
         
         keys = list(loaded.keys())
         self.assertEqual(keys, sorted(keys))
 
 
+class TestParallelBuild(unittest.TestCase):
+    """Test chế độ build song song cho kết quả giống hệt chế độ tuần tự."""
+    
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.jsonl_path = os.path.join(self.test_dir, "docs.jsonl")
+        with open(self.jsonl_path, "w", encoding="utf-8") as f:
+            for i in range(25):
+                doc = {
+                    "company_name_seg": f"công_ty tnhh số{i}",
+                    "address_seg": "hà_nội" if i % 2 else "đà_nẵng",
+                    "industries_str_seg": "xây_dựng" if i % 3 else "",
+                }
+                f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+                if i == 10:
+                    f.write("\n")  # dòng rỗng giữa file
+    
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+    
+    def _build(self, name, workers):
+        blocks_dir = os.path.join(self.test_dir, name, "blocks")
+        block_files, total_docs, doc_store = build_spimi_index(
+            self.jsonl_path, blocks_dir, block_size=4, workers=workers
+        )
+        blocks = [read_block(path) for path in block_files]
+        return total_docs, list(doc_store.lengths), list(doc_store.offsets), blocks
+    
+    def test_parallel_matches_serial(self):
+        serial = self._build("serial", workers=1)
+        parallel = self._build("parallel", workers=3)
+        self.assertEqual(serial, parallel)
+        self.assertEqual(serial[0], 25)
+
+
+class TestMemoryBudget(unittest.TestCase):
+    """Test flush block theo memory budget thay vì số documents cố định."""
+    
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.jsonl_path = os.path.join(self.test_dir, "docs.jsonl")
+        with open(self.jsonl_path, "w", encoding="utf-8") as f:
+            for i in range(30):
+                doc = {
+                    "company_name_seg": f"công_ty tnhh số{i}",
+                    "industries_str_seg": " ".join(f"ngành{j}" for j in range(i % 7 * 10)),
+                }
+                f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+    
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+    
+    def _build_and_merge(self, name, memory_budget_mb):
+        blocks_dir = os.path.join(self.test_dir, name, "blocks")
+        block_files, _, _ = build_spimi_index(
+            self.jsonl_path, blocks_dir, block_size=1000, memory_budget_mb=memory_budget_mb
+        )
+        index_dir = os.path.dirname(blocks_dir)
+        merge_blocks(blocks_dir, index_dir)
+        with open(os.path.join(index_dir, "postings.bin"), "rb") as f:
+            return block_files, f.read()
+    
+    def test_inverter_matches_spimi_invert(self):
+        docs = [(0, ["a1", "b2", "a1"]), (3, ["b2", "c3"]), (7, ["a1"])]
+        inverter = BlockInverter()
+        token_stream = []
+        for doc_id, tokens in docs:
+            inverter.add_document(doc_id, tokens)
+            token_stream.extend((token, doc_id) for token in tokens)
+        
+        path = inverter.write(os.path.join(self.test_dir, "block_0000.blk"))
+        self.assertEqual(read_block(path), spimi_invert(token_stream))
+        self.assertEqual(inverter.num_postings, 5)
+        self.assertGreater(inverter.estimated_bytes, 0)
+    
+    def test_small_budget_splits_blocks(self):
+        big_blocks, big_postings = self._build_and_merge("big", memory_budget_mb=256)
+        small_blocks, small_postings = self._build_and_merge("small", memory_budget_mb=0.005)
+        self.assertEqual(len(big_blocks), 1)
+        self.assertGreater(len(small_blocks), 1)
+        # Thứ tự tên file = thứ tự doc_id
+        self.assertEqual(small_blocks, sorted(small_blocks))
+        self.assertEqual(big_postings, small_postings)
+
+
+class TestMergeBlocks(unittest.TestCase):
+    """Test K-way merge streaming (1 pass và nhiều pass)."""
+    
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.blocks_dir = os.path.join(self.test_dir, "blocks")
+        os.makedirs(self.blocks_dir)
+        # 5 blocks, doc_id tăng dần theo block; sample dày để có nhiều khoảng term
+        for block_num in range(5):
+            base = block_num * 10
+            block_index = {
+                "chung": [(base, 1), (base + 1, 2)],
+                f"riêng{block_num}": [(base + 2, 3)],
+            }
+            if block_num % 2 == 0:
+                block_index["chẵn"] = [(base + 3, 1)]
+            for j in range(block_num, 20):
+                block_index[f"từ{j:02d}"] = [(base + 4, j + 1)]
+            path = os.path.join(self.blocks_dir, f"block_{block_num:04d}.blk")
+            with BlockWriter(path, sample_interval=3) as writer:
+                for term in sorted(block_index):
+                    writer.add(term, *zip(*block_index[term]))
+    
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+    
+    def _merge(self, name, max_fan_in=64, workers=1):
+        index_dir = os.path.join(self.test_dir, name)
+        os.makedirs(index_dir)
+        merge_blocks(self.blocks_dir, index_dir, max_fan_in=max_fan_in, workers=workers)
+        with open(os.path.join(index_dir, "postings.bin"), "rb") as f:
+            postings = f.read()
+        term_dict = MmapTermDict(os.path.join(index_dir, "term_dict.bin"))
+        entries = dict(term_dict.items())
+        term_dict.close()
+        return entries, postings
+    
+    def test_single_pass(self):
+        entries, _ = self._merge("single", max_fan_in=64)
+        self.assertEqual(entries["chung"][0], 10)
+        self.assertEqual(entries["chẵn"][0], 3)
+        self.assertEqual(entries["riêng4"][0], 1)
+        self.assertEqual(entries["từ19"][0], 5)
+    
+    def test_multi_pass_matches_single_pass(self):
+        single = self._merge("single", max_fan_in=64)
+        multi = self._merge("multi", max_fan_in=2)
+        self.assertEqual(single, multi)
+        # Block trung gian đã được dọn sạch, block gốc còn nguyên
+        self.assertFalse(os.path.exists(os.path.join(self.blocks_dir, "_merge_tmp")))
+        self.assertEqual(len(list_block_files(self.blocks_dir)), 5)
+    
+    def test_term_ranges_cover_vocabulary(self):
+        ranges = plan_term_ranges(list_block_files(self.blocks_dir), 4)
+        self.assertGreater(len(ranges), 1)
+        self.assertIsNone(ranges[0][0])
+        self.assertIsNone(ranges[-1][1])
+        for (_, hi), (lo, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(hi, lo)
+    
+    def test_parallel_matches_serial(self):
+        serial = self._merge("serial")
+        parallel = self._merge("parallel", workers=2)
+        self.assertEqual(serial, parallel)
+        parallel_multi_pass = self._merge("parallel_multi", max_fan_in=2, workers=3)
+        self.assertEqual(serial, parallel_multi_pass)
+    
+    def test_block_writer_rejects_unsorted_terms(self):
+        with BlockWriter(os.path.join(self.test_dir, "bad.blk")) as writer:
+            writer.add("b", [1], [1])
+            with self.assertRaises(ValueError):
+                writer.add("a", [2], [1])
+
+
 if __name__ == "__main__":
     unittest.main(verbosity=2)
@@ -0,0 +1,136 @@
+"""
+Unit Tests for the Prefix Autocomplete Index
+=============================================
+"""
+
+import os
+import sys
+import json
+import random
+import shutil
+import tempfile
+import unittest
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.indexer.suggest import (
+    suggest_key, name_key, has_suggest_index, load_suggest_meta, write_prefix_index, PrefixIndex,
+)
+from src.indexer.spimi import build_spimi_index
+from src.indexer.merging import merge_blocks
+from src.indexer.segments import add_documents, delete_documents, compact_base
+from src.ranking.bm25 import BM25Searcher
+
+
+DOCS = [
+    {"company_name": "CÔNG TY TNHH XÂY DỰNG HOÀ BÌNH", "company_name_seg": "CÔNG_TY TNHH XÂY_DỰNG HOÀ_BÌNH",
+     "address_seg": "hà_nội", "industries_str_seg": "xây_dựng nhà các loại"},
+    {"company_name": "CÔNG TY CỔ PHẦN XÂY LẮP AN PHÁT", "company_name_seg": "CÔNG_TY CỔ_PHẦN XÂY_LẮP AN_PHÁT",
+     "address_seg": "hà_nội", "industries_str_seg": "xây_dựng"},
+    {"company_name": "CÔNG TY TNHH XÂY DỰNG HOÀ BÌNH", "company_name_seg": "CÔNG_TY TNHH XÂY_DỰNG HOÀ_BÌNH",
+     "address_seg": "đà_nẵng", "industries_str_seg": "xây_dựng"},
+    {"company_name": "CÔNG TY CỔ PHẦN SỮA VIỆT NAM", "company_name_seg": "CÔNG_TY CỔ_PHẦN SỮA VIỆT_NAM",
+     "address_seg": "hồ_chí_minh", "industries_str_seg": "sữa"},
+    {"company_name": "DOANH NGHIỆP TƯ NHÂN HÀ NAM", "company_name_seg": "DOANH_NGHIỆP TƯ_NHÂN HÀ_NAM",
+     "address_seg": "hà_nam", "industries_str_seg": "vận_tải"},
+]
+
+
+class TestSuggestKeys(unittest.TestCase):
+    """Test key gợi ý và bỏ loại hình doanh nghiệp."""
+
+    def test_keys(self):
+        self.assertEqual(suggest_key("Xây_Dựng (Hà-Nội)"), "xay dung ha noi")
+        self.assertEqual(name_key("CÔNG_TY TNHH MTV ẨM_THỰC BẾP VIỆT"), "am thuc bep viet")
+        self.assertEqual(name_key("Chi nhánh Công ty Cổ phần ABC"), "abc")
+        self.assertEqual(name_key("CÔNG TY TNHH"), "")
+        self.assertEqual(name_key("cpt group"), "cpt group")
+
+
+class TestPrefixIndex(unittest.TestCase):
+    """Top-N theo tiền tố (nút tính sẵn + chọn trực tiếp) vs duyệt toàn bộ."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_matches_brute_force(self):
+        rng = random.Random(301)
+        for scan_limit in (1, 3, 16):
+            keys = {"".join(rng.choice("ab c") for _ in range(rng.randint(1, 6))).strip() for _ in range(400)}
+            keys.discard("")
+            entries = {key: (rng.randint(1, 5), key.upper()) for key in keys}
+            meta = write_prefix_index(self.test_dir, "terms", entries, top_n=4, scan_limit=scan_limit)
+            self.assertGreater(meta["num_nodes"], 0)
+            index = PrefixIndex(self.test_dir, "terms")
+            ordered = sorted(keys)
+            prefixes = {key[:i] for key in keys for i in range(1, len(key) + 1)} | {"d", "b c a b c a b"}
+            for prefix in prefixes:
+                expected = sorted((key for key in ordered if key.startswith(prefix)),
+                                  key=lambda key: (-entries[key][0], key))[:4]
+                self.assertEqual(index.complete(prefix, 4),
+                                 [(entries[key][1], entries[key][0]) for key in expected], prefix)
+            self.assertEqual(index.complete(""), [])
+            index.close()
+
+
+class TestSuggestSearch(unittest.TestCase):
+    """Gợi ý term / tên công ty qua BM25Searcher."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.index_dir = os.path.join(self.test_dir, "index")
+        os.makedirs(self.index_dir)
+        self.jsonl_path = os.path.join(self.index_dir, "docs.jsonl")
+        with open(self.jsonl_path, "w", encoding="utf-8") as f:
+            for doc in DOCS:
+                f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+        blocks_dir = os.path.join(self.index_dir, "blocks")
+        build_spimi_index(self.jsonl_path, blocks_dir, block_size=2)
+        merge_blocks(blocks_dir, self.index_dir, jsonl_path=self.jsonl_path)
+        self.searcher = BM25Searcher(index_dir=self.index_dir, jsonl_path=self.jsonl_path)
+        self.searcher.load_index()
+
+    def tearDown(self):
+        self.searcher.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_complete_terms(self):
+        suggest = self.searcher.suggest
+        self.assertEqual(suggest("xay")["terms"], ["xây dựng"])
+        self.assertEqual(suggest("công ty xây d")["terms"], ["công ty xây dựng"])
+        # "hà_nam": df 1 < SUGGEST_MIN_DF
+        self.assertEqual(suggest("Ha N")["terms"], ["hà nội"])
+        self.assertEqual(suggest("hà ", limit=1)["terms"], ["hà nội"])
+        self.assertEqual(suggest("zzz"), {"terms": [], "companies": []})
+
+    def test_complete_names(self):
+        suggest = self.searcher.suggest
+        # Bỏ loại hình ở đầu: "xây" khớp phần tên riêng, tên trùng xếp trước
+        self.assertEqual(suggest("xây")["companies"],
+                         ["CÔNG TY TNHH XÂY DỰNG HOÀ BÌNH", "CÔNG TY CỔ PHẦN XÂY LẮP AN PHÁT"])
+        self.assertEqual(suggest("cong ty co phan sua")["companies"], ["CÔNG TY CỔ PHẦN SỮA VIỆT NAM"])
+        self.assertEqual(suggest("ha nam")["companies"], ["DOANH NGHIỆP TƯ NHÂN HÀ NAM"])
+        self.assertEqual(suggest("công ty tnhh")["companies"], [])
+
+    def test_merge_without_jsonl_keeps_names(self):
+        merge_blocks(os.path.join(self.index_dir, "blocks"), self.index_dir)
+        self.assertTrue(has_suggest_index(self.index_dir, "names"))
+        self.assertEqual(load_suggest_meta(self.index_dir, "names")["num_keys"], 4)
+
+    def test_compaction_rebuilds_terms(self):
+        add_documents(self.index_dir, [{"company_name_seg": "vận_tải huế"}])
+        delete_documents(self.index_dir, [0, 1, 2])
+        compact_base(self.index_dir)
+        self.assertEqual(self.searcher.suggest("xay")["terms"], [])
+        # Tên công ty không phụ thuộc term dict: giữ nguyên
+        self.assertEqual(len(self.searcher.suggest("xay")["companies"]), 2)
+        self.assertEqual(self.searcher.get_stats()["suggest_keys"],
+                         load_suggest_meta(self.index_dir, "terms")["num_keys"] + 4)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,57 @@
+"""
+Unit Tests for Top-k Selection
+===============================
+"""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.ranking.topk import top_k_order, top_k_items
+
+
+class TestTopKOrder(unittest.TestCase):
+    """top_k_order == np.lexsort((doc_ids, -scores))[:k]."""
+
+    def test_matches_full_sort(self):
+        rng = np.random.default_rng(7)
+        for _ in range(500):
+            n = int(rng.integers(0, 80))
+            k = int(rng.integers(0, 90))
+            # Ít giá trị khác nhau -> nhiều doc đồng điểm ở biên top-k
+            scores = rng.integers(0, 6, n).astype(np.float64)
+            doc_ids = rng.permutation(10 * n + 1)[:n]
+            expected = np.lexsort((doc_ids, -scores))[:k]
+            np.testing.assert_array_equal(top_k_order(scores, k, doc_ids), expected)
+
+    def test_default_tie_key_is_position(self):
+        scores = np.array([1.0, 3.0, 3.0, 2.0, 3.0])
+        self.assertEqual(top_k_order(scores, 2).tolist(), [1, 2])
+        self.assertEqual(top_k_order(scores, 0).tolist(), [])
+        self.assertEqual(top_k_order(np.empty(0), 5).tolist(), [])
+
+
+class TestTopKItems(unittest.TestCase):
+    """top_k_items == sorted(items, key=key, reverse=True)[:k]."""
+
+    def test_matches_sorted(self):
+        rng = np.random.default_rng(11)
+        for _ in range(200):
+            n = int(rng.integers(0, 50))
+            k = int(rng.integers(0, 60))
+            items = list(zip(range(n), rng.integers(0, 4, n).tolist()))
+            self.assertEqual(top_k_items(items, k, key=lambda x: x[1]),
+                             sorted(items, key=lambda x: x[1], reverse=True)[:k])
+
+    def test_dict_items(self):
+        scores = {5: 0.5, 2: 1.5, 9: 1.0}
+        self.assertEqual(top_k_items(scores.items(), 2, key=lambda x: x[1]), [(2, 1.5), (9, 1.0)])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)